@@ -0,0 +1,28 @@
+# Backtest Initialization
+"""
+回测模块
+- data: 从本地缓存或数据库加载K线/指标列为 NumPy 数组
+- indicators: 向量化指标计算
+- rules: 信号规则（目标仓位序列）
+- engine: 成交模拟（手续费/滑点）与 PnL/回撤统计
+- sweep: 进程池并行参数扫描
+"""
+
+# 延迟导入，避免在包级别导入时出现依赖错误
+def get_engine():
+    from . import engine
+    return engine
+
+def get_rules():
+    from . import rules
+    return rules
+
+def get_sweep():
+    from . import sweep
+    return sweep
+
+def get_data():
+    from . import data
+    return data
+
+__all__ = ['get_engine', 'get_rules', 'get_sweep', 'get_data']
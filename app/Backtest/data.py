@@ -0,0 +1,125 @@
+# app/Backtest/data.py
+"""
+data.py
+- 回测数据加载：K线列与 ma_<symbol> 指标列统一转换为按 open_time 对齐的 NumPy 数组
+- 优先使用本地列式缓存（kline_cache，内存映射），不可用时回退到数据库读取
+"""
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+CANDLE_COLUMNS = (
+    'open_time', 'close_time', 'open', 'high', 'low', 'close', 'volume',
+    'quote_asset_volume', 'num_trades', 'taker_buy_base_vol', 'taker_buy_quote_vol',
+)
+
+
+def _from_ms(ms: int) -> datetime:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc)
+
+
+def _load_from_db(symbol: str, interval: str, start_ms: Optional[int]) -> Dict[str, np.ndarray]:
+    """从数据库读取（dbget_kline，支持所有存储后端与布局）"""
+    from DatabaseOperator.pg_operator import Session, dbget_kline
+    from DatabaseOperator.kline_store import kline_table_name_for
+
+    start_time = None if start_ms is None else _from_ms(start_ms)
+    with Session() as session:
+        rows = dbget_kline(session, kline_table_name_for(symbol, interval), symbol, order_by_column='open_time',
+                           ascending=True, interval=interval, start_time=start_time)
+
+    arrays = {}
+    for name in CANDLE_COLUMNS:
+        if name in ('open_time', 'close_time'):
+            arrays[name] = np.fromiter((int(getattr(row, name).timestamp() * 1000) for row in rows),
+                                       dtype=np.int64, count=len(rows))
+        elif name == 'num_trades':
+            arrays[name] = np.fromiter((getattr(row, name) or 0 for row in rows), dtype=np.int64, count=len(rows))
+        else:
+            arrays[name] = np.fromiter((np.nan if getattr(row, name) is None else getattr(row, name) for row in rows),
+                                       dtype=np.float64, count=len(rows))
+    return arrays
+
+
+def load_candles(symbol: str, interval: str = '1m', start_ms: Optional[int] = None,
+                 end_ms: Optional[int] = None, use_cache: bool = True, sync: bool = True) -> Dict[str, np.ndarray]:
+    """
+    加载K线列为 NumPy 数组（按 open_time 升序）
+
+    Args:
+        symbol: 交易对
+        interval: K线周期
+        start_ms: 起始开盘时间（毫秒，含）
+        end_ms: 结束开盘时间（毫秒，不含）
+        use_cache: 是否优先使用本地缓存（需要 pyarrow）
+        sync: 使用缓存前是否先从数据库增量同步
+
+    Returns:
+        Dict[str, np.ndarray]: CANDLE_COLUMNS 中的各列
+    """
+    from DataProcessingCalculator import kline_cache
+
+    symbol = symbol.upper()
+    if use_cache and kline_cache.is_cache_available():
+        if sync:
+            kline_cache.sync_from_db(symbol, interval)
+        arrays = kline_cache.load_klines(symbol, interval, start_ms=start_ms, end_ms=end_ms)
+        if len(arrays['open_time']):
+            return arrays
+        logger.warning(f"[Backtest] {symbol} {interval} 本地缓存为空，改为从数据库读取")
+
+    arrays = _load_from_db(symbol, interval, start_ms)
+    if end_ms is not None:
+        hi = int(np.searchsorted(arrays['open_time'], end_ms, side='left'))
+        arrays = {name: values[:hi] for name, values in arrays.items()}
+    return arrays
+
+
+def load_indicator_columns(symbol: str, open_time_ms: np.ndarray,
+                           columns: Iterable[str]) -> Dict[str, np.ndarray]:
+    """
+    读取 DataAnalyze 写入的 ma_<symbol> 指标表，并按 open_time 对齐到K线
+    指标表中缺失的时间点填充 NaN
+
+    Args:
+        symbol: 交易对
+        open_time_ms: K线开盘时间数组（毫秒，升序）
+        columns: 指标列名，如 ["ema5", "ema20", "macd"]
+
+    Returns:
+        Dict[str, np.ndarray]: 与 open_time_ms 等长的指标数组
+    """
+    from sqlalchemy import MetaData, Table, select
+    from DatabaseOperator.pg_operator import engine
+
+    columns = list(columns)
+    table = Table(f"ma_{symbol.lower()}", MetaData(), autoload_with=engine)
+    unknown = [c for c in columns if c not in table.c]
+    if unknown:
+        raise ValueError(f"指标表 {table.name} 中不存在列: {unknown}")
+
+    query = select(table.c.open_time, *[table.c[c] for c in columns]).order_by(table.c.open_time)
+    if len(open_time_ms):
+        query = query.where(table.c.open_time >= _from_ms(int(open_time_ms[0])))
+    with engine.connect() as connection:
+        rows = connection.execute(query).fetchall()
+
+    source_time = np.fromiter((int(row[0].timestamp() * 1000) for row in rows), dtype=np.int64, count=len(rows))
+    index = np.searchsorted(source_time, open_time_ms)
+    index_clipped = np.minimum(index, max(len(source_time) - 1, 0))
+    matched = (index < len(source_time)) & (source_time[index_clipped] == open_time_ms) if len(source_time) else \
+        np.zeros(len(open_time_ms), dtype=bool)
+
+    result = {}
+    for offset, name in enumerate(columns, start=1):
+        values = np.fromiter((np.nan if row[offset] is None else row[offset] for row in rows),
+                             dtype=np.float64, count=len(rows))
+        aligned = np.full(len(open_time_ms), np.nan)
+        if len(values):
+            aligned[matched] = values[index_clipped[matched]]
+        result[name] = aligned
+    return result
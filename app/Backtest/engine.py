@@ -0,0 +1,162 @@
+# app/Backtest/engine.py
+"""
+engine.py
+- 向量化成交模拟：规则在第 t 根K线收盘时给出目标仓位，于第 t+1 根开盘成交（避免未来函数）
+- 仓位以权益比例表示（1 = 满仓做多），每次调仓按变化量收取手续费与滑点
+- 仓位变化即成交事件，生成成交明细；同时统计收益、最大回撤、夏普等指标
+"""
+import logging
+from typing import Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MS_PER_YEAR = 365 * 24 * 60 * 60 * 1000
+
+
+class BacktestResult:
+    """单次回测结果"""
+
+    def __init__(self, open_time: np.ndarray, positions: np.ndarray, returns: np.ndarray,
+                 equity: np.ndarray, trades: List[dict], metrics: Dict[str, float]):
+        self.open_time = open_time
+        self.positions = positions
+        self.returns = returns
+        self.equity = equity
+        self.trades = trades
+        self.metrics = metrics
+
+    def summary(self) -> Dict[str, float]:
+        """指标字典（可直接序列化）"""
+        return dict(self.metrics)
+
+    def __repr__(self):
+        return f"BacktestResult({', '.join(f'{k}={v:.4f}' for k, v in self.metrics.items())})"
+
+
+def _bars_per_year(open_time: np.ndarray) -> float:
+    """由K线间隔推算年化因子"""
+    if len(open_time) < 2:
+        return 1.0
+    step = float(np.median(np.diff(open_time)))
+    return MS_PER_YEAR / step if step > 0 else 1.0
+
+
+def _max_drawdown(equity: np.ndarray) -> float:
+    if not len(equity):
+        return 0.0
+    peak = np.maximum.accumulate(equity)
+    return float(np.max(1.0 - equity / peak))
+
+
+def _holding_returns(positions: np.ndarray, returns: np.ndarray) -> np.ndarray:
+    """每段连续持仓（仓位不变且非零）的累计收益"""
+    if not len(positions):
+        return np.empty(0)
+    starts = np.flatnonzero(np.diff(positions, prepend=np.nan) != 0)
+    segment_growth = np.multiply.reduceat(1.0 + returns, starts) - 1.0
+    held = positions[starts] != 0
+    return segment_growth[held]
+
+
+def simulate(data: Dict[str, np.ndarray], target: np.ndarray, fee_rate: float = 0.001,
+             slippage_bps: float = 1.0, initial_cash: float = 10000.0,
+             record_trades: bool = True) -> BacktestResult:
+    """
+    根据目标仓位序列模拟成交
+
+    Args:
+        data: 至少包含 open_time/open/close 列
+        target: 每根K线收盘时的目标仓位（与 close 等长）
+        fee_rate: 手续费率（按成交额，0.001 = 0.1%）
+        slippage_bps: 滑点（基点），买入价上浮、卖出价下浮
+        initial_cash: 初始权益
+        record_trades: 是否生成成交明细（参数扫描时关闭以节省时间）
+
+    Returns:
+        BacktestResult
+    """
+    open_price = np.asarray(data['open'], dtype=np.float64)
+    close_price = np.asarray(data['close'], dtype=np.float64)
+    open_time = np.asarray(data['open_time'])
+    count = len(close_price)
+    if len(target) != count:
+        raise ValueError(f"目标仓位长度 {len(target)} 与K线数量 {count} 不一致")
+    if count == 0:
+        return BacktestResult(open_time, np.empty(0), np.empty(0), np.empty(0), [], {
+            'total_return': 0.0, 'max_drawdown': 0.0, 'sharpe': 0.0, 'trades': 0,
+            'win_rate': 0.0, 'exposure': 0.0, 'final_equity': initial_cash,
+        })
+
+    # 第 t 根收盘的决策在第 t+1 根开盘执行
+    positions = np.zeros(count)
+    positions[1:] = np.nan_to_num(np.asarray(target[:-1], dtype=np.float64))
+
+    # 持仓区间为 开盘 t -> 开盘 t+1，最后一根以收盘价结算
+    next_open = np.append(open_price[1:], close_price[-1])
+    bar_returns = next_open / open_price - 1.0
+
+    delta = np.diff(positions, prepend=0.0)
+    slippage = slippage_bps / 10000.0
+    returns = positions * bar_returns - np.abs(delta) * (fee_rate + slippage)
+    equity = initial_cash * np.cumprod(1.0 + returns)
+
+    trade_index = np.flatnonzero(delta)
+    trades = []
+    if record_trades and len(trade_index):
+        equity_before = np.concatenate(([initial_cash], equity[:-1]))[trade_index]
+        side = np.sign(delta[trade_index])
+        fill_price = open_price[trade_index] * (1.0 + side * slippage)
+        quantity = delta[trade_index] * equity_before / fill_price
+        fees = np.abs(quantity) * fill_price * fee_rate
+        for i, idx in enumerate(trade_index):
+            trades.append({
+                'open_time': int(open_time[idx]),
+                'side': 'BUY' if side[i] > 0 else 'SELL',
+                'price': float(fill_price[i]),
+                'quantity': float(abs(quantity[i])),
+                'fee': float(fees[i]),
+                'position': float(positions[idx]),
+            })
+
+    holding = _holding_returns(positions, returns)
+    volatility = float(np.std(returns))
+    metrics = {
+        'total_return': float(equity[-1] / initial_cash - 1.0),
+        'max_drawdown': _max_drawdown(equity),
+        'sharpe': float(np.mean(returns) / volatility * np.sqrt(_bars_per_year(open_time))) if volatility > 0 else 0.0,
+        'trades': int(len(trade_index)),
+        'win_rate': float(np.mean(holding > 0)) if len(holding) else 0.0,
+        'exposure': float(np.mean(positions != 0)),
+        'final_equity': float(equity[-1]),
+    }
+    return BacktestResult(open_time, positions, returns, equity, trades, metrics)
+
+
+def run_backtest(symbol: str, rule: str, params: Optional[dict] = None, interval: str = '1m',
+                 start_ms: Optional[int] = None, end_ms: Optional[int] = None,
+                 fee_rate: float = 0.001, slippage_bps: float = 1.0, initial_cash: float = 10000.0,
+                 indicator_columns: Optional[List[str]] = None) -> BacktestResult:
+    """
+    加载数据、计算信号并模拟成交
+
+    Args:
+        symbol: 交易对
+        rule: rules.RULES 中的规则名
+        params: 规则参数
+        interval: K线周期
+        start_ms / end_ms: 回测区间（开盘时间毫秒）
+        fee_rate / slippage_bps / initial_cash: 见 simulate
+        indicator_columns: 需要从 ma_<symbol> 读取并对齐的指标列
+    """
+    from Backtest.data import load_candles, load_indicator_columns
+    from Backtest.rules import get_rule
+
+    data = load_candles(symbol, interval, start_ms=start_ms, end_ms=end_ms)
+    if indicator_columns:
+        data.update(load_indicator_columns(symbol, data['open_time'], indicator_columns))
+    target = get_rule(rule)(data, **(params or {}))
+    result = simulate(data, target, fee_rate=fee_rate, slippage_bps=slippage_bps, initial_cash=initial_cash)
+    logger.info(f"[Backtest] {symbol} {interval} {rule} {params or {}}: {result.metrics}")
+    return result
@@ -0,0 +1,49 @@
+# app/Backtest/indicators.py
+"""
+indicators.py
+- 面向回测的向量化指标，输入输出均为 NumPy 数组
+- EMA/MACD 的口径与 DataAnalyze.calculate_ema / calculate_macd 一致（adjust=False, min_periods=1），
+  保证回测信号与线上存储的 ma_<symbol> 指标相同
+"""
+import numpy as np
+import pandas as pd
+
+
+def ema(values: np.ndarray, span: int) -> np.ndarray:
+    """指数移动平均（pandas ewm 的 C 实现，单序列最快）"""
+    if span <= 0:
+        raise ValueError("span 必须是正整数。")
+    return pd.Series(values, copy=False).ewm(span=span, adjust=False, min_periods=1).mean().to_numpy()
+
+
+def sma(values: np.ndarray, window: int) -> np.ndarray:
+    """简单移动平均，前 window-1 个值为 NaN（累加和实现，O(n)）"""
+    if window <= 0:
+        raise ValueError("window 必须是正整数。")
+    result = np.full(len(values), np.nan)
+    if len(values) < window:
+        return result
+    cumsum = np.cumsum(np.insert(values.astype(np.float64), 0, 0.0))
+    result[window - 1:] = (cumsum[window:] - cumsum[:-window]) / window
+    return result
+
+
+def macd(close: np.ndarray, fast: int = 12, slow: int = 26, signal: int = 9):
+    """
+    MACD 指标
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: (dif, dea, macd)，macd = 2 * (dif - dea)
+    """
+    dif = ema(close, fast) - ema(close, slow)
+    dea = ema(dif, signal)
+    return dif, dea, 2 * (dif - dea)
+
+
+def roc(values: np.ndarray, epsilon: float = 1e-8) -> np.ndarray:
+    """变化率（%），口径同 DataAnalyze.calculator_roc"""
+    result = np.full(len(values), np.nan)
+    if len(values) > 1:
+        previous = values[:-1]
+        result[1:] = (values[1:] - previous) / (np.abs(previous) + epsilon) * 100
+    return result
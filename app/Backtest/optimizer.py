@@ -0,0 +1,300 @@
+# app/Backtest/optimizer.py
+"""
+optimizer.py
+- EMA 交叉 / MACD 周期的网格或随机搜索
+- 所有候选组合用到的 EMA 周期只计算一次（每个周期一次 pandas ewm 的 C 实现遍历），组成 周期数 × K线数 的 EMA 矩阵，
+  各组合只从矩阵中取行，不再重复计算 EMA
+- 价格与 EMA 矩阵放在 multiprocessing.shared_memory 中，工作进程按名称挂载，不复制数据
+- 每个组合在样本内打分排序，并给出样本外（holdout）指标用于检查过拟合
+
+用法：
+    cd app
+    python -m Backtest.optimizer --symbol BTCUSDT --family ema --fast 3:30:1 --slow 10:200:5
+    （周期写法与 Backtest.sweep 的 --param 相同：5,10,20 或 start:stop:step）
+    python -m Backtest.optimizer --symbol BTCUSDT --family macd --fast 5:20:1 --slow 15:60:1 --signal 3:15:1 \
+        --search random --samples 3000 --processes 8 --holdout 0.3
+"""
+import argparse
+import itertools
+import logging
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from Backtest.engine import simulate
+from Backtest.indicators import ema
+from Backtest.sweep import parse_grid, rank_results
+
+logger = logging.getLogger(__name__)
+
+FAMILIES = ('ema', 'macd')
+# 可用于排序的样本内指标（engine.simulate 的 metrics 加综合得分），划分样本外时另有对应的 oos_* 指标
+RANK_METRICS = ('score', 'sharpe', 'total_return', 'max_drawdown', 'win_rate', 'exposure', 'trades', 'final_equity')
+
+# 工作进程内挂载的共享数组（由 _init_worker 设置）
+_worker_blocks: List[shared_memory.SharedMemory] = []
+_worker_arrays: Dict[str, np.ndarray] = {}
+_worker_context: dict = {}
+
+
+def ema_matrix(series: np.ndarray, spans: Sequence[int]) -> np.ndarray:
+    """
+    计算多条 EMA：第 j 行为 series 以 spans[j] 计算的 EMA
+    口径与 pandas ewm(span, adjust=False) 相同；每个周期一次 C 实现的时间遍历（indicators.ema），
+    递推本身无法跨时间向量化，节省来自每个周期只算一次、所有组合共享
+
+    Args:
+        series: 形状 (n,) 的序列
+        spans: k 个周期
+
+    Returns:
+        np.ndarray: 形状 (k, n)，行连续，工作进程按行取用
+    """
+    if any(span <= 0 for span in spans):
+        raise ValueError("周期必须是正整数。")
+    result = np.empty((len(spans), series.shape[0]))
+    for row, span in enumerate(spans):
+        result[row] = ema(series, int(span))
+    return result
+
+
+def _to_shared(array: np.ndarray) -> Tuple[shared_memory.SharedMemory, dict]:
+    """拷贝到新建的共享内存块，返回块与挂载描述"""
+    block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)
+    view[...] = array
+    return block, {'name': block.name, 'shape': array.shape, 'dtype': array.dtype.str}
+
+
+def _set_worker(arrays: Dict[str, np.ndarray], context: dict):
+    global _worker_arrays, _worker_context
+    _worker_arrays = arrays
+    _worker_context = context
+
+
+def _init_worker(specs: Dict[str, dict], context: dict):
+    """进程池初始化函数：按名称挂载共享内存（track=False，由主进程负责释放）"""
+    global _worker_blocks
+    _worker_blocks = []
+    arrays = {}
+    for key, spec in specs.items():
+        block = shared_memory.SharedMemory(name=spec['name'], track=False)
+        _worker_blocks.append(block)
+        array = np.ndarray(spec['shape'], dtype=np.dtype(spec['dtype']), buffer=block.buf)
+        array.flags.writeable = False
+        arrays[key] = array
+    _set_worker(arrays, context)
+
+
+def _score(metrics: Dict[str, float]) -> float:
+    """综合得分：夏普按最大回撤折减"""
+    return metrics['sharpe'] * (1.0 - metrics['max_drawdown'])
+
+
+def _simulate_split(target: np.ndarray) -> dict:
+    """分别在样本内/样本外区间模拟成交"""
+    arrays, context = _worker_arrays, _worker_context
+    split = context['split']
+    data = {name: arrays[name] for name in ('open_time', 'open', 'close')}
+    options = context['options']
+
+    in_sample = simulate({k: v[:split] for k, v in data.items()}, target[:split], record_trades=False, **options)
+    row = dict(in_sample.metrics)
+    row['score'] = _score(in_sample.metrics)
+    if split < len(target):
+        out_sample = simulate({k: v[split:] for k, v in data.items()}, target[split:], record_trades=False, **options)
+        row.update({f"oos_{k}": v for k, v in out_sample.metrics.items()})
+        row['oos_score'] = _score(out_sample.metrics)
+    return row
+
+
+def _evaluate(params: dict) -> dict:
+    """在工作进程中评估一个组合：从共享 EMA 矩阵中取行生成目标仓位；非法组合返回 error"""
+    context = _worker_context
+    matrix = _worker_arrays['ema']
+    index = context['span_index']
+    allow_short = context['allow_short']
+    try:
+        fast, slow = params['fast'], params['slow']
+        if context['family'] == 'ema':
+            diff = matrix[index[fast]] - matrix[index[slow]]
+            warmup = slow
+        else:
+            dif = matrix[index[fast]] - matrix[index[slow]]
+            diff = dif - ema(dif, params['signal'])
+            warmup = slow + params['signal']
+
+        target = np.where(diff > 0, 1.0, -1.0 if allow_short else 0.0)
+        target[:warmup] = 0.0
+        return {'params': params, **_simulate_split(target)}
+    except ValueError as e:
+        return {'params': params, 'error': str(e)}
+
+
+def build_combinations(family: str, fast: Iterable[int], slow: Iterable[int], signal: Iterable[int] = (9,),
+                       search: str = 'grid', samples: Optional[int] = None, seed: int = 42) -> List[dict]:
+    """
+    生成候选组合（自动剔除 fast >= slow）
+
+    Args:
+        family: ema / macd
+        fast / slow / signal: 候选周期
+        search: grid 全部组合；random 无放回随机抽取 samples 个
+        samples: 随机搜索的组合数
+        seed: 随机种子
+    """
+    if family not in FAMILIES:
+        raise ValueError(f"未知的指标族: {family}，可选: {FAMILIES}")
+    fast, slow, signal = list(fast), list(slow), list(signal)
+    if not all(isinstance(v, int) and not isinstance(v, bool) and v > 0 for v in fast + slow + signal):
+        raise ValueError("周期必须是正整数。")
+    signals = list(signal) if family == 'macd' else [None]
+    combos = []
+    for f, s, g in itertools.product(sorted(set(fast)), sorted(set(slow)), sorted(set(signals), key=lambda v: v or 0)):
+        if f >= s:
+            continue
+        combos.append({'fast': f, 'slow': s} if g is None else {'fast': f, 'slow': s, 'signal': g})
+
+    if search == 'random':
+        if not samples:
+            raise ValueError("随机搜索需要指定 samples。")
+        combos = random.Random(seed).sample(combos, min(samples, len(combos)))
+    elif search != 'grid':
+        raise ValueError(f"未知的搜索方式: {search}，可选: grid, random")
+    return combos
+
+
+def _check_rank_by(rank_by: str, count: int, split: int):
+    """排序指标必须在结果中存在：oos_* 只有划分出非空的样本外区间时才有"""
+    metric = rank_by[4:] if rank_by.startswith('oos_') else rank_by
+    if metric not in RANK_METRICS:
+        raise ValueError(f"未知的排序指标: {rank_by}，可选: {', '.join(RANK_METRICS)}（及对应的 oos_*）")
+    if rank_by.startswith('oos_') and split >= count:
+        raise ValueError(f"按 {rank_by} 排序需要样本外区间，请设置 holdout > 0（当前样本外为 0 根K线）")
+
+
+def optimize(data: Dict[str, np.ndarray], family: str, combinations: List[dict], processes: Optional[int] = None,
+             rank_by: str = 'score', holdout: float = 0.0, allow_short: bool = False, fee_rate: float = 0.001,
+             slippage_bps: float = 1.0, initial_cash: float = 10000.0) -> List[dict]:
+    """
+    并行评估候选组合并排序（与 sweep.run_sweep 相同的进程池初始化/评估方式，
+    区别是数据与 EMA 矩阵通过共享内存下发）
+
+    Args:
+        data: load_candles 返回的数组字典（至少 open_time/open/close）
+        family: ema / macd
+        combinations: build_combinations 的结果
+        processes: 进程数，默认 CPU 核数；1 表示在当前进程串行执行
+        rank_by: 排序指标（RANK_METRICS 或 oos_*），默认 score（sharpe * (1 - max_drawdown)）
+        holdout: 末尾作为样本外区间的比例（0 表示不划分）
+        allow_short: 是否允许做空
+        fee_rate / slippage_bps / initial_cash: 见 engine.simulate
+
+    Returns:
+        List[dict]: 按 rank_by 降序（max_drawdown 升序），非法组合排在最后
+
+    Raises:
+        ValueError: holdout 越界、排序指标未知，或按 oos_* 排序但没有样本外区间
+    """
+    if not 0.0 <= holdout < 1.0:
+        raise ValueError("holdout 必须在 [0, 1) 之间。")
+    close = np.ascontiguousarray(data['close'], dtype=np.float64)
+    split = int(len(close) * (1.0 - holdout))
+    _check_rank_by(rank_by, len(close), split)
+    if not combinations:
+        return []
+
+    spans = sorted({c['fast'] for c in combinations} | {c['slow'] for c in combinations})
+    matrix = ema_matrix(close, spans)
+    logger.info(f"[Optimizer] {len(spans)} 个 EMA 周期 x {len(close)} 根K线，矩阵 {matrix.nbytes / 1024 / 1024:.1f} MB")
+
+    arrays = {
+        'ema': matrix,
+        'open_time': np.ascontiguousarray(data['open_time'], dtype=np.int64),
+        'open': np.ascontiguousarray(data['open'], dtype=np.float64),
+        'close': close,
+    }
+    context = {
+        'family': family,
+        'span_index': {span: i for i, span in enumerate(spans)},
+        'split': split,
+        'allow_short': allow_short,
+        'options': {'fee_rate': fee_rate, 'slippage_bps': slippage_bps, 'initial_cash': initial_cash},
+    }
+    processes = processes or os.cpu_count() or 1
+
+    if processes == 1:
+        _set_worker(arrays, context)
+        results = [_evaluate(params) for params in combinations]
+    else:
+        blocks, specs = [], {}
+        try:
+            for key, array in arrays.items():
+                block, spec = _to_shared(array)
+                blocks.append(block)
+                specs[key] = spec
+            del matrix, arrays
+
+            with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                     initargs=(specs, context)) as executor:
+                chunksize = max(1, len(combinations) // (processes * 8))
+                results = list(executor.map(_evaluate, combinations, chunksize=chunksize))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    ranked = rank_results(results, rank_by)
+    logger.info(f"[Optimizer] {family} 共评估 {len(ranked)} 组参数，有效 {sum('error' not in r for r in ranked)} 组")
+    return ranked
+
+
+def main():
+    """命令行入口"""
+    from config.logging_config import setup_logging
+    from Backtest.data import load_candles
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='EMA / MACD 周期参数优化')
+    parser.add_argument('--symbol', required=True, help='交易对，如 BTCUSDT')
+    parser.add_argument('--interval', default='1m', help='K线周期')
+    parser.add_argument('--family', choices=FAMILIES, default='ema', help='指标族')
+    parser.add_argument('--fast', default='5:30:1', help='快线周期，如 5,10,12 或 5:30:1')
+    parser.add_argument('--slow', default='20:120:2', help='慢线周期')
+    parser.add_argument('--signal', default='9', help='MACD 信号线周期（仅 macd）')
+    parser.add_argument('--search', choices=['grid', 'random'], default='grid', help='搜索方式')
+    parser.add_argument('--samples', type=int, default=None, help='随机搜索的组合数')
+    parser.add_argument('--processes', type=int, default=None, help='进程数，默认 CPU 核数')
+    parser.add_argument('--rank-by', default='score', help=f"排序指标：{' / '.join(RANK_METRICS)}，或 oos_*（需要 --holdout）")
+    parser.add_argument('--holdout', type=float, default=0.0, help='样本外比例，如 0.3')
+    parser.add_argument('--allow-short', action='store_true', help='允许做空')
+    parser.add_argument('--fee-rate', type=float, default=0.001, help='手续费率')
+    parser.add_argument('--slippage-bps', type=float, default=1.0, help='滑点（基点）')
+    parser.add_argument('--top', type=int, default=20, help='输出前 N 组')
+    args = parser.parse_args()
+
+    grid = parse_grid([f'fast={args.fast}', f'slow={args.slow}', f'signal={args.signal}'])
+    combinations = build_combinations(args.family, grid['fast'], grid['slow'], grid['signal'], args.search,
+                                      args.samples)
+    data = load_candles(args.symbol, args.interval)
+    results = optimize(data, args.family, combinations, processes=args.processes, rank_by=args.rank_by,
+                       holdout=args.holdout, allow_short=args.allow_short, fee_rate=args.fee_rate,
+                       slippage_bps=args.slippage_bps)
+
+    print(f"{args.symbol.upper()} {args.interval} {args.family}: {len(data['close'])} 根K线，{len(results)} 组参数")
+    for row in results[:args.top]:
+        if 'error' in row:
+            continue
+        line = (f"{row['params']}  score={row['score']:.3f}  sharpe={row['sharpe']:.3f}  "
+                f"return={row['total_return']:.2%}  mdd={row['max_drawdown']:.2%}  trades={row['trades']}")
+        if 'oos_score' in row:
+            line += f"  | oos sharpe={row['oos_sharpe']:.3f} return={row['oos_total_return']:.2%}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+# app/Backtest/rules.py
+"""
+rules.py
+- 信号规则：输入K线/指标数组与参数，输出每根K线收盘时的目标仓位（1 多 / 0 空仓 / -1 空）
+- 规则在全量历史上一次性向量化计算，不逐根循环
+- 通过 RULES 注册，参数扫描按名称引用
+
+自定义规则：
+    def my_rule(data, **params) -> np.ndarray  # 与 data['close'] 等长
+    RULES['my_rule'] = my_rule
+"""
+from typing import Callable, Dict
+
+import numpy as np
+
+from Backtest.indicators import ema, macd
+
+
+def _positions_from_cross(diff: np.ndarray, warmup: int, allow_short: bool) -> np.ndarray:
+    """diff > 0 做多，diff < 0 空仓（或做空），预热期内不持仓"""
+    target = np.where(diff > 0, 1.0, -1.0 if allow_short else 0.0)
+    target[np.isnan(diff)] = 0.0
+    target[:warmup] = 0.0
+    return target
+
+
+def ema_cross(data: Dict[str, np.ndarray], fast: int = 12, slow: int = 26, allow_short: bool = False) -> np.ndarray:
+    """快慢 EMA 交叉：快线在慢线上方持多"""
+    if fast >= slow:
+        raise ValueError("fast 必须小于 slow。")
+    close = data['close']
+    return _positions_from_cross(ema(close, fast) - ema(close, slow), slow, allow_short)
+
+
+def macd_cross(data: Dict[str, np.ndarray], fast: int = 12, slow: int = 26, signal: int = 9,
+               allow_short: bool = False) -> np.ndarray:
+    """MACD 柱线为正（DIF 在 DEA 上方）持多"""
+    if fast >= slow:
+        raise ValueError("fast 必须小于 slow。")
+    _, _, histogram = macd(data['close'], fast, slow, signal)
+    return _positions_from_cross(histogram, slow + signal, allow_short)
+
+
+def indicator_cross(data: Dict[str, np.ndarray], fast_column: str = 'ema5', slow_column: str = 'ema20',
+                    allow_short: bool = False) -> np.ndarray:
+    """
+    使用已存储的 ma_<symbol> 指标列交叉（列需先通过 data.load_indicator_columns 放入 data）
+    """
+    for column in (fast_column, slow_column):
+        if column not in data:
+            raise ValueError(f"数据中缺少指标列: {column}")
+    return _positions_from_cross(data[fast_column] - data[slow_column], 1, allow_short)
+
+
+RULES: Dict[str, Callable[..., np.ndarray]] = {
+    'ema_cross': ema_cross,
+    'macd_cross': macd_cross,
+    'indicator_cross': indicator_cross,
+}
+
+
+def get_rule(name: str) -> Callable[..., np.ndarray]:
+    """按名称获取规则"""
+    if name not in RULES:
+        raise ValueError(f"未知的信号规则: {name}，可选: {list(RULES.keys())}")
+    return RULES[name]
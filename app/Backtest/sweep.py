@@ -0,0 +1,156 @@
+# app/Backtest/sweep.py
+"""
+sweep.py
+- 参数网格扫描：数据在主进程加载一次，通过进程池初始化函数下发给每个工作进程（每进程一份，而不是每个任务一份）
+- 每个参数组合独立计算信号并模拟成交，结果按指定指标排序
+
+用法：
+    cd app
+    python -m Backtest.sweep --symbol BTCUSDT --rule ema_cross --param fast=5,10,20 --param slow=30,60,120
+    python -m Backtest.sweep --symbol BTCUSDT --rule macd_cross --param fast=8,12 --param slow=21,26 \
+        --param signal=5,9 --processes 8 --rank-by total_return --top 5
+"""
+import argparse
+import itertools
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from Backtest.engine import simulate
+from Backtest.rules import get_rule
+
+logger = logging.getLogger(__name__)
+
+# 工作进程内的数据与成交参数（由 _init_worker 设置）
+_worker_data: Optional[Dict[str, np.ndarray]] = None
+_worker_options: Dict[str, float] = {}
+
+
+def expand_grid(grid: Dict[str, Iterable]) -> List[dict]:
+    """{'fast': [5, 10], 'slow': [20, 30]} -> 笛卡尔积参数列表"""
+    names = list(grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*(list(grid[n]) for n in names))]
+
+
+def _init_worker(data: Dict[str, np.ndarray], options: Dict[str, float]):
+    global _worker_data, _worker_options
+    _worker_data = data
+    _worker_options = options
+
+
+def _evaluate(rule: str, params: dict) -> dict:
+    """在工作进程中评估一个参数组合；非法组合（如 fast >= slow）返回 error"""
+    try:
+        target = get_rule(rule)(_worker_data, **params)
+        result = simulate(_worker_data, target, record_trades=False, **_worker_options)
+        return {'params': params, **result.metrics}
+    except ValueError as e:
+        return {'params': params, 'error': str(e)}
+
+
+def run_sweep(data: Dict[str, np.ndarray], rule: str, grid: Dict[str, Iterable],
+              processes: Optional[int] = None, rank_by: str = 'sharpe', fee_rate: float = 0.001,
+              slippage_bps: float = 1.0, initial_cash: float = 10000.0) -> List[dict]:
+    """
+    在进程池中并行评估参数网格
+
+    Args:
+        data: load_candles 返回的数组字典
+        rule: 规则名
+        grid: 参数名 -> 候选值
+        processes: 进程数，默认 CPU 核数；1 表示在当前进程串行执行
+        rank_by: 排序指标（降序；max_drawdown 升序）
+        fee_rate / slippage_bps / initial_cash: 见 engine.simulate
+
+    Returns:
+        List[dict]: 每个组合的参数与指标，已排序；非法组合排在最后
+    """
+    get_rule(rule)
+    combinations = expand_grid(grid)
+    options = {'fee_rate': fee_rate, 'slippage_bps': slippage_bps, 'initial_cash': initial_cash}
+    processes = processes or os.cpu_count() or 1
+
+    if processes == 1:
+        _init_worker(data, options)
+        results = [_evaluate(rule, params) for params in combinations]
+    else:
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(data, options)) as executor:
+            chunksize = max(1, len(combinations) // (processes * 4))
+            results = list(executor.map(_evaluate, itertools.repeat(rule), combinations, chunksize=chunksize))
+
+    ranked = rank_results(results, rank_by)
+    logger.info(f"[Sweep] {rule} 共 {len(combinations)} 组参数，有效 {sum('error' not in r for r in ranked)} 组")
+    return ranked
+
+
+def rank_results(results: List[dict], rank_by: str) -> List[dict]:
+    """按 rank_by 排序（降序；max_drawdown / oos_max_drawdown 升序），带 error 的非法组合排在最后"""
+    valid = [r for r in results if 'error' not in r]
+    invalid = [r for r in results if 'error' in r]
+    valid.sort(key=lambda r: r[rank_by], reverse=not rank_by.endswith('max_drawdown'))
+    return valid + invalid
+
+
+def _parse_value(text: str):
+    lowered = text.lower()
+    if lowered in ('true', 'false'):
+        return lowered == 'true'
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            continue
+    return text
+
+
+def parse_grid(items: Iterable[str]) -> Dict[str, list]:
+    """['fast=5,10', 'slow=20:60:10'] -> {'fast': [5, 10], 'slow': [20, 30, 40, 50]}（a:b:c 表示 range）"""
+    grid = {}
+    for item in items:
+        name, _, values = item.partition('=')
+        if not name or not values:
+            raise ValueError(f"参数格式应为 name=v1,v2 或 name=start:stop:step，实际: {item}")
+        if values.count(':') == 2:
+            start, stop, step = (int(v) for v in values.split(':'))
+            grid[name] = list(range(start, stop, step))
+        else:
+            grid[name] = [_parse_value(v) for v in values.split(',')]
+    return grid
+
+
+def main():
+    """命令行入口"""
+    from config.logging_config import setup_logging
+    from Backtest.data import load_candles
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='回测参数网格扫描')
+    parser.add_argument('--symbol', required=True, help='交易对，如 BTCUSDT')
+    parser.add_argument('--interval', default='1m', help='K线周期')
+    parser.add_argument('--rule', required=True, help='信号规则名，如 ema_cross / macd_cross')
+    parser.add_argument('--param', action='append', default=[], help='参数网格，如 fast=5,10,20 或 slow=20:100:10')
+    parser.add_argument('--processes', type=int, default=None, help='进程数，默认 CPU 核数')
+    parser.add_argument('--rank-by', default='sharpe', help='排序指标')
+    parser.add_argument('--top', type=int, default=10, help='输出前 N 组')
+    parser.add_argument('--fee-rate', type=float, default=0.001, help='手续费率')
+    parser.add_argument('--slippage-bps', type=float, default=1.0, help='滑点（基点）')
+    parser.add_argument('--no-cache', action='store_true', help='不使用本地K线缓存，直接读数据库')
+    args = parser.parse_args()
+
+    data = load_candles(args.symbol, args.interval, use_cache=not args.no_cache)
+    results = run_sweep(data, args.rule, parse_grid(args.param), processes=args.processes, rank_by=args.rank_by,
+                        fee_rate=args.fee_rate, slippage_bps=args.slippage_bps)
+    print(f"{args.symbol.upper()} {args.interval} {args.rule}: {len(data['close'])} 根K线，{len(results)} 组参数")
+    for row in results[:args.top]:
+        if 'error' in row:
+            continue
+        print(f"{row['params']}  sharpe={row['sharpe']:.3f}  return={row['total_return']:.2%}  "
+              f"mdd={row['max_drawdown']:.2%}  trades={row['trades']}  win={row['win_rate']:.1%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+# Benchmark Initialization
+"""
+性能基准模块
+各脚本通过 python -m Benchmark.<脚本名> 运行
+"""
@@ -0,0 +1,138 @@
+# app/Benchmark/exchange_latency_benchmark.py
+"""
+exchange_latency_benchmark.py
+- 对交易所（通常是本地模拟交易所 MockExchange/server.py）做延迟与吞吐测量，地址全部取自 config：
+    rest     GET ticker/price 往返延迟（BINANCE_API_BASE_URL）
+    stream   行情流接收速率与事件时间延迟 now - E（BINANCE_WS_STREAM_URL）
+    orders   OrderGateway 并发 MARKET 单往返延迟与吞吐（BINANCE_WS_API_URL，临时 Ed25519 密钥 + session.logon）
+- orders 只在设置了 MOCK_EXCHANGE_URL 时运行，避免向真实交易所下单；不写订单日志，不经过下单前风控
+
+用法：
+    cd app
+    python -m MockExchange.server --port 8700 --rate 0 &
+    MOCK_EXCHANGE_URL=http://127.0.0.1:8700 python -m Benchmark.exchange_latency_benchmark
+    MOCK_EXCHANGE_URL=http://127.0.0.1:8700 python -m Benchmark.exchange_latency_benchmark \\
+        --stream btcusdt@kline_1m --orders 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import requests
+
+from config import BINANCE_API_BASE_URL, BINANCE_WS_STREAM_URL, DEFAULT_SYMBOL, MOCK_EXCHANGE_URL
+
+
+def _percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    if not samples_ms:
+        return {'count': 0}
+    ordered = sorted(samples_ms)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+    return {'count': len(ordered), 'mean_ms': statistics.fmean(ordered), 'p50_ms': pick(0.5),
+            'p99_ms': pick(0.99), 'max_ms': ordered[-1]}
+
+
+def bench_rest(symbol: str, requests_count: int) -> Dict[str, float]:
+    """顺序请求 ticker/price，复用同一个连接"""
+    samples = []
+    with requests.Session() as session:
+        for _ in range(requests_count):
+            started = time.perf_counter()
+            response = session.get(f'{BINANCE_API_BASE_URL}ticker/price', params={'symbol': symbol}, timeout=10)
+            response.raise_for_status()
+            samples.append((time.perf_counter() - started) * 1000)
+    return _percentiles(samples)
+
+
+async def bench_stream(stream: str, seconds: float) -> Dict[str, float]:
+    """接收 seconds 秒行情推送，统计 msg/s 与事件时间延迟"""
+    import websockets
+
+    lags, count = [], 0
+    async with websockets.connect(f'{BINANCE_WS_STREAM_URL}/ws/{stream}', max_queue=None) as websocket:
+        started = time.perf_counter()
+        deadline = started + seconds
+        while time.perf_counter() < deadline:
+            try:
+                message = await asyncio.wait_for(websocket.recv(), timeout=deadline - time.perf_counter())
+            except asyncio.TimeoutError:
+                break
+            count += 1
+            event_time = json.loads(message).get('E')
+            if event_time:
+                lags.append(time.time() * 1000 - event_time)
+        elapsed = time.perf_counter() - started
+    return {'msg_per_s': count / elapsed, **_percentiles(lags)}
+
+
+async def bench_orders(symbol: str, orders: int, concurrency: int) -> Dict[str, float]:
+    """并发 concurrency 个下单协程，共 orders 笔 MARKET 单"""
+    from cryptography.hazmat.primitives import serialization
+    from cryptography.hazmat.primitives.asymmetric import ed25519
+
+    from ExchangeBill.order_gateway import OrderGateway
+    from ExchangeBill.request_signer import RequestSigner
+
+    with tempfile.TemporaryDirectory() as directory:
+        key_path = Path(directory) / 'ed25519.pem'
+        key_path.write_bytes(ed25519.Ed25519PrivateKey.generate().private_bytes(
+            encoding=serialization.Encoding.PEM, format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()))
+        gateway = OrderGateway(api_key='benchmark', signer=RequestSigner(str(key_path)), recorder=False,
+                               risk_engine=False)
+        await gateway.connect()
+
+        samples: List[float] = []
+        remaining = iter(range(orders))
+
+        async def worker():
+            for _ in remaining:
+                started = time.perf_counter()
+                await gateway.place_order(symbol=symbol, side='BUY', type='MARKET', quantity='0.001')
+                samples.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        try:
+            await asyncio.gather(*(worker() for _ in range(concurrency)))
+        finally:
+            await gateway.close()
+        elapsed = time.perf_counter() - started
+    return {'orders_per_s': len(samples) / elapsed, **_percentiles(samples)}
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='交易所 REST / 行情流 / 下单延迟基准')
+    parser.add_argument('--symbol', default=DEFAULT_SYMBOL)
+    parser.add_argument('--rest', type=int, default=1000, help='REST 请求次数，0 跳过')
+    parser.add_argument('--stream', default=None, help='行情流名称，默认 <symbol>@depth@100ms')
+    parser.add_argument('--seconds', type=float, default=5.0, help='行情流接收时长，0 跳过')
+    parser.add_argument('--orders', type=int, default=2000, help='下单笔数，0 跳过（仅模拟交易所）')
+    parser.add_argument('--concurrency', type=int, default=20, help='并发下单协程数')
+    args = parser.parse_args()
+
+    print(f"REST: {BINANCE_API_BASE_URL}  WS: {BINANCE_WS_STREAM_URL}")
+    results = {}
+    if args.rest:
+        results['rest'] = bench_rest(args.symbol, args.rest)
+    if args.seconds:
+        stream = args.stream or f'{args.symbol.lower()}@depth@100ms'
+        results['stream'] = asyncio.run(bench_stream(stream, args.seconds))
+    if args.orders:
+        if MOCK_EXCHANGE_URL:
+            results['orders'] = asyncio.run(bench_orders(args.symbol, args.orders, args.concurrency))
+        else:
+            print("未设置 MOCK_EXCHANGE_URL，跳过下单测试")
+
+    for scenario, metrics in results.items():
+        print(f"[{scenario}] " + '  '.join(f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}"
+                                          for key, value in metrics.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+# app/Benchmark/kline_storage_benchmark.py
+"""
+kline_storage_benchmark.py
+- 对比 standard 与 compact 两种K线表布局的存储占用与读取速度
+- 写入相同的合成 1m K线后 VACUUM ANALYZE，统计 bytes/row（堆表与含索引的总大小）
+- 读取速度分别测量 dbget_kline 全量读取（含解码）与库内聚合扫描
+
+用法：
+    cd app
+    python -m Benchmark.kline_storage_benchmark --rows 200000
+    python -m Benchmark.kline_storage_benchmark --rows 500000 --repeat 5 --keep
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timezone
+from typing import Dict, List
+
+from sqlalchemy import text
+
+from DatabaseOperator.pg_operator import (
+    Session,
+    create_kline_table_if_not_exists,
+    dbget_kline,
+    engine,
+    insert_kline,
+)
+from DatabaseOperator.kline_compact import encode_kline
+
+LAYOUTS = ('standard', 'compact')
+BENCH_SYMBOL_PREFIX = 'BENCH'
+MINUTE_MS = 60 * 1000
+
+
+def _quote(name: str) -> str:
+    return engine.dialect.identifier_preparer.quote(name)
+
+
+def generate_klines(rows: int, start_ms: int = 1_600_000_000_000, seed: int = 42) -> List[dict]:
+    """生成随机游走的合成 1m K线（字段与 parse_kline 一致，价格保留 2 位小数）"""
+    rng = random.Random(seed)
+    price = 30000.0
+    klines = []
+    for index in range(rows):
+        open_price = price
+        close_price = max(1.0, open_price * (1 + rng.gauss(0, 0.001)))
+        high = max(open_price, close_price) * (1 + abs(rng.gauss(0, 0.0005)))
+        low = min(open_price, close_price) * (1 - abs(rng.gauss(0, 0.0005)))
+        volume = abs(rng.gauss(50, 20))
+        open_time = start_ms + index * MINUTE_MS
+        klines.append({
+            'open_time': open_time,
+            'open': f"{open_price:.2f}",
+            'high': f"{high:.2f}",
+            'low': f"{low:.2f}",
+            'close': f"{close_price:.2f}",
+            'volume': f"{volume:.5f}",
+            'close_time': open_time + MINUTE_MS - 1,
+            'quote_asset_volume': f"{volume * close_price:.8f}",
+            'num_trades': rng.randint(100, 5000),
+            'taker_buy_base_vol': f"{volume / 2:.5f}",
+            'taker_buy_quote_vol': f"{volume * close_price / 2:.8f}",
+        })
+        price = close_price
+    return klines
+
+
+def _bulk_load(table, symbol: str, klines: List[dict], compact: bool, batch_size: int = 5000) -> None:
+    """批量写入合成数据；首行走 insert_kline 以覆盖真实写入路径"""
+    with Session() as session:
+        insert_kline(session, table, symbol, klines[0])
+        session.commit()
+
+    if compact:
+        rows = [encode_kline(k) for k in klines[1:]]
+    else:
+        rows = [{
+            'symbol': symbol,
+            'open': float(k['open']), 'high': float(k['high']),
+            'low': float(k['low']), 'close': float(k['close']),
+            'volume': float(k['volume']),
+            'open_time': datetime.fromtimestamp(k['open_time'] / 1000, tz=timezone.utc),
+            'close_time': datetime.fromtimestamp(k['close_time'] / 1000, tz=timezone.utc),
+            'quote_asset_volume': float(k['quote_asset_volume']),
+            'num_trades': int(k['num_trades']),
+            'taker_buy_base_vol': float(k['taker_buy_base_vol']),
+            'taker_buy_quote_vol': float(k['taker_buy_quote_vol']),
+            'timestamp': datetime.now(timezone.utc),
+        } for k in klines[1:]]
+
+    with engine.begin() as connection:
+        for offset in range(0, len(rows), batch_size):
+            connection.execute(table.insert(), rows[offset:offset + batch_size])
+
+
+def _relation_sizes(table_name: str) -> Dict[str, int]:
+    """堆表大小与含索引/TOAST 的总大小（分区表汇总所有分区）"""
+    with engine.connect() as connection:
+        return dict(connection.execute(text(
+            "SELECT coalesce(sum(pg_relation_size(relid)), 0) AS heap, "
+            "coalesce(sum(pg_total_relation_size(relid)), 0) AS total "
+            "FROM pg_partition_tree(to_regclass(:name)) WHERE isleaf"
+        ), {'name': _quote(table_name)}).mappings().one())
+
+
+def _best_of(repeat: int, func) -> float:
+    """重复执行取最短耗时（秒）"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run_benchmark(rows: int, repeat: int = 3, keep: bool = False) -> Dict[str, Dict[str, float]]:
+    """
+    执行两种布局的对比测试
+
+    Args:
+        rows: 每种布局写入的K线行数
+        repeat: 读取测试的重复次数（取最优）
+        keep: 是否保留测试表
+
+    Returns:
+        Dict[str, Dict[str, float]]: 布局 -> 指标
+    """
+    klines = generate_klines(rows)
+    results = {}
+    for layout in LAYOUTS:
+        symbol = f"{BENCH_SYMBOL_PREFIX}{layout.upper()}"
+        table = create_kline_table_if_not_exists(engine, symbol, partitioned=False, layout=layout)
+        table_name = table.name
+        try:
+            with engine.begin() as connection:
+                connection.execute(text(f"TRUNCATE {_quote(table_name)}"))
+
+            started = time.perf_counter()
+            _bulk_load(table, symbol, klines, layout == 'compact')
+            load_seconds = time.perf_counter() - started
+
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                connection.execute(text(f"VACUUM ANALYZE {_quote(table_name)}"))
+            sizes = _relation_sizes(table_name)
+
+            def read_all():
+                with Session() as session:
+                    dbget_kline(session, table_name, symbol)
+
+            def scan_aggregate():
+                with engine.connect() as connection:
+                    connection.execute(text(
+                        f"SELECT count(*), max(high), min(low), sum(volume) FROM {_quote(table_name)}"
+                    )).one()
+
+            read_seconds = _best_of(repeat, read_all)
+            scan_seconds = _best_of(repeat, scan_aggregate)
+            results[layout] = {
+                'heap_bytes_per_row': sizes['heap'] / rows,
+                'total_bytes_per_row': sizes['total'] / rows,
+                'load_rows_per_sec': rows / load_seconds,
+                'read_rows_per_sec': rows / read_seconds,
+                'scan_rows_per_sec': rows / scan_seconds,
+            }
+        finally:
+            if not keep:
+                with engine.begin() as connection:
+                    connection.execute(text(f"DROP TABLE IF EXISTS {_quote(table_name)}"))
+    return results
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='K线表 standard / compact 布局存储与读取基准')
+    parser.add_argument('--rows', type=int, default=200000, help='每种布局写入的行数')
+    parser.add_argument('--repeat', type=int, default=3, help='读取测试重复次数，取最优')
+    parser.add_argument('--keep', action='store_true', help='保留测试表（KLine_BENCH*）')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.rows, args.repeat, args.keep)
+    metrics = list(next(iter(results.values())).keys())
+    print(f"{'metric':<22}" + ''.join(f"{layout:>14}" for layout in results))
+    for metric in metrics:
+        print(f"{metric:<22}" + ''.join(f"{results[layout][metric]:>14.1f}" for layout in results))
+    if {'standard', 'compact'} <= results.keys():
+        ratio = results['compact']['total_bytes_per_row'] / results['standard']['total_bytes_per_row']
+        print(f"compact / standard 总占用: {ratio:.2%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# app/Benchmark/signing_benchmark.py
+"""
+signing_benchmark.py
+- 测量请求签名吞吐（signatures/sec）
+    rsa_reload     每次签名都读取并解析 PEM（RequestSigner 之前的 rsa_sign 做法）
+    rsa_cached     RequestSigner 缓存 RSA 私钥
+    ed25519_cached RequestSigner 缓存 Ed25519 私钥
+- 默认在临时目录生成 RSA-2048 与 Ed25519 测试密钥；--key 可改为测量指定的私钥文件
+
+用法：
+    cd app
+    python -m Benchmark.signing_benchmark --seconds 2
+    python -m Benchmark.signing_benchmark --key data/secrets/Binance-testnet-prvke.pem
+"""
+import argparse
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, padding, rsa
+
+from ExchangeBill.request_signer import RequestSigner
+
+SAMPLE_QUERY = ("symbol=BTCUSDT&side=BUY&type=LIMIT&timeInForce=GTC&quantity=0.001&price=20000"
+                "&recvWindow=5000&timestamp=1700000000000")
+
+
+def _write_key(path: Path, key) -> str:
+    path.write_bytes(key.private_bytes(
+        encoding=serialization.Encoding.PEM,
+        format=serialization.PrivateFormat.PKCS8,
+        encryption_algorithm=serialization.NoEncryption(),
+    ))
+    return str(path)
+
+
+def _reload_sign(query_string: str, private_key_path: str) -> bytes:
+    with open(private_key_path, 'rb') as key_file:
+        private_key = serialization.load_pem_private_key(key_file.read(), password=None)
+    return private_key.sign(query_string.encode('utf-8'), padding.PKCS1v15(), hashes.SHA256())
+
+
+def _rate(seconds: float, func: Callable[[], object]) -> float:
+    """在 seconds 秒内重复调用，返回每秒次数"""
+    func()  # 预热（首次加载私钥）
+    count = 0
+    started = time.perf_counter()
+    deadline = started + seconds
+    while True:
+        func()
+        count += 1
+        if count % 16 == 0 and time.perf_counter() >= deadline:
+            break
+    return count / (time.perf_counter() - started)
+
+
+def run_benchmark(seconds: float = 2.0, key_path: str = None) -> Dict[str, float]:
+    """
+    Returns:
+        Dict[str, float]: 场景 -> signatures/sec
+    """
+    results = {}
+    if key_path:
+        signer = RequestSigner(key_path)
+        signer.private_key()
+        if signer.key_type == 'rsa':
+            results['rsa_reload'] = _rate(seconds, lambda: _reload_sign(SAMPLE_QUERY, key_path))
+        results[f'{signer.key_type}_cached'] = _rate(seconds, lambda: signer.sign_query(SAMPLE_QUERY))
+        return results
+
+    with tempfile.TemporaryDirectory() as directory:
+        rsa_path = _write_key(Path(directory) / 'rsa.pem', rsa.generate_private_key(public_exponent=65537,
+                                                                                    key_size=2048))
+        ed25519_path = _write_key(Path(directory) / 'ed25519.pem', ed25519.Ed25519PrivateKey.generate())
+        rsa_signer = RequestSigner(rsa_path)
+        ed25519_signer = RequestSigner(ed25519_path)
+        results['rsa_reload'] = _rate(seconds, lambda: _reload_sign(SAMPLE_QUERY, rsa_path))
+        results['rsa_cached'] = _rate(seconds, lambda: rsa_signer.sign_query(SAMPLE_QUERY))
+        results['ed25519_cached'] = _rate(seconds, lambda: ed25519_signer.sign_query(SAMPLE_QUERY))
+    return results
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='请求签名吞吐基准（signatures/sec）')
+    parser.add_argument('--seconds', type=float, default=2.0, help='每个场景的测量时长')
+    parser.add_argument('--key', default=None, help='测量指定的私钥文件，默认生成临时测试密钥')
+    args = parser.parse_args()
+
+    results = run_benchmark(args.seconds, args.key)
+    print(f"{'scenario':<16}{'sig/s':>12}{'us/sig':>12}")
+    for scenario, rate in results.items():
+        print(f"{scenario:<16}{rate:>12.1f}{1e6 / rate:>12.1f}")
+    if 'rsa_reload' in results and 'rsa_cached' in results:
+        print(f"缓存私钥后 RSA 签名提速: {results['rsa_cached'] / results['rsa_reload']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
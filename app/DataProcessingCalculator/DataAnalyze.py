@@ -1,4 +1,5 @@
 # app/DataProcessingCalculator/DataAnalyze.py
+import os
 import pandas as pd
 import logging
 from config import SYMBOL, FETCH_INTERVAL_SECONDS
@@ -42,12 +43,7 @@ def StartCaculateMACD(): # This function seems to be more for MACD, let's keep a
     """
     session = Session()
     try:
-        KLine_data = dbget_kline(session, f"KLine_{SYMBOL}", SYMBOL, order_by_column='open_time', ascending=True)
-        if KLine_data is None:
-            logging.error(f"获取K线数据失败 (StartCaculateMACD for {SYMBOL})")
-            return
-
-        df = KLine_to_dataframe(KLine_data)
+        df = load_kline_dataframe(SYMBOL, session=session)
         if df.empty:
             logging.warning(f"K线数据转换后DataFrame为空 (StartCaculateMACD for {SYMBOL})")
             return
@@ -73,10 +69,12 @@ def calculate_ema(series, span):
     # Using min_periods=1 (or 0 which defaults to 1 for mean) allows EMA to be calculated from the first data point.
     return series.ewm(span=span, adjust=False, min_periods=1).mean()
 
-def calculate_macd(df):
+def calculate_macd(df, fast=12, slow=26, signal=9):
     """
     计算 MACD 指标，并添加到原始 DataFrame 中。
     要求 df 有 'close' 列（收盘价）。
+    周期默认 12/26/9，可用 Backtest.optimizer 搜索更优组合；
+    存储列名 ema12/ema26 固定不变，与 ma_<symbol> 表结构保持一致。
     """
     if 'close' not in df.columns:
         logging.error("'close' column not found in DataFrame. Cannot calculate MACD.")
@@ -88,10 +86,10 @@ def calculate_macd(df):
             df[col_name] = pd.NA 
         return df
 
-    df['ema12'] = calculate_ema(df['close'], 12)
-    df['ema26'] = calculate_ema(df['close'], 26)
+    df['ema12'] = calculate_ema(df['close'], fast)
+    df['ema26'] = calculate_ema(df['close'], slow)
     df['dif'] = df['ema12'] - df['ema26']
-    df['dea'] = calculate_ema(df['dif'], 9)
+    df['dea'] = calculate_ema(df['dif'], signal)
     df['macd'] = 2 * (df['dif'] - df['dea'])
     return df
 
@@ -119,6 +117,62 @@ def KLine_to_dataframe(KLine_data):
         
     return df
 
+# 开启后 load_kline_dataframe 优先读取本地列式缓存（需要 pyarrow，见 kline_cache）
+KLINE_CACHE_ENABLED = os.getenv('KLINE_CACHE_ENABLED', 'false').lower() in ('1', 'true', 'yes', 'on')
+
+def load_kline_dataframe(symbol, interval='1m', session=None, use_cache=None):
+    """
+    加载K线为 DataFrame（列与 KLine_to_dataframe 一致，按 open_time 升序）
+
+    启用缓存时：先从数据库增量同步已完结的K线到本地缓存，再内存映射读取缓存，
+    最后只从数据库补读缓存之后的少量K线（包括尚未完结的最新一根），
+    因此数据库每次只需读取新增部分。未启用缓存或 pyarrow 不可用时直接全量读取数据库。
+
+    Args:
+        symbol: 交易对
+        interval: K线周期
+        session: 可选的数据库会话
+        use_cache: 是否使用本地缓存，None 读取 KLINE_CACHE_ENABLED
+    """
+    from DatabaseOperator.kline_store import kline_table_name_for
+    from DataProcessingCalculator import kline_cache
+
+    symbol = symbol.upper()
+    use_cache = KLINE_CACHE_ENABLED if use_cache is None else use_cache
+    if use_cache and not kline_cache.is_cache_available():
+        logging.warning("pyarrow 未安装，K线缓存不可用，改为从数据库读取")
+        use_cache = False
+
+    own_session = session is None
+    session = session or Session()
+    try:
+        table_name = kline_table_name_for(symbol, interval)
+        if not use_cache:
+            return KLine_to_dataframe(dbget_kline(session, table_name, symbol, order_by_column='open_time',
+                                                  ascending=True, interval=interval))
+
+        kline_cache.sync_from_db(symbol, interval, session=session)
+        arrays = kline_cache.load_klines(symbol, interval)
+        cached = pd.DataFrame({name: arrays[name] for name in kline_cache.CACHE_COLUMNS if name not in ('open_time', 'close_time')})
+        cached.insert(0, 'symbol', symbol)
+        cached['open_time'] = pd.to_datetime(arrays['open_time'], unit='ms', utc=True)
+        cached['close_time'] = pd.to_datetime(arrays['close_time'], unit='ms', utc=True)
+        cached['timestamp'] = pd.NaT
+
+        last = kline_cache.last_cached_open_time(symbol, interval)
+        tail_start = None if last is None else datetime.fromtimestamp((last + 1) / 1000, tz=timezone.utc)
+        tail = KLine_to_dataframe(dbget_kline(session, table_name, symbol, order_by_column='open_time',
+                                              ascending=True, interval=interval, start_time=tail_start))
+        columns = tail.columns
+        if cached.empty:
+            return tail
+        if tail.empty:
+            return cached[columns]
+        return pd.concat([cached[columns], tail], ignore_index=True)
+    finally:
+        if own_session:
+            session.close()
+
 def calculate_multiple_emas(df, periods=[5, 10, 20, 30]):
     """
     Calculates multiple EMAs for the 'close' price and adds them to the DataFrame.
@@ -231,15 +285,8 @@ def analyze_data_and_store_emas():
         from app.DatabaseOperator.pg_operator import create_kline_table_if_not_exists
         create_kline_table_if_not_exists(engine, SYMBOL)
         
-        # Use the new dbget_kline function, ensuring data is sorted by open_time ascending
-        KLine_data = dbget_kline(session, KLine_table_name, SYMBOL, order_by_column='open_time', ascending=True)
-        
-        if not KLine_data: 
-            logger.warning(f"未找到符号为 {SYMBOL} 的K线数据，或数据为空。")
-            return
-
-        # logger.debug("将K线数据转换为DataFrame...")
-        df = KLine_to_dataframe(KLine_data)
+        # 按 open_time 升序读取；启用 KLINE_CACHE_ENABLED 时历史部分来自本地缓存
+        df = load_kline_dataframe(SYMBOL, session=session)
         
         if df.empty:
             logger.warning(f"转换后的DataFrame为空，符号: {SYMBOL}")
@@ -366,6 +413,33 @@ def analyze_data_and_store_emas():
         # logger.debug("关闭数据库会话 (analyze_data_and_store_emas)。")
         session.close()
 
+def store_indicator_records(symbol, records):
+    """
+    将增量指标记录（IncrementalIndicators.update 的输出）upsert 到 ma_<symbol> 表
+
+    Args:
+        symbol: 交易对
+        records: 指标记录列表，open_time 为毫秒时间戳
+
+    Returns:
+        int: 写入的记录数
+    """
+    if not records:
+        return 0
+    ma_table = create_ma_table_if_not_exists(engine, f"ma_{symbol.lower()}")
+    columns = set(ma_table.columns.keys())
+    with engine.begin() as connection:
+        for record in records:
+            values = {key: value for key, value in record.items() if key in columns}
+            values['open_time'] = datetime.fromtimestamp(record['open_time'] / 1000, tz=timezone.utc)
+            stmt = pg_insert(ma_table).values(values)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['open_time'],
+                set_={key: stmt.excluded[key] for key in values if key != 'open_time'}
+            )
+            connection.execute(stmt)
+    return len(records)
+
 def main():
     """
     用于测试调用的主函数。
@@ -1,69 +1,48 @@
 # app/DataProcessingCalculator/calculator.py
 import argparse
 import logging
-from app.DatabaseOperator.pg_operator import Session, engine
 from config import SYMBOL
-from sqlalchemy import Table, MetaData
 from datetime import datetime, timezone
-from DataProcessingCalculator.DataAnalyze import StartCaculateMACD, analyze_data_and_store_emas
 
-metadata = MetaData()
-Price = Table(
-    f"price_data_{SYMBOL.lower()}",
-    metadata,
-    autoload_with=engine
-)
-BuyHistory = Table(
-    f"buy_history_{SYMBOL.lower()}",
-    metadata,
-    autoload_with=engine
-)
-PriceDiff = Table(
-    f"price_diff_{SYMBOL.lower()}",
-    metadata,
-    autoload_with=engine
-)
+# price_data / buy_history / price_diff 三张表不再在导入时反射，首次使用时由 pnl_store.reflect_table 反射并缓存
 
 # calculate_diff 函数：计算最新价格与最后一次买入价格的差值
-# 参数：无
+# 参数：symbol - 交易对，默认 config.SYMBOL
 # 功能：
-# 1. 查询数据库中最新的价格记录
-# 2. 查询数据库中最后一次买入记录
-# 3. 计算价格差值并存储到数据库中
-# 4. 打印价格差值信息
+# 1. 由盈亏服务（pnl_service）冷启动：最新价格与最后买入价走索引查询，持仓与成本回放 BinanceOrders 的成交
+# 2. 计算价格差值并存储到 price_diff_<symbol> 表中
+# 3. 打印价格差值信息
 # 注意：如果没有价格记录或买入记录，函数会提前返回
-def calculate_diff():
-    session = Session()
-    current_price = session.query(Price).order_by(Price.c.timestamp.desc()).first()
-    if current_price:
-        print(f"[Calculator] Current price: {current_price.price}")
-    else:
+# 持续运行时请使用 pnl_service.PnLService：价格与成交在内存中增量更新，快照批量写入 pnl_snapshots
+def calculate_diff(symbol: str = SYMBOL):
+    from DatabaseOperator.pnl_store import reflect_table
+    from DataProcessingCalculator.pnl_service import PnLService
+
+    state = PnLService(store=False).cold_start(symbol)
+    if state.last_price is None:
         print("[Calculator] No current price data available.")
-        session.close()
         return
-
-    last_buy = session.query(BuyHistory).order_by(BuyHistory.c.timestamp.desc()).first()
-    if last_buy:
-        print(f"[Calculator] Last buy price: {last_buy.price}")
-    else:
+    print(f"[Calculator] Current price: {state.last_price}")
+    if state.last_buy_price is None:
         print("[Calculator] No buy history available.")
-        session.close()
         return
+    print(f"[Calculator] Last buy price: {state.last_buy_price}")
 
-    if current_price and last_buy:
-        diff = current_price.price - last_buy.price
-        diff_entry = PriceDiff.insert().values(
-            diff=diff,
-            current_price=current_price.price,
-            buy_price=last_buy.price,
+    PriceDiff = reflect_table(f"price_diff_{symbol.lower()}")
+    if PriceDiff is None:
+        logging.warning(f"[Calculator] 表 price_diff_{symbol.lower()} 不存在，不写入价差")
+        return
+    from DatabaseOperator.pg_operator import Session
+    with Session() as session:
+        session.execute(PriceDiff.insert().values(
+            diff=state.diff,
+            current_price=state.last_price,
+            buy_price=state.last_buy_price,
             timestamp=datetime.now(timezone.utc)
-        )
-        session.execute(diff_entry)
+        ))
         session.commit()
 
-        print(f"[Calculator] Price diff: {diff:.2f}")
-
-    session.close()
+    print(f"[Calculator] Price diff: {state.diff:.2f}")
 
 if __name__ == '__main__':
     # 添加命令行参数解析
@@ -0,0 +1,114 @@
+# app/DataProcessingCalculator/incremental_indicators.py
+"""
+incremental_indicators.py
+- 增量计算 EMA / MACD / ROC：每根完结K线 O(1) 更新，不再每次重算全量历史
+- 口径与 DataAnalyze.calculate_multiple_emas / calculate_macd / calculator_roc 完全一致，
+  输出字段与 ma_<symbol> 表列名相同，可直接 upsert
+"""
+import logging
+from typing import Dict, Iterable, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_EMA_PERIODS = (5, 10, 20, 30)
+DEFAULT_MACD_PERIODS = (12, 26, 9)
+ROC_EPSILON = 1e-8
+
+
+class IncrementalIndicators:
+    """单个交易对/周期的指标状态"""
+
+    def __init__(self, ema_periods: Sequence[int] = DEFAULT_EMA_PERIODS,
+                 macd_periods: Sequence[int] = DEFAULT_MACD_PERIODS):
+        self.ema_periods = tuple(ema_periods)
+        self.fast, self.slow, self.signal = macd_periods
+        self.last_open_time: Optional[int] = None
+        self.count = 0
+        self._ema: Dict[int, float] = {}
+        self._dea: Optional[float] = None
+        self._previous: Dict[str, float] = {}
+
+    @staticmethod
+    def _step(previous: Optional[float], value: float, span: int) -> float:
+        """adjust=False 的 EMA 递推；首个值等于输入"""
+        if previous is None:
+            return value
+        alpha = 2.0 / (span + 1.0)
+        return alpha * value + (1.0 - alpha) * previous
+
+    def update(self, open_time: int, close: float) -> Optional[dict]:
+        """
+        输入一根完结K线的收盘价，返回该K线的指标记录
+
+        Args:
+            open_time: 开盘时间（毫秒）
+            close: 收盘价
+
+        Returns:
+            dict | None: 指标记录；open_time 不晚于上一根时（重复推送）返回 None
+        """
+        if self.last_open_time is not None and open_time <= self.last_open_time:
+            return None
+        close = float(close)
+
+        for span in set(self.ema_periods) | {self.fast, self.slow}:
+            self._ema[span] = self._step(self._ema.get(span), close, span)
+
+        dif = self._ema[self.fast] - self._ema[self.slow]
+        self._dea = self._step(self._dea, dif, self.signal)
+        record = {'open_time': open_time, 'close': close}
+        for span in self.ema_periods:
+            record[f'ema{span}'] = self._ema[span]
+        # ma_<symbol> 中 MACD 使用的两条 EMA 固定列名为 ema12 / ema26
+        record['ema12'] = self._ema[self.fast]
+        record['ema26'] = self._ema[self.slow]
+        record['dif'] = dif
+        record['dea'] = self._dea
+        record['macd'] = 2 * (dif - self._dea)
+
+        for name in [f'ema{span}' for span in self.ema_periods] + ['macd', 'dif', 'dea']:
+            previous = self._previous.get(name)
+            record[f'{name}_roc'] = None if previous is None else \
+                (record[name] - previous) / (abs(previous) + ROC_EPSILON) * 100
+            self._previous[name] = record[name]
+
+        self.last_open_time = open_time
+        self.count += 1
+        return record
+
+    def seed(self, open_times: Iterable[int], closes: Iterable[float]) -> Optional[dict]:
+        """用历史完结K线预热状态，返回最后一条记录"""
+        record = None
+        for open_time, close in zip(open_times, closes):
+            record = self.update(int(open_time), close) or record
+        logger.debug(f"[Indicators] 预热完成，共 {self.count} 根K线")
+        return record
+
+
+class CrossoverDetector:
+    """
+    快慢线交叉检测：按 (symbol, interval) 记录上一次差值符号
+    快线上穿慢线返回 BUY，下穿返回 SELL；第一条记录和差值为 0 时不出信号
+    """
+
+    def __init__(self, fast_column: str = 'ema5', slow_column: str = 'ema20'):
+        self.fast_column = fast_column
+        self.slow_column = slow_column
+        self._last_sign: Dict[tuple, int] = {}
+
+    def update(self, symbol: str, interval: str, record: dict) -> Optional[dict]:
+        """输入一条指标记录，发生交叉时返回信号事件"""
+        key = (symbol, interval)
+        diff = record[self.fast_column] - record[self.slow_column]
+        sign = 1 if diff > 0 else -1 if diff < 0 else 0
+        previous = self._last_sign.get(key)
+        self._last_sign[key] = sign
+        if previous is None or sign == 0 or sign == previous:
+            return None
+        return {
+            'symbol': symbol,
+            'interval': interval,
+            'open_time': record['open_time'],
+            'action': 'BUY' if sign > 0 else 'SELL',
+            'price': record['close'],
+        }
@@ -0,0 +1,344 @@
+# app/DataProcessingCalculator/kline_cache.py
+"""
+kline_cache.py
+- 本地列式K线缓存，供离线分析与回测使用，避免每次都从 PostgreSQL 读取全量历史
+- 存储格式为 Arrow IPC 文件（未压缩），读取时内存映射，数值列零拷贝得到 NumPy 数组
+- 按 <KLINE_CACHE_DIR>/<SYMBOL>/<interval>/ 分目录，每次增量追加写一个分段文件，
+  分段数超过阈值时合并为一个文件
+- 只缓存已完结的K线（close_time 早于当前时间），已缓存的数据不会再被修改
+- 采集端（REST/WebSocket）只追加与缓存末根首尾相接的K线，遇到缺口即停止，缺口由 sync_from_db
+  从数据库补齐；否则断线期间漏掉的K线会被之后追加的K线"跳过"，增量同步再也不会读到
+
+环境变量：
+    KLINE_CACHE_DIR           缓存根目录（默认 <DATA_DIR>/kline_cache）
+    KLINE_CACHE_MAX_SEGMENTS  触发合并的分段数（默认 32）
+
+依赖 pyarrow（可选）：未安装时 is_cache_available() 返回 False，调用方应回退到数据库读取。
+
+用法：
+    cd app
+    python -m DataProcessingCalculator.kline_cache sync --symbol BTCUSDT --interval 1m
+    python -m DataProcessingCalculator.kline_cache info --symbol BTCUSDT
+"""
+import argparse
+import fcntl
+import logging
+import os
+import re
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401  确保 pa.ipc 子模块已加载
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    PYARROW_AVAILABLE = False
+
+from PathUniti import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+KLINE_CACHE_DIR = Path(os.getenv('KLINE_CACHE_DIR', str(DATA_DIR / 'kline_cache')))
+KLINE_CACHE_MAX_SEGMENTS = int(os.getenv('KLINE_CACHE_MAX_SEGMENTS', '32'))
+
+# 缓存列：时间为纪元毫秒，symbol 由目录名体现
+CACHE_COLUMNS = (
+    'open_time', 'close_time', 'open', 'high', 'low', 'close', 'volume',
+    'quote_asset_volume', 'num_trades', 'taker_buy_base_vol', 'taker_buy_quote_vol',
+)
+_INT_COLUMNS = ('open_time', 'close_time', 'num_trades')
+
+_SEGMENT_NAME = re.compile(r'^(\d{13})_(\d{13})\.arrow$')
+
+# 单次从数据库读取的最大行数
+DB_SYNC_BATCH = 100000
+
+
+def is_cache_available() -> bool:
+    """pyarrow 是否可用"""
+    return PYARROW_AVAILABLE
+
+
+def _require_pyarrow():
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("K线缓存需要 pyarrow，请使用 pip install pyarrow 安装")
+
+
+def _schema():
+    return pa.schema([
+        (name, pa.int64() if name in _INT_COLUMNS else pa.float64()) for name in CACHE_COLUMNS
+    ])
+
+
+def cache_dir(symbol: str, interval: str = '1m') -> Path:
+    """某交易对/周期的缓存目录"""
+    return KLINE_CACHE_DIR / symbol.upper() / interval
+
+
+def list_segments(symbol: str, interval: str = '1m') -> List[Path]:
+    """按时间顺序列出分段文件（文件名即 首根_末根 开盘时间，字典序与时间序一致）"""
+    directory = cache_dir(symbol, interval)
+    if not directory.exists():
+        return []
+    return sorted(p for p in directory.iterdir() if _SEGMENT_NAME.match(p.name))
+
+
+def last_cached_open_time(symbol: str, interval: str = '1m') -> Optional[int]:
+    """已缓存的最后一根K线开盘时间（毫秒），无缓存返回 None"""
+    segments = list_segments(symbol, interval)
+    if not segments:
+        return None
+    return int(_SEGMENT_NAME.match(segments[-1].name).group(2))
+
+
+def last_cached_close_time(symbol: str, interval: str = '1m') -> Optional[int]:
+    """已缓存的最后一根K线收盘时间（毫秒），下一根首尾相接的K线开盘时间为该值 + 1；无缓存返回 None"""
+    segments = list_segments(symbol, interval)
+    if not segments:
+        return None
+    return int(_read_segment(segments[-1]).column('close_time')[-1].as_py())
+
+
+@contextmanager
+def _writer_lock(symbol: str, interval: str):
+    """同一缓存目录的写入互斥（跨进程）；读取不加锁"""
+    directory = cache_dir(symbol, interval)
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / '.lock', 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield directory
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _write_segment(directory: Path, table) -> Path:
+    """先写临时文件再原子改名，读取方不会看到写了一半的分段"""
+    first = table.column('open_time')[0].as_py()
+    last = table.column('open_time')[-1].as_py()
+    path = directory / f"{first:013d}_{last:013d}.arrow"
+    tmp_path = path.with_suffix('.arrow.tmp')
+    with pa.OSFile(str(tmp_path), 'wb') as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _rows_to_table(rows: Dict[str, Iterable]):
+    """列字典 -> Arrow 表；空值填充为 NaN/0，保证数值列可零拷贝转为 NumPy"""
+    arrays = []
+    for name in CACHE_COLUMNS:
+        if name in _INT_COLUMNS:
+            values = np.asarray([0 if v is None else int(v) for v in rows[name]], dtype=np.int64)
+        else:
+            values = np.asarray([np.nan if v is None else float(v) for v in rows[name]], dtype=np.float64)
+        arrays.append(pa.array(values))
+    return pa.Table.from_arrays(arrays, schema=_schema())
+
+
+def append_klines(symbol: str, interval: str, klines: Iterable[dict],
+                  now_ms: Optional[int] = None, contiguous: bool = True) -> int:
+    """
+    追加K线到缓存（只保留已完结且晚于已缓存末根的K线）
+
+    Args:
+        symbol: 交易对
+        interval: K线周期
+        klines: parse_kline 格式的字典（open_time/close_time 为毫秒）
+        now_ms: 判断是否完结的当前时间，默认取系统时间
+        contiguous: True（采集端）只追加从缓存末根起首尾相接的K线，遇到缺口停止；
+            缓存为空时不写入，首次需由 sync_from_db 从数据库初始化。
+            False（sync_from_db）以数据库为准，追加所有晚于缓存末根的K线
+
+    Returns:
+        int: 实际追加的行数
+    """
+    _require_pyarrow()
+    now_ms = now_ms if now_ms is not None else int(datetime.now(timezone.utc).timestamp() * 1000)
+
+    with _writer_lock(symbol, interval) as directory:
+        last = last_cached_open_time(symbol, interval)
+        if contiguous and last is None:
+            return 0
+        fresh = {}
+        for kline in klines:
+            open_time = int(kline['open_time'])
+            if (last is not None and open_time <= last) or int(kline['close_time']) >= now_ms:
+                continue
+            # 同一批内重复的开盘时间以最后一条为准
+            fresh[open_time] = kline
+
+        ordered = [fresh[key] for key in sorted(fresh)]
+        if contiguous and ordered:
+            expected = last_cached_close_time(symbol, interval) + 1
+            for count, kline in enumerate(ordered):
+                if int(kline['open_time']) != expected:
+                    logger.debug(f"[KlineCache] {symbol} {interval} 缺口 {expected} -> {kline['open_time']}，"
+                                 f"丢弃 {len(ordered) - count} 行，等待 sync_from_db 补齐")
+                    ordered = ordered[:count]
+                    break
+                expected = int(kline['close_time']) + 1
+        if not ordered:
+            return 0
+
+        table = _rows_to_table({name: [k.get(name) for k in ordered] for name in CACHE_COLUMNS})
+        _write_segment(directory, table)
+        if len(list_segments(symbol, interval)) > KLINE_CACHE_MAX_SEGMENTS:
+            _compact_locked(symbol, interval, directory)
+    logger.debug(f"[KlineCache] {symbol} {interval} 追加 {len(ordered)} 行")
+    return len(ordered)
+
+
+def _compact_locked(symbol: str, interval: str, directory: Path) -> Optional[Path]:
+    segments = list_segments(symbol, interval)
+    if len(segments) <= 1:
+        return segments[0] if segments else None
+    tables = [_read_segment(path) for path in segments]
+    merged = _write_segment(directory, pa.concat_tables(tables).combine_chunks())
+    for path in segments:
+        if path != merged:
+            path.unlink()
+    logger.info(f"[KlineCache] {symbol} {interval} 合并 {len(segments)} 个分段 -> {merged.name}")
+    return merged
+
+
+def compact(symbol: str, interval: str = '1m') -> Optional[Path]:
+    """将所有分段合并为一个文件，返回合并后的文件路径"""
+    _require_pyarrow()
+    with _writer_lock(symbol, interval) as directory:
+        return _compact_locked(symbol, interval, directory)
+
+
+def sync_from_db(symbol: str, interval: str = '1m', session=None, batch_size: int = DB_SYNC_BATCH) -> int:
+    """
+    从数据库增量同步：只读取晚于已缓存末根的K线，按 batch_size 分批
+    读取路径为 dbget_kline，因此支持所有存储后端与布局
+
+    Returns:
+        int: 新增的行数
+    """
+    _require_pyarrow()
+    from DatabaseOperator.pg_operator import Session, dbget_kline
+    from DatabaseOperator.kline_store import kline_table_name_for
+
+    symbol = symbol.upper()
+    table_name = kline_table_name_for(symbol, interval)
+    own_session = session is None
+    session = session or Session()
+    total = 0
+    try:
+        while True:
+            last = last_cached_open_time(symbol, interval)
+            start_time = None if last is None else datetime.fromtimestamp((last + 1) / 1000, tz=timezone.utc)
+            rows = dbget_kline(session, table_name, symbol, order_by_column='open_time', ascending=True,
+                               interval=interval, limit=batch_size, start_time=start_time)
+            if not rows:
+                break
+            klines = [{
+                'open_time': int(row.open_time.timestamp() * 1000),
+                'close_time': int(row.close_time.timestamp() * 1000),
+                'open': row.open, 'high': row.high, 'low': row.low, 'close': row.close,
+                'volume': row.volume,
+                'quote_asset_volume': row.quote_asset_volume,
+                'num_trades': row.num_trades,
+                'taker_buy_base_vol': row.taker_buy_base_vol,
+                'taker_buy_quote_vol': row.taker_buy_quote_vol,
+            } for row in rows]
+            added = append_klines(symbol, interval, klines, contiguous=False)
+            total += added
+            # 本批只剩未完结的K线时结束
+            if added == 0 or len(rows) < batch_size:
+                break
+    finally:
+        if own_session:
+            session.close()
+    logger.info(f"[KlineCache] {symbol} {interval} 从数据库同步 {total} 行")
+    return total
+
+
+def _read_segment(path: Path):
+    """内存映射读取一个分段（不拷贝数据）"""
+    source = pa.memory_map(str(path), 'r')
+    return pa.ipc.open_file(source).read_all()
+
+
+def load_klines(symbol: str, interval: str = '1m', start_ms: Optional[int] = None,
+                end_ms: Optional[int] = None, columns: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    内存映射加载缓存为 NumPy 数组
+    只有一个分段时（合并之后的常态）数组直接指向映射内存，不发生拷贝
+
+    Args:
+        symbol: 交易对
+        interval: K线周期
+        start_ms: 只返回 open_time >= start_ms 的K线
+        end_ms: 只返回 open_time < end_ms 的K线
+        columns: 需要的列，默认全部
+
+    Returns:
+        Dict[str, np.ndarray]: 列名 -> 数组（只读），按 open_time 升序
+    """
+    _require_pyarrow()
+    columns = list(columns or CACHE_COLUMNS)
+    unknown = [c for c in columns if c not in CACHE_COLUMNS]
+    if unknown:
+        raise ValueError(f"未知的缓存列: {unknown}")
+
+    # 合并任务可能在列目录与打开文件之间删除旧分段，重新列目录一次即可
+    for attempt in range(2):
+        try:
+            tables = [_read_segment(path) for path in list_segments(symbol, interval)]
+            break
+        except FileNotFoundError:
+            if attempt:
+                raise
+
+    if not tables:
+        return {name: np.empty(0, dtype=np.int64 if name in _INT_COLUMNS else np.float64) for name in columns}
+
+    table = tables[0] if len(tables) == 1 else pa.concat_tables(tables)
+    arrays = {}
+    for name in set(columns) | {'open_time'}:
+        column = table.column(name)
+        arrays[name] = column.chunk(0).to_numpy() if column.num_chunks == 1 else column.to_numpy()
+
+    open_time = arrays['open_time']
+    lo = 0 if start_ms is None else int(np.searchsorted(open_time, start_ms, side='left'))
+    hi = len(open_time) if end_ms is None else int(np.searchsorted(open_time, end_ms, side='left'))
+    return {name: arrays[name][lo:hi] for name in columns}
+
+
+def main():
+    """命令行入口：同步、合并与查看缓存"""
+    from config.logging_config import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='本地K线列式缓存工具')
+    parser.add_argument('command', choices=['sync', 'compact', 'info'], help='sync: 从数据库增量同步; compact: 合并分段; info: 查看缓存')
+    parser.add_argument('--symbol', required=True, help='交易对，如 BTCUSDT')
+    parser.add_argument('--interval', default='1m', help='K线周期')
+    args = parser.parse_args()
+
+    if args.command == 'sync':
+        print(f"新增 {sync_from_db(args.symbol, args.interval)} 行")
+    elif args.command == 'compact':
+        print(compact(args.symbol, args.interval))
+    else:
+        segments = list_segments(args.symbol, args.interval)
+        rows = len(load_klines(args.symbol, args.interval, columns=['open_time'])['open_time'])
+        last = last_cached_open_time(args.symbol, args.interval)
+        print(f"目录: {cache_dir(args.symbol, args.interval)}")
+        print(f"分段: {len(segments)}，行数: {rows}")
+        if last is not None:
+            print(f"最后一根: {datetime.fromtimestamp(last / 1000, tz=timezone.utc)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+# app/DataProcessingCalculator/kline_ring.py
+"""
+kline_ring.py
+- 每个 (symbol, interval) 一个定长环形缓冲区，以 NumPy 列保存最近 N 根K线，读取“最近 N 根”不再查询数据库
+- 采集回调每收到一条K线调用 update：同一 open_time 覆盖最新一格（未完结K线不断刷新），新的 open_time 追加
+- 可选 Redis 镜像：完结K线 RPUSH + LTRIM 到 kline:ring:<SYMBOL>:<interval>，供 API 或其他进程读取
+- 读取结果按 open_time 升序，时间为纪元毫秒，列名与 kline_cache 一致
+
+环境变量：
+    KLINE_RING_CAPACITY   每个缓冲区保存的K线数（默认 1000）
+    KLINE_RING_MIRROR     完结K线是否镜像到 Redis（默认 false）
+"""
+import json
+import logging
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+KLINE_RING_CAPACITY = int(os.getenv('KLINE_RING_CAPACITY', '1000'))
+RING_KEY_PREFIX = 'kline:ring:'
+
+RING_COLUMNS = (
+    'open_time', 'close_time', 'open', 'high', 'low', 'close', 'volume',
+    'quote_asset_volume', 'num_trades', 'taker_buy_base_vol', 'taker_buy_quote_vol',
+)
+_INT_COLUMNS = ('open_time', 'close_time', 'num_trades')
+# Redis 镜像中每根K线的紧凑编码：按该顺序的 JSON 数组
+MIRROR_COLUMNS = ('open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time')
+
+
+def ring_key(symbol: str, interval: str) -> str:
+    return f"{RING_KEY_PREFIX}{symbol.upper()}:{interval}"
+
+
+class KlineRingBuffer:
+    """单个交易对/周期的环形缓冲区"""
+
+    def __init__(self, capacity: int = KLINE_RING_CAPACITY):
+        if capacity <= 0:
+            raise ValueError("capacity 必须为正整数。")
+        self.capacity = capacity
+        self.columns: Dict[str, np.ndarray] = {
+            name: np.zeros(capacity, dtype=np.int64 if name in _INT_COLUMNS else np.float64)
+            for name in RING_COLUMNS
+        }
+        self.size = 0
+        self._next = 0            # 下一根K线写入的位置
+        self.last_closed = False  # 最新一根是否已完结
+        self._lock = threading.Lock()
+
+    @property
+    def last_open_time(self) -> Optional[int]:
+        if not self.size:
+            return None
+        return int(self.columns['open_time'][(self._next - 1) % self.capacity])
+
+    def _write(self, index: int, kline: dict) -> None:
+        # 交易所推送的价格为字符串，缺失字段记为 0
+        for name, column in self.columns.items():
+            value = kline.get(name)
+            column[index] = 0 if value is None else (int(value) if name in _INT_COLUMNS else float(value))
+
+    def update(self, kline: dict) -> bool:
+        """
+        写入一条K线（parse_kline 格式，时间为毫秒）
+
+        Returns:
+            bool: 是否写入；早于最新一根的K线被忽略
+        """
+        open_time = int(kline['open_time'])
+        with self._lock:
+            last = self.last_open_time
+            if last is not None and open_time < last:
+                return False
+            if last is not None and open_time == last:
+                index = (self._next - 1) % self.capacity
+            else:
+                index = self._next
+                self._next = (self._next + 1) % self.capacity
+                self.size = min(self.size + 1, self.capacity)
+            self._write(index, kline)
+            self.last_closed = bool(kline.get('is_closed', True))
+            return True
+
+    def extend(self, columns: Dict[str, np.ndarray]) -> int:
+        """批量写入已完结的历史K线（按 open_time 升序），返回写入条数"""
+        count = len(columns['open_time'])
+        for i in range(max(0, count - self.capacity), count):
+            self.update({name: columns[name][i] for name in RING_COLUMNS if name in columns})
+        return min(count, self.capacity)
+
+    def last(self, n: Optional[int] = None, closed_only: bool = False) -> Dict[str, np.ndarray]:
+        """
+        最近 n 根K线（按时间升序的拷贝）
+
+        Args:
+            n: 条数，默认全部
+            closed_only: 是否排除尚未完结的最新一根
+        """
+        with self._lock:
+            available = self.size - (1 if closed_only and self.size and not self.last_closed else 0)
+            n = available if n is None else max(0, min(n, available))
+            end = self._next - (self.size - available)
+            indices = np.arange(end - n, end) % self.capacity
+            return {name: column[indices] for name, column in self.columns.items()}
+
+
+class KlineRingRegistry:
+    """所有环形缓冲区，可选镜像到 Redis"""
+
+    def __init__(self, capacity: int = KLINE_RING_CAPACITY, client=None, mirror: bool = False):
+        """
+        Args:
+            capacity: 每个缓冲区的容量
+            client: Redis 客户端（镜像使用），默认 RedisClient 单例
+            mirror: 完结K线是否写入 Redis 镜像
+        """
+        self.capacity = capacity
+        self._client = client
+        self.mirror = mirror
+        self._buffers: Dict[Tuple[str, str], KlineRingBuffer] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            from DatabaseOperator.redis_operator import RedisClient
+            self._client = RedisClient().client
+        return self._client
+
+    def buffer(self, symbol: str, interval: str, create: bool = True) -> Optional[KlineRingBuffer]:
+        key = (symbol.upper(), interval)
+        buffer = self._buffers.get(key)
+        if buffer is None and create:
+            with self._lock:
+                buffer = self._buffers.setdefault(key, KlineRingBuffer(self.capacity))
+        return buffer
+
+    def keys(self) -> List[Tuple[str, str]]:
+        return sorted(self._buffers)
+
+    def update(self, symbol: str, interval: str, kline: dict) -> bool:
+        """采集回调：写入缓冲区，完结K线同时写入 Redis 镜像（失败只记录日志）"""
+        written = self.buffer(symbol, interval).update(kline)
+        if written and self.mirror and kline.get('is_closed'):
+            try:
+                self.push_mirror(symbol, interval, [kline])
+            except Exception as e:
+                logger.warning(f"[KlineRing] 写入 Redis 镜像失败 {symbol} {interval}: {e}")
+        return written
+
+    def last(self, symbol: str, interval: str, n: Optional[int] = None,
+             closed_only: bool = False) -> Optional[Dict[str, np.ndarray]]:
+        """最近 n 根K线；本进程没有该缓冲区时返回 None"""
+        buffer = self.buffer(symbol, interval, create=False)
+        if buffer is None or not buffer.size:
+            return None
+        return buffer.last(n, closed_only)
+
+    def seed(self, symbol: str, interval: str) -> int:
+        """用已完结的历史K线预热（优先本地列式缓存，其次数据库）"""
+        from DataProcessingCalculator.DataAnalyze import load_kline_dataframe
+        df = load_kline_dataframe(symbol, interval).tail(self.capacity)
+        if df.empty:
+            return 0
+        columns = {name: df[name].to_numpy() for name in RING_COLUMNS if name in df}
+        for name in ('open_time', 'close_time'):
+            columns[name] = df[name].astype('int64').to_numpy() // 1_000_000
+        buffer = self.buffer(symbol, interval)
+        count = buffer.extend(columns)
+        # 最后一根可能尚未完结，交由实时推送刷新
+        logger.info(f"[KlineRing] {symbol} {interval} 预热 {count} 根K线")
+        return count
+
+    # ---------- Redis 镜像 ----------
+
+    def push_mirror(self, symbol: str, interval: str, klines: List[dict]) -> None:
+        key = ring_key(symbol, interval)
+        pipe = self.client.pipeline(transaction=False)
+        rows = [[int(k[name]) if name in _INT_COLUMNS else float(k[name]) for name in MIRROR_COLUMNS]
+                for k in klines]
+        pipe.rpush(key, *[json.dumps(row, separators=(',', ':')) for row in rows])
+        pipe.ltrim(key, -self.capacity, -1)
+        pipe.execute()
+
+    def read_mirror(self, symbol: str, interval: str, n: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """从 Redis 镜像读取最近 n 根完结K线（MIRROR_COLUMNS 列）"""
+        n = self.capacity if n is None else n
+        rows = [json.loads(v) for v in self.client.lrange(ring_key(symbol, interval), -n, -1)] if n > 0 else []
+        return {
+            name: np.array([row[i] for row in rows], dtype=np.int64 if name in _INT_COLUMNS else np.float64)
+            for i, name in enumerate(MIRROR_COLUMNS)
+        }
+
+
+# 全局实例，由采集回调更新（main.py）
+kline_rings = KlineRingRegistry(mirror=os.getenv('KLINE_RING_MIRROR', 'false').lower() in ('1', 'true', 'yes', 'on'))
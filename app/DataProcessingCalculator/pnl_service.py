@@ -0,0 +1,325 @@
+# app/DataProcessingCalculator/pnl_service.py
+"""
+pnl_service.py
+- 增量盈亏：内存中按交易对维护持仓、平均成本、最新价格与最后买入价，替代 calculator.calculate_diff
+  每次查询最新价格与最后买入记录再插入一行的做法
+    on_price   每个价格 tick O(1) 更新最新价、未实现盈亏与价差（最新价 - 最后买入价）
+    on_fill    成交按平均成本法更新持仓：同方向加仓重算均价，反方向减仓计入已实现盈亏，穿越零点后按成交价开新仓
+    apply_order 接收订单记录（order_response_to_record / execution_report_to_record 的格式），
+                按累计成交量与累计成交金额的增量换算成交，重复回报不会重复计入
+- 快照不逐 tick 写库：flush() 把上次写入后有变化的交易对各取一条最新快照，一批写入 pnl_snapshots
+- 冷启动 cold_start(symbol) 走索引查询（见 DatabaseOperator/pnl_store.py）：回放 BinanceOrders 中该交易对的成交
+  得到持仓与成本，最新价格取 price_data_<symbol>（其次 K线表），最后买入价以 buy_history_<symbol> 为准
+  （与 calculator.calculate_diff 原先的口径一致），该表没有记录时才取回放成交中的最后一笔买入；
+  所需索引由 python -m DatabaseOperator.pnl_store 在部署时创建
+
+用法：
+    cd app
+    python -m DataProcessingCalculator.pnl_service --symbol BTCUSDT          # 冷启动并输出当前盈亏
+    python -m DataProcessingCalculator.pnl_service --symbol BTCUSDT --store  # 同时写入一条快照
+
+环境变量：
+    PNL_SERVICE          主程序是否运行盈亏服务（见 main.py，默认 false）
+    PNL_FLUSH_INTERVAL   快照写库间隔秒数（默认 10）
+"""
+import argparse
+import asyncio
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+PNL_FLUSH_INTERVAL = float(os.getenv('PNL_FLUSH_INTERVAL', '10'))
+
+# 订单累计成交的保留条数，用于把累计值换算为增量
+ORDER_FILLS_KEPT = 10000
+
+
+def _to_float(value) -> float:
+    return float(value) if value not in (None, '') else 0.0
+
+
+class PositionPnL:
+    """单个交易对的持仓与盈亏（平均成本法，正数为多头，负数为空头）"""
+
+    __slots__ = ('symbol', 'position', 'avg_cost', 'realized', 'unrealized', 'last_price', 'last_buy_price',
+                 'updated_at')
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.position = 0.0
+        self.avg_cost = 0.0
+        self.realized = 0.0
+        self.unrealized = 0.0
+        self.last_price: Optional[float] = None
+        self.last_buy_price: Optional[float] = None
+        self.updated_at: Optional[datetime] = None
+
+    def mark(self, price: float) -> None:
+        """更新最新价与未实现盈亏"""
+        self.last_price = price
+        self.unrealized = self.position * (price - self.avg_cost) if self.position else 0.0
+
+    def fill(self, side: str, quantity: float, price: float) -> float:
+        """
+        计入一笔成交
+
+        Returns:
+            float: 本笔成交的已实现盈亏
+        """
+        signed = quantity if side == 'BUY' else -quantity
+        realized = 0.0
+        if self.position == 0 or (self.position > 0) == (signed > 0):
+            total = abs(self.position) + quantity
+            self.avg_cost = (self.avg_cost * abs(self.position) + price * quantity) / total
+            self.position += signed
+        else:
+            closed = min(quantity, abs(self.position))
+            realized = closed * (price - self.avg_cost) * (1 if self.position > 0 else -1)
+            self.position += signed
+            if abs(self.position) < 1e-12:
+                self.position, self.avg_cost = 0.0, 0.0
+            elif (self.position > 0) == (signed > 0):
+                # 反手：剩余部分按成交价开新仓
+                self.avg_cost = price
+        self.realized += realized
+        if side == 'BUY':
+            self.last_buy_price = price
+        if self.last_price is not None:
+            self.mark(self.last_price)
+        return realized
+
+    @property
+    def diff(self) -> Optional[float]:
+        """最新价 - 最后买入价（与 price_diff_<symbol> 表的 diff 一致）"""
+        if self.last_price is None or self.last_buy_price is None:
+            return None
+        return self.last_price - self.last_buy_price
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'symbol': self.symbol,
+            'position': self.position,
+            'avg_cost': self.avg_cost if self.position else None,
+            'last_price': self.last_price,
+            'realized_pnl': self.realized,
+            'unrealized_pnl': self.unrealized if self.last_price is not None else None,
+            'diff': self.diff,
+            'snapshot_time': self.updated_at or datetime.now(timezone.utc),
+        }
+
+
+class PnLService:
+    """
+    增量盈亏服务
+
+    用法：
+        pnl = PnLService()
+        pnl.cold_start('BTCUSDT')           # 同步，查询数据库
+        pnl.on_price('BTCUSDT', 65000.0)    # 行情 tick
+        pnl.apply_order(order_record)       # 成交回报
+        pnl.flush()                         # 批量写入快照
+    """
+
+    def __init__(self, store: bool = True):
+        """
+        Args:
+            store: flush() 是否写入 pnl_snapshots；False 时只在内存中计算
+        """
+        self.store = store
+        self.positions: Dict[str, PositionPnL] = {}
+        # newClientOrderId -> [已计入的累计成交量, 已计入的累计成交金额]
+        self._order_fills: 'OrderedDict[str, list]' = OrderedDict()
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self.ticks = 0
+        self.fills = 0
+        self.flushed = 0
+
+    def position(self, symbol: str) -> PositionPnL:
+        state = self.positions.get(symbol)
+        if state is None:
+            state = self.positions[symbol] = PositionPnL(symbol)
+        return state
+
+    # ---------- 增量更新 ----------
+
+    def on_price(self, symbol: str, price: float) -> None:
+        """价格 tick：更新最新价与未实现盈亏"""
+        with self._lock:
+            state = self.position(symbol)
+            state.mark(price)
+            state.updated_at = datetime.now(timezone.utc)
+            self._dirty.add(symbol)
+            self.ticks += 1
+
+    def on_fill(self, symbol: str, side: str, quantity: float, price: float) -> float:
+        """一笔成交（数量与成交价），返回本笔已实现盈亏"""
+        with self._lock:
+            return self._fill(symbol, side, quantity, price)
+
+    def _fill(self, symbol: str, side: str, quantity: float, price: float) -> float:
+        state = self.position(symbol)
+        realized = state.fill(side, quantity, price)
+        state.updated_at = datetime.now(timezone.utc)
+        self._dirty.add(symbol)
+        self.fills += 1
+        return realized
+
+    def apply_order(self, record: Dict[str, Any]) -> float:
+        """
+        订单记录 -> 成交增量：累计成交量与累计成交金额相对上次的差值，成交价 = 金额增量 / 数量增量
+        （没有成交金额时用订单价格或最新价）
+
+        Returns:
+            float: 本次计入的已实现盈亏
+        """
+        client_order_id = record.get('newClientOrderId')
+        executed = _to_float(record.get('executed_qty'))
+        if not client_order_id or executed <= 0:
+            return 0.0
+        quote = _to_float(record.get('cummulative_quote_qty'))
+        symbol = record['symbol']
+        with self._lock:
+            previous = self._order_fills.get(client_order_id)
+            if previous is None:
+                previous = self._order_fills[client_order_id] = [0.0, 0.0]
+                while len(self._order_fills) > ORDER_FILLS_KEPT:
+                    self._order_fills.popitem(last=False)
+            quantity = executed - previous[0]
+            if quantity <= 1e-12:
+                return 0.0
+            if quote > previous[1]:
+                price = (quote - previous[1]) / quantity
+            else:
+                price = _to_float(record.get('price')) or self.position(symbol).last_price
+                if not price:
+                    logger.warning(f"[PnL] {symbol} 订单 {client_order_id} 缺少成交价，跳过")
+                    return 0.0
+            previous[0], previous[1] = executed, max(quote, previous[1])
+            return self._fill(symbol, record['side'], quantity, price)
+
+    # ---------- 冷启动 ----------
+
+    def cold_start(self, symbol: str) -> PositionPnL:
+        """
+        从数据库重建一个交易对的状态（同步）：回放 BinanceOrders 的成交，取最新价格与最后买入价
+        最后买入价以 buy_history_<symbol> 为准；已收到实时价格时保留实时价格
+        """
+        from DatabaseOperator.pnl_store import load_cold_start
+
+        loaded = load_cold_start(symbol)
+        state = PositionPnL(symbol)
+        order_fills = []
+        for fill in loaded['fills']:
+            executed = float(fill['executed_qty'] or 0)
+            quote = float(fill['cummulative_quote_qty'] or 0)
+            if executed > 0 and quote > 0:
+                state.fill(fill['side'], executed, quote / executed)
+                order_fills.append((fill['newClientOrderId'], [executed, quote]))
+        if loaded['last_buy_price'] is not None:
+            state.last_buy_price = loaded['last_buy_price']
+
+        with self._lock:
+            live = self.positions.get(symbol)
+            price = live.last_price if live is not None and live.last_price is not None else loaded['last_price']
+            if price is not None:
+                state.mark(price)
+            state.updated_at = datetime.now(timezone.utc)
+            self.positions[symbol] = state
+            for client_order_id, cumulative in order_fills:
+                if client_order_id:
+                    self._order_fills[client_order_id] = cumulative
+            self._dirty.add(symbol)
+        logger.info(f"[PnL] {symbol} 冷启动：回放 {len(order_fills)} 笔订单成交，持仓 {state.position}，"
+                    f"已实现 {state.realized:.4f}，最新价 {state.last_price}")
+        return state
+
+    # ---------- 快照 ----------
+
+    def snapshot(self, symbol: Optional[str] = None) -> Any:
+        """当前盈亏；不指定交易对时返回全部"""
+        with self._lock:
+            if symbol is not None:
+                state = self.positions.get(symbol)
+                return state.to_dict() if state is not None else None
+            return {name: state.to_dict() for name, state in self.positions.items()}
+
+    def collect(self) -> List[Dict[str, Any]]:
+        """取出上次写入后有变化的交易对的最新快照"""
+        with self._lock:
+            dirty, self._dirty = self._dirty, set()
+            return [self.positions[symbol].to_dict() for symbol in dirty]
+
+    def flush(self) -> int:
+        """把有变化的交易对各写一条快照（一批一个事务），返回写入行数；失败时下次重试"""
+        rows = self.collect()
+        if not rows or not self.store:
+            return 0
+        from DatabaseOperator.pnl_store import insert_pnl_snapshots
+        try:
+            written = insert_pnl_snapshots(rows)
+        except Exception:
+            with self._lock:
+                self._dirty.update(row['symbol'] for row in rows)
+            raise
+        self.flushed += written
+        return written
+
+    async def run(self, symbols: Iterable[str] = (), interval: float = PNL_FLUSH_INTERVAL) -> None:
+        """冷启动指定交易对，之后每 interval 秒写一批快照（数据库操作在线程中执行）"""
+        for symbol in symbols:
+            try:
+                await asyncio.to_thread(self.cold_start, symbol)
+            except Exception as e:
+                logger.error(f"[PnL] {symbol} 冷启动失败: {e}")
+        try:
+            while True:
+                await asyncio.sleep(interval)
+                try:
+                    await asyncio.to_thread(self.flush)
+                except Exception as e:
+                    logger.error(f"[PnL] 快照写入失败: {e}")
+        finally:
+            await asyncio.to_thread(self.flush)
+
+    def stats(self) -> Dict[str, int]:
+        return {'ticks': self.ticks, 'fills': self.fills, 'flushed': self.flushed, 'symbols': len(self.positions)}
+
+
+_service: Optional[PnLService] = None
+_service_lock = threading.Lock()
+
+
+def get_pnl_service() -> PnLService:
+    """进程内共享的盈亏服务"""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = PnLService()
+        return _service
+
+
+def main():
+    """命令行入口：冷启动并输出当前盈亏"""
+    parser = argparse.ArgumentParser(description='增量盈亏服务：从数据库冷启动并输出当前盈亏')
+    parser.add_argument('--symbol', action='append', help='交易对，可重复；默认 config.SYMBOL')
+    parser.add_argument('--store', action='store_true', help='同时写入一条快照到 pnl_snapshots')
+    args = parser.parse_args()
+
+    from config import SYMBOL
+    service = PnLService(store=args.store)
+    for symbol in args.symbol or [SYMBOL]:
+        service.cold_start(symbol.upper())
+    for symbol, snapshot in service.snapshot().items():
+        print(f"[PnL] {symbol} " + '  '.join(f"{key}={value}" for key, value in snapshot.items() if key != 'symbol'))
+    if args.store:
+        print(f"[PnL] 写入 {service.flush()} 条快照")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+# app/DataProcessingCalculator/trade_bars.py
+"""
+trade_bars.py
+- 由逐笔成交实时生成非时间K线：
+    tick    每 N 笔归集成交一根
+    volume  成交量累计达到 N 一根
+    dollar  成交额（价格 × 数量）累计达到 N 一根
+- 一笔成交不拆分：使累计值达到阈值的那笔成交计入当前K线并使其完结
+- 输出字段与 parse_kline 接近（时间为毫秒），另含 kind/threshold/first_agg_trade_id/last_agg_trade_id
+
+用法：
+    builders = parse_bar_specs("volume:100,dollar:5000000")
+    for trade in trades:
+        for builder in builders:
+            bar = builder.update(trade)
+            if bar:
+                ...
+"""
+from typing import List, Optional
+
+BAR_KINDS = ('tick', 'volume', 'dollar')
+
+
+class BarBuilder:
+    """按阈值切分成交的K线生成器，子类只需实现 measure"""
+
+    kind = 'tick'
+
+    def __init__(self, threshold: float):
+        if threshold <= 0:
+            raise ValueError("threshold 必须为正数。")
+        self.threshold = threshold
+        self.bar: Optional[dict] = None
+        self.accumulated = 0.0
+        self.bars = 0
+
+    def measure(self, price: float, quantity: float) -> float:
+        """一笔成交对累计值的贡献"""
+        return 1.0
+
+    def update(self, trade: dict) -> Optional[dict]:
+        """
+        加入一笔成交（parse_agg_trade 格式）
+
+        Returns:
+            Optional[dict]: 累计值达到阈值时返回完结的K线，否则 None
+        """
+        price = float(trade['price'])
+        quantity = float(trade['quantity'])
+        trade_time = int(trade['trade_time'])
+        bar = self.bar
+        if bar is None:
+            bar = self.bar = {
+                'kind': self.kind,
+                'threshold': self.threshold,
+                'open_time': trade_time,
+                'open': price,
+                'high': price,
+                'low': price,
+                'volume': 0.0,
+                'quote_asset_volume': 0.0,
+                'taker_buy_base_vol': 0.0,
+                'num_trades': 0,
+                'first_agg_trade_id': int(trade['agg_trade_id']),
+            }
+        if price > bar['high']:
+            bar['high'] = price
+        elif price < bar['low']:
+            bar['low'] = price
+        bar['close'] = price
+        bar['close_time'] = trade_time
+        bar['volume'] += quantity
+        bar['quote_asset_volume'] += price * quantity
+        if not trade.get('is_buyer_maker'):
+            bar['taker_buy_base_vol'] += quantity
+        bar['num_trades'] += 1
+        bar['last_agg_trade_id'] = int(trade['agg_trade_id'])
+
+        self.accumulated += self.measure(price, quantity)
+        if self.accumulated < self.threshold:
+            return None
+        self.bar = None
+        self.accumulated = 0.0
+        self.bars += 1
+        return bar
+
+    def pending(self) -> Optional[dict]:
+        """尚未完结的当前K线（拷贝）"""
+        return dict(self.bar) if self.bar else None
+
+
+class TickBarBuilder(BarBuilder):
+    kind = 'tick'
+
+
+class VolumeBarBuilder(BarBuilder):
+    kind = 'volume'
+
+    def measure(self, price: float, quantity: float) -> float:
+        return quantity
+
+
+class DollarBarBuilder(BarBuilder):
+    kind = 'dollar'
+
+    def measure(self, price: float, quantity: float) -> float:
+        return price * quantity
+
+
+_BUILDERS = {'tick': TickBarBuilder, 'volume': VolumeBarBuilder, 'dollar': DollarBarBuilder}
+
+
+def create_bar_builder(kind: str, threshold: float) -> BarBuilder:
+    if kind not in _BUILDERS:
+        raise ValueError(f"未知的K线类型: {kind}，可选: {', '.join(BAR_KINDS)}")
+    return _BUILDERS[kind](threshold)
+
+
+def parse_bar_specs(spec: str) -> List[BarBuilder]:
+    """解析 "volume:100,tick:500,dollar:1e6" 形式的配置，空字符串返回空列表"""
+    builders = []
+    for item in spec.split(','):
+        item = item.strip()
+        if not item:
+            continue
+        kind, _, threshold = item.partition(':')
+        if not threshold:
+            raise ValueError(f"K线配置缺少阈值: {item}")
+        builders.append(create_bar_builder(kind.strip().lower(), float(threshold)))
+    return builders
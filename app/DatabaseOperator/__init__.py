@@ -45,6 +45,10 @@ def get_trading_cache():
     from .redis_operator import trading_cache
     return trading_cache
 
+def get_price_cache():
+    from .price_cache import price_cache
+    return price_cache
+
 # 为了保持向后兼容，提供 Session 属性
 class _SessionProxy:
     def __getattr__(self, name):
@@ -57,4 +61,4 @@ class _SessionProxy:
 
 Session = _SessionProxy()
 
-__all__ = ['init_db', 'Session', 'get_session', 'get_pg_operator', 'get_redis_operator', 'get_trading_cache']
\ No newline at end of file
+__all__ = ['init_db', 'Session', 'get_session', 'get_pg_operator', 'get_redis_operator', 'get_trading_cache', 'get_price_cache']
\ No newline at end of file
@@ -0,0 +1,179 @@
+# app/DatabaseOperator/kline_compact.py
+"""
+kline_compact.py
+- KLine_<SYMBOL> 分表的紧凑存储布局（compact），与原有的 standard 布局并存
+- 通过 KLINE_STORAGE_LAYOUT 选择新建表使用的布局，已有的表按实际列类型识别
+
+环境变量：
+    KLINE_STORAGE_LAYOUT  standard（默认，timestamptz + double）或 compact
+
+compact 布局：
+- open_time / close_time 为 bigint 纪元毫秒（与 Binance 原始值一致，无需时区换算）
+- 不存 symbol（表名已包含交易对）和入库时间 timestamp
+- open/high/low/close 为按 1e8 放大的 bigint，Binance 价格最多 8 位小数，可无损还原
+- volume、成交额、主动买入量保留 double precision（real 只有约 7 位有效数字，会丢失大额成交额的精度）；
+  早期版本建出的 real 列读取时仍转换为 double
+- 8 字节列在前、4 字节列在后，行内无对齐填充
+
+dbget_kline 在 SQL 中完成解码，返回与 standard 布局相同的列与类型，调用方无感知。
+"""
+import logging
+import os
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, Optional
+
+from sqlalchemy import (
+    BigInteger, Column, DateTime, Float, Integer, REAL, String, Table, cast, func, literal, null, text
+)
+
+from DatabaseOperator.pg_operator import engine
+
+logger = logging.getLogger(__name__)
+
+KLINE_STORAGE_LAYOUT = os.getenv('KLINE_STORAGE_LAYOUT', 'standard').lower()
+
+# 价格放大倍数：Binance 价格精度为 8 位小数
+PRICE_SCALE = 100_000_000
+PRICE_COLUMNS = ('open', 'high', 'low', 'close')
+
+# 进程内缓存：表名 -> 是否为 compact 布局
+_compact_cache: Dict[str, bool] = {}
+
+
+def is_compact_layout(layout: Optional[str] = None) -> bool:
+    """当前（或指定的）布局是否为 compact"""
+    layout = (layout or KLINE_STORAGE_LAYOUT).lower()
+    if layout not in ('standard', 'compact'):
+        raise ValueError(f"未知的K线存储布局: {layout}，可选: standard, compact")
+    return layout == 'compact'
+
+
+def build_compact_kline_table(metadata_obj, table_name: str, **table_kwargs) -> Table:
+    """定义 compact 布局的K线表（不执行建表）"""
+    return Table(
+        table_name,
+        metadata_obj,
+        Column('open_time', BigInteger, primary_key=True),  # 纪元毫秒
+        Column('close_time', BigInteger),
+        Column('open', BigInteger),  # 价格 * PRICE_SCALE
+        Column('high', BigInteger),
+        Column('low', BigInteger),
+        Column('close', BigInteger),
+        Column('volume', Float),
+        Column('quote_asset_volume', Float),
+        Column('taker_buy_base_vol', Float),
+        Column('taker_buy_quote_vol', Float),
+        Column('num_trades', Integer),
+        **table_kwargs
+    )
+
+
+def is_compact_table(table) -> bool:
+    """
+    判断K线表是否为 compact 布局（open_time 为 bigint）
+
+    Args:
+        table: Table 对象或表名；表名通过 pg_attribute 查询并在进程内缓存
+    """
+    if isinstance(table, Table):
+        return 'open_time' in table.c and isinstance(table.c.open_time.type, BigInteger)
+
+    cached = _compact_cache.get(table)
+    if cached is not None:
+        return cached
+    with engine.connect() as connection:
+        type_name = connection.execute(text(
+            "SELECT format_type(atttypid, atttypmod) FROM pg_attribute "
+            "WHERE attrelid = to_regclass(:name) AND attname = 'open_time' AND NOT attisdropped"
+        ), {'name': engine.dialect.identifier_preparer.quote(table)}).scalar()
+    result = type_name == 'bigint'
+    # 表尚不存在时不缓存
+    if type_name is not None:
+        _compact_cache[table] = result
+    return result
+
+
+def to_epoch_ms(ts: datetime) -> int:
+    """时区感知的 datetime -> 纪元毫秒"""
+    if ts.tzinfo is None:
+        raise ValueError("时间必须是时区感知的 datetime 对象。")
+    return int(ts.timestamp() * 1000)
+
+
+def from_epoch_ms(ms) -> datetime:
+    """纪元毫秒 -> UTC datetime"""
+    return datetime.fromtimestamp(int(ms) / 1000, tz=timezone.utc)
+
+
+def encode_price(value) -> int:
+    """价格放大为整数；经 Decimal 转换，避免浮点误差"""
+    return int((Decimal(str(value)) * PRICE_SCALE).to_integral_value())
+
+
+def encode_kline(kline: dict) -> dict:
+    """
+    将 parse_kline 解析后的K线编码为 compact 布局的一行
+
+    Args:
+        kline: 包含 open_time/close_time（毫秒）及价格、成交量字段的字典
+
+    Returns:
+        dict: 列名 -> 值
+    """
+    row = {
+        'open_time': int(kline['open_time']),
+        'close_time': int(kline['close_time']),
+        'volume': float(kline['volume']),
+        'quote_asset_volume': float(kline['quote_asset_volume']),
+        'taker_buy_base_vol': float(kline['taker_buy_base_vol']),
+        'taker_buy_quote_vol': float(kline['taker_buy_quote_vol']),
+        'num_trades': int(kline['num_trades']),
+    }
+    for name in PRICE_COLUMNS:
+        row[name] = encode_price(kline[name])
+    return row
+
+
+def compact_select_columns(table: Table, symbol_value: str, result_columns) -> list:
+    """
+    构造解码查询列，输出与 standard 布局相同的列顺序与类型
+
+    Args:
+        table: compact 布局的表对象
+        symbol_value: 交易对（表中不存储，作为常量返回）
+        result_columns: 输出列顺序（pg_operator.KLINE_RESULT_COLUMNS）
+    """
+    columns = []
+    for name in result_columns:
+        if name == 'symbol':
+            columns.append(literal(symbol_value, String).label('symbol'))
+        elif name == 'timestamp':
+            columns.append(cast(null(), DateTime(timezone=True)).label('timestamp'))
+        elif name in ('open_time', 'close_time'):
+            columns.append(func.to_timestamp(table.c[name] / 1000.0).label(name))
+        elif name in PRICE_COLUMNS:
+            columns.append((cast(table.c[name], Float) / PRICE_SCALE).label(name))
+        elif isinstance(table.c[name].type, REAL):
+            # 早期版本的 compact 表
+            columns.append(cast(table.c[name], Float).label(name))
+        else:
+            columns.append(table.c[name])
+    return columns
+
+
+def decoded_source_sql(table_name: str) -> str:
+    """
+    返回把 compact 表解码为 standard 列的子查询，供原生 SQL 的 FROM 子句使用
+    仅按纪元毫秒过滤（:start_ms / :end_ms），以便利用主键/BRIN 索引
+    """
+    quoted = engine.dialect.identifier_preparer.quote(table_name)
+    prices = ', '.join(f"{name}::float8 / {PRICE_SCALE} AS {name}" for name in PRICE_COLUMNS)
+    return (
+        f"(SELECT to_timestamp(open_time / 1000.0) AS open_time, "
+        f"to_timestamp(close_time / 1000.0) AS close_time, {prices}, volume, "
+        f"quote_asset_volume::float8 AS quote_asset_volume, num_trades, "
+        f"taker_buy_base_vol::float8 AS taker_buy_base_vol, "
+        f"taker_buy_quote_vol::float8 AS taker_buy_quote_vol "
+        f"FROM {quoted} WHERE open_time >= :start_ms AND open_time < :end_ms)"
+    )
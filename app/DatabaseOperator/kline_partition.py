@@ -0,0 +1,433 @@
+# app/DatabaseOperator/kline_partition.py
+"""
+kline_partition.py
+- K线表的可选分区布局：按 open_time 做月度 RANGE 分区
+- 自动创建分区、为范围扫描建立 BRIN 索引
+- 可配置的保留/归档任务：超出保留期的分区先导出为 csv.gz 再卸载删除
+
+环境变量：
+    KLINE_PARTITIONED             新建的 K线表是否使用分区布局（默认 false）
+    KLINE_RETENTION_MONTHS        保留最近 N 个月的分区，0 表示永久保留（默认 0）
+    KLINE_ARCHIVE_DIR             删除分区前的归档目录，留空则不归档直接删除
+    KLINE_PARTITION_MONTHS_AHEAD  维护任务提前创建的未来分区数（默认 1）
+
+分区命名为 <表名>_pYYYYMM，例如 KLine_BTCUSDT_p202501。
+dbget_kline / insert_kline / 采集函数都通过父表读写，对调用方透明。
+"""
+import argparse
+import gzip
+import logging
+import os
+import re
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session as OrmSession
+
+from DatabaseOperator.pg_operator import engine, get_kline_table_name
+
+logger = logging.getLogger(__name__)
+
+KLINE_PARTITIONED = os.getenv('KLINE_PARTITIONED', 'false').lower() in ('1', 'true', 'yes', 'on')
+KLINE_RETENTION_MONTHS = int(os.getenv('KLINE_RETENTION_MONTHS', '0'))
+KLINE_ARCHIVE_DIR = os.getenv('KLINE_ARCHIVE_DIR', '')
+KLINE_PARTITION_MONTHS_AHEAD = int(os.getenv('KLINE_PARTITION_MONTHS_AHEAD', '1'))
+
+_PARTITION_SUFFIX = re.compile(r'_p(\d{4})(\d{2})$')
+
+# 进程内缓存：表是否为分区表、已确认存在的分区，避免每次写入都执行 DDL/元数据查询
+_partitioned_cache: Dict[str, bool] = {}
+_known_partitions: Set[str] = set()
+# Connection.info 中记录当前事务内创建、尚未提交的分区
+_PENDING_KEY = 'kline_partitions_pending'
+_lock = threading.Lock()
+
+
+def _quote(name: str) -> str:
+    """按 PostgreSQL 规则引用标识符"""
+    return engine.dialect.identifier_preparer.quote(name)
+
+
+def month_start(ts: datetime) -> datetime:
+    """返回 ts 所在月份第一天 00:00 (UTC)"""
+    if ts.tzinfo is None:
+        raise ValueError("时间必须是时区感知的 datetime 对象。")
+    ts = ts.astimezone(timezone.utc)
+    return datetime(ts.year, ts.month, 1, tzinfo=timezone.utc)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """月份加减（month 必须是月初）"""
+    index = month.year * 12 + (month.month - 1) + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=timezone.utc)
+
+
+def partition_name(table_name: str, month: datetime) -> str:
+    """分区表名：<表名>_pYYYYMM"""
+    return f"{table_name}_p{month.year:04d}{month.month:02d}"
+
+
+def is_partitioned_table(table_name: str) -> bool:
+    """判断表是否为分区父表（结果在进程内缓存）"""
+    cached = _partitioned_cache.get(table_name)
+    if cached is not None:
+        return cached
+    with engine.connect() as connection:
+        relkind = connection.execute(
+            text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"),
+            {'name': _quote(table_name)}
+        ).scalar()
+    result = relkind == 'p'
+    # 表尚不存在时不缓存，以便建表后重新判断
+    if relkind is not None:
+        _partitioned_cache[table_name] = result
+    return result
+
+
+def _partition_bound(table_name: str, month: datetime) -> str:
+    """分区边界字面量：standard 布局为时间戳，compact 布局为纪元毫秒"""
+    from DatabaseOperator.kline_compact import is_compact_table, to_epoch_ms
+    if is_compact_table(table_name):
+        return str(to_epoch_ms(month))
+    return f"'{month.isoformat()}'"
+
+
+def _on_commit(connection) -> None:
+    """事务提交后，事务内创建的分区才对其他连接可见，此时再记入进程内缓存"""
+    pending = connection.info.pop(_PENDING_KEY, None)
+    if pending:
+        with _lock:
+            _known_partitions.update(pending)
+
+
+def _on_rollback(connection) -> None:
+    """事务回滚时，事务内创建的分区随之撤销"""
+    connection.info.pop(_PENDING_KEY, None)
+
+
+event.listen(engine, 'commit', _on_commit)
+event.listen(engine, 'rollback', _on_rollback)
+
+
+def _partition_exists(connection, name: str) -> bool:
+    return bool(connection.execute(text("SELECT to_regclass(:name) IS NOT NULL"), {'name': _quote(name)}).scalar())
+
+
+def create_month_partition(table_name: str, month: datetime, conn_engine=None, bind=None) -> str:
+    """
+    创建指定月份的分区（已存在则跳过）
+
+    Args:
+        table_name: 分区父表名
+        month: 月初时间 (UTC)
+        conn_engine: 可选 engine，默认使用 pg_operator.engine
+        bind: 调用方正在使用的 Session / Connection。调用方的事务已写过父表时必须传入：
+            CREATE TABLE ... PARTITION OF 需要父表的 ACCESS EXCLUSIVE 锁，
+            在另一条连接上执行会等待调用方自己事务持有的锁而永久阻塞。
+            传入时 DDL 在该事务的保存点内执行，随调用方一起提交，提交后才记入缓存
+
+    Returns:
+        str: 分区表名
+    """
+    name = partition_name(table_name, month)
+    if name in _known_partitions:
+        return name
+
+    ddl = text(
+        f"CREATE TABLE IF NOT EXISTS {_quote(name)} PARTITION OF {_quote(table_name)} "
+        f"FOR VALUES FROM ({_partition_bound(table_name, month)}) TO ({_partition_bound(table_name, add_months(month, 1))})"
+    )
+    if bind is not None:
+        connection = bind.connection() if isinstance(bind, OrmSession) else bind
+        pending = connection.info.setdefault(_PENDING_KEY, set())
+        if name in pending:
+            return name
+        # 不持有 _lock 执行：DDL 可能等待其他会话的事务，而那些会话也可能在等 _lock
+        try:
+            with bind.begin_nested():
+                bind.execute(ddl)
+        except Exception as e:
+            if not _partition_exists(bind, name):
+                logger.error(f"[Partition] 创建分区 {name} 失败: {e}")
+                raise
+        pending.add(name)
+        logger.info(f"[Partition] 分区已在当前事务中创建: {name}")
+        return name
+
+    with _lock:
+        if name in _known_partitions:
+            return name
+        try:
+            with (conn_engine or engine).begin() as connection:
+                connection.execute(ddl)
+        except Exception as e:
+            # 多进程并发创建同一分区时，另一方可能已先创建成功
+            with (conn_engine or engine).connect() as connection:
+                exists = _partition_exists(connection, name)
+            if not exists:
+                logger.error(f"[Partition] 创建分区 {name} 失败: {e}")
+                raise
+        _known_partitions.add(name)
+    logger.info(f"[Partition] 分区已就绪: {name}")
+    return name
+
+
+def ensure_kline_partitions(table_name: str, start_time: datetime, end_time: datetime, bind=None) -> List[str]:
+    """
+    确保 [start_time, end_time] 覆盖的每个月份都有分区；非分区表直接返回空列表
+
+    Args:
+        table_name: K线表名
+        start_time: 起始时间（时区感知）
+        end_time: 结束时间（时区感知）
+        bind: 调用方的 Session / Connection，见 create_month_partition
+
+    Returns:
+        List[str]: 涉及的分区表名
+    """
+    if not is_partitioned_table(table_name):
+        return []
+    month = month_start(start_time)
+    last = month_start(end_time)
+    names = []
+    while month <= last:
+        names.append(create_month_partition(table_name, month, bind=bind))
+        month = add_months(month, 1)
+    return names
+
+
+def ensure_partition_for_time(table_name: str, ts: datetime, bind=None) -> None:
+    """
+    写入单行前调用：确保 ts 所在月份的分区存在；非分区表为空操作
+    bind 传入写入所用的 Session，缺失的分区在同一事务内创建（见 create_month_partition）
+    """
+    if not is_partitioned_table(table_name):
+        return
+    month = month_start(ts)
+    if partition_name(table_name, month) not in _known_partitions:
+        create_month_partition(table_name, month, bind=bind)
+
+
+def setup_partitioned_kline_table(conn_engine, table_name: str) -> None:
+    """
+    新建分区父表后的初始化：
+    - 在父表上建立 open_time 的 BRIN 索引（自动下发到所有分区），用于低成本范围扫描
+      主键 btree 仍保留，用于 insert_kline 的 ON CONFLICT 去重，但按分区拆小
+    - 预先创建当前月份及未来 KLINE_PARTITION_MONTHS_AHEAD 个月的分区
+    """
+    with conn_engine.begin() as connection:
+        connection.execute(text(
+            f"CREATE INDEX IF NOT EXISTS {_quote(table_name + '_open_time_brin')} "
+            f"ON {_quote(table_name)} USING brin (open_time)"
+        ))
+    _partitioned_cache[table_name] = True
+
+    current = month_start(datetime.now(timezone.utc))
+    for offset in range(KLINE_PARTITION_MONTHS_AHEAD + 1):
+        create_month_partition(table_name, add_months(current, offset), conn_engine)
+
+
+def list_partitions(table_name: str) -> List[Tuple[str, datetime]]:
+    """
+    列出分区父表下按本模块规则命名的分区
+
+    Returns:
+        List[Tuple[str, datetime]]: (分区名, 月初时间)，按时间升序
+    """
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(:name)"
+        ), {'name': _quote(table_name)}).fetchall()
+
+    partitions = []
+    for (name,) in rows:
+        match = _PARTITION_SUFFIX.search(name)
+        if match and name.startswith(table_name):
+            partitions.append((name, datetime(int(match.group(1)), int(match.group(2)), 1, tzinfo=timezone.utc)))
+    return sorted(partitions, key=lambda item: item[1])
+
+
+def list_partitioned_kline_tables() -> List[str]:
+    """列出所有使用分区布局的 KLine_ 表"""
+    with engine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT relname FROM pg_class WHERE relkind = 'p' AND relname LIKE 'KLine\\_%' ORDER BY relname"
+        )).fetchall()
+    return [row[0] for row in rows]
+
+
+def archive_partition(name: str, archive_dir: str) -> Path:
+    """
+    将分区数据导出为 <archive_dir>/<分区名>.csv.gz（COPY TO STDOUT，流式写入）
+
+    Returns:
+        Path: 归档文件路径
+    """
+    directory = Path(archive_dir)
+    directory.mkdir(parents=True, exist_ok=True)
+    path = directory / f"{name}.csv.gz"
+
+    raw_connection = engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        with gzip.open(path, 'wt', encoding='utf-8') as archive_file:
+            cursor.copy_expert(f"COPY {_quote(name)} TO STDOUT WITH (FORMAT csv, HEADER true)", archive_file)
+        cursor.close()
+    finally:
+        raw_connection.close()
+    logger.info(f"[Partition] 分区 {name} 已归档到 {path}")
+    return path
+
+
+def apply_kline_retention(table_name: str, keep_months: int, archive_dir: Optional[str] = None) -> List[str]:
+    """
+    删除超出保留期的分区（整月早于 当前月份 - keep_months 的分区）
+
+    Args:
+        table_name: 分区父表名
+        keep_months: 保留的月份数（含当前月），必须为正整数
+        archive_dir: 归档目录，提供时删除前先导出
+
+    Returns:
+        List[str]: 已删除的分区名
+    """
+    if keep_months <= 0:
+        raise ValueError("keep_months 必须是正整数。")
+    cutoff = add_months(month_start(datetime.now(timezone.utc)), -(keep_months - 1))
+
+    dropped = []
+    for name, month in list_partitions(table_name):
+        if month >= cutoff:
+            continue
+        if archive_dir:
+            archive_partition(name, archive_dir)
+        with engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE {_quote(table_name)} DETACH PARTITION {_quote(name)}"))
+            connection.execute(text(f"DROP TABLE {_quote(name)}"))
+        _known_partitions.discard(name)
+        dropped.append(name)
+        logger.info(f"[Partition] 已删除过期分区: {name}")
+    return dropped
+
+
+def run_partition_maintenance(keep_months: Optional[int] = None, archive_dir: Optional[str] = None,
+                              months_ahead: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    分区维护任务（适合定时执行）：为所有分区 K线表预建未来分区，并按保留策略清理旧分区
+
+    Args:
+        keep_months: 保留月份数，None 读取 KLINE_RETENTION_MONTHS，0 表示不清理
+        archive_dir: 归档目录，None 读取 KLINE_ARCHIVE_DIR
+        months_ahead: 预建未来分区数，None 读取 KLINE_PARTITION_MONTHS_AHEAD
+
+    Returns:
+        Dict[str, List[str]]: 每张表被删除的分区
+    """
+    keep_months = KLINE_RETENTION_MONTHS if keep_months is None else keep_months
+    archive_dir = KLINE_ARCHIVE_DIR if archive_dir is None else archive_dir
+    months_ahead = KLINE_PARTITION_MONTHS_AHEAD if months_ahead is None else months_ahead
+
+    current = month_start(datetime.now(timezone.utc))
+    result = {}
+    for table_name in list_partitioned_kline_tables():
+        _partitioned_cache[table_name] = True
+        for offset in range(months_ahead + 1):
+            create_month_partition(table_name, add_months(current, offset))
+        result[table_name] = apply_kline_retention(table_name, keep_months, archive_dir or None) if keep_months > 0 else []
+    return result
+
+
+def convert_to_partitioned(symbol: str, interval: Optional[str] = None, drop_legacy: bool = False) -> str:
+    """
+    将已有的未分区 K线表迁移为分区布局
+    原表重命名为 <表名>_legacy，新建分区父表后整体复制数据
+
+    Args:
+        symbol: 交易对
+        interval: K线周期，None 表示基础 1m 表
+        drop_legacy: 复制完成后是否删除旧表
+
+    Returns:
+        str: 分区父表名
+    """
+    from DatabaseOperator.pg_operator import create_kline_table_if_not_exists
+    from DatabaseOperator.kline_compact import is_compact_table, from_epoch_ms
+
+    symbol = symbol.upper()
+    table_name = get_kline_table_name(symbol, interval)
+    if is_partitioned_table(table_name):
+        logger.info(f"[Partition] {table_name} 已是分区表，跳过")
+        return table_name
+
+    # 新表沿用旧表的布局
+    compact = is_compact_table(table_name)
+    legacy = f"{table_name}_legacy"
+    with engine.begin() as connection:
+        connection.execute(text(f"ALTER TABLE {_quote(table_name)} RENAME TO {_quote(legacy)}"))
+        # 主键约束与索引名在 schema 内唯一，需要一并改名以便新表复用原名称
+        connection.execute(text(
+            f"ALTER TABLE {_quote(legacy)} RENAME CONSTRAINT {_quote(table_name + '_pkey')} TO {_quote(legacy + '_pkey')}"
+        ))
+        connection.execute(text(
+            f"ALTER INDEX IF EXISTS {_quote('ix_' + table_name + '_symbol')} RENAME TO {_quote('ix_' + legacy + '_symbol')}"
+        ))
+    _partitioned_cache.pop(table_name, None)
+
+    create_kline_table_if_not_exists(engine, symbol, interval, partitioned=True,
+                                     layout='compact' if compact else 'standard')
+
+    with engine.connect() as connection:
+        first, last = connection.execute(text(f"SELECT min(open_time), max(open_time) FROM {_quote(legacy)}")).one()
+    if first is not None:
+        if compact:
+            first, last = from_epoch_ms(first), from_epoch_ms(last)
+        ensure_kline_partitions(table_name, first, last)
+
+    columns = ('open, high, low, close, volume, open_time, close_time, quote_asset_volume, '
+               'num_trades, taker_buy_base_vol, taker_buy_quote_vol')
+    if not compact:
+        columns = f'symbol, {columns}, "timestamp"'
+    with engine.begin() as connection:
+        copied = connection.execute(text(
+            f"INSERT INTO {_quote(table_name)} ({columns}) SELECT {columns} FROM {_quote(legacy)}"
+        )).rowcount
+        if drop_legacy:
+            connection.execute(text(f"DROP TABLE {_quote(legacy)}"))
+    logger.info(f"[Partition] {table_name} 迁移完成，共复制 {copied} 行")
+    return table_name
+
+
+def main():
+    """命令行入口：分区维护与迁移"""
+    from config.logging_config import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='K线分区表维护工具')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    maintain = subparsers.add_parser('maintain', help='预建未来分区并执行保留/归档策略')
+    maintain.add_argument('--keep-months', type=int, default=None, help='保留最近 N 个月，0 表示不清理')
+    maintain.add_argument('--archive-dir', default=None, help='删除前的归档目录')
+    maintain.add_argument('--months-ahead', type=int, default=None, help='预建未来分区数')
+
+    convert = subparsers.add_parser('convert', help='将已有的未分区表迁移为分区表')
+    convert.add_argument('--symbol', required=True, help='交易对，如 BTCUSDT')
+    convert.add_argument('--interval', default=None, help='K线周期，默认基础 1m 表')
+    convert.add_argument('--drop-legacy', action='store_true', help='迁移完成后删除旧表')
+
+    args = parser.parse_args()
+    if args.command == 'maintain':
+        result = run_partition_maintenance(args.keep_months, args.archive_dir, args.months_ahead)
+        for table_name, dropped in result.items():
+            print(f"{table_name}: 删除 {len(dropped)} 个分区 {dropped}")
+    elif args.command == 'convert':
+        print(convert_to_partitioned(args.symbol, args.interval, args.drop_legacy))
+
+
+if __name__ == '__main__':
+    main()
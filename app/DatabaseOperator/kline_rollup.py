@@ -0,0 +1,350 @@
+# app/DatabaseOperator/kline_rollup.py
+"""
+kline_rollup.py
+- 基于已完结的 1m K线，在数据库内增量维护 5m/15m/1h/4h/1d 聚合K线表
+- 聚合完全在 SQL 中完成，高周期数据不再需要单独请求 Binance（节省 API 权重）
+- 提供历史数据的批量回填
+
+表命名（per_symbol 后端）：
+    基础表  KLine_<SYMBOL>            (1m)
+    聚合表  KLine_<SYMBOL>_<interval> (例如 KLine_BTCUSDT_1h)
+unified 后端下基础数据与聚合结果都写入统一表 klines，以 interval 列区分；
+compact 布局的基础表，其聚合表同样使用 compact 布局（整数时间与价格）
+"""
+import argparse
+import logging
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+
+from DatabaseOperator.pg_operator import (
+    engine,
+    create_kline_table_if_not_exists,
+    get_kline_table_name,
+)
+from DatabaseOperator.kline_partition import ensure_kline_partitions
+from DatabaseOperator.kline_compact import from_epoch_ms, is_compact_table, to_epoch_ms
+from DatabaseOperator.kline_store import (
+    UNIFIED_KLINE_TABLE,
+    create_unified_kline_table_if_not_exists,
+    is_unified_backend,
+)
+
+logger = logging.getLogger(__name__)
+
+# 支持的聚合周期及其长度（秒）
+ROLLUP_INTERVALS: Dict[str, int] = {
+    '5m': 5 * 60,
+    '15m': 15 * 60,
+    '1h': 60 * 60,
+    '4h': 4 * 60 * 60,
+    '1d': 24 * 60 * 60,
+}
+
+# 聚合 SQL：按周期对齐到 UTC 纪元（与 Binance 的K线边界一致），
+# open 取桶内第一根，close 取桶内最后一根，其余字段取极值或求和
+_ROLLUP_SQL = """
+INSERT INTO {target} (
+    symbol, open, high, low, close, volume, open_time, close_time,
+    quote_asset_volume, num_trades, taker_buy_base_vol, taker_buy_quote_vol, "timestamp"
+)
+SELECT
+    :symbol,
+    (array_agg(src.open ORDER BY src.open_time ASC))[1],
+    max(src.high),
+    min(src.low),
+    (array_agg(src.close ORDER BY src.open_time DESC))[1],
+    sum(src.volume),
+    src.bucket,
+    src.bucket + make_interval(secs => :step_seconds) - interval '1 millisecond',
+    sum(src.quote_asset_volume),
+    sum(src.num_trades),
+    sum(src.taker_buy_base_vol),
+    sum(src.taker_buy_quote_vol),
+    now()
+FROM (
+    SELECT s.*,
+           to_timestamp(floor(extract(epoch FROM s.open_time) / :step_seconds) * :step_seconds) AS bucket
+    FROM {source} AS s
+    WHERE s.open_time >= :start_time AND s.open_time < :end_time
+) AS src
+GROUP BY src.bucket
+ON CONFLICT (open_time) DO UPDATE SET
+    symbol = EXCLUDED.symbol,
+    open = EXCLUDED.open,
+    high = EXCLUDED.high,
+    low = EXCLUDED.low,
+    close = EXCLUDED.close,
+    volume = EXCLUDED.volume,
+    close_time = EXCLUDED.close_time,
+    quote_asset_volume = EXCLUDED.quote_asset_volume,
+    num_trades = EXCLUDED.num_trades,
+    taker_buy_base_vol = EXCLUDED.taker_buy_base_vol,
+    taker_buy_quote_vol = EXCLUDED.taker_buy_quote_vol,
+    "timestamp" = EXCLUDED."timestamp"
+"""
+
+# 统一表版本：源数据与结果都在 klines 中，按 (symbol, interval) 区分
+_UNIFIED_ROLLUP_SQL = """
+INSERT INTO {target} (
+    symbol, "interval", open_time, open, high, low, close, volume,
+    quote_asset_volume, num_trades, taker_buy_base_vol, taker_buy_quote_vol
+)
+SELECT
+    :symbol,
+    :interval,
+    src.bucket,
+    (array_agg(src.open ORDER BY src.open_time ASC))[1],
+    max(src.high),
+    min(src.low),
+    (array_agg(src.close ORDER BY src.open_time DESC))[1],
+    sum(src.volume),
+    sum(src.quote_asset_volume),
+    sum(src.num_trades),
+    sum(src.taker_buy_base_vol),
+    sum(src.taker_buy_quote_vol)
+FROM (
+    SELECT s.*,
+           to_timestamp(floor(extract(epoch FROM s.open_time) / :step_seconds) * :step_seconds) AS bucket
+    FROM {target} AS s
+    WHERE s.symbol = :symbol AND s."interval" = '1m'
+      AND s.open_time >= :start_time AND s.open_time < :end_time
+) AS src
+GROUP BY src.bucket
+ON CONFLICT (symbol, "interval", open_time) DO UPDATE SET
+    open = EXCLUDED.open,
+    high = EXCLUDED.high,
+    low = EXCLUDED.low,
+    close = EXCLUDED.close,
+    volume = EXCLUDED.volume,
+    quote_asset_volume = EXCLUDED.quote_asset_volume,
+    num_trades = EXCLUDED.num_trades,
+    taker_buy_base_vol = EXCLUDED.taker_buy_base_vol,
+    taker_buy_quote_vol = EXCLUDED.taker_buy_quote_vol
+"""
+
+# compact 布局版本：时间为纪元毫秒、价格为放大后的整数，桶边界直接做整数运算
+_COMPACT_ROLLUP_SQL = """
+INSERT INTO {target} (
+    open_time, close_time, open, high, low, close, volume,
+    quote_asset_volume, num_trades, taker_buy_base_vol, taker_buy_quote_vol
+)
+SELECT
+    src.bucket,
+    src.bucket + :step_ms - 1,
+    (array_agg(src.open ORDER BY src.open_time ASC))[1],
+    max(src.high),
+    min(src.low),
+    (array_agg(src.close ORDER BY src.open_time DESC))[1],
+    sum(src.volume),
+    sum(src.quote_asset_volume),
+    sum(src.num_trades),
+    sum(src.taker_buy_base_vol),
+    sum(src.taker_buy_quote_vol)
+FROM (
+    SELECT s.*, (s.open_time / :step_ms) * :step_ms AS bucket
+    FROM {source} AS s
+    WHERE s.open_time >= :start_ms AND s.open_time < :end_ms
+) AS src
+GROUP BY src.bucket
+ON CONFLICT (open_time) DO UPDATE SET
+    open = EXCLUDED.open,
+    high = EXCLUDED.high,
+    low = EXCLUDED.low,
+    close = EXCLUDED.close,
+    volume = EXCLUDED.volume,
+    close_time = EXCLUDED.close_time,
+    quote_asset_volume = EXCLUDED.quote_asset_volume,
+    num_trades = EXCLUDED.num_trades,
+    taker_buy_base_vol = EXCLUDED.taker_buy_base_vol,
+    taker_buy_quote_vol = EXCLUDED.taker_buy_quote_vol
+"""
+
+
+def _quote(name: str) -> str:
+    """按 PostgreSQL 规则引用表名（KLine_ 表名包含大写字母）"""
+    return engine.dialect.identifier_preparer.quote(name)
+
+
+def _validate_intervals(intervals: Optional[Iterable[str]]) -> List[str]:
+    """校验聚合周期，None 表示全部支持的周期"""
+    if intervals is None:
+        return list(ROLLUP_INTERVALS.keys())
+    intervals = list(intervals)
+    unknown = [i for i in intervals if i not in ROLLUP_INTERVALS]
+    if unknown:
+        raise ValueError(f"不支持的聚合周期: {unknown}，可选: {list(ROLLUP_INTERVALS.keys())}")
+    return intervals
+
+
+def ensure_rollup_tables(symbol: str, intervals: Optional[Iterable[str]] = None) -> None:
+    """
+    确保基础 1m 表与各聚合表存在
+
+    Args:
+        symbol: 交易对 (e.g., "BTCUSDT")
+        intervals: 聚合周期列表，None 表示全部
+    """
+    symbol = symbol.upper()
+    if is_unified_backend():
+        _validate_intervals(intervals)
+        create_unified_kline_table_if_not_exists()
+        return
+    base = create_kline_table_if_not_exists(engine, symbol)
+    # 聚合表与基础表使用相同的布局
+    layout = 'compact' if is_compact_table(base) else 'standard'
+    for interval in _validate_intervals(intervals):
+        create_kline_table_if_not_exists(engine, symbol, interval, layout=layout)
+
+
+def _execute_rollup(connection, symbol: str, interval: str, start_time: datetime, end_time: datetime) -> int:
+    """在给定连接/会话上执行一次区间聚合，返回影响的行数"""
+    params = {
+        'symbol': symbol,
+        'interval': interval,
+        'step_seconds': ROLLUP_INTERVALS[interval],
+        'start_time': start_time,
+        'end_time': end_time,
+    }
+    if is_unified_backend():
+        stmt = text(_UNIFIED_ROLLUP_SQL.format(target=_quote(UNIFIED_KLINE_TABLE)))
+        return connection.execute(stmt, params).rowcount or 0
+
+    target = get_kline_table_name(symbol, interval)
+    source = get_kline_table_name(symbol)
+    # 聚合表为分区表时，先在同一事务内确保目标区间的分区存在
+    ensure_kline_partitions(target, start_time, end_time - timedelta(milliseconds=1), bind=connection)
+    if is_compact_table(source):
+        stmt = text(_COMPACT_ROLLUP_SQL.format(target=_quote(target), source=_quote(source)))
+        return connection.execute(stmt, {
+            'step_ms': ROLLUP_INTERVALS[interval] * 1000,
+            'start_ms': to_epoch_ms(start_time),
+            'end_ms': to_epoch_ms(end_time),
+        }).rowcount or 0
+
+    stmt = text(_ROLLUP_SQL.format(target=_quote(target), source=_quote(source)))
+    params.pop('interval')
+    return connection.execute(stmt, params).rowcount or 0
+
+
+def bucket_bounds(open_time_ms: int, interval: str):
+    """
+    计算某根 1m K线所属聚合桶的起止时间
+
+    Args:
+        open_time_ms: 1m K线开盘时间（Unix 毫秒）
+        interval: 聚合周期
+
+    Returns:
+        tuple[datetime, datetime]: [桶开始, 桶结束) 的 UTC 时间
+    """
+    step_ms = ROLLUP_INTERVALS[interval] * 1000
+    start_ms = (int(open_time_ms) // step_ms) * step_ms
+    start = datetime.fromtimestamp(start_ms / 1000, tz=timezone.utc)
+    return start, start + timedelta(milliseconds=step_ms)
+
+
+def rollup_closed_kline(session, symbol: str, open_time_ms: int,
+                        intervals: Optional[Iterable[str]] = None) -> None:
+    """
+    在 1m K线完结时增量更新其所属的各聚合桶
+    与 insert_kline 使用同一会话，因此可以看到尚未提交的 1m 数据；
+    提交由调用方（上下文管理器或 auto_commit）处理
+
+    Args:
+        session: SQLAlchemy session
+        symbol: 交易对
+        open_time_ms: 已完结 1m K线的开盘时间（Unix 毫秒）
+        intervals: 需要更新的聚合周期，None 表示全部
+    """
+    symbol = symbol.upper()
+    for interval in _validate_intervals(intervals):
+        start_time, end_time = bucket_bounds(open_time_ms, interval)
+        _execute_rollup(session, symbol, interval, start_time, end_time)
+    logger.debug(f"[Rollup] 已增量聚合 {symbol} {datetime.fromtimestamp(open_time_ms / 1000, tz=timezone.utc)}")
+
+
+def backfill_rollups(symbol: str, intervals: Optional[Iterable[str]] = None,
+                     start_time: Optional[datetime] = None, end_time: Optional[datetime] = None,
+                     chunk_days: int = 30) -> Dict[str, int]:
+    """
+    从基础 1m 表批量回填聚合表
+    按 chunk_days 分段执行，每段一个事务，避免超长事务
+
+    Args:
+        symbol: 交易对
+        intervals: 聚合周期列表，None 表示全部
+        start_time: 回填起始时间（时区感知），None 表示 1m 表中最早的数据
+        end_time: 回填结束时间（时区感知），None 表示 1m 表中最新的数据
+        chunk_days: 每段天数
+
+    Returns:
+        Dict[str, int]: 每个周期写入/更新的行数
+    """
+    symbol = symbol.upper()
+    intervals = _validate_intervals(intervals)
+    if chunk_days <= 0:
+        raise ValueError("chunk_days 必须是正整数。")
+    ensure_rollup_tables(symbol, intervals)
+
+    if is_unified_backend():
+        bounds_sql = (f"SELECT min(open_time), max(open_time) FROM {_quote(UNIFIED_KLINE_TABLE)} "
+                      f"WHERE symbol = :symbol AND \"interval\" = '1m'")
+    else:
+        bounds_sql = f"SELECT min(open_time), max(open_time) FROM {_quote(get_kline_table_name(symbol))}"
+    with engine.connect() as connection:
+        first, last = connection.execute(text(bounds_sql), {'symbol': symbol}).one()
+    if isinstance(first, int):
+        # compact 布局返回纪元毫秒
+        first, last = from_epoch_ms(first), from_epoch_ms(last)
+
+    if first is None:
+        logger.warning(f"[Rollup] {symbol} 的 1m 表为空，跳过回填")
+        return {interval: 0 for interval in intervals}
+
+    start_time = start_time or first
+    end_time = end_time or (last + timedelta(minutes=1))
+
+    totals = {interval: 0 for interval in intervals}
+    for interval in intervals:
+        step = timedelta(seconds=ROLLUP_INTERVALS[interval])
+        # 段边界对齐到桶边界，保证每个桶只在一个段内被聚合
+        chunk_start, _ = bucket_bounds(int(start_time.timestamp() * 1000), interval)
+        chunk = max(timedelta(days=chunk_days), step)
+        chunk = step * (chunk // step)
+        while chunk_start < end_time:
+            chunk_end = min(chunk_start + chunk, end_time)
+            _, chunk_end = bucket_bounds(int(chunk_end.timestamp() * 1000) - 1, interval)
+            with engine.begin() as connection:
+                totals[interval] += _execute_rollup(connection, symbol, interval, chunk_start, chunk_end)
+            chunk_start = chunk_end
+        logger.info(f"[Rollup] {symbol} {interval} 回填完成，共 {totals[interval]} 行")
+
+    return totals
+
+
+def main():
+    """命令行入口：批量回填聚合表"""
+    from config.logging_config import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='从 1m K线回填高周期聚合表')
+    parser.add_argument('--symbol', required=True, help='交易对，如 BTCUSDT')
+    parser.add_argument('--intervals', nargs='*', default=None,
+                        help=f"聚合周期，默认全部: {' '.join(ROLLUP_INTERVALS.keys())}")
+    parser.add_argument('--days', type=int, default=None, help='只回填最近 N 天')
+    parser.add_argument('--chunk-days', type=int, default=30, help='每个事务覆盖的天数')
+    args = parser.parse_args()
+
+    start_time = None
+    if args.days is not None:
+        start_time = datetime.now(timezone.utc) - timedelta(days=args.days)
+
+    totals = backfill_rollups(args.symbol, args.intervals, start_time=start_time, chunk_days=args.chunk_days)
+    for interval, count in totals.items():
+        print(f"{args.symbol.upper()} {interval}: {count} 行")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,326 @@
+# app/DatabaseOperator/kline_store.py
+"""
+kline_store.py
+- 统一的多交易对K线表 klines，主键 (symbol, interval, open_time)
+- 与原有的按交易对分表 (KLine_<SYMBOL>) 并存，通过 KLINE_STORAGE_BACKEND 选择
+- 提供从分表迁移到统一表的工具
+- 存储键包含交易所：binance 之外的交易所以 <EXCHANGE>_<SYMBOL> 作为存储用的交易对（storage_symbol），
+  分表为 KLine_FAKE_BTCUSDT，统一表 symbol 列为 FAKE_BTCUSDT，与 binance 的同名交易对互不覆盖
+
+环境变量：
+    KLINE_STORAGE_BACKEND  per_symbol（默认，KLine_<SYMBOL> 分表）或 unified（klines 统一表）
+
+统一表的设计：
+- 主键 btree (symbol, interval, open_time) 同时服务于 UPSERT 去重与
+  "某交易对最近 N 根K线" 查询（等值前缀 + open_time 反向索引扫描 + LIMIT）
+- 定长 8 字节列在前、4 字节列居中、变长列在后，减少行内对齐填充
+- 不存储可推导的字段：close_time = open_time + 周期 - 1ms，入库时间 timestamp 也不再逐行保存
+- 价格、成交量、成交额与主动买入量都使用 double precision：real 只有约 7 位有效数字，
+  大额成交额会丢失精度（早期版本建出的 real 列可用 ALTER COLUMN ... TYPE double precision 升级）
+"""
+import argparse
+import logging
+import os
+import re
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import (
+    Column, Float, Index, Integer, MetaData, PrimaryKeyConstraint, String, Table, DateTime,
+    inspect, literal_column, text
+)
+
+from DatabaseOperator.pg_operator import (
+    engine,
+    create_kline_table_if_not_exists,
+    get_kline_table_name,
+)
+from DatabaseOperator.kline_compact import decoded_source_sql, from_epoch_ms, is_compact_table, to_epoch_ms
+
+logger = logging.getLogger(__name__)
+
+KLINE_STORAGE_BACKEND = os.getenv('KLINE_STORAGE_BACKEND', 'per_symbol').lower()
+UNIFIED_KLINE_TABLE = 'klines'
+
+# Binance K线周期 -> PostgreSQL interval 字面量（用于推导 close_time）
+KLINE_INTERVALS: Dict[str, str] = {
+    '1s': '1 second',
+    '1m': '1 minute',
+    '3m': '3 minutes',
+    '5m': '5 minutes',
+    '15m': '15 minutes',
+    '30m': '30 minutes',
+    '1h': '1 hour',
+    '2h': '2 hours',
+    '4h': '4 hours',
+    '6h': '6 hours',
+    '8h': '8 hours',
+    '12h': '12 hours',
+    '1d': '1 day',
+    '3d': '3 days',
+    '1w': '7 days',
+    '1M': '1 month',
+}
+
+_unified_table: Optional[Table] = None
+
+
+def _quote(name: str) -> str:
+    """按 PostgreSQL 规则引用标识符"""
+    return engine.dialect.identifier_preparer.quote(name)
+
+
+def is_unified_backend(backend: Optional[str] = None) -> bool:
+    """当前（或指定的）存储后端是否为统一表"""
+    backend = (backend or KLINE_STORAGE_BACKEND).lower()
+    if backend not in ('per_symbol', 'unified'):
+        raise ValueError(f"未知的K线存储后端: {backend}，可选: per_symbol, unified")
+    return backend == 'unified'
+
+
+def create_unified_kline_table_if_not_exists(conn_engine=None) -> Table:
+    """
+    创建统一K线表 klines（已存在则反射返回）
+
+    Returns:
+        Table: klines 表对象
+    """
+    global _unified_table
+    if _unified_table is not None:
+        return _unified_table
+
+    conn_engine = conn_engine or engine
+    metadata_obj = MetaData()
+    if inspect(conn_engine).has_table(UNIFIED_KLINE_TABLE):
+        _unified_table = Table(UNIFIED_KLINE_TABLE, metadata_obj, autoload_with=conn_engine)
+        return _unified_table
+
+    table = Table(
+        UNIFIED_KLINE_TABLE,
+        metadata_obj,
+        Column('open_time', DateTime(timezone=True), nullable=False),
+        Column('open', Float, nullable=False),
+        Column('high', Float, nullable=False),
+        Column('low', Float, nullable=False),
+        Column('close', Float, nullable=False),
+        Column('volume', Float, nullable=False),
+        Column('quote_asset_volume', Float),
+        Column('taker_buy_base_vol', Float),
+        Column('taker_buy_quote_vol', Float),
+        Column('num_trades', Integer),
+        Column('symbol', String(20), nullable=False),
+        Column('interval', String(3), nullable=False),
+        # 主键列顺序即索引顺序，等值列在前、open_time 在后
+        PrimaryKeyConstraint('symbol', 'interval', 'open_time', name=f'{UNIFIED_KLINE_TABLE}_pkey'),
+        # 跨交易对的时间范围扫描（例如按天导出）走 BRIN，几乎不占空间
+        Index(f'{UNIFIED_KLINE_TABLE}_open_time_brin', 'open_time', postgresql_using='brin'),
+    )
+    table.create(conn_engine)
+    logger.info(f"创建统一K线表: {UNIFIED_KLINE_TABLE}")
+    _unified_table = table
+    return table
+
+
+def storage_symbol(symbol: str, exchange: Optional[str] = None) -> str:
+    """
+    存储用的交易对：binance（默认交易所）为 SYMBOL，其他交易所为 <EXCHANGE>_<SYMBOL>
+    K线表、聚合表、本地缓存与 Redis Stream 都以它为键（统一表 symbol 列最长 20 个字符）
+    """
+    from ExchangeFetcher.exchange_adapter import DEFAULT_EXCHANGE
+
+    exchange = (exchange or DEFAULT_EXCHANGE).lower()
+    if exchange == DEFAULT_EXCHANGE:
+        return symbol.upper()
+    return f"{exchange.upper()}_{symbol.upper()}"
+
+
+def resolve_kline_table(symbol: str, interval: str = '1m', backend: Optional[str] = None) -> Table:
+    """
+    根据存储后端返回应写入/读取的K线表（不存在则创建）
+
+    Args:
+        symbol: 交易对
+        interval: K线周期
+        backend: per_symbol / unified，None 读取 KLINE_STORAGE_BACKEND
+
+    Returns:
+        Table: KLine_<SYMBOL>[_<interval>] 或 klines
+    """
+    if is_unified_backend(backend):
+        return create_unified_kline_table_if_not_exists()
+    return create_kline_table_if_not_exists(engine, symbol.upper(), interval)
+
+
+def kline_table_name_for(symbol: str, interval: str = '1m', backend: Optional[str] = None) -> str:
+    """返回 dbget_kline 所需的表名（不创建表）"""
+    if is_unified_backend(backend):
+        return UNIFIED_KLINE_TABLE
+    return get_kline_table_name(symbol.upper(), interval)
+
+
+def close_time_expression(open_time_column, interval: str):
+    """统一表不存 close_time，按周期推导：open_time + 周期 - 1ms"""
+    if interval not in KLINE_INTERVALS:
+        raise ValueError(f"不支持的K线周期: {interval}")
+    return open_time_column + literal_column(f"interval '{KLINE_INTERVALS[interval]}'") \
+        - literal_column("interval '1 millisecond'")
+
+
+def latest_klines(session, symbol: str, interval: str = '1m', limit: int = 100,
+                  backend: Optional[str] = None) -> list:
+    """
+    获取某交易对最近 N 根K线（按 open_time 升序返回）
+    统一表上走主键索引的反向扫描，只读取 N 个索引项
+
+    Returns:
+        list of tuples: 与 dbget_kline 相同的列顺序
+    """
+    from DatabaseOperator.pg_operator import dbget_kline
+
+    rows = dbget_kline(session, kline_table_name_for(symbol, interval, backend), symbol.upper(),
+                       order_by_column='open_time', ascending=False, interval=interval, limit=limit)
+    return list(reversed(rows))
+
+
+# =============================================================================
+# 分表 -> 统一表迁移
+# =============================================================================
+
+_MIGRATE_SQL = """
+INSERT INTO {target} (
+    symbol, "interval", open_time, open, high, low, close, volume,
+    quote_asset_volume, num_trades, taker_buy_base_vol, taker_buy_quote_vol
+)
+SELECT :symbol, :interval, s.open_time, s.open, s.high, s.low, s.close, s.volume,
+       s.quote_asset_volume, s.num_trades, s.taker_buy_base_vol, s.taker_buy_quote_vol
+FROM {source} AS s
+WHERE s.open_time >= :start_time AND s.open_time < :end_time
+  AND s.open IS NOT NULL AND s.close IS NOT NULL
+ON CONFLICT (symbol, "interval", open_time) DO UPDATE SET
+    open = EXCLUDED.open,
+    high = EXCLUDED.high,
+    low = EXCLUDED.low,
+    close = EXCLUDED.close,
+    volume = EXCLUDED.volume,
+    quote_asset_volume = EXCLUDED.quote_asset_volume,
+    num_trades = EXCLUDED.num_trades,
+    taker_buy_base_vol = EXCLUDED.taker_buy_base_vol,
+    taker_buy_quote_vol = EXCLUDED.taker_buy_quote_vol
+"""
+
+def _per_symbol_table_pattern() -> re.Pattern:
+    """KLine_[<EXCHANGE>_]<SYMBOL>[_<interval>]；交易所前缀只接受已注册的非默认交易所，避免与周期后缀混淆"""
+    from ExchangeFetcher.exchange_adapter import DEFAULT_EXCHANGE, available_exchanges
+
+    prefixes = '|'.join(re.escape(name.upper()) for name in available_exchanges() if name != DEFAULT_EXCHANGE)
+    prefix = f'(?:(?:{prefixes})_)?' if prefixes else ''
+    return re.compile(rf'^KLine_({prefix}[A-Z0-9]+?)(?:_([0-9]+[smhdwM]))?$')
+
+
+def parse_per_symbol_table(table_name: str, base_interval: str = '1m') -> Optional[Tuple[str, str]]:
+    """
+    解析分表名
+
+    Returns:
+        (存储用的交易对, 周期)，例如 KLine_FAKE_BTCUSDT_1h -> ('FAKE_BTCUSDT', '1h')；不是K线分表时返回 None
+    """
+    match = _per_symbol_table_pattern().match(table_name)
+    if not match:
+        return None
+    interval = match.group(2) or base_interval
+    if interval not in KLINE_INTERVALS:
+        return None
+    return match.group(1), interval
+
+
+def discover_per_symbol_tables(base_interval: str = '1m') -> List[Tuple[str, str, str]]:
+    """
+    查找数据库中的 KLine_ 分表（排除分区子表与 _legacy 备份表），包括其他交易所的 KLine_<EXCHANGE>_<SYMBOL> 表
+
+    Args:
+        base_interval: 基础表 KLine_<SYMBOL> 存储的周期
+
+    Returns:
+        List[Tuple[str, str, str]]: (表名, 存储用的交易对, 周期)，交易对即统一表 symbol 列的值
+    """
+    found = []
+    for table_name in inspect(engine).get_table_names():
+        parsed = parse_per_symbol_table(table_name, base_interval)
+        if parsed is not None:
+            found.append((table_name, *parsed))
+    return sorted(found)
+
+
+def migrate_per_symbol_to_unified(symbols: Optional[Iterable[str]] = None, base_interval: str = '1m',
+                                  chunk_days: int = 30) -> Dict[str, int]:
+    """
+    将 KLine_<SYMBOL>[_<interval>] 分表的数据迁移到统一表 klines
+    按 open_time 分段执行，每段一个事务；可重复执行（冲突时覆盖）
+
+    Args:
+        symbols: 只迁移这些交易对（其他交易所为存储用的交易对，如 FAKE_BTCUSDT），None 表示全部
+        base_interval: 基础表存储的周期
+        chunk_days: 每段天数
+
+    Returns:
+        Dict[str, int]: 每张源表迁移的行数
+    """
+    if chunk_days <= 0:
+        raise ValueError("chunk_days 必须是正整数。")
+    wanted = {s.upper() for s in symbols} if symbols else None
+    target = create_unified_kline_table_if_not_exists()
+
+    totals = {}
+    for table_name, symbol, interval in discover_per_symbol_tables(base_interval):
+        if wanted is not None and symbol not in wanted:
+            continue
+        source = _quote(table_name)
+        with engine.connect() as connection:
+            first, last = connection.execute(text(f"SELECT min(open_time), max(open_time) FROM {source}")).one()
+        totals[table_name] = 0
+        if first is None:
+            continue
+
+        # compact 布局的分表先在子查询中解码为标准列
+        compact = is_compact_table(table_name)
+        if compact:
+            first, last = from_epoch_ms(first), from_epoch_ms(last)
+            source = decoded_source_sql(table_name)
+
+        stmt = text(_MIGRATE_SQL.format(target=_quote(target.name), source=source))
+        chunk_start = first
+        while chunk_start <= last:
+            chunk_end = chunk_start + timedelta(days=chunk_days)
+            params = {
+                'symbol': symbol,
+                'interval': interval,
+                'start_time': chunk_start,
+                'end_time': chunk_end,
+            }
+            if compact:
+                params.update(start_ms=to_epoch_ms(chunk_start), end_ms=to_epoch_ms(chunk_end))
+            with engine.begin() as connection:
+                totals[table_name] += connection.execute(stmt, params).rowcount or 0
+            chunk_start = chunk_end
+        logger.info(f"[KlineStore] {table_name} -> {target.name} ({symbol} {interval}) 迁移 {totals[table_name]} 行")
+    return totals
+
+
+def main():
+    """命令行入口：分表迁移到统一表"""
+    from config.logging_config import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='将 KLine_<SYMBOL> 分表迁移到统一K线表 klines')
+    parser.add_argument('--symbols', nargs='*', default=None, help='只迁移指定交易对，默认全部')
+    parser.add_argument('--base-interval', default='1m', help='KLine_<SYMBOL> 基础表存储的周期')
+    parser.add_argument('--chunk-days', type=int, default=30, help='每个事务覆盖的天数')
+    args = parser.parse_args()
+
+    totals = migrate_per_symbol_to_unified(args.symbols, args.base_interval, args.chunk_days)
+    for table_name, count in totals.items():
+        print(f"{table_name}: {count} 行")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,342 @@
+# app/DatabaseOperator/order_journal.py
+"""
+order_journal.py
+- 订单状态变化的异步日志：下单路径只追加一行本地 WAL 并入队，后台线程批量写入 BinanceOrders
+- 一批记录在一个事务中写入：同一 newClientOrderId 的多次变化先在内存中合并，再按列集合分组，
+  每组一条多行 INSERT ... ON CONFLICT (newClientOrderId) DO UPDATE ... RETURNING id；
+  冲突时只更新记录中实际给出的列，未给出的列保持库中原值
+- 崩溃安全：WAL（JSON Lines）每条记录带递增序号，事务提交后追加检查点 {"checkpoint": 序号}；
+  启动时 replay() 重新写入最后一个检查点之后的记录。全部记录落库且无待写记录时截断 WAL
+- 写入失败时：连接类错误（数据库不可用）整批按指数退避重试；其他错误把批次二分拆开重试，
+  单条记录连续失败 ORDER_JOURNAL_MAX_ATTEMPTS 次后写入死信文件（WAL 旁的 <WAL 文件名>.dead.jsonl），
+  检查点越过该记录，不再阻塞之后的订单
+- record() 返回 concurrent.futures.Future，落库后得到记录的 UUID；进入死信的记录 Future 为写库时的异常
+
+环境变量：
+    ORDER_WAL_PATH          WAL 文件路径（默认 <DATA_DIR>/order_journal.wal）
+    ORDER_WAL_FSYNC         每条记录是否 fsync（默认 false，只 flush 到操作系统；断电安全需设为 true）
+    ORDER_JOURNAL_BATCH     每个事务最多写入的记录数（默认 200）
+    ORDER_JOURNAL_INTERVAL  攒批等待的最长秒数（默认 0.2）
+    ORDER_JOURNAL_MAX_ATTEMPTS  单条记录写入失败（非连接类错误）多少次后进入死信文件（默认 3）
+"""
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+from DatabaseOperator.pg_operator import Session, build_order_entry, get_order_table
+from PathUniti import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+ORDER_WAL_PATH = Path(os.getenv('ORDER_WAL_PATH', str(DATA_DIR / 'order_journal.wal')))
+ORDER_WAL_FSYNC = os.getenv('ORDER_WAL_FSYNC', 'false').lower() in ('1', 'true', 'yes', 'on')
+ORDER_JOURNAL_BATCH = int(os.getenv('ORDER_JOURNAL_BATCH', '200'))
+ORDER_JOURNAL_INTERVAL = float(os.getenv('ORDER_JOURNAL_INTERVAL', '0.2'))
+ORDER_JOURNAL_MAX_ATTEMPTS = int(os.getenv('ORDER_JOURNAL_MAX_ATTEMPTS', '3'))
+
+# 冲突更新时不覆盖的列
+_IMMUTABLE_COLUMNS = ('id', 'created_at', 'newClientOrderId')
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"无法序列化的类型: {type(value).__name__}")
+
+
+def _is_connection_error(error: Exception) -> bool:
+    """数据库不可用（重试整批即可恢复），与记录本身有问题的错误区分"""
+    if isinstance(error, (OperationalError, InterfaceError)):
+        return True
+    return isinstance(error, DBAPIError) and error.connection_invalidated
+
+
+class OrderJournal:
+    """
+    订单日志
+
+    用法：
+        journal = OrderJournal()
+        journal.replay()                       # 启动时补写上次未落库的记录
+        future = journal.record(order_data)    # insert_order_Binance 的 order_data 格式
+        journal.update(order_uuid, {'order_status': 'FILLED'})
+        journal.close()
+    """
+
+    def __init__(self, wal_path: Path = ORDER_WAL_PATH, batch_size: int = ORDER_JOURNAL_BATCH,
+                 flush_interval: float = ORDER_JOURNAL_INTERVAL, fsync: bool = ORDER_WAL_FSYNC,
+                 max_attempts: int = ORDER_JOURNAL_MAX_ATTEMPTS):
+        self.wal_path = Path(wal_path)
+        self.dead_letter_path = self.wal_path.with_name(f"{self.wal_path.stem}.dead.jsonl")
+        self.max_attempts = max(1, max_attempts)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self._queue: "queue.Queue[Optional[Tuple[int, dict, Future]]]" = queue.Queue()
+        self._wal = None
+        self._wal_lock = threading.Lock()
+        self._seq = 0
+        self._committed = 0
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {'records': 0, 'batches': 0, 'rows': 0, 'errors': 0, 'replayed': 0, 'dead_letters': 0}
+
+    # ---------- WAL ----------
+
+    def _open_wal(self):
+        if self._wal is None:
+            self.wal_path.parent.mkdir(parents=True, exist_ok=True)
+            self._wal = open(self.wal_path, 'a', encoding='utf-8')
+        return self._wal
+
+    def _append_wal(self, line: dict) -> None:
+        wal = self._open_wal()
+        wal.write(json.dumps(line, default=_json_default, separators=(',', ':')) + '\n')
+        wal.flush()
+        if self.fsync:
+            os.fsync(wal.fileno())
+
+    def _checkpoint(self, seq: int) -> None:
+        """记录已提交到 seq；没有更晚的记录时截断 WAL"""
+        with self._wal_lock:
+            self._committed = max(self._committed, seq)
+            if self._committed >= self._seq:
+                self._open_wal().truncate(0)
+            else:
+                self._append_wal({'checkpoint': self._committed})
+
+    def replay(self) -> int:
+        """
+        读取 WAL，把最后一个检查点之后的记录重新入队（启动时调用一次，在 record 之前）
+
+        Returns:
+            int: 重新入队的记录数
+        """
+        if not self.wal_path.exists():
+            return 0
+        checkpoint = 0
+        records: List[Tuple[int, dict]] = []
+        with open(self.wal_path, 'r', encoding='utf-8') as wal:
+            for line in wal:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能只写了一半
+                    logger.warning(f"[OrderJournal] 跳过损坏的 WAL 行: {line[:80]!r}")
+                    continue
+                if 'checkpoint' in entry:
+                    checkpoint = max(checkpoint, entry['checkpoint'])
+                else:
+                    records.append((entry['seq'], entry))
+        pending = [(seq, entry) for seq, entry in records if seq > checkpoint]
+        with self._wal_lock:
+            self._seq = max([checkpoint] + [seq for seq, _ in records])
+            self._committed = checkpoint
+        for seq, entry in pending:
+            self._enqueue(seq, {k: entry[k] for k in ('op', 'id', 'data') if k in entry}, Future())
+        self.stats['replayed'] += len(pending)
+        if pending:
+            logger.info(f"[OrderJournal] 从 WAL 恢复 {len(pending)} 条未落库的订单记录")
+        return len(pending)
+
+    # ---------- 写入接口 ----------
+
+    def _enqueue(self, seq: int, item: dict, future: Future) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='order-journal', daemon=True)
+            self._thread.start()
+        self._queue.put((seq, item, future))
+
+    def _submit(self, item: dict) -> Future:
+        future: Future = Future()
+        with self._wal_lock:
+            self._seq += 1
+            seq = self._seq
+            self._append_wal({'seq': seq, **item})
+        self.stats['records'] += 1
+        self._enqueue(seq, item, future)
+        return future
+
+    def record(self, order_data: Dict[str, Any]) -> Future:
+        """写入或更新（按 newClientOrderId）一条订单记录，Future 结果为记录 UUID 字符串"""
+        return self._submit({'op': 'upsert', 'data': order_data})
+
+    def update(self, order_uuid: str, update_data: Dict[str, Any]) -> Future:
+        """按记录 UUID 更新（change_order_Binance 的异步版本）"""
+        return self._submit({'op': 'update', 'id': str(order_uuid), 'data': update_data})
+
+    # ---------- 后台写库 ----------
+
+    def _next_batch(self) -> Tuple[List[Tuple[int, dict, Future]], bool]:
+        """阻塞等待第一条记录，再在 flush_interval 内攒满一批；返回 (批次, 是否收到停止信号)"""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _write_batch(self, session, table, batch: List[Tuple[int, dict, Future]]) -> Dict[str, str]:
+        """在一个事务中写入一批记录，返回 newClientOrderId/UUID -> 记录 UUID"""
+        upserts: Dict[str, Dict[str, Any]] = {}
+        plain_inserts: List[Dict[str, Any]] = []
+        updates: Dict[str, Dict[str, Any]] = {}
+        for _, item, _ in batch:
+            data = item['data']
+            if item['op'] == 'update':
+                updates.setdefault(item['id'], {}).update(data)
+            elif data.get('newClientOrderId'):
+                # 同一订单的多次状态变化合并为最终状态
+                upserts.setdefault(data['newClientOrderId'], {}).update(data)
+            else:
+                plain_inserts.append(data)
+
+        ids: Dict[str, str] = {}
+        groups: Dict[Tuple[frozenset, frozenset], List[Dict[str, Any]]] = {}
+        for data in list(upserts.values()) + plain_inserts:
+            entry = build_order_entry(data)
+            explicit = frozenset(k for k, v in data.items() if v is not None and k in entry)
+            groups.setdefault((frozenset(entry), explicit), []).append(entry)
+        for (columns, explicit), rows in groups.items():
+            stmt = insert(table).values(rows)
+            if 'newClientOrderId' in columns:
+                set_ = {key: stmt.excluded[key] for key in explicit if key not in _IMMUTABLE_COLUMNS}
+                set_['updated_at'] = func.now()
+                stmt = stmt.on_conflict_do_update(index_elements=['newClientOrderId'], set_=set_)
+            for row in session.execute(stmt.returning(table.c.id, table.c.newClientOrderId)):
+                if row.newClientOrderId:
+                    ids[row.newClientOrderId] = str(row.id)
+
+        for order_uuid, data in updates.items():
+            session.execute(table.update().where(table.c.id == order_uuid).values(**data, updated_at=func.now()))
+            ids[order_uuid] = order_uuid
+        session.commit()
+        self.stats['rows'] += len(upserts) + len(plain_inserts) + len(updates)
+        return ids
+
+    def _run(self) -> None:
+        table = get_order_table()
+        with Session() as session:
+            while True:
+                batch, stopping = self._next_batch()
+                if batch:
+                    self._flush(session, table, batch)
+                if stopping:
+                    return
+
+    def _flush(self, session, table, batch: List[Tuple[int, dict, Future]]) -> None:
+        ids: Dict[str, str] = {}
+        self._write_split(session, table, batch, ids)
+        self.stats['batches'] += 1
+        for _, item, future in batch:
+            key = item.get('id') or item['data'].get('newClientOrderId')
+            if not future.done():
+                future.set_result(ids.get(key))
+        self._checkpoint(max(seq for seq, _, _ in batch))
+
+    def _write_split(self, session, table, batch: List[Tuple[int, dict, Future]], ids: Dict[str, str]) -> None:
+        """
+        写入一批记录，结果合并到 ids
+        数据库不可用时整批重试；其他错误二分拆批定位出错的记录，单条连续失败 max_attempts 次后进入死信文件
+        """
+        backoff = 1
+        attempts = 0
+        while True:
+            try:
+                ids.update(self._write_batch(session, table, batch))
+                return
+            except Exception as e:
+                session.rollback()
+                self.stats['errors'] += 1
+                if _is_connection_error(e):
+                    # 记录已在 WAL 中，重试直到数据库恢复；进程退出后由 replay 补写
+                    logger.error(f"[OrderJournal] 写入 {len(batch)} 条订单记录失败，{backoff}s 后重试: {e}")
+                elif len(batch) > 1:
+                    # 按顺序先写前半再写后半，同一订单的多次变化仍按原顺序落库
+                    logger.warning(f"[OrderJournal] 写入 {len(batch)} 条订单记录失败，拆分后重试: {e}")
+                    middle = len(batch) // 2
+                    self._write_split(session, table, batch[:middle], ids)
+                    self._write_split(session, table, batch[middle:], ids)
+                    return
+                else:
+                    attempts += 1
+                    if attempts >= self.max_attempts:
+                        self._dead_letter(batch[0], e)
+                        return
+                    logger.warning(f"[OrderJournal] 订单记录 seq={batch[0][0]} 第 {attempts} 次写入失败，"
+                                   f"{backoff}s 后重试: {e}")
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def _dead_letter(self, entry: Tuple[int, dict, Future], error: Exception) -> None:
+        """把反复写入失败的记录追加到死信文件，检查点随后越过它"""
+        seq, item, future = entry
+        line = {'seq': seq, **item, 'error': str(error), 'failed_at': datetime.now().isoformat()}
+        self.dead_letter_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.dead_letter_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(line, default=_json_default, separators=(',', ':')) + '\n')
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        self.stats['dead_letters'] += 1
+        logger.error(f"[OrderJournal] 订单记录 seq={seq} 连续 {self.max_attempts} 次写入失败，"
+                     f"已写入死信文件 {self.dead_letter_path}: {error}")
+        if not future.done():
+            future.set_exception(error)
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """等待已提交的记录全部落库"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self._wal_lock:
+                if self._committed >= self._seq:
+                    return True
+            time.sleep(0.01)
+        return False
+
+    def close(self, timeout: float = 10.0) -> None:
+        """写完已入队的记录后停止后台线程"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join(timeout)
+            self._thread = None
+        with self._wal_lock:
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+
+
+_journal: Optional[OrderJournal] = None
+_journal_lock = threading.Lock()
+
+
+def get_order_journal() -> OrderJournal:
+    """进程内共享的订单日志；首次获取时回放 WAL"""
+    global _journal
+    with _journal_lock:
+        if _journal is None:
+            _journal = OrderJournal()
+            _journal.replay()
+        return _journal
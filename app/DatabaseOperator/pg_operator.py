@@ -343,34 +343,87 @@ def dbselect_common(session, table_name, var, value):
     result = session.execute(select_entry).fetchall()
     return result
 
-def dbget_kline(session, table_name: str, symbol_value: str, order_by_column: Optional[str] = 'open_time', ascending: bool = True):
+# dbget_kline 返回的标准列顺序（与 KLine_<SYMBOL> 表及 DataAnalyze.KLine_to_dataframe 一致）
+KLINE_RESULT_COLUMNS = [
+    'symbol', 'open', 'high', 'low', 'close', 'volume',
+    'open_time', 'close_time', 'quote_asset_volume', 'num_trades',
+    'taker_buy_base_vol', 'taker_buy_quote_vol', 'timestamp'
+]
+
+def _kline_select_columns(table, interval: Optional[str], symbol_value: Optional[str] = None):
+    """
+    按标准列顺序构造查询列
+    统一表 klines 不存 close_time/timestamp，分别由周期推导或返回 NULL
+    compact 布局的分表在 SQL 中解码（见 kline_compact）
+    """
+    from sqlalchemy import null, cast
+    from DatabaseOperator.kline_compact import is_compact_table, compact_select_columns
+
+    if is_compact_table(table):
+        return compact_select_columns(table, symbol_value, KLINE_RESULT_COLUMNS)
+    if 'interval' not in table.c:
+        return [table.c[name] for name in KLINE_RESULT_COLUMNS]
+
+    from DatabaseOperator.kline_store import close_time_expression
+    columns = []
+    for name in KLINE_RESULT_COLUMNS:
+        if name == 'close_time':
+            columns.append(close_time_expression(table.c.open_time, interval).label('close_time'))
+        elif name == 'timestamp':
+            columns.append(cast(null(), DateTime(timezone=True)).label('timestamp'))
+        else:
+            columns.append(table.c[name])
+    return columns
+
+def dbget_kline(session, table_name: str, symbol_value: str, order_by_column: Optional[str] = 'open_time',
+                ascending: bool = True, interval: Optional[str] = None, limit: Optional[int] = None,
+                start_time: Optional[datetime] = None):
     """
     查询指定K线表中特定交易对的数据，并可选择排序.
+    同时支持 KLine_<SYMBOL> 分表与统一表 klines（见 kline_store），返回相同的列顺序。
     Args:
         session: SQLAlchemy session
-        table_name: K线表名字符串 (e.g., "KLine_BTCUSDT")
+        table_name: K线表名字符串 (e.g., "KLine_BTCUSDT" 或 "klines")，standard/compact 布局均可
         symbol_value: 交易对的值 (e.g., "BTCUSDT")
         order_by_column: 用于排序的列名。默认为 "open_time".
                          如果为 None，则不进行特定排序 (依赖数据库默认)。
         ascending: True for ascending order, False for descending. 默认为 True.
+        interval: K线周期，仅统一表使用，默认为 "1m"
+        limit: 最多返回的行数，None 表示不限制
+        start_time: 只返回 open_time >= start_time 的K线（时区感知），用于增量读取
     Returns:
         list of tuples: 查询结果列表, 或在表/列不存在时返回空列表并记录错误。
     """
     try:
         table = Table(table_name, metadata, autoload_with=engine)
 
-        if 'symbol' not in table.c:
+        from DatabaseOperator.kline_compact import is_compact_table
+        is_compact = is_compact_table(table)
+        if not is_compact and 'symbol' not in table.c:
             logging.error(f"列 'symbol' 在表 '{table_name}' 中未找到。")
             return []
         if order_by_column and order_by_column not in table.c:
             logging.warning(f"排序列 '{order_by_column}' 在表 '{table_name}' 中未找到。将不进行排序。")
             order_by_column = None 
 
-        query = table.select().where(table.c.symbol == symbol_value)
+        is_unified = 'interval' in table.c
+        interval = interval or '1m'
+        from sqlalchemy import select
+        query = select(*_kline_select_columns(table, interval, symbol_value))
+        # compact 分表不存 symbol 列
+        if not is_compact:
+            query = query.where(table.c.symbol == symbol_value)
+        if is_unified:
+            query = query.where(table.c.interval == interval)
+        if start_time is not None:
+            from DatabaseOperator.kline_compact import to_epoch_ms
+            query = query.where(table.c.open_time >= (to_epoch_ms(start_time) if is_compact else start_time))
         
         if order_by_column:
             order_direction = asc if ascending else desc
             query = query.order_by(order_direction(table.c[order_by_column]))
+        if limit is not None:
+            query = query.limit(limit)
             
         result = session.execute(query).fetchall()
         return result
@@ -434,60 +487,108 @@ def Time_Discrete_Check(table_name: str, time_column_name: str, start_time: Opti
         else:
             raise ValueError("必须指定 'days_ago' 或同时指定 'start_time' 和 'end_time'。")
 
+        # compact 布局的时间列为纪元毫秒
+        from DatabaseOperator.kline_compact import to_epoch_ms, from_epoch_ms
+        is_epoch_ms = isinstance(table.c[time_column_name].type, BigInteger)
+        if is_epoch_ms:
+            actual_start_time, actual_end_time = to_epoch_ms(actual_start_time), to_epoch_ms(actual_end_time)
+
         query = table.select().with_only_columns(table.c[time_column_name]).where(
             table.c[time_column_name].between(actual_start_time, actual_end_time)
         ).order_by(table.c[time_column_name])
 
         result_proxy = session.execute(query)
         time_values = [row[0] for row in result_proxy.fetchall()]
+        if is_epoch_ms:
+            time_values = [from_epoch_ms(value) for value in time_values]
         
         return time_values
 
     finally:
         session.close()  # 确保会话被关闭
 
-def create_kline_table_if_not_exists(engine, symbol_value):
+def get_kline_table_name(symbol_value: str, interval: Optional[str] = None) -> str:
+    """
+    获取K线表名
+    基础 1m 表沿用 KLine_SYMBOLVALUE，其他周期（聚合表）为 KLine_SYMBOLVALUE_<interval>
+
+    Args:
+        symbol_value: 交易对的值 (e.g., "BTCUSDT")
+        interval: K线周期，None 或 "1m" 表示基础表
+
+    Returns:
+        str: 表名 (e.g., "KLine_BTCUSDT", "KLine_BTCUSDT_1h")
+    """
+    if interval is None or interval == '1m':
+        return f"KLine_{symbol_value}"
+    return f"KLine_{symbol_value}_{interval}"
+
+def create_kline_table_if_not_exists(engine, symbol_value, interval: Optional[str] = None,
+                                     partitioned: Optional[bool] = None, layout: Optional[str] = None):
     """
     创建K线数据表如果不存在
-    表名格式为 KLine_SYMBOLVALUE (例如 KLine_BTCUSDT)
+    表名格式为 KLine_SYMBOLVALUE (例如 KLine_BTCUSDT)，
+    非 1m 周期的聚合表为 KLine_SYMBOLVALUE_<interval> (例如 KLine_BTCUSDT_1h)
     主键为自定义id，并保持与insert_kline函数相同的字段结构
-    
+
     Args:
         engine: SQLAlchemy engine
         symbol_value: 交易对的值 (e.g., "BTCUSDT")
-        
+        interval: K线周期，None 或 "1m" 表示基础表
+        partitioned: 是否按 open_time 月度分区建表，None 表示读取 KLINE_PARTITIONED 环境变量
+                     （只影响新建的表，已存在的表原样返回）
+        layout: standard / compact，None 表示读取 KLINE_STORAGE_LAYOUT 环境变量（同样只影响新建的表）
+
     Returns:
         Table: 创建或获取的表对象
     """
     metadata_obj = MetaData()
     inspector = inspect(engine)
-    table_name = f"KLine_{symbol_value}"
-    
+    table_name = get_kline_table_name(symbol_value, interval)
+
     if inspector.has_table(table_name):
         # 如果表已存在，返回它
         return Table(table_name, metadata_obj, autoload_with=engine)
+
+    from DatabaseOperator.kline_partition import KLINE_PARTITIONED
+    if partitioned is None:
+        partitioned = KLINE_PARTITIONED
+
+    # 分区表按 open_time 做 RANGE 分区；symbol 在单交易对表中取值唯一，分区表不再为其建索引
+    table_kwargs = {'postgresql_partition_by': 'RANGE (open_time)'} if partitioned else {}
+
+    from DatabaseOperator.kline_compact import is_compact_layout, build_compact_kline_table
+    compact = is_compact_layout(layout)
     
     # 定义表结构，与insert_kline函数相匹配
-    kline_table = Table(
-        table_name,
-        metadata_obj,
-        Column('symbol', String, index=True),
-        Column('open', Float),
-        Column('high', Float),
-        Column('low', Float),
-        Column('close', Float),
-        Column('volume', Float),
-        Column('open_time', DateTime(timezone=True), primary_key=True),  # 使用带时区的DateTime作为主键
-        Column('close_time', DateTime(timezone=True)),  # 使用带时区的DateTime
-        Column('quote_asset_volume', Float),
-        Column('num_trades', Integer),
-        Column('taker_buy_base_vol', Float),
-        Column('taker_buy_quote_vol', Float),
-        Column('timestamp', DateTime(timezone=True))  # 使用带时区的DateTime
-    )
+    if compact:
+        kline_table = build_compact_kline_table(metadata_obj, table_name, **table_kwargs)
+    else:
+        kline_table = Table(
+            table_name,
+            metadata_obj,
+            Column('symbol', String, index=not partitioned),
+            Column('open', Float),
+            Column('high', Float),
+            Column('low', Float),
+            Column('close', Float),
+            Column('volume', Float),
+            Column('open_time', DateTime(timezone=True), primary_key=True),  # 使用带时区的DateTime作为主键
+            Column('close_time', DateTime(timezone=True)),  # 使用带时区的DateTime
+            Column('quote_asset_volume', Float),
+            Column('num_trades', Integer),
+            Column('taker_buy_base_vol', Float),
+            Column('taker_buy_quote_vol', Float),
+            Column('timestamp', DateTime(timezone=True)),  # 使用带时区的DateTime
+            **table_kwargs
+        )
     
-    logging.info(f"创建K线表: {table_name}")
+    logging.info(f"创建K线表: {table_name}{' (月度分区)' if partitioned else ''}{' (compact)' if compact else ''}")
     kline_table.create(engine)
+
+    if partitioned:
+        from DatabaseOperator.kline_partition import setup_partitioned_kline_table
+        setup_partitioned_kline_table(engine, table_name)
     return kline_table
 
 def insert_price(session, Price, symbol, price, timestamp):
@@ -506,7 +607,18 @@ def insert_price(session, Price, symbol, price, timestamp):
     return custom_id
 
 # 存储K线数据
-def insert_kline(session, table, symbol, kline):
+def insert_kline(session, table, symbol, kline, interval: Optional[str] = None):
+    """
+    UPSERT 单根K线，同时支持 KLine_<SYMBOL> 分表与统一表 klines
+
+    Args:
+        session: SQLAlchemy session
+        table: K线表对象
+        symbol: 交易对
+        kline: parse_kline 解析后的K线字典
+        interval: K线周期，仅统一表使用；默认取 kline['interval']，再退化为 "1m"
+    compact 布局的分表按 kline_compact.encode_kline 编码写入
+    """
     # 将时间戳转换为datetime对象，UTC时区
     open_time = datetime.fromtimestamp(kline['open_time'] / 1000, tz=timezone.utc)
     close_time = datetime.fromtimestamp(kline['close_time'] / 1000, tz=timezone.utc)
@@ -527,16 +639,31 @@ def insert_kline(session, table, symbol, kline):
         'taker_buy_quote_vol': float(kline['taker_buy_quote_vol']),
         'timestamp': datetime.now(timezone.utc)
     }
+
+    # 统一表以 (symbol, interval, open_time) 为主键，且不存 close_time/timestamp
+    from DatabaseOperator.kline_compact import is_compact_table, encode_kline
+    conflict_columns = ['open_time']
+    if is_compact_table(table):
+        kline_data = encode_kline(kline)
+    elif 'interval' in table.c:
+        kline_data['interval'] = interval or kline.get('interval') or '1m'
+        conflict_columns = ['symbol', 'interval', 'open_time']
+    kline_data = {key: value for key, value in kline_data.items() if key in table.c}
     
     try:
+        # 分区表需要先确保目标月份的分区存在（非分区表直接跳过）；
+        # 在本会话的事务内建分区，避免另开连接等待本会话持有的父表锁
+        from DatabaseOperator.kline_partition import ensure_partition_for_time
+        ensure_partition_for_time(table.name, open_time, bind=session)
+
         # 使用 PostgreSQL 的 ON CONFLICT DO UPDATE 语法进行 UPSERT
         from sqlalchemy.dialects.postgresql import insert
         
         stmt = insert(table).values(**kline_data)
         # 如果主键冲突，则更新除主键外的所有字段
-        update_dict = {key: stmt.excluded[key] for key in kline_data.keys() if key != 'open_time'}
+        update_dict = {key: stmt.excluded[key] for key in kline_data.keys() if key not in conflict_columns}
         stmt = stmt.on_conflict_do_update(
-            index_elements=['open_time'],
+            index_elements=conflict_columns,
             set_=update_dict
         )
         
@@ -559,10 +686,50 @@ class ExchangeDataFetcherQueueSettings:
     def __init__(self):
         self.engine = engine
         self.Session = Session
+        self._queue_table = None
+    
+    @property
+    def queue_table(self) -> Table:
+        """fetcher_queue_configs 表（首次使用时反射一次并缓存）"""
+        if self._queue_table is None:
+            self._queue_table = Table('fetcher_queue_configs', MetaData(), autoload_with=self.engine)
+        return self._queue_table
+    
+    @staticmethod
+    def _row_to_config(result) -> Dict:
+        return {
+            'id': str(result.id),
+            'queue_name': result.queue_name,
+            'symbol': result.symbol,
+            'exchange': result.exchange,
+            'interval': result.interval,
+            'is_active': result.is_active,
+            'description': result.description,
+            'created_by': result.created_by,
+            'updated_by': result.updated_by,
+            'created_at': result.created_at.isoformat() if result.created_at else None,
+            'updated_at': result.updated_at.isoformat() if result.updated_at else None
+        }
+    
+    def _notify(self, action: str, queue_name: str) -> None:
+        """
+        配置变更后失效缓存并通过 Redis pub/sub 通知（失败不影响数据库操作）
+        先失效本进程与 Redis 中的配置缓存，再发布通知，订阅者收到通知后读到的一定是新配置
+        """
+        try:
+            from DatabaseOperator.queue_config_cache import queue_config_cache
+            queue_config_cache.invalidate(shared=True)
+        except Exception as e:
+            logging.warning(f"[QueueConfig] 失效配置缓存失败: {e}")
+        try:
+            from DatabaseOperator.redis_operator import publish_queue_event
+            publish_queue_event(action, queue_name)
+        except Exception as e:
+            logging.warning(f"[QueueConfig] 发布配置变更通知失败: {e}")
     
     def create_queue_config(self, queue_name: str, symbol: str, interval: str, 
                           exchange: str = 'binance', description: Optional[str] = None, 
-                          created_by: str = 'system') -> bool:
+                          created_by: str = 'system') -> Optional[Dict]:
         """
         创建新的队列配置
         
@@ -575,15 +742,13 @@ class ExchangeDataFetcherQueueSettings:
             created_by: 创建者用户ID/用户名，默认 'system'
         
         Returns:
-            bool: 创建成功返回 True，失败返回 False
+            Optional[Dict]: 创建成功返回新配置（INSERT ... RETURNING，无需再次查询），失败返回 None
         """
         session = self.Session()
         try:
-            from sqlalchemy import Table, MetaData, insert
-            
-            metadata = MetaData()
-            queue_table = Table('fetcher_queue_configs', metadata, autoload_with=self.engine)
+            from sqlalchemy import insert
             
+            queue_table = self.queue_table
             stmt = insert(queue_table).values(
                 queue_name=queue_name,
                 symbol=symbol,
@@ -592,17 +757,18 @@ class ExchangeDataFetcherQueueSettings:
                 is_active=False,  # 默认创建为不激活状态
                 description=description,
                 created_by=created_by
-            )
+            ).returning(*queue_table.c)
             
-            session.execute(stmt)
+            created = self._row_to_config(session.execute(stmt).first())
             session.commit()
             logging.info(f"[QueueConfig] 创建队列配置成功: {queue_name}")
-            return True
+            self._notify('create', queue_name)
+            return created
             
         except Exception as e:
             logging.error(f"[QueueConfig] 创建队列配置失败: {e}")
             session.rollback()
-            return False
+            return None
         finally:
             session.close()
     
@@ -618,28 +784,14 @@ class ExchangeDataFetcherQueueSettings:
         """
         session = self.Session()
         try:
-            from sqlalchemy import Table, MetaData, select
-            
-            metadata = MetaData()
-            queue_table = Table('fetcher_queue_configs', metadata, autoload_with=self.engine)
+            from sqlalchemy import select
             
+            queue_table = self.queue_table
             stmt = select(queue_table).where(queue_table.c.queue_name == queue_name)
             result = session.execute(stmt).first()
             
             if result:
-                return {
-                    'id': str(result.id),
-                    'queue_name': result.queue_name,
-                    'symbol': result.symbol,
-                    'exchange': result.exchange,
-                    'interval': result.interval,
-                    'is_active': result.is_active,
-                    'description': result.description,
-                    'created_by': result.created_by,
-                    'updated_by': result.updated_by,
-                    'created_at': result.created_at.isoformat() if result.created_at else None,
-                    'updated_at': result.updated_at.isoformat() if result.updated_at else None
-                }
+                return self._row_to_config(result)
             return None
             
         except Exception as e:
@@ -648,6 +800,26 @@ class ExchangeDataFetcherQueueSettings:
         finally:
             session.close()
     
+    def load_queue_configs(self, active_only: bool = True) -> List[Dict]:
+        """
+        读取队列配置；与 get_all_queue_configs 相同，但读取失败时抛出异常
+        （缓存据此区分“没有配置”与“数据库暂时不可用”）
+
+        Raises:
+            Exception: 数据库读取失败
+        """
+        from sqlalchemy import select
+
+        session = self.Session()
+        try:
+            queue_table = self.queue_table
+            stmt = select(queue_table)
+            if active_only:
+                stmt = stmt.where(queue_table.c.is_active == True)
+            return [self._row_to_config(result) for result in session.execute(stmt).fetchall()]
+        finally:
+            session.close()
+
     def get_all_queue_configs(self, active_only: bool = True) -> List[Dict]:
         """
         获取所有队列配置
@@ -656,44 +828,13 @@ class ExchangeDataFetcherQueueSettings:
             active_only: 是否只返回激活的队列配置
         
         Returns:
-            List[Dict]: 队列配置列表
+            List[Dict]: 队列配置列表，读取失败返回空列表
         """
-        session = self.Session()
         try:
-            from sqlalchemy import Table, MetaData, select
-            
-            metadata = MetaData()
-            queue_table = Table('fetcher_queue_configs', metadata, autoload_with=self.engine)
-            
-            stmt = select(queue_table)
-            if active_only:
-                stmt = stmt.where(queue_table.c.is_active == True)
-            
-            results = session.execute(stmt).fetchall()
-            
-            configs = []
-            for result in results:
-                configs.append({
-                    'id': str(result.id),
-                    'queue_name': result.queue_name,
-                    'symbol': result.symbol,
-                    'exchange': result.exchange,
-                    'interval': result.interval,
-                    'is_active': result.is_active,
-                    'description': result.description,
-                    'created_by': result.created_by,
-                    'updated_by': result.updated_by,
-                    'created_at': result.created_at.isoformat() if result.created_at else None,
-                    'updated_at': result.updated_at.isoformat() if result.updated_at else None
-                })
-            
-            return configs
-            
+            return self.load_queue_configs(active_only)
         except Exception as e:
             logging.error(f"[QueueConfig] 获取所有队列配置失败: {e}")
             return []
-        finally:
-            session.close()
     
     def update_queue_config(self, queue_name: str, updated_by: str = 'system', **kwargs) -> bool:
         """
@@ -709,10 +850,9 @@ class ExchangeDataFetcherQueueSettings:
         """
         session = self.Session()
         try:
-            from sqlalchemy import Table, MetaData, update
+            from sqlalchemy import update
             
-            metadata = MetaData()
-            queue_table = Table('fetcher_queue_configs', metadata, autoload_with=self.engine)
+            queue_table = self.queue_table
             
             # 过滤掉不允许更新的字段
             allowed_fields = ['symbol', 'exchange', 'interval', 'is_active', 'description']
@@ -731,6 +871,10 @@ class ExchangeDataFetcherQueueSettings:
             
             if result.rowcount > 0:
                 logging.info(f"[QueueConfig] 更新队列配置成功: {queue_name}")
+                if 'is_active' in update_data and len(update_data) == 2:
+                    self._notify('activate' if update_data['is_active'] else 'deactivate', queue_name)
+                else:
+                    self._notify('update', queue_name)
                 return True
             else:
                 logging.warning(f"[QueueConfig] 队列配置不存在: {queue_name}")
@@ -755,10 +899,9 @@ class ExchangeDataFetcherQueueSettings:
         """
         session = self.Session()
         try:
-            from sqlalchemy import Table, MetaData, delete
+            from sqlalchemy import delete
             
-            metadata = MetaData()
-            queue_table = Table('fetcher_queue_configs', metadata, autoload_with=self.engine)
+            queue_table = self.queue_table
             
             stmt = delete(queue_table).where(queue_table.c.queue_name == queue_name)
             result = session.execute(stmt)
@@ -766,6 +909,7 @@ class ExchangeDataFetcherQueueSettings:
             
             if result.rowcount > 0:
                 logging.info(f"[QueueConfig] 删除队列配置成功: {queue_name}")
+                self._notify('delete', queue_name)
                 return True
             else:
                 logging.warning(f"[QueueConfig] 队列配置不存在: {queue_name}")
@@ -790,26 +934,54 @@ class ExchangeDataFetcherQueueSettings:
 fetcher_queue_manager = ExchangeDataFetcherQueueSettings()
 
 # 存储订单信息
-def insert_order_Binance(session, table, order_data):
+_order_table: Optional[Table] = None
+
+
+def get_order_table() -> Table:
+    """BinanceOrders 表（首次使用时反射一次并缓存）"""
+    global _order_table
+    if _order_table is None:
+        _order_table = Table('BinanceOrders', MetaData(), autoload_with=engine)
+    return _order_table
+
+
+# BinanceOrders.order_status 枚举之外的交易所状态
+ORDER_STATUS_ALIASES = {'EXPIRED_IN_MATCH': 'EXPIRED', 'PENDING_NEW': 'NEW'}
+
+
+def normalize_order_status(status: str) -> str:
+    """交易所订单状态 -> order_status 枚举值"""
+    return ORDER_STATUS_ALIASES.get(status, status)
+
+
+def order_response_to_record(params: Dict[str, Any], result: Optional[Dict[str, Any]] = None,
+                             error: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
-    插入订单数据，支持完整的 Binance API 字段
-    
-    Args:
-        session: SQLAlchemy session
-        table: 订单表对象
-        order_data: 包含订单数据的字典，支持以下字段：
-            必填: symbol, side, type, timestamp
-            条件必填: timeInForce, quantity, quoteOrderQty, price, stopPrice, trailingDelta
-            可选: icebergQty, newClientOrderId, newOrderRespType, selfTradePreventionMode,
-                  strategyId, strategyType, recvWindow, is_test_order 等
-    
-    Returns:
-        str: 生成的订单UUID
+    下单参数 + 交易所返回（order.place / POST /api/v3/order 的结果或错误）-> insert_order_Binance 的 order_data
     """
-    from sqlalchemy.dialects.postgresql import insert
-    
-    # 设置默认值
-    order_entry_data = {
+    record = {key: value for key, value in params.items() if key not in ('apiKey', 'signature')}
+    if result:
+        record['order_id'] = result.get('orderId')
+        record['client_order_id'] = result.get('clientOrderId')
+        record['order_status'] = normalize_order_status(result.get('status', 'NEW'))
+        if result.get('executedQty') is not None:
+            record['executed_qty'] = result['executedQty']
+        if result.get('cummulativeQuoteQty') is not None:
+            record['cummulative_quote_qty'] = result['cummulativeQuoteQty']
+        if result.get('transactTime'):
+            record['order_time'] = datetime.fromtimestamp(result['transactTime'] / 1000, tz=timezone.utc)
+    if error:
+        record['order_status'] = 'REJECTED'
+        record['error_code'] = error.get('code')
+        record['error_msg'] = error.get('msg')
+    return record
+
+
+def build_order_entry(order_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    订单数据 -> BinanceOrders 行（补齐默认值，去掉 None 值）
+    """
+    entry = {
         'symbol': order_data.get('symbol'),
         'side': order_data.get('side'),
         'type': order_data.get('type'),
@@ -837,9 +1009,28 @@ def insert_order_Binance(session, table, order_data):
         'error_msg': order_data.get('error_msg'),
         'order_time': order_data.get('order_time')
     }
+    return {k: v for k, v in entry.items() if v is not None}
+
+
+def insert_order_Binance(session, table, order_data):
+    """
+    插入订单数据，支持完整的 Binance API 字段
     
-    # 移除 None 值
-    order_entry_data = {k: v for k, v in order_entry_data.items() if v is not None}
+    Args:
+        session: SQLAlchemy session
+        table: 订单表对象
+        order_data: 包含订单数据的字典，支持以下字段：
+            必填: symbol, side, type, timestamp
+            条件必填: timeInForce, quantity, quoteOrderQty, price, stopPrice, trailingDelta
+            可选: icebergQty, newClientOrderId, newOrderRespType, selfTradePreventionMode,
+                  strategyId, strategyType, recvWindow, is_test_order 等
+    
+    Returns:
+        str: 生成的订单UUID
+    """
+    from sqlalchemy.dialects.postgresql import insert
+    
+    order_entry_data = build_order_entry(order_data)
     
     try:
         # 使用 PostgreSQL 的 ON CONFLICT DO UPDATE 语法进行 UPSERT（如果需要）
@@ -854,21 +1045,10 @@ def insert_order_Binance(session, table, order_data):
                 set_=update_dict
             )
         
-        result = session.execute(stmt)
+        # 插入与冲突更新都由 RETURNING 返回记录ID，无需再查询一次
+        order_id = session.execute(stmt.returning(table.c.id)).scalar()
         session.commit()
         
-        # 获取插入的记录ID
-        if hasattr(result, 'inserted_primary_key') and result.inserted_primary_key:
-            order_id = result.inserted_primary_key[0]
-        else:
-            # 如果是更新操作，通过客户端订单ID查询
-            if 'newClientOrderId' in order_entry_data:
-                from sqlalchemy import select
-                stmt = select(table.c.id).where(table.c.newClientOrderId == order_entry_data['newClientOrderId'])
-                order_id = session.execute(stmt).scalar()
-            else:
-                order_id = None
-        
         logging.info(f"[Database] 订单数据插入/更新成功: {order_entry_data.get('symbol')} - {order_entry_data.get('side')}")
         return str(order_id) if order_id else None
         
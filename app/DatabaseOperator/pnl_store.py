@@ -0,0 +1,191 @@
+# app/DatabaseOperator/pnl_store.py
+"""
+pnl_store.py
+- 盈亏快照表 pnl_snapshots 与冷启动查询（供 DataProcessingCalculator/pnl_service.py 使用）
+- 快照按批写入：一批快照一条多行 INSERT、一个事务
+- 冷启动只做走索引的查询（读取路径上不建索引）：
+    最新价格   price_data_<symbol> 按 timestamp 倒序取 1 行，表不存在或为空时取当前K线存储后端
+               （kline_store.KLINE_STORAGE_BACKEND：KLine_<SYMBOL> 分表或 klines 统一表）最后一根 1m K线的收盘价
+    成交回放   BinanceOrders 按 (symbol, order_time) 取该交易对有成交的订单，表不存在时没有成交
+    最后买入   buy_history_<symbol> 按 timestamp 倒序取 1 行
+- 所需索引在部署/迁移时创建：create_cold_start_indexes() 在自动提交连接上执行
+  CREATE INDEX CONCURRENTLY IF NOT EXISTS，不阻塞写入，也不在运行中的冷启动里执行 DDL
+- 表在首次使用时反射一次并缓存，不存在的表返回 None，模块导入时不访问数据库
+
+用法：
+    cd app
+    python -m DatabaseOperator.pnl_store --symbols BTCUSDT ETHUSDT   # 建 pnl_snapshots 表与冷启动索引
+
+表结构：
+    id bigserial 主键 | symbol varchar(20) | position double | avg_cost double | last_price double
+    realized_pnl double | unrealized_pnl double | diff double | snapshot_time timestamptz
+    (symbol, snapshot_time) 复合索引
+"""
+import argparse
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import (BigInteger, Column, DateTime, Float, Index, MetaData, String, Table, inspect, select,
+                        text)
+from sqlalchemy.exc import NoSuchTableError
+
+from DatabaseOperator.pg_operator import KLINE_RESULT_COLUMNS, Session, engine, get_order_table
+
+logger = logging.getLogger(__name__)
+
+PNL_SNAPSHOT_TABLE = 'pnl_snapshots'
+PNL_COLUMNS = ('symbol', 'position', 'avg_cost', 'last_price', 'realized_pnl', 'unrealized_pnl', 'diff',
+               'snapshot_time')
+
+_tables: Dict[str, Optional[Table]] = {}
+_tables_lock = threading.Lock()
+
+
+def _quote(name: str) -> str:
+    return engine.dialect.identifier_preparer.quote(name)
+
+
+def reflect_table(name: str) -> Optional[Table]:
+    """反射表（首次使用时一次并缓存）；表不存在时返回 None，之后再次检查"""
+    with _tables_lock:
+        table = _tables.get(name)
+        if table is None:
+            if not inspect(engine).has_table(name):
+                return None
+            table = _tables[name] = Table(name, MetaData(), autoload_with=engine)
+        return table
+
+
+def create_pnl_table_if_not_exists() -> Table:
+    """创建 pnl_snapshots 表（已存在则直接反射）"""
+    table = reflect_table(PNL_SNAPSHOT_TABLE)
+    if table is not None:
+        return table
+    table = Table(
+        PNL_SNAPSHOT_TABLE,
+        MetaData(),
+        Column('id', BigInteger, primary_key=True, autoincrement=True),
+        Column('symbol', String(20), nullable=False),
+        Column('position', Float, nullable=False),
+        Column('avg_cost', Float),
+        Column('last_price', Float),
+        Column('realized_pnl', Float, nullable=False),
+        Column('unrealized_pnl', Float),
+        Column('diff', Float),
+        Column('snapshot_time', DateTime(timezone=True), nullable=False),
+        Index(f'{PNL_SNAPSHOT_TABLE}_symbol_time', 'symbol', 'snapshot_time'),
+    )
+    table.create(engine, checkfirst=True)
+    logger.info(f"创建盈亏快照表: {PNL_SNAPSHOT_TABLE}")
+    with _tables_lock:
+        _tables[PNL_SNAPSHOT_TABLE] = table
+    return table
+
+
+def insert_pnl_snapshots(rows: List[Dict[str, Any]]) -> int:
+    """一个事务、一条多行 INSERT 写入一批快照，返回行数"""
+    if not rows:
+        return 0
+    table = create_pnl_table_if_not_exists()
+    with engine.begin() as conn:
+        conn.execute(table.insert(), [{name: row.get(name) for name in PNL_COLUMNS} for row in rows])
+    return len(rows)
+
+
+def create_cold_start_indexes(symbols: Iterable[str]) -> List[str]:
+    """
+    创建冷启动查询所需的索引（部署/迁移时执行，可重复执行）
+    CREATE INDEX CONCURRENTLY 不能在事务中执行，使用自动提交连接；建索引期间不阻塞订单与价格写入
+
+    Returns:
+        List[str]: 执行的语句
+    """
+    statements = ['CREATE INDEX CONCURRENTLY IF NOT EXISTS "BinanceOrders_symbol_order_time" '
+                  'ON "BinanceOrders" (symbol, order_time)']
+    for symbol in symbols:
+        for name in (f"price_data_{symbol.lower()}", f"buy_history_{symbol.lower()}"):
+            if reflect_table(name) is not None:
+                statements.append(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {_quote(name + '_timestamp_desc')} "
+                                  f"ON {_quote(name)} (timestamp DESC)")
+    with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+        for statement in statements:
+            logger.info(f"[PnLStore] {statement}")
+            conn.execute(text(statement))
+    return statements
+
+
+def load_last_price(session, symbol: str) -> Optional[float]:
+    """最新价格：price_data_<symbol> 最后一行，其次当前K线存储后端中最后一根 1m K线的收盘价"""
+    from DatabaseOperator.kline_store import kline_table_name_for, latest_klines
+
+    table = reflect_table(f"price_data_{symbol.lower()}")
+    if table is not None:
+        price = session.execute(select(table.c.price).order_by(table.c.timestamp.desc()).limit(1)).scalar()
+        if price is not None:
+            return float(price)
+    if reflect_table(kline_table_name_for(symbol)) is not None:
+        # latest_klines 兼容分表 / 统一表与 standard / compact 布局，按主键倒序取 1 行
+        rows = latest_klines(session, symbol, limit=1)
+        if rows:
+            return float(rows[-1][KLINE_RESULT_COLUMNS.index('close')])
+    return None
+
+
+def load_last_buy_price(session, symbol: str) -> Optional[float]:
+    """buy_history_<symbol> 中最后一次买入的价格"""
+    table = reflect_table(f"buy_history_{symbol.lower()}")
+    if table is None:
+        return None
+    price = session.execute(select(table.c.price).order_by(table.c.timestamp.desc()).limit(1)).scalar()
+    return float(price) if price is not None else None
+
+
+def load_order_fills(session, symbol: str) -> List[Dict[str, Any]]:
+    """
+    该交易对所有有成交的订单（按订单时间排序），每笔订单的累计成交量与成交金额
+    Returns:
+        [{'newClientOrderId', 'side', 'executed_qty', 'cummulative_quote_qty'}]，BinanceOrders 不存在时为空列表
+    """
+    try:
+        table = get_order_table()
+    except NoSuchTableError:
+        # 没有下过单的部署（例如只运行 calculator.calculate_diff）：没有可回放的成交
+        logger.info("[PnL] 表 BinanceOrders 不存在，不回放订单成交")
+        return []
+    rows = session.execute(
+        select(table.c.newClientOrderId, table.c.side, table.c.executed_qty, table.c.cummulative_quote_qty)
+        .where(table.c.symbol == symbol)
+        .where(table.c.executed_qty > 0)
+        .where(table.c.is_test_order.is_(False))
+        .order_by(table.c.order_time.asc().nulls_last(), table.c.created_at.asc()))
+    return [dict(row._mapping) for row in rows]
+
+
+def load_cold_start(symbol: str) -> Dict[str, Any]:
+    """冷启动所需的全部数据（一个会话内的几条索引查询）"""
+    with Session() as session:
+        return {
+            'last_price': load_last_price(session, symbol),
+            'last_buy_price': load_last_buy_price(session, symbol),
+            'fills': load_order_fills(session, symbol),
+        }
+
+
+def main():
+    """命令行入口：建 pnl_snapshots 表与冷启动索引"""
+    from config import SYMBOL
+    from config.logging_config import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='创建盈亏快照表与冷启动查询所需的索引')
+    parser.add_argument('--symbols', nargs='*', default=[SYMBOL], help='交易对，默认 config.SYMBOL')
+    args = parser.parse_args()
+
+    create_pnl_table_if_not_exists()
+    for statement in create_cold_start_indexes(s.upper() for s in args.symbols):
+        print(statement)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+# app/DatabaseOperator/price_cache.py
+"""
+price_cache.py
+- 读穿透的最新价格缓存：Redis 未命中时调用交易所接口获取并回填
+- 存储格式：price:<SYMBOL> 为哈希 {p: 价格, t: 毫秒时间戳}，比 JSON 字符串更紧凑，也无需序列化
+- 多个交易对一次 pipeline HMGET 读取；未命中的交易对合并为一次批量行情请求（ticker/price?symbols=）
+- 请求合并：多个线程同时未命中同一交易对时只有一个线程请求交易所，其余线程等待其结果
+- max_age：调用方可要求价格不早于 N 秒，更旧的缓存按未命中处理（风控等对时效敏感的读取）
+- stats 由多个线程更新，统一在 _lock 内累加
+
+环境变量：
+    PRICE_CACHE_TTL      价格缓存秒数（默认 300）
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, List, Optional
+
+import redis
+
+from DatabaseOperator.redis_operator import RedisClient
+
+logger = logging.getLogger(__name__)
+
+PRICE_KEY_PREFIX = 'price:'
+PRICE_CACHE_TTL = int(os.getenv('PRICE_CACHE_TTL', '300'))
+
+
+def price_key(symbol: str) -> str:
+    return f"{PRICE_KEY_PREFIX}{symbol.upper()}"
+
+
+def _default_fetcher(symbols: List[str]) -> Dict[str, float]:
+    from ExchangeFetcher.fetcher import fetch_prices
+    return fetch_prices(symbols)
+
+
+class PriceCache:
+    """价格缓存"""
+
+    def __init__(self, client=None, fetcher: Optional[Callable[[List[str]], Dict[str, float]]] = None,
+                 ttl: int = PRICE_CACHE_TTL, fetch_timeout: float = 15.0):
+        """
+        Args:
+            client: Redis 客户端，默认 RedisClient 单例（首次使用时连接）
+            fetcher: 未命中时的批量取价函数 symbols -> {symbol: price}，默认 fetcher.fetch_prices
+            ttl: 缓存秒数
+            fetch_timeout: 等待其他线程取价结果的最长秒数
+        """
+        self._client = client
+        self.fetcher = fetcher or _default_fetcher
+        self.ttl = ttl
+        self.fetch_timeout = fetch_timeout
+        self._inflight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'stale': 0, 'fetches': 0, 'coalesced': 0}
+
+    def _count(self, **deltas: int) -> None:
+        with self._lock:
+            for name, delta in deltas.items():
+                self.stats[name] += delta
+
+    @property
+    def client(self) -> redis.Redis:
+        if self._client is None:
+            self._client = RedisClient().client
+        return self._client
+
+    # ---------- 写入 ----------
+
+    def set_prices(self, prices: Dict[str, float], timestamp_ms: Optional[int] = None,
+                   ttl: Optional[int] = None) -> None:
+        """pipeline 批量写入价格（每个交易对 DEL + HSET + EXPIRE 原子执行，兼容旧的 JSON 字符串键）"""
+        if not prices:
+            return
+        timestamp_ms = timestamp_ms or int(time.time() * 1000)
+        ttl = ttl or self.ttl
+        pipe = self.client.pipeline(transaction=True)
+        for symbol, price in prices.items():
+            key = price_key(symbol)
+            pipe.delete(key)
+            pipe.hset(key, mapping={'p': repr(float(price)), 't': timestamp_ms})
+            pipe.expire(key, ttl)
+        pipe.execute()
+        logger.debug(f"[PriceCache] 写入 {len(prices)} 个价格")
+
+    def set_price(self, symbol: str, price: float, timestamp_ms: Optional[int] = None,
+                  ttl: Optional[int] = None) -> None:
+        self.set_prices({symbol.upper(): price}, timestamp_ms, ttl)
+
+    # ---------- 读取 ----------
+
+    def get_many(self, symbols: Iterable[str]) -> Dict[str, Optional[dict]]:
+        """
+        只读缓存：一次 pipeline HMGET 读取多个交易对
+
+        Returns:
+            Dict[str, Optional[dict]]: {symbol: {'price': float, 'timestamp': 毫秒} 或 None}
+        """
+        symbols = [s.upper() for s in symbols]
+        if not symbols:
+            return {}
+        pipe = self.client.pipeline(transaction=False)
+        for symbol in symbols:
+            pipe.hmget(price_key(symbol), 'p', 't')
+        result = {}
+        for symbol, values in zip(symbols, pipe.execute(raise_on_error=False)):
+            # 旧格式（JSON 字符串）的键返回 WRONGTYPE 错误，按未命中处理
+            if isinstance(values, Exception) or values[0] is None:
+                result[symbol] = None
+                continue
+            price, timestamp = (v.decode() if isinstance(v, bytes) else v for v in values)
+            result[symbol] = {'price': float(price), 'timestamp': int(timestamp) if timestamp else None}
+        return result
+
+    def get_entries(self, symbols: Iterable[str], fetch: bool = True,
+                    max_age: Optional[float] = None) -> Dict[str, Optional[dict]]:
+        """
+        读穿透批量取价：先读缓存，未命中（或早于 max_age 秒）的交易对合并为一次交易所请求并回填缓存
+
+        Args:
+            symbols: 交易对列表
+            fetch: 未命中时是否请求交易所
+            max_age: 可接受的最大价格年龄（秒），None 表示只要在缓存中即可
+
+        Returns:
+            Dict[str, Optional[dict]]: {symbol: {'price': float, 'timestamp': 毫秒} 或 None}
+        """
+        entries = self.get_many(symbols)
+        stale = 0
+        if max_age is not None:
+            oldest = (time.time() - max_age) * 1000
+            for symbol, entry in entries.items():
+                if entry and (entry['timestamp'] is None or entry['timestamp'] < oldest):
+                    entries[symbol] = None
+                    stale += 1
+        misses = [symbol for symbol, entry in entries.items() if entry is None]
+        self._count(hits=len(entries) - len(misses), misses=len(misses) - stale, stale=stale)
+        if fetch and misses:
+            now_ms = int(time.time() * 1000)
+            for symbol, price in self._fetch_coalesced(misses).items():
+                entries[symbol] = None if price is None else {'price': price, 'timestamp': now_ms}
+        return entries
+
+    def get_prices(self, symbols: Iterable[str], fetch: bool = True,
+                   max_age: Optional[float] = None) -> Dict[str, Optional[float]]:
+        """
+        读穿透批量取价（见 get_entries）
+
+        Returns:
+            Dict[str, Optional[float]]: 取不到价格的交易对为 None
+        """
+        return {symbol: entry['price'] if entry else None
+                for symbol, entry in self.get_entries(symbols, fetch, max_age).items()}
+
+    def get_price(self, symbol: str, fetch: bool = True, max_age: Optional[float] = None) -> Optional[float]:
+        return self.get_prices([symbol], fetch, max_age)[symbol.upper()]
+
+    async def aget_prices(self, symbols: Iterable[str], fetch: bool = True,
+                          max_age: Optional[float] = None) -> Dict[str, Optional[float]]:
+        """get_prices 的异步版本（在线程中执行，不阻塞事件循环）"""
+        return await asyncio.to_thread(self.get_prices, list(symbols), fetch, max_age)
+
+    def _fetch_coalesced(self, symbols: List[str]) -> Dict[str, Optional[float]]:
+        """
+        请求合并：其他线程正在获取的交易对直接等待其结果，其余交易对由当前线程一次批量获取
+        """
+        own: Dict[str, Future] = {}
+        waiting: Dict[str, Future] = {}
+        with self._lock:
+            for symbol in symbols:
+                future = self._inflight.get(symbol)
+                if future is None:
+                    future = own[symbol] = self._inflight[symbol] = Future()
+                else:
+                    waiting[symbol] = future
+            self.stats['coalesced'] += len(waiting)
+
+        result: Dict[str, Optional[float]] = {}
+        if own:
+            fetched: Dict[str, float] = {}
+            try:
+                self._count(fetches=1)
+                fetched = {s.upper(): p for s, p in (self.fetcher(list(own)) or {}).items() if p is not None}
+                self.set_prices(fetched)
+            except Exception as e:
+                logger.error(f"[PriceCache] 获取价格失败 {list(own)}: {e}")
+            finally:
+                with self._lock:
+                    for symbol, future in own.items():
+                        del self._inflight[symbol]
+                        future.set_result(fetched.get(symbol))
+            result.update({symbol: fetched.get(symbol) for symbol in own})
+
+        for symbol, future in waiting.items():
+            try:
+                result[symbol] = future.result(timeout=self.fetch_timeout)
+            except Exception as e:
+                logger.warning(f"[PriceCache] 等待 {symbol} 价格超时: {e}")
+                result[symbol] = None
+        return result
+
+
+# 全局实例（首次读写时才连接 Redis）
+price_cache = PriceCache()
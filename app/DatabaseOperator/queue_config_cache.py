@@ -0,0 +1,225 @@
+# app/DatabaseOperator/queue_config_cache.py
+"""
+queue_config_cache.py
+- fetcher_queue_configs 的多级缓存：进程内 TTL 缓存 -> Redis 哈希 fetcher_queue:configs -> PostgreSQL
+- 任何进程修改配置后（ExchangeDataFetcherQueueSettings._notify），先删除 Redis 哈希并清空本进程缓存，
+  再在 fetcher_queue:events 上发布通知；各进程的监听线程收到通知后清空自己的进程内缓存
+- 从数据库回填 Redis 时使用 WATCH 版本号，回填期间若配置被修改则放弃写入，避免把旧配置写回共享缓存
+- 进程内 TTL 兜底漏掉的通知；Redis 不可用时退化为 进程内缓存 + 数据库
+- 数据库读取失败时不写入任何缓存（不回填 Redis、不更新进程内快照），继续返回上一次的快照；
+  从未成功读取过时抛出异常，调用方（例如队列监督器）保持当前状态，而不是把故障当成“没有任何队列”
+
+其他组件可通过 add_listener 复用同一个订阅线程（例如队列监督器的热加载），回调在缓存失效之后执行。
+
+环境变量：
+    QUEUE_CONFIG_CACHE_TTL        进程内缓存秒数（默认 30）
+    QUEUE_CONFIG_REDIS_TTL        Redis 哈希过期秒数（默认 600）
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+import redis
+
+from DatabaseOperator.redis_operator import QUEUE_EVENTS_CHANNEL, RedisClient
+
+logger = logging.getLogger(__name__)
+
+QUEUE_CONFIG_HASH = 'fetcher_queue:configs'
+QUEUE_CONFIG_VERSION_KEY = 'fetcher_queue:configs:version'
+QUEUE_CONFIG_CACHE_TTL = float(os.getenv('QUEUE_CONFIG_CACHE_TTL', '30'))
+QUEUE_CONFIG_REDIS_TTL = int(os.getenv('QUEUE_CONFIG_REDIS_TTL', '600'))
+# 哈希中的标记字段：区分“没有任何配置”与“缓存不存在”
+_LOADED_FIELD = '__loaded_at__'
+
+
+class QueueConfigCache:
+    """队列配置缓存；读取方法与 ExchangeDataFetcherQueueSettings 的返回格式一致"""
+
+    def __init__(self, manager=None, client=None, ttl: float = QUEUE_CONFIG_CACHE_TTL,
+                 redis_ttl: int = QUEUE_CONFIG_REDIS_TTL):
+        """
+        Args:
+            manager: 数据库读取方，默认 pg_operator.fetcher_queue_manager
+            client: Redis 客户端，默认 RedisClient 单例（首次使用时连接）
+            ttl: 进程内缓存秒数
+            redis_ttl: Redis 哈希过期秒数
+        """
+        self._manager = manager
+        self._client = client
+        self._client_failed = False
+        self.ttl = ttl
+        self.redis_ttl = redis_ttl
+        self._configs: Optional[Dict[str, dict]] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[dict], None]] = []
+        self._listener_thread: Optional[threading.Thread] = None
+        self.hits = {'memory': 0, 'redis': 0, 'database': 0}
+
+    @property
+    def manager(self):
+        if self._manager is None:
+            from DatabaseOperator.pg_operator import fetcher_queue_manager
+            self._manager = fetcher_queue_manager
+        return self._manager
+
+    @property
+    def client(self) -> Optional[redis.Redis]:
+        if self._client is None and not self._client_failed:
+            try:
+                self._client = RedisClient().client
+            except Exception as e:
+                self._client_failed = True
+                logger.warning(f"[QueueConfigCache] Redis 不可用，仅使用进程内缓存: {e}")
+        return self._client
+
+    # ---------- 读取 ----------
+
+    def _read_redis(self) -> Optional[Dict[str, dict]]:
+        raw = self.client.hgetall(QUEUE_CONFIG_HASH)
+        if not raw:
+            return None
+        configs = {}
+        for field, value in raw.items():
+            field = field.decode() if isinstance(field, bytes) else field
+            if field != _LOADED_FIELD:
+                configs[field] = json.loads(value)
+        return configs
+
+    def _read_database(self) -> Dict[str, dict]:
+        """从数据库读取全部配置；读取失败时抛出异常（不能用空列表代替）"""
+        return {c['queue_name']: c for c in self.manager.load_queue_configs(active_only=False)}
+
+    def _fill_redis(self) -> Dict[str, dict]:
+        """从数据库读取全部配置并回填 Redis；期间版本号变化则只返回结果、不回填；数据库读取失败时不写入"""
+        with self.client.pipeline() as pipe:
+            pipe.watch(QUEUE_CONFIG_VERSION_KEY)
+            configs = self._read_database()
+            mapping = {name: json.dumps(config) for name, config in configs.items()}
+            mapping[_LOADED_FIELD] = str(time.time())
+            try:
+                pipe.multi()
+                pipe.delete(QUEUE_CONFIG_HASH)
+                pipe.hset(QUEUE_CONFIG_HASH, mapping=mapping)
+                pipe.expire(QUEUE_CONFIG_HASH, self.redis_ttl)
+                pipe.execute()
+            except redis.WatchError:
+                logger.info("[QueueConfigCache] 回填期间配置已变更，跳过写入 Redis")
+        return configs
+
+    def _load(self) -> Dict[str, dict]:
+        configs = self._configs
+        if configs is not None and time.monotonic() < self._expires_at:
+            self.hits['memory'] += 1
+            return configs
+
+        with self._lock:
+            if self._configs is not None and time.monotonic() < self._expires_at:
+                self.hits['memory'] += 1
+                return self._configs
+            self._ensure_listener()
+
+            configs = None
+            try:
+                if self.client is not None:
+                    try:
+                        configs = self._read_redis()
+                        if configs is not None:
+                            self.hits['redis'] += 1
+                        else:
+                            configs = self._fill_redis()
+                            self.hits['database'] += 1
+                    except redis.RedisError as e:
+                        logger.warning(f"[QueueConfigCache] 读取 Redis 失败，回退数据库: {e}")
+                        configs = None
+                if configs is None:
+                    configs = self._read_database()
+                    self.hits['database'] += 1
+            except Exception as e:
+                if self._configs is None:
+                    raise
+                # 保留上一次的快照且不延长有效期，下次读取时重试
+                logger.warning(f"[QueueConfigCache] 读取队列配置失败，继续使用上一次的配置: {e}")
+                return self._configs
+
+            self._configs = configs
+            self._expires_at = time.monotonic() + self.ttl
+            return configs
+
+    def get(self, queue_name: str) -> Optional[Dict]:
+        """同 get_queue_config：返回配置副本，不存在返回 None"""
+        config = self._load().get(queue_name)
+        return dict(config) if config else None
+
+    def list(self, active_only: bool = True) -> List[Dict]:
+        """同 get_all_queue_configs"""
+        return [dict(c) for c in self._load().values() if c.get('is_active') or not active_only]
+
+    # ---------- 失效 ----------
+
+    def invalidate(self, shared: bool = False) -> None:
+        """
+        使进程内缓存过期（下次读取时重新加载；快照保留，只在重新加载失败时继续使用）
+
+        Args:
+            shared: 同时删除 Redis 哈希并递增版本号（配置写入方调用）
+        """
+        with self._lock:
+            self._expires_at = 0.0
+        if shared and self.client is not None:
+            pipe = self.client.pipeline(transaction=True)
+            pipe.incr(QUEUE_CONFIG_VERSION_KEY)
+            pipe.delete(QUEUE_CONFIG_HASH)
+            pipe.execute()
+
+    def add_listener(self, callback: Callable[[dict], None]) -> None:
+        """注册配置变更回调（在监听线程中执行，缓存已失效）；回调收到通知内容"""
+        self._listeners.append(callback)
+        self._ensure_listener()
+
+    def remove_listener(self, callback: Callable[[dict], None]) -> None:
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _ensure_listener(self) -> None:
+        if self._listener_thread is not None or self.client is None:
+            return
+        self._listener_thread = threading.Thread(target=self._listen, name='queue-config-events', daemon=True)
+        self._listener_thread.start()
+
+    def _listen(self) -> None:
+        while True:
+            pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            try:
+                pubsub.subscribe(QUEUE_EVENTS_CHANNEL)
+                # 订阅建立之前的变更可能已错过
+                self.invalidate()
+                while True:
+                    # 用短超时轮询而不是 listen()，避免空闲时触发客户端的 socket_timeout
+                    message = pubsub.get_message(timeout=1.0)
+                    if not message:
+                        continue
+                    try:
+                        event = json.loads(message['data'])
+                    except (TypeError, ValueError):
+                        event = {'action': 'unknown', 'data': message['data']}
+                    if not str(event.get('action', '')).startswith('member_'):
+                        self.invalidate()
+                    for callback in list(self._listeners):
+                        try:
+                            callback(event)
+                        except Exception as e:
+                            logger.error(f"[QueueConfigCache] 变更回调失败: {e}")
+            except Exception as e:
+                logger.warning(f"[QueueConfigCache] 订阅 {QUEUE_EVENTS_CHANNEL} 失败: {e}，5s 后重试")
+                time.sleep(5)
+            finally:
+                pubsub.close()
+
+
+# 全局实例（首次读取时才连接 Redis / 数据库）
+queue_config_cache = QueueConfigCache()
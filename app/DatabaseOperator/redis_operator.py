@@ -104,32 +104,62 @@ class TradingCacheManager:
         self.client = self.redis_client.client
     
     def cache_price(self, symbol: str, price: float, ttl: int = 300):
-        """缓存价格数据"""
+        """缓存价格数据（哈希编码，见 price_cache.PriceCache）"""
+        from DatabaseOperator.price_cache import PriceCache
         try:
-            key = f"price:{symbol}"
-            data = {
-                'price': str(price),
-                'timestamp': datetime.now().isoformat()
-            }
-            self.client.setex(key, ttl, json.dumps(data))
-            logger.info(f"价格缓存成功: {symbol} = {price}")
+            PriceCache(client=self.client).set_price(symbol, price, ttl=ttl)
+            logger.debug(f"价格缓存成功: {symbol} = {price}")
             return True
         except Exception as e:
             logger.error(f"价格缓存失败: {e}")
             return False
     
     def get_cached_price(self, symbol: str) -> Optional[Dict]:
-        """获取缓存的价格数据"""
+        """获取缓存的价格数据（只读缓存，批量/读穿透请使用 price_cache）"""
+        from DatabaseOperator.price_cache import PriceCache
         try:
-            key = f"price:{symbol}"
-            data = self.client.get(key)
-            if data and isinstance(data, (str, bytes)):
-                return json.loads(data)
-            return None
+            entry = PriceCache(client=self.client).get_many([symbol])[symbol.upper()]
+            if entry is None:
+                return None
+            timestamp = entry['timestamp']
+            return {
+                'price': str(entry['price']),
+                'timestamp': datetime.fromtimestamp(timestamp / 1000).isoformat() if timestamp else None
+            }
         except Exception as e:
             logger.error(f"获取缓存价格失败: {e}")
             return None
 
 
-# 创建全局实例
-trading_cache = TradingCacheManager()
\ No newline at end of file
+# 全局实例：首次访问 redis_operator.trading_cache 时才创建（连接 Redis），导入本模块不再要求 Redis 可用
+_trading_cache: Optional[TradingCacheManager] = None
+
+
+def __getattr__(name: str):
+    global _trading_cache
+    if name == 'trading_cache':
+        if _trading_cache is None:
+            _trading_cache = TradingCacheManager()
+        return _trading_cache
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# 采集队列配置变更通知（create/update/delete/activate/deactivate），由队列监督器订阅后热加载
+QUEUE_EVENTS_CHANNEL = 'fetcher_queue:events'
+
+
+def publish_queue_event(action: str, queue_name: str, client: Optional[redis.Redis] = None) -> int:
+    """
+    发布队列配置变更通知
+
+    Args:
+        action: create / update / delete / activate / deactivate
+        queue_name: 队列名称
+        client: 可选的 Redis 客户端，默认 RedisClient 单例
+
+    Returns:
+        int: 收到通知的订阅者数量
+    """
+    client = client or RedisClient().client
+    message = json.dumps({'action': action, 'queue_name': queue_name, 'timestamp': datetime.now().isoformat()})
+    return client.publish(QUEUE_EVENTS_CHANNEL, message)
@@ -0,0 +1,274 @@
+# app/DatabaseOperator/redis_streams.py
+"""
+redis_streams.py
+- 基于 Redis Streams 的跨进程事件总线：采集端 XADD 完结K线，指标引擎与策略通过消费者组消费
+- 每个交易对一个流：stream:kline:<SYMBOL>、stream:indicator:<SYMBOL>
+- XADD 使用 MAXLEN ~ 近似裁剪，控制内存且不拖慢写入
+- 批量写入/确认通过 pipeline 一次往返完成；读取一次 XREADGROUP 覆盖多个流并按 COUNT 批量返回
+- 消费者启动时先重放自己未确认的消息；iter_batches/process 每隔 REDIS_STREAM_CLAIM_INTERVAL 秒调用
+  claim_stale 接管组内其他消费者闲置超过 REDIS_STREAM_CLAIM_IDLE_MS 的消息（消费者崩溃后不再重启时，消息不会永远悬挂）
+- 待确认列表中已被 MAXLEN 裁剪的消息（字段为空）无法处理，读取时直接 XACK，避免每次重放都读到它们
+
+所有类都接受注入的 client（例如 fakeredis.FakeRedis()），默认使用 RedisClient 单例。
+
+环境变量：
+    REDIS_STREAM_MAXLEN          每个流保留的大约条数（默认 100000）
+    REDIS_STREAM_CLAIM_IDLE_MS   接管其他消费者消息的最小闲置毫秒数，0 表示不接管（默认 60000）
+    REDIS_STREAM_CLAIM_INTERVAL  消费循环中检查闲置消息的间隔秒数（默认 30）
+"""
+import json
+import logging
+import os
+import socket
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import redis
+
+from DatabaseOperator.redis_operator import RedisClient
+
+logger = logging.getLogger(__name__)
+
+REDIS_STREAM_MAXLEN = int(os.getenv('REDIS_STREAM_MAXLEN', '100000'))
+REDIS_STREAM_CLAIM_IDLE_MS = int(os.getenv('REDIS_STREAM_CLAIM_IDLE_MS', '60000'))
+REDIS_STREAM_CLAIM_INTERVAL = float(os.getenv('REDIS_STREAM_CLAIM_INTERVAL', '30'))
+
+KLINE_STREAM_PREFIX = 'stream:kline:'
+INDICATOR_STREAM_PREFIX = 'stream:indicator:'
+
+
+def kline_stream_key(symbol: str) -> str:
+    return f"{KLINE_STREAM_PREFIX}{symbol.upper()}"
+
+
+def indicator_stream_key(symbol: str) -> str:
+    return f"{INDICATOR_STREAM_PREFIX}{symbol.upper()}"
+
+
+def default_consumer_name() -> str:
+    """主机名-进程号，保证同组内的消费者名称唯一"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _default_client():
+    return RedisClient().client
+
+
+def _text(value) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def encode_event(event: dict) -> Dict[str, str]:
+    """事件 -> 流字段；symbol/interval 单独成列便于排查，完整内容放在 data 中"""
+    fields = {'data': json.dumps(event, separators=(',', ':'), default=str)}
+    for name in ('symbol', 'interval'):
+        if name in event:
+            fields[name] = str(event[name])
+    return fields
+
+
+def decode_event(fields: dict) -> dict:
+    fields = {_text(k): _text(v) for k, v in fields.items()}
+    return json.loads(fields['data'])
+
+
+class StreamMessage:
+    """从流中读到的一条消息"""
+
+    __slots__ = ('stream', 'id', 'event')
+
+    def __init__(self, stream: str, message_id: str, event: dict):
+        self.stream = stream
+        self.id = message_id
+        self.event = event
+
+    def __repr__(self):
+        return f"StreamMessage({self.stream}, {self.id})"
+
+
+class StreamPublisher:
+    """流写入端"""
+
+    def __init__(self, client=None, maxlen: int = REDIS_STREAM_MAXLEN):
+        self.client = client or _default_client()
+        self.maxlen = maxlen
+
+    def publish(self, stream: str, event: dict) -> str:
+        """XADD 单条事件（MAXLEN ~ 近似裁剪），返回消息 ID"""
+        return _text(self.client.xadd(stream, encode_event(event), maxlen=self.maxlen, approximate=True))
+
+    def publish_many(self, items: Iterable[Tuple[str, dict]]) -> List[str]:
+        """pipeline 批量 XADD，一次网络往返"""
+        pipe = self.client.pipeline(transaction=False)
+        count = 0
+        for stream, event in items:
+            pipe.xadd(stream, encode_event(event), maxlen=self.maxlen, approximate=True)
+            count += 1
+        if not count:
+            return []
+        return [_text(message_id) for message_id in pipe.execute()]
+
+
+class StreamConsumer:
+    """
+    消费者组读取端
+
+    用法：
+        consumer = StreamConsumer([kline_stream_key('BTCUSDT')], group='indicator-engine')
+        for batch in consumer.iter_batches():
+            handle(batch)
+            consumer.ack(batch)
+    """
+
+    def __init__(self, streams: Sequence[str], group: str, consumer: Optional[str] = None, client=None,
+                 count: int = 100, block_ms: int = 5000, start_id: str = '0',
+                 claim_idle_ms: int = REDIS_STREAM_CLAIM_IDLE_MS,
+                 claim_interval: float = REDIS_STREAM_CLAIM_INTERVAL):
+        """
+        Args:
+            streams: 流名称列表
+            group: 消费者组
+            consumer: 消费者名称，默认 主机名-进程号
+            client: Redis 客户端，默认 RedisClient 单例
+            count: 每次读取的最大条数（每个流）
+            block_ms: 无消息时阻塞等待的毫秒数
+            start_id: 新建消费者组时的起始位置，'0' 从头消费，'$' 只消费新消息
+            claim_idle_ms: iter_batches 接管其他消费者闲置消息的阈值（毫秒），0 表示不接管
+            claim_interval: iter_batches 检查闲置消息的间隔（秒）
+        """
+        self.client = client or _default_client()
+        self.streams = list(streams)
+        self.group = group
+        self.consumer = consumer or default_consumer_name()
+        self.count = count
+        self.block_ms = block_ms
+        self.claim_idle_ms = claim_idle_ms
+        self.claim_interval = claim_interval
+        self.acked = 0
+        self.claimed = 0
+        self.tombstones = 0
+        # 启动时先读取本消费者已投递未确认的消息（崩溃恢复）
+        self._replay_pending = True
+        self._next_claim = 0.0
+        self.ensure_groups(start_id)
+
+    def ensure_groups(self, start_id: str = '0') -> None:
+        """创建消费者组（流不存在时一并创建），已存在则忽略"""
+        for stream in self.streams:
+            try:
+                self.client.xgroup_create(stream, self.group, id=start_id, mkstream=True)
+                logger.info(f"[Streams] 创建消费者组 {self.group} @ {stream}")
+            except redis.ResponseError as e:
+                if 'BUSYGROUP' not in str(e):
+                    raise
+
+    def _parse(self, response) -> Tuple[List[StreamMessage], List[StreamMessage]]:
+        """返回 (消息, 墓碑)；墓碑为待确认列表中内容已被裁剪的消息（字段为空）"""
+        messages, tombstones = [], []
+        for stream, entries in response or []:
+            stream = _text(stream)
+            for message_id, fields in entries:
+                if not fields:
+                    tombstones.append(StreamMessage(stream, _text(message_id), {}))
+                    continue
+                messages.append(StreamMessage(stream, _text(message_id), decode_event(fields)))
+        return messages, tombstones
+
+    def _ack_tombstones(self, tombstones: List[StreamMessage]) -> None:
+        """裁剪掉的消息已无法处理，确认后移出待确认列表，否则每次重放/接管都会再读到"""
+        if tombstones:
+            self.tombstones += self.ack(tombstones)
+            logger.warning(f"[Streams] {self.consumer} 确认 {len(tombstones)} 条已被裁剪的待确认消息")
+
+    def read(self, block_ms: Optional[int] = None) -> List[StreamMessage]:
+        """
+        读取一批消息：启动后先逐批返回本消费者未确认的历史消息，重放完后读取新消息
+        """
+        while self._replay_pending:
+            response = self.client.xreadgroup(self.group, self.consumer, {s: '0' for s in self.streams},
+                                              count=self.count)
+            messages, tombstones = self._parse(response)
+            self._ack_tombstones(tombstones)
+            if messages:
+                return messages
+            if not tombstones:
+                self._replay_pending = False
+
+        response = self.client.xreadgroup(self.group, self.consumer, {s: '>' for s in self.streams},
+                                          count=self.count, block=self.block_ms if block_ms is None else block_ms)
+        return self._parse(response)[0]
+
+    def ack(self, messages: Iterable[StreamMessage]) -> int:
+        """按流分组，pipeline 一次往返批量 XACK"""
+        by_stream: Dict[str, List[str]] = {}
+        for message in messages:
+            by_stream.setdefault(message.stream, []).append(message.id)
+        if not by_stream:
+            return 0
+        pipe = self.client.pipeline(transaction=False)
+        for stream, ids in by_stream.items():
+            pipe.xack(stream, self.group, *ids)
+        acked = sum(int(n) for n in pipe.execute())
+        self.acked += acked
+        return acked
+
+    def pending(self) -> Dict[str, int]:
+        """各流在本消费者组中待确认的消息数"""
+        pipe = self.client.pipeline(transaction=False)
+        for stream in self.streams:
+            pipe.xpending(stream, self.group)
+        return {stream: int(info['pending']) for stream, info in zip(self.streams, pipe.execute())}
+
+    def claim_stale(self, min_idle_ms: int = 60000, count: int = 100) -> List[StreamMessage]:
+        """接管组内其他消费者闲置超过 min_idle_ms 的未确认消息（XAUTOCLAIM）"""
+        claimed = []
+        for stream in self.streams:
+            result = self.client.xautoclaim(stream, self.group, self.consumer, min_idle_ms,
+                                            start_id='0-0', count=count)
+            messages, tombstones = self._parse([(stream, result[1])])
+            self._ack_tombstones(tombstones)
+            claimed.extend(messages)
+        if claimed:
+            self.claimed += len(claimed)
+            logger.warning(f"[Streams] {self.consumer} 接管 {len(claimed)} 条闲置消息")
+        return claimed
+
+    def _claim_due(self) -> List[StreamMessage]:
+        """到达检查间隔时接管闲置消息（claim_idle_ms 为 0 时不接管）"""
+        if not self.claim_idle_ms or self._replay_pending:
+            return []
+        now = time.monotonic()
+        if now < self._next_claim:
+            return []
+        claimed = self.claim_stale(self.claim_idle_ms, self.count)
+        # 接管满一批时可能还有剩余，下一轮继续接管
+        self._next_claim = now if len(claimed) >= self.count else now + self.claim_interval
+        return claimed
+
+    def iter_batches(self, max_batches: Optional[int] = None):
+        """
+        持续读取，逐批产出（空批次不产出）
+        重放完自己的未确认消息后，每隔 claim_interval 秒先产出从其他消费者接管的闲置消息
+        """
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            messages = self._claim_due() or self.read()
+            if not messages:
+                if max_batches is not None:
+                    batches += 1
+                continue
+            batches += 1
+            yield messages
+
+    def process(self, handler: Callable[[List[StreamMessage]], None], max_batches: Optional[int] = None) -> int:
+        """
+        读取 -> handler 处理 -> 确认；handler 抛出异常时该批不确认，下次启动时会重放
+
+        Returns:
+            int: 确认的消息数
+        """
+        total = 0
+        for batch in self.iter_batches(max_batches):
+            handler(batch)
+            total += self.ack(batch)
+        return total
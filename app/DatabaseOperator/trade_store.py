@@ -0,0 +1,149 @@
+# app/DatabaseOperator/trade_store.py
+"""
+trade_store.py
+- 逐笔（归集）成交的按交易对分表 AggTrade_<SYMBOL>，主键为交易所的归集成交 ID（agg_trade_id）
+- 采集端把成交缓存为列式批次 TradeBatch，整批通过 COPY 写入：
+  COPY 到临时表 -> INSERT ... SELECT ... ON CONFLICT (agg_trade_id) DO NOTHING
+  COPY 本身不支持冲突处理，经临时表中转后重连补采、重复推送的成交都会被去重
+- trade_time 上建 BRIN 索引，按时间范围扫描几乎不占空间
+
+表结构：
+    agg_trade_id bigint 主键 | trade_time timestamptz | price double | quantity double
+    first_trade_id bigint | last_trade_id bigint | is_buyer_maker boolean
+"""
+import csv
+import io
+import logging
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Float, Index, MetaData, Table, inspect, text
+
+from DatabaseOperator.pg_operator import engine
+
+logger = logging.getLogger(__name__)
+
+TRADE_COLUMNS = ('agg_trade_id', 'trade_time', 'price', 'quantity', 'first_trade_id', 'last_trade_id',
+                 'is_buyer_maker')
+
+_ensured_tables: Set[str] = set()
+
+
+def trade_table_name(symbol: str) -> str:
+    return f"AggTrade_{symbol.upper()}"
+
+
+def _quote(name: str) -> str:
+    return engine.dialect.identifier_preparer.quote(name)
+
+
+def create_trade_table_if_not_exists(symbol: str, conn_engine=None) -> str:
+    """创建 AggTrade_<SYMBOL> 表（已存在则跳过），返回表名"""
+    name = trade_table_name(symbol)
+    if name in _ensured_tables:
+        return name
+    conn_engine = conn_engine or engine
+    if not inspect(conn_engine).has_table(name):
+        table = Table(
+            name,
+            MetaData(),
+            Column('agg_trade_id', BigInteger, primary_key=True),
+            Column('trade_time', DateTime(timezone=True), nullable=False),
+            Column('price', Float, nullable=False),
+            Column('quantity', Float, nullable=False),
+            Column('first_trade_id', BigInteger),
+            Column('last_trade_id', BigInteger),
+            Column('is_buyer_maker', Boolean),
+            Index(f'{name}_trade_time_brin', 'trade_time', postgresql_using='brin'),
+        )
+        table.create(conn_engine, checkfirst=True)
+        logger.info(f"创建逐笔成交表: {name}")
+    _ensured_tables.add(name)
+    return name
+
+
+class TradeBatch:
+    """
+    列式成交批次：每列一个列表，append 只做类型转换，不创建中间对象
+
+    trade 为 parse_agg_trade 格式：{'agg_trade_id', 'price', 'quantity', 'first_trade_id',
+    'last_trade_id', 'trade_time'(毫秒), 'is_buyer_maker'}
+    """
+
+    def __init__(self):
+        self.columns: Dict[str, List] = {name: [] for name in TRADE_COLUMNS}
+        self.last_agg_trade_id: Optional[int] = None
+
+    def __len__(self) -> int:
+        return len(self.columns['agg_trade_id'])
+
+    def append(self, trade: dict) -> None:
+        columns = self.columns
+        columns['agg_trade_id'].append(int(trade['agg_trade_id']))
+        columns['trade_time'].append(int(trade['trade_time']))
+        columns['price'].append(float(trade['price']))
+        columns['quantity'].append(float(trade['quantity']))
+        columns['first_trade_id'].append(int(trade['first_trade_id']))
+        columns['last_trade_id'].append(int(trade['last_trade_id']))
+        columns['is_buyer_maker'].append(bool(trade['is_buyer_maker']))
+        self.last_agg_trade_id = int(trade['agg_trade_id'])
+
+    def extend(self, trades: Iterable[dict]) -> None:
+        for trade in trades:
+            self.append(trade)
+
+    def clear(self) -> None:
+        for column in self.columns.values():
+            column.clear()
+
+    def to_csv(self) -> io.StringIO:
+        """COPY FROM STDIN 使用的 CSV 缓冲区（列顺序为 TRADE_COLUMNS）"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        columns = self.columns
+        trade_times = [datetime.fromtimestamp(ms / 1000, tz=timezone.utc).isoformat() for ms in columns['trade_time']]
+        writer.writerows(zip(columns['agg_trade_id'], trade_times, map(repr, columns['price']),
+                             map(repr, columns['quantity']), columns['first_trade_id'], columns['last_trade_id'],
+                             ['t' if v else 'f' for v in columns['is_buyer_maker']]))
+        buffer.seek(0)
+        return buffer
+
+
+def copy_trades(symbol: str, batch: TradeBatch) -> int:
+    """
+    COPY 批量写入成交并按 agg_trade_id 去重
+
+    Returns:
+        int: 实际新增的行数
+    """
+    if not len(batch):
+        return 0
+    table = _quote(create_trade_table_if_not_exists(symbol))
+    columns = ', '.join(TRADE_COLUMNS)
+    raw_connection = engine.raw_connection()
+    try:
+        cursor = raw_connection.cursor()
+        cursor.execute(f"CREATE TEMP TABLE IF NOT EXISTS aggtrade_staging "
+                       f"(LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS")
+        cursor.copy_expert(f"COPY aggtrade_staging ({columns}) FROM STDIN WITH (FORMAT csv)", batch.to_csv())
+        cursor.execute(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM aggtrade_staging "
+                       f"ON CONFLICT (agg_trade_id) DO NOTHING")
+        inserted = cursor.rowcount
+        raw_connection.commit()
+        cursor.close()
+    except Exception:
+        raw_connection.rollback()
+        raise
+    finally:
+        raw_connection.close()
+    logger.debug(f"[TradeStore] {symbol} 写入 {inserted}/{len(batch)} 笔成交")
+    return inserted
+
+
+def latest_agg_trade_id(symbol: str) -> Optional[int]:
+    """表中最大的 agg_trade_id，表不存在时返回 None（补采起点）"""
+    name = trade_table_name(symbol)
+    if not inspect(engine).has_table(name):
+        return None
+    with engine.connect() as connection:
+        return connection.execute(text(f"SELECT max(agg_trade_id) FROM {_quote(name)}")).scalar()
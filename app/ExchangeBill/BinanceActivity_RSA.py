@@ -1,15 +1,13 @@
 # BinanceActivity_RSA.py
-# 使用 RSA 签名与 Binance Testnet 通信
+# 使用 RSA（或 Ed25519）签名与 Binance Testnet 通信
 # 功能包括：获取账户余额、提交限价买单、查看当前挂单
+# 下单请求先经过内存风控（ExchangeBill/risk_engine.py），不通过时不发出
 
 import time
-import base64
-import urllib.parse
+import uuid
 import requests
-from cryptography.hazmat.primitives import hashes, serialization
-from cryptography.hazmat.primitives.asymmetric import padding
-from cryptography.hazmat.backends import default_backend
-from config import BINANCE_API_KEY, BINANCE_PRIVATE_KEY_PATH
+from config import BINANCE_API_KEY, BINANCE_PRIVATE_KEY_PATH, BINANCE_TRADE_API_URL
+from ExchangeBill.request_signer import get_signer
 
 # ==== 账户配置 ====
 API_KEY = BINANCE_API_KEY
@@ -17,41 +15,65 @@ PRIVATE_KEY_PATH = BINANCE_PRIVATE_KEY_PATH
 
 # ==== 通用签名函数 ====
 def rsa_sign(query_string: str, private_key_path: str) -> str:
-    with open(private_key_path, 'rb') as key_file:
-        private_key = serialization.load_pem_private_key(
-            key_file.read(),
-            password=None,
-            backend=default_backend()
-        )
-    # 检查密钥类型
-    from cryptography.hazmat.primitives.asymmetric import rsa
-    if not isinstance(private_key, rsa.RSAPrivateKey):
+    # 私钥由 RequestSigner 缓存，只在首次使用或文件变化时重新读取
+    signer = get_signer(private_key_path)
+    signer.private_key()
+    if signer.key_type != 'rsa':
         raise TypeError("私钥类型不是 RSA，请检查密钥文件！")
-    signature = private_key.sign(
-        query_string.encode('utf-8'),
-        padding.PKCS1v15(),
-        hashes.SHA256()
-    )
-    signature_b64 = base64.b64encode(signature).decode('utf-8')
-    return urllib.parse.quote_plus(signature_b64)
+    return signer.sign_query(query_string)
+
+# ==== 下单前风控 ====
+def _risk_check(params: dict):
+    # 共享的风控引擎（ExchangeBill/risk_engine.py）；进程内价格缺失或过期时从 PriceCache 读取
+    from ExchangeBill.risk_engine import get_risk_engine
+    risk = get_risk_engine()
+    risk.refresh_price(params['symbol'])
+    params.setdefault('newClientOrderId', uuid.uuid4().hex)
+    risk.pre_trade(params)
+    return risk
 
 # ==== 构建并发送带签名请求 ====
 def signed_request(method: str, endpoint: str, params: dict):
-    base_url = "https://testnet.binance.vision"
+    # 默认测试网，可通过 BINANCE_TRADE_API_URL / MOCK_EXCHANGE_URL 切换
+    base_url = BINANCE_TRADE_API_URL.split('/api/')[0]
+    risk = None
+    if method.upper() == 'POST' and endpoint == '/api/v3/order':
+        from ExchangeBill.risk_engine import RiskRejected
+        try:
+            risk = _risk_check(params)
+        except RiskRejected as e:
+            print(f"风控拒绝: {method} {endpoint} {e}")
+            return
     params['timestamp'] = str(int(time.time() * 1000))
     query_string = '&'.join([f"{key}={value}" for key, value in params.items()])
     if not isinstance(PRIVATE_KEY_PATH, str) or not PRIVATE_KEY_PATH:
         raise ValueError("PRIVATE_KEY_PATH 配置无效或未设置，请检查配置文件。")
-    signature = rsa_sign(query_string, PRIVATE_KEY_PATH)
+    # RSA 与 Ed25519 私钥均可，类型由密钥文件自动识别
+    signature = get_signer(PRIVATE_KEY_PATH).sign_query(query_string)
     full_url = f"{base_url}{endpoint}?{query_string}&signature={signature}"
     headers = {
         'X-MBX-APIKEY': API_KEY,
         'Content-Type': 'application/json'
     }
-    response = requests.request(method, full_url, headers=headers)
-    print(f"请求: {method} {endpoint}")
-    print(f"响应状态: {response.status_code}")
-    print(response.json())
+    try:
+        response = requests.request(method, full_url, headers=headers)
+        print(f"请求: {method} {endpoint}")
+        print(f"响应状态: {response.status_code}")
+        # 只解析一次；网关错误页等非 JSON 响应抛出 ValueError
+        body = response.json()
+        print(body)
+        if risk is not None:
+            # 下单结果回写风控状态（成交计入持仓，拒单释放挂单额度）
+            from DatabaseOperator.pg_operator import order_response_to_record
+            risk.apply(order_response_to_record(params, result=body) if response.ok
+                       else order_response_to_record(params, error=body))
+    except Exception:
+        # 请求失败或响应无法解析：订单结果未知，释放风控占用的挂单额度
+        # （订单若已到达交易所，之后由用户数据流回报或对账校正）
+        if risk is not None:
+            risk.release(params['newClientOrderId'])
+        raise
+    return body
 
 def main():
     """主函数 - 执行交易操作"""
@@ -0,0 +1,278 @@
+# app/ExchangeBill/order_gateway.py
+"""
+order_gateway.py
+- 基于 Binance WebSocket API（order.place / order.cancel / order.status）的异步下单网关
+- 一条长连接上并发多笔请求：每个请求带唯一 id，读取任务按 id 把响应交给对应的 Future，
+  下单不必等待上一笔返回，单笔往返只需一次 socket 写入
+- Ed25519 私钥时连接后执行 session.logon，之后的请求不再逐笔签名；RSA 私钥逐笔签名（见 request_signer）
+- 下单前经过内存风控（ExchangeBill/risk_engine.py）：进程内价格过期时先在线程中从 PriceCache 刷新，
+  不通过时抛出 RiskRejected，请求不会发出；下单结果回写风控状态（持仓、挂单额度）
+- 下单结果交给订单日志（DatabaseOperator/order_journal.py）：下单路径只追加本地 WAL，后台批量写入 BinanceOrders。
+  发送失败或等待超时（结果未知）时用 order.status 查询一次：查到则按查询结果记录，返回 -2013（订单不存在）
+  则记为拒单，其他错误码（限频、时间戳等）或查询失败时不记录（之后由用户数据流回报或对账补齐）；
+  后两种情况释放风控占用的挂单额度
+- 断线时所有未完成的请求以 ConnectionError 结束，下一次请求自动重连
+
+环境变量：
+    BINANCE_WS_API_URL       WebSocket API 地址（见 config.basicConfig，默认测试网）
+    ORDER_REQUEST_TIMEOUT    等待单个请求响应的秒数（默认 10）
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from config import BINANCE_API_KEY, BINANCE_PRIVATE_KEY_PATH, BINANCE_WS_API_URL
+
+logger = logging.getLogger(__name__)
+
+ORDER_REQUEST_TIMEOUT = float(os.getenv('ORDER_REQUEST_TIMEOUT', '10'))
+# order.status 的 "Order does not exist."：只有这个错误码说明订单没有到达交易所
+ORDER_NOT_FOUND = -2013
+
+
+class OrderGatewayError(Exception):
+    """交易所返回错误（status 非 200）"""
+
+    def __init__(self, status: int, code: Optional[int], msg: str):
+        super().__init__(f"[{status}] {code}: {msg}")
+        self.status = status
+        self.code = code
+        self.msg = msg
+
+
+class OrderGateway:
+    """
+    异步下单网关
+
+    用法：
+        gateway = OrderGateway()
+        result = await gateway.place_order(symbol="BTCUSDT", side="BUY", type="MARKET", quantity="0.001")
+        await gateway.close()
+    """
+
+    def __init__(self, url: str = BINANCE_WS_API_URL, api_key: str = BINANCE_API_KEY, signer=None,
+                 recorder: Optional[Any] = None, request_timeout: float = ORDER_REQUEST_TIMEOUT,
+                 recv_window: Optional[int] = 5000, risk_engine: Optional[Any] = None):
+        """
+        Args:
+            url: WebSocket API 地址
+            api_key: API Key
+            signer: RequestSigner，默认 get_signer(BINANCE_PRIVATE_KEY_PATH)
+            recorder: 订单记录器（需提供 record(order_data)），默认共享的 OrderJournal；传 False 不记录
+            request_timeout: 等待单个请求响应的秒数
+            recv_window: 下单请求的 recvWindow，None 不设置
+            risk_engine: 下单前风控（RiskEngine），默认共享的 get_risk_engine()；传 False 不检查
+        """
+        if signer is None:
+            from ExchangeBill.request_signer import get_signer
+            signer = get_signer(BINANCE_PRIVATE_KEY_PATH)
+        self.url = url
+        self.api_key = api_key
+        self.signer = signer
+        if recorder is None:
+            from DatabaseOperator.order_journal import get_order_journal
+            recorder = get_order_journal()
+        self.recorder = recorder or None
+        if risk_engine is None:
+            from ExchangeBill.risk_engine import get_risk_engine
+            risk_engine = get_risk_engine()
+        self.risk_engine = risk_engine or None
+        self.request_timeout = request_timeout
+        self.recv_window = recv_window
+        self.rate_limits: list = []
+        self.logged_on = False
+        self._websocket = None
+        self._reader: Optional[asyncio.Task] = None
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    # ---------- 连接 ----------
+
+    async def connect(self) -> None:
+        """建立连接（已连接时直接返回）；Ed25519 私钥时执行 session.logon"""
+        if self._connect_lock is None:
+            self._connect_lock = asyncio.Lock()
+        async with self._connect_lock:
+            if self._websocket is not None:
+                return
+            import websockets
+            self._websocket = await websockets.connect(self.url, ping_interval=20, ping_timeout=10,
+                                                       close_timeout=10)
+            self._reader = asyncio.create_task(self._read_loop(self._websocket), name='order-gateway-reader')
+            logger.info(f"[OrderGateway] 已连接 {self.url}")
+            self.logged_on = False
+            await asyncio.to_thread(self.signer.private_key)
+            if self.signer.key_type == 'ed25519':
+                await self._send('session.logon', self._signed({'apiKey': self.api_key}))
+                self.logged_on = True
+                logger.info("[OrderGateway] session.logon 成功，后续请求不再逐笔签名")
+
+    async def close(self) -> None:
+        websocket, self._websocket = self._websocket, None
+        if websocket is not None:
+            await websocket.close()
+        if self._reader is not None:
+            await asyncio.gather(self._reader, return_exceptions=True)
+            self._reader = None
+        if self.recorder is not None and hasattr(self.recorder, 'flush'):
+            await asyncio.to_thread(self.recorder.flush)
+
+    async def _read_loop(self, websocket) -> None:
+        try:
+            async for message in websocket:
+                try:
+                    response = json.loads(message)
+                except ValueError:
+                    logger.error(f"[OrderGateway] 无法解析的响应: {message!r}")
+                    continue
+                if response.get('rateLimits'):
+                    self.rate_limits = response['rateLimits']
+                future = self._pending.pop(str(response.get('id')), None)
+                if future is None or future.done():
+                    continue
+                if response.get('status') == 200:
+                    future.set_result(response.get('result'))
+                else:
+                    error = response.get('error') or {}
+                    future.set_exception(OrderGatewayError(response.get('status'), error.get('code'),
+                                                           error.get('msg', '')))
+        except Exception as e:
+            logger.warning(f"[OrderGateway] 连接中断: {e}")
+        finally:
+            if self._websocket is websocket:
+                self._websocket = None
+            pending, self._pending = self._pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("WebSocket API 连接已断开"))
+
+    # ---------- 请求 ----------
+
+    def _signed(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """加入 timestamp 与签名；签名载荷为按参数名排序的 key=value&..."""
+        params = {**params, 'timestamp': params.get('timestamp') or int(time.time() * 1000)}
+        payload = '&'.join(f"{key}={params[key]}" for key in sorted(params))
+        params['signature'] = self.signer.sign(payload)
+        return params
+
+    async def _send(self, method: str, params: Dict[str, Any]) -> Any:
+        request_id = uuid.uuid4().hex
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            await self._websocket.send(json.dumps({'id': request_id, 'method': method, 'params': params}))
+            return await asyncio.wait_for(future, timeout=self.request_timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def request(self, method: str, params: Optional[Dict[str, Any]] = None, signed: bool = True) -> Any:
+        """
+        发送一个 WebSocket API 请求并等待结果
+
+        Raises:
+            OrderGatewayError: 交易所返回错误
+            ConnectionError: 等待期间连接断开
+            asyncio.TimeoutError: 超时
+        """
+        await self.connect()
+        params = dict(params or {})
+        if signed:
+            if self.logged_on:
+                params.setdefault('timestamp', int(time.time() * 1000))
+            else:
+                params = self._signed({'apiKey': self.api_key, **params})
+        return await self._send(method, params)
+
+    def _record(self, params: Dict[str, Any], result: Optional[dict] = None, error: Optional[dict] = None) -> None:
+        if self.recorder is None and self.risk_engine is None:
+            return
+        from DatabaseOperator.pg_operator import order_response_to_record
+        record = order_response_to_record(params, result, error)
+        if self.risk_engine is not None and (result or error):
+            self.risk_engine.apply(record)
+        if self.recorder is None:
+            return
+        try:
+            self.recorder.record(record)
+        except Exception as e:
+            logger.error(f"[OrderGateway] 订单记录失败: {e}")
+
+    async def place_order(self, **params) -> dict:
+        """
+        order.place：参数与 BinanceOrders 表字段一致（symbol, side, type, timeInForce, quantity, price ...）
+        未提供 newClientOrderId 时自动生成；结果确定后才记录（见模块说明）
+
+        Returns:
+            dict: 交易所返回的订单结果
+
+        Raises:
+            RiskRejected: 风控不通过（请求未发出，也不记录）
+            OrderGatewayError: 交易所返回错误
+            ConnectionError / asyncio.TimeoutError: 发送失败或等待超时（已按 order.status 查询结果处理）
+        """
+        params.setdefault('newClientOrderId', uuid.uuid4().hex)
+        if self.recv_window is not None:
+            params.setdefault('recvWindow', self.recv_window)
+        params = {key: value for key, value in params.items() if value is not None}
+        if self.risk_engine is not None:
+            if self.risk_engine.price_stale(params['symbol']):
+                await asyncio.to_thread(self.risk_engine.refresh_price, params['symbol'])
+            self.risk_engine.pre_trade(params)
+        # 风控（可能在线程中刷新价格）之后再取时间戳，避免签名时间戳因等待而超出 recvWindow
+        params.setdefault('timestamp', int(time.time() * 1000))
+        try:
+            result = await self.request('order.place', params)
+        except OrderGatewayError as e:
+            self._record(params, error={'code': e.code, 'msg': e.msg})
+            raise
+        except asyncio.CancelledError:
+            # 调用方取消，结果未知：释放额度，之后由用户数据流回报或对账校正
+            self._release(params)
+            raise
+        except Exception as e:
+            await self._resolve_unknown(params, e)
+            raise
+        self._record(params, result)
+        return result
+
+    def _release(self, params: Dict[str, Any]) -> None:
+        if self.risk_engine is not None:
+            self.risk_engine.release(params['newClientOrderId'])
+
+    async def _resolve_unknown(self, params: Dict[str, Any], error: Exception) -> None:
+        """发送失败或等待超时：用 order.status 确认订单是否到达交易所"""
+        client_order_id = params['newClientOrderId']
+        try:
+            result = await self.order_status(params['symbol'], orig_client_order_id=client_order_id)
+        except OrderGatewayError as e:
+            if e.code == ORDER_NOT_FOUND:
+                # 交易所没有这笔订单，请求未到达
+                logger.warning(f"[OrderGateway] 下单 {client_order_id} 失败（{error!r}），交易所无此订单: {e}")
+                self._record(params, error={'code': e.code, 'msg': f"未到达交易所: {error!r}"})
+            else:
+                # 限频（-1003）、时间戳/recvWindow（-1021）等错误不能说明订单不存在：不记录，保持未决
+                logger.error(f"[OrderGateway] 下单 {client_order_id} 失败（{error!r}），查询订单状态返回 {e}，"
+                             f"订单状态未知，释放风控额度，等待用户数据流回报或对账")
+            self._release(params)
+        except Exception as e:
+            logger.error(f"[OrderGateway] 下单 {client_order_id} 失败（{error!r}），查询订单状态也失败: {e!r}，"
+                         f"释放风控额度，等待用户数据流回报")
+            self._release(params)
+        else:
+            logger.warning(f"[OrderGateway] 下单 {client_order_id} 等待响应失败（{error!r}），"
+                           f"交易所订单状态 {result.get('status')}")
+            self._record(params, result)
+
+    async def cancel_order(self, symbol: str, orig_client_order_id: Optional[str] = None,
+                           order_id: Optional[int] = None) -> dict:
+        params = {'symbol': symbol, 'origClientOrderId': orig_client_order_id, 'orderId': order_id}
+        return await self.request('order.cancel', {k: v for k, v in params.items() if v is not None})
+
+    async def order_status(self, symbol: str, orig_client_order_id: Optional[str] = None,
+                           order_id: Optional[int] = None) -> dict:
+        params = {'symbol': symbol, 'origClientOrderId': orig_client_order_id, 'orderId': order_id}
+        return await self.request('order.status', {k: v for k, v in params.items() if v is not None})
@@ -0,0 +1,118 @@
+# app/ExchangeBill/request_signer.py
+"""
+request_signer.py
+- Binance 请求签名器：私钥只加载一次并缓存，之后每次签名只做签名运算
+- 按文件 mtime/大小检测密钥轮换，变化时自动重新加载；检查间隔内不重复 stat
+- 支持 RSA（PKCS#1 v1.5 + SHA256）与 Ed25519 私钥，类型由 PEM 内容自动识别；
+  Ed25519 签名比 RSA-2048 快一个数量级以上，Binance 同样接受
+- 签名结果为 base64；放入查询字符串时使用 sign_query（已 URL 编码）
+
+环境变量：
+    BINANCE_PRIVATE_KEY_PASSWORD   私钥口令（PEM 已加密时设置）
+    SIGNER_RELOAD_CHECK_INTERVAL   检查私钥文件是否变化的间隔秒数（默认 1，0 表示每次签名都检查）
+"""
+import base64
+import logging
+import os
+import threading
+import time
+import urllib.parse
+from typing import Dict, Optional, Tuple
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ed25519, padding, rsa
+
+logger = logging.getLogger(__name__)
+
+SIGNER_RELOAD_CHECK_INTERVAL = float(os.getenv('SIGNER_RELOAD_CHECK_INTERVAL', '1'))
+
+
+class RequestSigner:
+    """
+    私钥签名器
+
+    用法：
+        signer = get_signer(BINANCE_PRIVATE_KEY_PATH)
+        query_string = "symbol=BTCUSDT&timestamp=..."
+        url = f"{base_url}{endpoint}?{query_string}&signature={signer.sign_query(query_string)}"
+    """
+
+    def __init__(self, private_key_path: str, password: Optional[bytes] = None,
+                 check_interval: float = SIGNER_RELOAD_CHECK_INTERVAL):
+        """
+        Args:
+            private_key_path: PEM 私钥文件路径（RSA 或 Ed25519）
+            password: 私钥口令，默认读取 BINANCE_PRIVATE_KEY_PASSWORD
+            check_interval: 检查文件是否变化的间隔秒数
+        """
+        if not isinstance(private_key_path, str) or not private_key_path:
+            raise ValueError("private_key_path 配置无效或未设置，请检查配置文件。")
+        if password is None and os.getenv('BINANCE_PRIVATE_KEY_PASSWORD'):
+            password = os.getenv('BINANCE_PRIVATE_KEY_PASSWORD').encode('utf-8')
+        self.private_key_path = private_key_path
+        self.password = password
+        self.check_interval = check_interval
+        self.key_type: Optional[str] = None
+        self.loads = 0
+        self._key = None
+        self._fingerprint: Optional[Tuple[int, int]] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _stat(self) -> Tuple[int, int]:
+        stat = os.stat(self.private_key_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, fingerprint: Tuple[int, int]) -> None:
+        with open(self.private_key_path, 'rb') as key_file:
+            key = serialization.load_pem_private_key(key_file.read(), password=self.password)
+        if isinstance(key, rsa.RSAPrivateKey):
+            self.key_type = 'rsa'
+        elif isinstance(key, ed25519.Ed25519PrivateKey):
+            self.key_type = 'ed25519'
+        else:
+            raise TypeError("私钥类型不是 RSA 或 Ed25519，请检查密钥文件！")
+        self._key = key
+        self._fingerprint = fingerprint
+        self.loads += 1
+        logger.info(f"[Signer] 已加载 {self.key_type} 私钥: {self.private_key_path}")
+
+    def private_key(self):
+        """当前私钥；首次调用或文件变化后重新加载"""
+        now = time.monotonic()
+        if self._key is not None and now < self._next_check:
+            return self._key
+        with self._lock:
+            if self._key is None or time.monotonic() >= self._next_check:
+                fingerprint = self._stat()
+                if fingerprint != self._fingerprint:
+                    self._load(fingerprint)
+                self._next_check = time.monotonic() + self.check_interval
+            return self._key
+
+    def sign(self, payload: str) -> str:
+        """对载荷签名，返回 base64 字符串"""
+        key = self.private_key()
+        data = payload.encode('utf-8')
+        if self.key_type == 'rsa':
+            signature = key.sign(data, padding.PKCS1v15(), hashes.SHA256())
+        else:
+            signature = key.sign(data)
+        return base64.b64encode(signature).decode('utf-8')
+
+    def sign_query(self, query_string: str) -> str:
+        """对查询字符串签名，返回 URL 编码后的签名（可直接拼接为 &signature=）"""
+        return urllib.parse.quote_plus(self.sign(query_string))
+
+
+_signers: Dict[str, RequestSigner] = {}
+_signers_lock = threading.Lock()
+
+
+def get_signer(private_key_path: str) -> RequestSigner:
+    """按路径复用签名器（进程内单例）"""
+    signer = _signers.get(private_key_path)
+    if signer is None:
+        with _signers_lock:
+            signer = _signers.setdefault(private_key_path, RequestSigner(private_key_path))
+    return signer
@@ -0,0 +1,428 @@
+# app/ExchangeBill/risk_engine.py
+"""
+risk_engine.py
+- 下单前风控：内存中维护每个交易对的净持仓、未完结订单数量与挂单量、最新价格，
+  校验只做几次字典查找与算术（微秒级），不查询数据库
+    order_notional     单笔名义金额上限（数量 x 参考价格）
+    position_notional  同方向最坏情况敞口上限：|持仓 + 同方向挂单 + 本单| x 参考价格
+    open_orders        全部交易对未完结订单数上限
+    order_rate         每秒下单笔数上限（滑动窗口）
+    price_band         限价单价格相对最新价的偏离上限（只检查吃单方向：买价过高 / 卖价过低）
+    no_price           没有最新价格（或价格过期）时无法计算市价单名义金额，直接拒绝
+- 最新价格分两级：进程内价格（K线推送经 update_price 写入）为一级；缺失或早于 RISK_PRICE_MAX_AGE 秒时
+  refresh_price() 从 DatabaseOperator/price_cache.py 的 PriceCache 读取（get_entries(max_age=...)，
+  Redis 未命中或过期时由 PriceCache 合并请求交易所并回填），下单网关在线程中调用后再执行 pre_trade
+- 通过校验的订单立即占用挂单额度（按 newClientOrderId 跟踪，请求中没有时由 pre_trade 生成并写回参数）；订单记录（order_response_to_record / execution_report_to_record 的格式）
+  经 apply() 更新成交量：按累计成交量的增量调整持仓，终结状态释放挂单额度
+- reconcile() 定时用 BinanceOrders 校正内存状态（净持仓 = 买入成交量 - 卖出成交量，未完结订单），
+  偏差写入日志；对账期间新下的、尚未落库的订单保留
+
+环境变量：
+    RISK_MAX_ORDER_NOTIONAL     单笔名义金额上限（默认 1000，计价货币）
+    RISK_MAX_POSITION_NOTIONAL  单个交易对同方向敞口上限（默认 5000）
+    RISK_MAX_OPEN_ORDERS        未完结订单数上限（默认 20）
+    RISK_MAX_ORDERS_PER_SECOND  每秒下单笔数上限（默认 5）
+    RISK_PRICE_BAND             限价单相对最新价的最大偏离比例（默认 0.05）
+    RISK_PRICE_MAX_AGE          最新价格的有效秒数，进程内价格更旧时从 PriceCache 读取（默认 60，0 不检查）
+    RISK_RECONCILE_INTERVAL     与数据库对账的间隔秒数（默认 60）
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+RISK_MAX_ORDER_NOTIONAL = float(os.getenv('RISK_MAX_ORDER_NOTIONAL', '1000'))
+RISK_MAX_POSITION_NOTIONAL = float(os.getenv('RISK_MAX_POSITION_NOTIONAL', '5000'))
+RISK_MAX_OPEN_ORDERS = int(os.getenv('RISK_MAX_OPEN_ORDERS', '20'))
+RISK_MAX_ORDERS_PER_SECOND = int(os.getenv('RISK_MAX_ORDERS_PER_SECOND', '5'))
+RISK_PRICE_BAND = float(os.getenv('RISK_PRICE_BAND', '0.05'))
+RISK_PRICE_MAX_AGE = float(os.getenv('RISK_PRICE_MAX_AGE', '60'))
+RISK_RECONCILE_INTERVAL = float(os.getenv('RISK_RECONCILE_INTERVAL', '60'))
+
+OPEN_STATUSES = ('NEW', 'PARTIALLY_FILLED', 'PENDING_CANCEL')
+# 终结订单的累计成交量保留条数，用于忽略同一订单的重复回报（下单结果与用户数据流各报一次）
+CLOSED_ORDERS_KEPT = 10000
+
+
+class RiskRejected(Exception):
+    """下单前风控拒绝"""
+
+    def __init__(self, rule: str, reason: str):
+        super().__init__(f"[{rule}] {reason}")
+        self.rule = rule
+        self.reason = reason
+
+
+class RiskLimits:
+    """风控限额（默认取环境变量）"""
+
+    def __init__(self, max_order_notional: float = RISK_MAX_ORDER_NOTIONAL,
+                 max_position_notional: float = RISK_MAX_POSITION_NOTIONAL,
+                 max_open_orders: int = RISK_MAX_OPEN_ORDERS,
+                 max_orders_per_second: int = RISK_MAX_ORDERS_PER_SECOND,
+                 price_band: float = RISK_PRICE_BAND, price_max_age: float = RISK_PRICE_MAX_AGE):
+        self.max_order_notional = max_order_notional
+        self.max_position_notional = max_position_notional
+        self.max_open_orders = max_open_orders
+        self.max_orders_per_second = max_orders_per_second
+        self.price_band = price_band
+        self.price_max_age = price_max_age
+
+    def to_dict(self) -> Dict[str, float]:
+        return dict(self.__dict__)
+
+
+class SymbolRisk:
+    """单个交易对的内存状态"""
+
+    __slots__ = ('position', 'open_buy', 'open_sell', 'open_count', 'last_price', 'price_time')
+
+    def __init__(self):
+        self.position = 0.0
+        self.open_buy = 0.0
+        self.open_sell = 0.0
+        self.open_count = 0
+        self.last_price: Optional[float] = None
+        self.price_time = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {'position': self.position, 'open_buy': self.open_buy, 'open_sell': self.open_sell,
+                'open_orders': self.open_count, 'last_price': self.last_price}
+
+
+def _to_float(value) -> float:
+    return float(value) if value not in (None, '') else 0.0
+
+
+class RiskEngine:
+    """
+    内存风控引擎
+
+    用法：
+        risk = RiskEngine()
+        risk.update_price('BTCUSDT', 65000.0)
+        risk.pre_trade({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': '0.001',
+                        'newClientOrderId': 'abc'})      # 不通过时抛出 RiskRejected
+        risk.apply(order_record)                         # 下单结果 / executionReport 转换后的订单记录
+    """
+
+    def __init__(self, limits: Optional[RiskLimits] = None, journal=None, price_cache=None):
+        """
+        Args:
+            limits: 风控限额，默认取环境变量
+            journal: 订单日志（需提供 flush()），对账前先把待写记录落库；None 不刷新
+            price_cache: 二级价格来源（需提供 get_entries(symbols, max_age=)），默认共享的 PriceCache
+        """
+        self.limits = limits or RiskLimits()
+        self.journal = journal
+        self._price_cache = price_cache
+        self.symbols: Dict[str, SymbolRisk] = {}
+        # newClientOrderId -> [symbol, side, 剩余数量, 累计成交量, 占用时间]
+        self.open_orders: Dict[str, list] = {}
+        self._closed: 'OrderedDict[str, float]' = OrderedDict()
+        self._sent = deque()
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.rejections: Dict[str, int] = {}
+        self.last_reconcile: Optional[Dict[str, Any]] = None
+
+    def _symbol(self, symbol: str) -> SymbolRisk:
+        state = self.symbols.get(symbol)
+        if state is None:
+            state = self.symbols[symbol] = SymbolRisk()
+        return state
+
+    # ---------- 价格 ----------
+
+    def update_price(self, symbol: str, price: float, timestamp: Optional[int] = None) -> None:
+        """
+        更新最新价格（K线 / 成交推送时调用）
+
+        Args:
+            timestamp: 价格时间（毫秒），None 为当前；早于进程内已有价格时忽略
+        """
+        state = self._symbol(symbol)
+        price_time = time.monotonic()
+        if timestamp is not None:
+            price_time -= max(0.0, time.time() - timestamp / 1000)
+            if state.last_price is not None and price_time < state.price_time:
+                return
+        state.last_price = price
+        state.price_time = price_time
+
+    def last_price(self, symbol: str) -> Optional[float]:
+        state = self.symbols.get(symbol)
+        return state.last_price if state is not None else None
+
+    def price_stale(self, symbol: str) -> bool:
+        """进程内价格缺失或早于 price_max_age 秒，下单前需要 refresh_price"""
+        state = self.symbols.get(symbol)
+        if state is None or state.last_price is None:
+            return True
+        max_age = self.limits.price_max_age
+        return bool(max_age) and time.monotonic() - state.price_time > max_age
+
+    def refresh_price(self, symbol: str) -> Optional[float]:
+        """
+        进程内价格过期时从 PriceCache 读取并更新（同步，可能访问 Redis 与交易所，异步代码中用 asyncio.to_thread）
+
+        Returns:
+            Optional[float]: 最新价格；仍取不到时为 None，pre_trade 按 no_price 处理
+        """
+        if not self.price_stale(symbol):
+            return self.last_price(symbol)
+        if self._price_cache is None:
+            from DatabaseOperator.price_cache import price_cache
+            self._price_cache = price_cache
+        try:
+            entry = self._price_cache.get_entries([symbol], max_age=self.limits.price_max_age or None).get(
+                symbol.upper())
+        except Exception as e:
+            logger.warning(f"[Risk] 从价格缓存读取 {symbol} 失败: {e}")
+            return None
+        if entry is None:
+            return None
+        self.update_price(symbol, entry['price'], entry['timestamp'])
+        return self.last_price(symbol)
+
+    # ---------- 下单前校验 ----------
+
+    def _reject(self, rule: str, reason: str):
+        self.rejections[rule] = self.rejections.get(rule, 0) + 1
+        raise RiskRejected(rule, reason)
+
+    def pre_trade(self, params: Dict[str, Any]) -> None:
+        """
+        校验一笔下单请求（order.place / POST /api/v3/order 的参数），通过时占用挂单额度与下单频率
+        未提供 newClientOrderId 时写入生成的 ID（挂单额度按它跟踪，params 需原样发出）
+
+        Raises:
+            RiskRejected: 任一规则不通过
+        """
+        limits = self.limits
+        symbol = params['symbol']
+        side = params['side']
+        price = _to_float(params.get('price')) or None
+        now = time.monotonic()
+        with self._lock:
+            self.checks += 1
+            state = self._symbol(symbol)
+            last_price = state.last_price
+            if last_price is not None and limits.price_max_age and now - state.price_time > limits.price_max_age:
+                last_price = None
+
+            if price is not None and last_price is not None:
+                deviation = (price - last_price) / last_price if side == 'BUY' else (last_price - price) / last_price
+                if deviation > limits.price_band:
+                    self._reject('price_band', f"{symbol} {side} 价格 {price} 偏离最新价 {last_price} "
+                                               f"{deviation:.2%} > {limits.price_band:.2%}")
+            reference = price or last_price
+            if reference is None:
+                self._reject('no_price', f"{symbol} 没有有效的最新价格")
+
+            quantity = _to_float(params.get('quantity'))
+            if not quantity and params.get('quoteOrderQty'):
+                quantity = _to_float(params['quoteOrderQty']) / reference
+            notional = quantity * reference
+            if notional > limits.max_order_notional:
+                self._reject('order_notional', f"{symbol} 单笔名义金额 {notional:.2f} > {limits.max_order_notional}")
+
+            if side == 'BUY':
+                exposure = state.position + state.open_buy + quantity
+            else:
+                exposure = state.open_sell + quantity - state.position
+            if exposure * reference > limits.max_position_notional:
+                self._reject('position_notional', f"{symbol} {side} 方向敞口 {exposure * reference:.2f} "
+                                                  f"> {limits.max_position_notional}")
+
+            if len(self.open_orders) >= limits.max_open_orders:
+                self._reject('open_orders', f"未完结订单 {len(self.open_orders)} 笔，已达上限 {limits.max_open_orders}")
+
+            sent = self._sent
+            while sent and now - sent[0] >= 1.0:
+                sent.popleft()
+            if len(sent) >= limits.max_orders_per_second:
+                self._reject('order_rate', f"最近 1 秒已下单 {len(sent)} 笔，已达上限 {limits.max_orders_per_second}")
+            sent.append(now)
+
+            # 没有 ID 的订单无法与回报对应，挂单额度也就无法跟踪和释放
+            client_order_id = params.setdefault('newClientOrderId', uuid.uuid4().hex)
+            self._open(client_order_id, symbol, side, quantity, 0.0, now)
+
+    def _open(self, client_order_id: str, symbol: str, side: str, remaining: float, executed: float,
+              opened_at: float) -> None:
+        state = self._symbol(symbol)
+        self.open_orders[client_order_id] = [symbol, side, remaining, executed, opened_at]
+        state.open_count += 1
+        if side == 'BUY':
+            state.open_buy += remaining
+        else:
+            state.open_sell += remaining
+
+    def _close(self, client_order_id: str) -> Optional[list]:
+        order = self.open_orders.pop(client_order_id, None)
+        if order is None:
+            return None
+        symbol, side, remaining = order[0], order[1], order[2]
+        state = self._symbol(symbol)
+        state.open_count -= 1
+        if side == 'BUY':
+            state.open_buy -= remaining
+        else:
+            state.open_sell -= remaining
+        return order
+
+    def release(self, client_order_id: str) -> None:
+        """释放未发出订单占用的挂单额度（请求未到达交易所时调用）"""
+        with self._lock:
+            self._close(client_order_id)
+
+    # ---------- 成交与状态更新 ----------
+
+    def apply(self, record: Dict[str, Any]) -> None:
+        """
+        按订单记录更新状态：累计成交量的增量计入持仓，终结状态释放挂单额度
+        同一订单的重复或乱序回报（累计成交量不增加）不会重复计入
+        """
+        client_order_id = record.get('newClientOrderId')
+        if not client_order_id:
+            return
+        status = record.get('order_status', 'NEW')
+        executed = _to_float(record.get('executed_qty'))
+        with self._lock:
+            order = self.open_orders.get(client_order_id)
+            if order is None:
+                if client_order_id in self._closed:
+                    previous = self._closed[client_order_id]
+                    if executed > previous:
+                        self._fill(record['symbol'], record['side'], executed - previous)
+                        self._closed[client_order_id] = executed
+                    return
+                # 其他途径下的订单（例如网页端）：按回报建立挂单
+                self._open(client_order_id, record['symbol'], record['side'], _to_float(record.get('quantity')),
+                           0.0, time.monotonic())
+                order = self.open_orders[client_order_id]
+
+            symbol, side = order[0], order[1]
+            delta = executed - order[3]
+            if delta > 0:
+                self._fill(symbol, side, delta)
+                order[3] = executed
+                filled = min(delta, order[2])
+                order[2] -= filled
+                state = self.symbols[symbol]
+                if side == 'BUY':
+                    state.open_buy -= filled
+                else:
+                    state.open_sell -= filled
+
+            if status not in OPEN_STATUSES:
+                self._close(client_order_id)
+                self._closed[client_order_id] = order[3]
+                while len(self._closed) > CLOSED_ORDERS_KEPT:
+                    self._closed.popitem(last=False)
+
+    def _fill(self, symbol: str, side: str, quantity: float) -> None:
+        state = self._symbol(symbol)
+        state.position += quantity if side == 'BUY' else -quantity
+
+    # ---------- 对账 ----------
+
+    def _load_from_db(self) -> Dict[str, Any]:
+        from sqlalchemy import case, func, select
+        from DatabaseOperator.pg_operator import Session, get_order_table
+
+        table = get_order_table()
+        signed_qty = case((table.c.side == 'BUY', table.c.executed_qty), else_=-table.c.executed_qty)
+        with Session() as session:
+            positions = {symbol: float(position or 0) for symbol, position in session.execute(
+                select(table.c.symbol, func.sum(signed_qty))
+                .where(table.c.is_test_order.is_(False))
+                .group_by(table.c.symbol))}
+            open_orders = {row.newClientOrderId: row for row in session.execute(
+                select(table.c.newClientOrderId, table.c.symbol, table.c.side, table.c.quantity,
+                       table.c.executed_qty)
+                .where(table.c.order_status.in_(OPEN_STATUSES))
+                .where(table.c.is_test_order.is_(False)))}
+        return {'positions': positions, 'open_orders': open_orders}
+
+    def reconcile(self, grace: float = 5.0) -> Dict[str, Any]:
+        """
+        用 BinanceOrders 校正净持仓与未完结订单（同步，会查询数据库）
+        对账开始前 grace 秒内占用的、库中还没有的订单保留（订单日志尚未落库）
+
+        Returns:
+            dict: {'drift': {symbol: 库中持仓 - 内存持仓}, 'open_orders': 对账后未完结订单数}
+        """
+        if self.journal is not None:
+            self.journal.flush()
+        started = time.monotonic()
+        loaded = self._load_from_db()
+        with self._lock:
+            drift = {}
+            for symbol in set(loaded['positions']) | {s for s, state in self.symbols.items() if state.position}:
+                difference = loaded['positions'].get(symbol, 0.0) - (self.symbols[symbol].position
+                                                                       if symbol in self.symbols else 0.0)
+                if abs(difference) > 1e-9:
+                    drift[symbol] = difference
+
+            kept = {client_order_id: order for client_order_id, order in self.open_orders.items()
+                    if client_order_id not in loaded['open_orders'] and order[4] >= started - grace}
+            self.open_orders = {}
+            for state in self.symbols.values():
+                state.position, state.open_buy, state.open_sell, state.open_count = 0.0, 0.0, 0.0, 0
+            for symbol, position in loaded['positions'].items():
+                self._symbol(symbol).position = position
+            for client_order_id, row in loaded['open_orders'].items():
+                executed = float(row.executed_qty or 0)
+                self._open(client_order_id, row.symbol, row.side, max(float(row.quantity or 0) - executed, 0.0),
+                           executed, started)
+            for client_order_id, order in kept.items():
+                self._open(client_order_id, *order)
+
+            self.last_reconcile = {'drift': drift, 'open_orders': len(self.open_orders), 'time': time.time()}
+        if drift:
+            logger.warning(f"[Risk] 对账发现持仓偏差（库中 - 内存）: {drift}")
+        else:
+            logger.info(f"[Risk] 对账完成，持仓一致，未完结订单 {len(self.open_orders)} 笔")
+        return self.last_reconcile
+
+    async def run_reconcile_loop(self, interval: float = RISK_RECONCILE_INTERVAL) -> None:
+        """启动时立即对账一次，之后每 interval 秒对账（在线程中查询数据库，不阻塞事件循环）"""
+        while True:
+            try:
+                await asyncio.to_thread(self.reconcile)
+            except Exception as e:
+                logger.error(f"[Risk] 对账失败: {e}")
+            await asyncio.sleep(interval)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """当前状态与统计"""
+        with self._lock:
+            return {
+                'limits': self.limits.to_dict(),
+                'symbols': {symbol: state.to_dict() for symbol, state in self.symbols.items()},
+                'open_orders': len(self.open_orders),
+                'checks': self.checks,
+                'rejections': dict(self.rejections),
+                'last_reconcile': self.last_reconcile,
+            }
+
+
+_engine: Optional[RiskEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_risk_engine() -> RiskEngine:
+    """进程内共享的风控引擎（下单网关与 signed_request 默认使用）"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = RiskEngine()
+        return _engine
@@ -0,0 +1,273 @@
+# app/ExchangeBill/user_data_stream.py
+"""
+user_data_stream.py
+- 用户数据流：通过 listenKey 订阅账户推送，订单状态变化实时到达，无需轮询 openOrders
+- listenKey 由 REST POST userDataStream 创建，每 USER_STREAM_KEEPALIVE 秒 PUT 续期（交易所 60 分钟过期），
+  收到 listenKeyExpired 或断线时重新创建并重连，退出时 DELETE
+- executionReport 转换为订单记录交给订单日志（DatabaseOperator/order_journal.py），
+  同一批次内同一订单的多次推送合并为一次写入
+- 内存中维护未完结订单索引（键为 newClientOrderId）：先连接并缓存推送，再用一次 openOrders 初始化，
+  然后按顺序应用缓存的推送，之后只由推送更新；openOrders 请求期间的成交/撤单不会被快照覆盖而丢失
+- outboundAccountPosition 更新内存中的余额
+
+环境变量：
+    BINANCE_TRADE_API_URL       下单/账户 REST 地址（见 config.basicConfig，默认测试网）
+    BINANCE_USER_STREAM_URL     用户数据流 WebSocket 地址（见 config.basicConfig，默认测试网）
+    USER_STREAM_KEEPALIVE       listenKey 续期间隔秒数（默认 1800）
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from config import BINANCE_API_KEY, BINANCE_PRIVATE_KEY_PATH, BINANCE_TRADE_API_URL, BINANCE_USER_STREAM_URL
+
+logger = logging.getLogger(__name__)
+
+USER_STREAM_KEEPALIVE = float(os.getenv('USER_STREAM_KEEPALIVE', '1800'))
+
+OPEN_STATUSES = ('NEW', 'PARTIALLY_FILLED', 'PENDING_NEW', 'PENDING_CANCEL')
+
+
+def execution_report_to_record(event: dict) -> dict:
+    """executionReport -> 订单记录（insert_order_Binance 的 order_data 格式）"""
+    from DatabaseOperator.pg_operator import normalize_order_status
+
+    status = event['X']
+    # 撤单回报中 c 为撤单请求的 ID，原订单 ID 在 C
+    client_order_id = event.get('C') if status == 'CANCELED' and event.get('C') else event['c']
+    record = {
+        'newClientOrderId': client_order_id,
+        'client_order_id': client_order_id,
+        'symbol': event['s'],
+        'side': event['S'],
+        'type': event['o'],
+        'timeInForce': event.get('f') if event.get('f') in ('GTC', 'IOC', 'FOK') else None,
+        'quantity': event.get('q'),
+        'price': event.get('p') if event.get('p') and float(event['p']) else None,
+        'stopPrice': event.get('P') if event.get('P') and float(event['P']) else None,
+        'order_id': event.get('i'),
+        'order_status': normalize_order_status(status),
+        'executed_qty': event.get('z'),
+        'cummulative_quote_qty': event.get('Z'),
+        'order_time': datetime.fromtimestamp(event['T'] / 1000, tz=timezone.utc) if event.get('T') else None,
+    }
+    if status == 'REJECTED' and event.get('r') not in (None, 'NONE'):
+        record['error_msg'] = event['r']
+    return {key: value for key, value in record.items() if value is not None}
+
+
+class OpenOrderIndex:
+    """未完结订单索引：newClientOrderId -> 最新订单状态"""
+
+    def __init__(self):
+        self.orders: Dict[str, dict] = {}
+
+    def __len__(self) -> int:
+        return len(self.orders)
+
+    def get(self, client_order_id: str) -> Optional[dict]:
+        return self.orders.get(client_order_id)
+
+    def by_symbol(self, symbol: str) -> List[dict]:
+        symbol = symbol.upper()
+        return [order for order in self.orders.values() if order['symbol'] == symbol]
+
+    def apply(self, record: dict) -> None:
+        """按订单记录更新索引；完结状态（成交/撤销/拒绝/过期）从索引中移除"""
+        client_order_id = record['newClientOrderId']
+        if record['order_status'] in OPEN_STATUSES:
+            self.orders[client_order_id] = {**self.orders.get(client_order_id, {}), **record}
+        else:
+            self.orders.pop(client_order_id, None)
+
+    def load(self, open_orders: List[dict]) -> None:
+        """用 REST openOrders 的结果重建索引"""
+        self.orders = {}
+        for order in open_orders:
+            self.apply({
+                'newClientOrderId': order['clientOrderId'],
+                'client_order_id': order['clientOrderId'],
+                'symbol': order['symbol'],
+                'side': order['side'],
+                'type': order['type'],
+                'quantity': order.get('origQty'),
+                'price': order.get('price'),
+                'order_id': order['orderId'],
+                'order_status': order['status'],
+                'executed_qty': order.get('executedQty'),
+                'cummulative_quote_qty': order.get('cummulativeQuoteQty'),
+            })
+
+
+class UserDataStream:
+    """
+    用户数据流监听器
+
+    用法：
+        stream = UserDataStream()
+        await stream.run()                 # 直到被取消
+        stream.open_orders.by_symbol("BTCUSDT")
+    """
+
+    def __init__(self, api_key: str = BINANCE_API_KEY, journal=None, open_orders: Optional[OpenOrderIndex] = None,
+                 on_execution: Optional[Callable[[dict], None]] = None, rest_url: str = BINANCE_TRADE_API_URL,
+                 ws_url: str = BINANCE_USER_STREAM_URL, keepalive_interval: float = USER_STREAM_KEEPALIVE):
+        """
+        Args:
+            api_key: API Key
+            journal: 订单日志（需提供 record(order_data)），默认共享的 OrderJournal；传 False 不写库
+            open_orders: 未完结订单索引，默认新建
+            on_execution: 每条 executionReport 转换后的订单记录回调
+            rest_url: REST 地址（listenKey 与 openOrders）
+            ws_url: 用户数据流 WebSocket 地址
+            keepalive_interval: listenKey 续期间隔秒数
+        """
+        if journal is None:
+            from DatabaseOperator.order_journal import get_order_journal
+            journal = get_order_journal()
+        self.api_key = api_key
+        self.journal = journal or None
+        self.open_orders = open_orders or OpenOrderIndex()
+        self.on_execution = on_execution
+        self.rest_url = rest_url
+        self.ws_url = ws_url
+        self.keepalive_interval = keepalive_interval
+        self.balances: Dict[str, dict] = {}
+        self.listen_key: Optional[str] = None
+        self.stats = {'executions': 0, 'reconnects': 0, 'keepalives': 0}
+
+    # ---------- REST ----------
+
+    def _api_request(self, method: str, endpoint: str, params: Optional[dict] = None, signed: bool = False):
+        params = dict(params or {})
+        if signed:
+            from ExchangeBill.request_signer import get_signer
+            params['timestamp'] = int(time.time() * 1000)
+            query_string = '&'.join(f"{key}={value}" for key, value in params.items())
+            params['signature'] = get_signer(BINANCE_PRIVATE_KEY_PATH).sign(query_string)
+        response = requests.request(method, f"{self.rest_url}{endpoint}", params=params,
+                                    headers={'X-MBX-APIKEY': self.api_key}, timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    def create_listen_key(self) -> str:
+        self.listen_key = self._api_request('POST', 'userDataStream')['listenKey']
+        return self.listen_key
+
+    def keepalive(self) -> None:
+        self._api_request('PUT', 'userDataStream', {'listenKey': self.listen_key})
+        self.stats['keepalives'] += 1
+
+    def close_listen_key(self) -> None:
+        if self.listen_key:
+            self._api_request('DELETE', 'userDataStream', {'listenKey': self.listen_key})
+            self.listen_key = None
+
+    def fetch_open_orders(self) -> List[dict]:
+        return self._api_request('GET', 'openOrders', signed=True)
+
+    # ---------- 事件处理 ----------
+
+    def handle_event(self, event: dict) -> None:
+        """处理一条推送（实时与回放共用）"""
+        event_type = event.get('e')
+        if event_type == 'executionReport':
+            record = execution_report_to_record(event)
+            self.stats['executions'] += 1
+            self.open_orders.apply(record)
+            if self.journal is not None:
+                self.journal.record(record)
+            if self.on_execution is not None:
+                self.on_execution(record)
+        elif event_type == 'outboundAccountPosition':
+            for balance in event.get('B', []):
+                self.balances[balance['a']] = {'free': float(balance['f']), 'locked': float(balance['l']),
+                                               'updated_at': event.get('u')}
+
+    async def _keepalive_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.keepalive_interval)
+            try:
+                await asyncio.to_thread(self.keepalive)
+            except Exception as e:
+                logger.warning(f"[UserDataStream] listenKey 续期失败: {e}")
+
+    def _dispatch(self, event: dict) -> bool:
+        """处理一条推送，listenKey 过期时返回 False"""
+        if event.get('e') == 'listenKeyExpired':
+            logger.warning("[UserDataStream] listenKey 已过期，重新创建")
+            return False
+        try:
+            self.handle_event(event)
+        except Exception as e:
+            logger.error(f"[UserDataStream] 处理推送失败: {e} {event}")
+        return True
+
+    @staticmethod
+    async def _buffer_events(websocket, buffer: List[dict]) -> None:
+        """openOrders 请求期间接收并缓存推送"""
+        async for message in websocket:
+            buffer.append(json.loads(message))
+
+    async def _load_open_orders(self, websocket) -> List[dict]:
+        """
+        连接后取一次 openOrders 初始化索引，返回请求期间缓存的推送（由调用方按顺序应用）
+        推送在快照之后应用：快照之前已完结的订单再收到完结推送时只是再移除一次
+        """
+        buffer: List[dict] = []
+        reader = asyncio.create_task(self._buffer_events(websocket, buffer), name='user-stream-buffer')
+        try:
+            open_orders = await asyncio.to_thread(self.fetch_open_orders)
+        finally:
+            reader.cancel()
+            try:
+                await reader
+            except asyncio.CancelledError:
+                pass
+        self.open_orders.load(open_orders)
+        logger.info(f"[UserDataStream] 当前未完结订单 {len(self.open_orders)} 笔，"
+                    f"应用请求期间缓存的推送 {len(buffer)} 条")
+        return buffer
+
+    async def run(self) -> None:
+        """创建 listenKey 并持续处理推送，断线或 listenKey 过期时重建，直到被取消"""
+        import websockets
+
+        backoff = 1
+        try:
+            while True:
+                keepalive_task = None
+                try:
+                    await asyncio.to_thread(self.create_listen_key)
+                    keepalive_task = asyncio.create_task(self._keepalive_loop(), name='user-stream-keepalive')
+                    async with websockets.connect(f"{self.ws_url}/{self.listen_key}", ping_interval=20,
+                                                  ping_timeout=10, close_timeout=10) as websocket:
+                        logger.info("[UserDataStream] 已连接用户数据流")
+                        backoff = 1
+                        # 先连接再取 openOrders，之后只依赖推送
+                        buffered = await self._load_open_orders(websocket)
+                        if all(self._dispatch(event) for event in buffered):
+                            async for message in websocket:
+                                if not self._dispatch(json.loads(message)):
+                                    break
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logger.warning(f"[UserDataStream] 连接异常: {e}，{backoff}s 后重连")
+                    await asyncio.sleep(backoff)
+                    backoff = min(backoff * 2, 60)
+                finally:
+                    if keepalive_task is not None:
+                        keepalive_task.cancel()
+                self.stats['reconnects'] += 1
+        finally:
+            try:
+                await asyncio.to_thread(self.close_listen_key)
+            except Exception as e:
+                logger.warning(f"[UserDataStream] 关闭 listenKey 失败: {e}")
@@ -5,8 +5,16 @@ def fetch_price(*args, **kwargs):
     from .fetcher import fetch_price as _fetch_price
     return _fetch_price(*args, **kwargs)
 
+def fetch_prices(*args, **kwargs):
+    from .fetcher import fetch_prices as _fetch_prices
+    return _fetch_prices(*args, **kwargs)
+
 def get_kline(*args, **kwargs):
     from .fetcher import get_kline as _get_kline
     return _get_kline(*args, **kwargs)
 
-__all__ = ['fetch_price', 'get_kline']
\ No newline at end of file
+def get_adapter(*args, **kwargs):
+    from .exchange_adapter import get_adapter as _get_adapter
+    return _get_adapter(*args, **kwargs)
+
+__all__ = ['fetch_price', 'fetch_prices', 'get_kline', 'get_adapter']
\ No newline at end of file
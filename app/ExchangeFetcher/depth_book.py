@@ -0,0 +1,475 @@
+# app/ExchangeFetcher/depth_book.py
+"""
+depth_book.py
+- 订阅 <symbol>@depth@100ms 增量深度，配合 REST 快照（depth?limit=）在本地重建订单簿
+- 同步流程（Binance 官方步骤）：先连接并缓存增量事件 -> 获取快照 -> 丢弃 u <= lastUpdateId 的事件
+  -> 之后每个事件须满足 U <= 上一个 u + 1，否则视为丢包，重新获取快照
+- 订单簿每侧为按价格升序的两个平行数组（bisect 定位），最优价在数组一端，读取最优买卖价为 O(1)，
+  更新为 O(log n) 定位 + 靠近盘口处的少量移动
+- 可选定时把前 N 档写入 gzip 压缩的 JSON Lines 快照文件：<DEPTH_SNAPSHOT_DIR>/<SYMBOL>/<YYYYMMDD>.jsonl.gz
+- 可把收到的原始消息与 REST 快照交给 stream_recorder.StreamRecorder 录制（与K线、成交流同一种格式），
+  离线回放时走与实时相同的同步逻辑
+
+环境变量：
+    DEPTH_SNAPSHOT_LIMIT     REST 快照档数（默认 1000）
+    DEPTH_SNAPSHOT_DIR       压缩快照目录（默认 <DATA_DIR>/depth_snapshots）
+    DEPTH_SNAPSHOT_INTERVAL  写入压缩快照的间隔秒数（默认 60，0 表示不写）
+    DEPTH_SNAPSHOT_LEVELS    压缩快照保存的档数（默认 100，0 表示全部）
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+from config import BINANCE_API_BASE_URL, BINANCE_WS_STREAM_URL, DEFAULT_SYMBOL
+from PathUniti import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+DEPTH_SNAPSHOT_LIMIT = int(os.getenv('DEPTH_SNAPSHOT_LIMIT', '1000'))
+DEPTH_SNAPSHOT_DIR = Path(os.getenv('DEPTH_SNAPSHOT_DIR', str(DATA_DIR / 'depth_snapshots')))
+DEPTH_SNAPSHOT_INTERVAL = float(os.getenv('DEPTH_SNAPSHOT_INTERVAL', '60'))
+DEPTH_SNAPSHOT_LEVELS = int(os.getenv('DEPTH_SNAPSHOT_LEVELS', '100'))
+# 等待快照期间最多缓存的增量事件数，超过后丢弃最早的事件（快照到达后会按需重新同步）
+MAX_BUFFERED_EVENTS = 10000
+
+Level = Tuple[float, float]
+
+
+class OrderBookGapError(Exception):
+    """增量事件不连续（丢包），需要重新获取快照"""
+
+
+class BookSide:
+    """订单簿一侧：按价格升序的平行数组；买盘最优价在末尾，卖盘最优价在开头"""
+
+    def __init__(self, is_bid: bool):
+        self.is_bid = is_bid
+        self.prices: List[float] = []
+        self.quantities: List[float] = []
+
+    def __len__(self) -> int:
+        return len(self.prices)
+
+    def clear(self) -> None:
+        self.prices.clear()
+        self.quantities.clear()
+
+    def set(self, price: float, quantity: float) -> None:
+        """设置某一档的数量，数量为 0 时删除该档"""
+        prices = self.prices
+        i = bisect_left(prices, price)
+        if i < len(prices) and prices[i] == price:
+            if quantity:
+                self.quantities[i] = quantity
+            else:
+                del prices[i]
+                del self.quantities[i]
+        elif quantity:
+            prices.insert(i, price)
+            self.quantities.insert(i, quantity)
+
+    def update(self, levels: Iterable[Iterable]) -> None:
+        """应用交易所格式的档位 [[价格字符串, 数量字符串], ...]"""
+        for price, quantity in levels:
+            self.set(float(price), float(quantity))
+
+    def best(self) -> Optional[Level]:
+        if not self.prices:
+            return None
+        i = -1 if self.is_bid else 0
+        return self.prices[i], self.quantities[i]
+
+    def top(self, n: Optional[int] = None) -> List[Level]:
+        """从最优价开始的前 n 档，n 为 None 时返回全部"""
+        size = len(self.prices)
+        n = size if n is None else min(n, size)
+        if self.is_bid:
+            return [(self.prices[i], self.quantities[i]) for i in range(size - 1, size - 1 - n, -1)]
+        return list(zip(self.prices[:n], self.quantities[:n]))
+
+
+class LocalOrderBook:
+    """
+    本地订单簿
+
+    用法：
+        book = LocalOrderBook("BTCUSDT")
+        book.load_snapshot(fetch_depth_snapshot("BTCUSDT"))
+        book.apply_diff(event)            # 丢包时抛出 OrderBookGapError
+        book.best_bid(), book.spread(), book.top(10)
+    """
+
+    def __init__(self, symbol: str):
+        self.symbol = symbol.upper()
+        self.bids = BookSide(is_bid=True)
+        self.asks = BookSide(is_bid=False)
+        self.last_update_id: Optional[int] = None
+        self.event_time: Optional[int] = None  # 最近一次增量事件的交易所时间（毫秒）
+        self.updates = 0
+
+    def load_snapshot(self, snapshot: dict) -> None:
+        """用 REST 快照（lastUpdateId/bids/asks）重置订单簿"""
+        self.bids.clear()
+        self.asks.clear()
+        self.bids.update(snapshot['bids'])
+        self.asks.update(snapshot['asks'])
+        self.last_update_id = int(snapshot['lastUpdateId'])
+        self.event_time = snapshot.get('E')
+
+    def apply_diff(self, event: dict) -> bool:
+        """
+        应用一条 depthUpdate 增量事件
+
+        Returns:
+            bool: 是否应用；已包含在当前订单簿中的旧事件返回 False
+
+        Raises:
+            OrderBookGapError: 尚未加载快照或事件不连续
+        """
+        if self.last_update_id is None:
+            raise OrderBookGapError(f"{self.symbol} 尚未加载快照")
+        first_id, final_id = int(event['U']), int(event['u'])
+        if final_id <= self.last_update_id:
+            return False
+        if first_id > self.last_update_id + 1:
+            raise OrderBookGapError(
+                f"{self.symbol} 增量事件不连续: 期望 U <= {self.last_update_id + 1}，收到 U={first_id}")
+        self.bids.update(event['b'])
+        self.asks.update(event['a'])
+        self.last_update_id = final_id
+        self.event_time = event.get('E')
+        self.updates += 1
+        return True
+
+    # ---------- 读取 ----------
+
+    def best_bid(self) -> Optional[Level]:
+        return self.bids.best()
+
+    def best_ask(self) -> Optional[Level]:
+        return self.asks.best()
+
+    def spread(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return ask[0] - bid[0]
+
+    def mid_price(self) -> Optional[float]:
+        bid, ask = self.bids.best(), self.asks.best()
+        if bid is None or ask is None:
+            return None
+        return (ask[0] + bid[0]) / 2
+
+    def top(self, n: Optional[int] = 10) -> dict:
+        """前 n 档深度 {'bids': [(价格, 数量), ...], 'asks': [...]}，均从最优价开始"""
+        return {'bids': self.bids.top(n), 'asks': self.asks.top(n)}
+
+    def to_snapshot(self, levels: Optional[int] = None) -> dict:
+        """序列化为与 REST 快照相同结构的字典（可再次 load_snapshot）"""
+        depth = self.top(levels)
+        return {
+            'symbol': self.symbol,
+            'lastUpdateId': self.last_update_id,
+            'E': self.event_time,
+            'bids': [[repr(p), repr(q)] for p, q in depth['bids']],
+            'asks': [[repr(p), repr(q)] for p, q in depth['asks']],
+        }
+
+
+class DepthSynchronizer:
+    """
+    快照与增量事件的同步状态机，不涉及网络，实时采集与 fixture 回放共用
+
+    on_event 在未同步时缓存事件；on_snapshot 加载快照并应用缓存事件，成功后进入同步状态。
+    同步后遇到丢包会回到未同步状态，needs_snapshot 变为 True。
+    """
+
+    def __init__(self, book: LocalOrderBook, on_update: Optional[Callable[[LocalOrderBook], None]] = None):
+        self.book = book
+        self.on_update = on_update
+        self.synced = False
+        self.buffer: List[dict] = []
+        self.resyncs = 0
+
+    @property
+    def needs_snapshot(self) -> bool:
+        return not self.synced
+
+    def on_event(self, event: dict) -> bool:
+        """处理一条增量事件，返回是否已应用到订单簿"""
+        if not self.synced:
+            self.buffer.append(event)
+            if len(self.buffer) > MAX_BUFFERED_EVENTS:
+                del self.buffer[0]
+            return False
+        try:
+            applied = self.book.apply_diff(event)
+        except OrderBookGapError as e:
+            logger.warning(f"[DepthBook] {e}，重新同步")
+            self.synced = False
+            self.resyncs += 1
+            self.buffer = [event]
+            return False
+        if applied and self.on_update is not None:
+            self.on_update(self.book)
+        return applied
+
+    def on_snapshot(self, snapshot: dict) -> bool:
+        """
+        加载快照并应用缓存的事件
+
+        Returns:
+            bool: 是否同步成功；快照早于缓存中最早的事件或缓存事件不连续时返回 False，需要重新获取快照
+        """
+        last_update_id = int(snapshot['lastUpdateId'])
+        if self.buffer and last_update_id < int(self.buffer[0]['U']) - 1:
+            logger.info(f"[DepthBook] {self.book.symbol} 快照 {last_update_id} 早于缓存事件 "
+                        f"{self.buffer[0]['U']}，重新获取")
+            return False
+        self.book.load_snapshot(snapshot)
+        try:
+            for event in self.buffer:
+                self.book.apply_diff(event)
+        except OrderBookGapError as e:
+            logger.warning(f"[DepthBook] {e}，重新获取快照")
+            return False
+        self.buffer = []
+        self.synced = True
+        if self.on_update is not None:
+            self.on_update(self.book)
+        return True
+
+
+# 本进程中由 run_depth_stream 维护的订单簿，键为交易对
+depth_books: Dict[str, LocalOrderBook] = {}
+
+
+def fetch_depth_snapshot(symbol: str, limit: int = DEPTH_SNAPSHOT_LIMIT) -> dict:
+    """REST 获取深度快照 {lastUpdateId, bids, asks}"""
+    response = requests.get(f'{BINANCE_API_BASE_URL}depth', params={'symbol': symbol.upper(), 'limit': limit},
+                            timeout=10)
+    response.raise_for_status()
+    return response.json()
+
+
+class DepthSnapshotStore:
+    """gzip 压缩的 JSON Lines 快照文件，按交易对与 UTC 日期分文件，追加写入"""
+
+    def __init__(self, directory: Path = DEPTH_SNAPSHOT_DIR, levels: int = DEPTH_SNAPSHOT_LEVELS):
+        self.directory = Path(directory)
+        self.levels = levels or None
+
+    def path_for(self, symbol: str, day: Optional[datetime] = None) -> Path:
+        day = day or datetime.now(timezone.utc)
+        return self.directory / symbol.upper() / f"{day:%Y%m%d}.jsonl.gz"
+
+    def write(self, book: LocalOrderBook) -> Path:
+        record = book.to_snapshot(self.levels)
+        record['saved_at'] = int(time.time() * 1000)
+        path = self.path_for(book.symbol)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 追加模式每次写入一个 gzip 成员，gzip.open 读取时自动拼接
+        with gzip.open(path, 'at', encoding='utf-8') as f:
+            f.write(json.dumps(record, separators=(',', ':')) + '\n')
+        return path
+
+    def read(self, symbol: str, day: Optional[datetime] = None) -> Iterator[dict]:
+        path = self.path_for(symbol, day)
+        if not path.exists():
+            return
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+# ---------- 录制回放 ----------
+
+def replay_depth_recording(path, symbol: Optional[str] = None,
+                           on_update: Optional[Callable[[LocalOrderBook], None]] = None) -> Dict[str, DepthSynchronizer]:
+    """
+    按录制顺序回放 stream_recorder 录制中的深度流，返回各交易对的同步器（订单簿为 sync.book）
+
+    Args:
+        path: 录制文件或目录
+        symbol: 只回放该交易对，None 为全部深度流
+        on_update: 每次订单簿变化后的回调
+    """
+    from ExchangeFetcher.stream_recorder import read_recording
+
+    syncs: Dict[str, DepthSynchronizer] = {}
+    for record in read_recording(path):
+        stream_symbol, _, name = record['s'].partition('@')
+        stream_symbol = stream_symbol.upper()
+        if not name.startswith('depth') or (symbol and stream_symbol != symbol.upper()):
+            continue
+        sync = syncs.get(stream_symbol)
+        if sync is None:
+            sync = syncs[stream_symbol] = DepthSynchronizer(LocalOrderBook(stream_symbol), on_update)
+        if 'snapshot' in record:
+            # 与实时采集相同：只在未同步时使用快照
+            if sync.needs_snapshot:
+                sync.on_snapshot(record['snapshot'])
+        else:
+            event = json.loads(record['m'])
+            if event.get('e') == 'depthUpdate':
+                sync.on_event(event)
+    return syncs
+
+
+async def run_depth_stream(symbol: str, book: Optional[LocalOrderBook] = None,
+                           on_update: Optional[Callable[[LocalOrderBook], None]] = None,
+                           snapshot_store: Optional[DepthSnapshotStore] = None,
+                           snapshot_interval: float = DEPTH_SNAPSHOT_INTERVAL,
+                           recorder=None, max_events: Optional[int] = None,
+                           auto_reconnect: bool = True) -> LocalOrderBook:
+    """
+    订阅增量深度并维护本地订单簿，直到被取消（或收到 max_events 条事件）
+
+    Args:
+        symbol: 交易对
+        book: 要维护的订单簿，默认新建
+        on_update: 每次订单簿变化后的回调（在事件循环中同步执行，应尽量轻量）
+        snapshot_store: 压缩快照存储；为 None 时不写快照
+        snapshot_interval: 写入压缩快照的间隔秒数
+        recorder: stream_recorder.StreamRecorder，收到的原始消息与获取的快照先原样录制再处理
+        max_events: 收到该数量的增量事件后返回（录制时使用）
+        auto_reconnect: 断线后是否按指数退避重连
+    """
+    import websockets
+
+    book = book or LocalOrderBook(symbol)
+    depth_books[book.symbol] = book
+    sync = DepthSynchronizer(book, on_update)
+    stream_name = f"{symbol.lower()}@depth@100ms"
+    ws_endpoint = f"{BINANCE_WS_STREAM_URL}/ws/{stream_name}"
+    next_snapshot = time.monotonic() + snapshot_interval
+    events = 0
+    backoff = 1
+
+    while True:
+        snapshot_task: Optional[asyncio.Task] = None
+        try:
+            async with websockets.connect(ws_endpoint, ping_interval=20, ping_timeout=10,
+                                          close_timeout=10) as websocket:
+                logger.info(f"[DepthBook] 已连接 {symbol} 深度流")
+                backoff = 1
+                sync.synced = False
+                sync.buffer = []
+                async for message in websocket:
+                    if recorder is not None:
+                        recorder.write(stream_name, message)
+                    event = json.loads(message)
+                    if event.get('e') != 'depthUpdate':
+                        continue
+                    sync.on_event(event)
+                    events += 1
+
+                    # 未同步时在后台获取快照，期间继续缓存事件
+                    if sync.needs_snapshot:
+                        if snapshot_task is None:
+                            snapshot_task = asyncio.create_task(asyncio.to_thread(fetch_depth_snapshot, symbol))
+                        elif snapshot_task.done():
+                            snapshot = snapshot_task.result()
+                            snapshot_task = None
+                            if recorder is not None:
+                                recorder.write_snapshot(stream_name, snapshot)
+                            if sync.on_snapshot(snapshot):
+                                logger.info(f"[DepthBook] {symbol} 已同步，lastUpdateId={book.last_update_id}")
+
+                    if snapshot_store is not None and snapshot_interval > 0 and sync.synced \
+                            and time.monotonic() >= next_snapshot:
+                        next_snapshot = time.monotonic() + snapshot_interval
+                        try:
+                            await asyncio.to_thread(snapshot_store.write, book)
+                        except Exception as e:
+                            logger.error(f"[DepthBook] 写入压缩快照失败 {symbol}: {e}")
+
+                    if max_events and events >= max_events:
+                        return book
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if not auto_reconnect:
+                raise
+            logger.warning(f"[DepthBook] {symbol} 深度流异常: {e}，{backoff}s 后重连")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 30)
+        finally:
+            if snapshot_task is not None:
+                snapshot_task.cancel()
+
+
+def _print_book(book: LocalOrderBook, levels: int) -> None:
+    depth = book.top(levels)
+    print(f"{book.symbol} lastUpdateId={book.last_update_id} best_bid={book.best_bid()} "
+          f"best_ask={book.best_ask()} spread={book.spread()}")
+    for (bid_price, bid_qty), (ask_price, ask_qty) in zip(depth['bids'], depth['asks']):
+        print(f"  {bid_qty:>14.6f} {bid_price:>14.6f} | {ask_price:<14.6f} {ask_qty:<14.6f}")
+
+
+def main():
+    """
+    python -m ExchangeFetcher.depth_book watch --symbol BTCUSDT
+    python -m ExchangeFetcher.depth_book record --symbol BTCUSDT --events 500 --out depth_btc.jsonl.gz
+    python -m ExchangeFetcher.depth_book replay depth_btc.jsonl.gz
+    """
+    parser = argparse.ArgumentParser(description='订单簿深度采集与本地重建')
+    sub = parser.add_subparsers(dest='command', required=True)
+    watch = sub.add_parser('watch', help='实时维护订单簿并定时打印盘口')
+    watch.add_argument('--symbol', default=DEFAULT_SYMBOL)
+    watch.add_argument('--levels', type=int, default=5)
+    watch.add_argument('--store', action='store_true', help='定时写入压缩快照')
+    record = sub.add_parser('record', help='录制原始增量消息与快照（stream_recorder 格式）')
+    record.add_argument('--symbol', default=DEFAULT_SYMBOL)
+    record.add_argument('--events', type=int, default=500)
+    record.add_argument('--out', required=True, help='录制文件路径（.jsonl.gz）')
+    replay = sub.add_parser('replay', help='回放录制中的深度流并打印最终盘口')
+    replay.add_argument('path', help='stream_recorder 录制的文件或目录')
+    replay.add_argument('--symbol', default=None, help='只回放该交易对')
+    replay.add_argument('--levels', type=int, default=5)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'replay':
+        syncs = replay_depth_recording(args.path, args.symbol)
+        if not syncs:
+            parser.error(f"录制中没有深度流: {args.path}")
+        for sync in syncs.values():
+            _print_book(sync.book, args.levels)
+            print(f"synced={sync.synced} updates={sync.book.updates} resyncs={sync.resyncs}")
+    elif args.command == 'record':
+        from ExchangeFetcher.stream_recorder import StreamRecorder
+
+        with StreamRecorder(args.out) as recorder:
+            asyncio.run(run_depth_stream(args.symbol, recorder=recorder, max_events=args.events,
+                                         auto_reconnect=False))
+        print(f"已录制 {args.events} 条事件到 {args.out}")
+    else:
+        last_print = [0.0]
+
+        def on_update(book):
+            if time.monotonic() - last_print[0] >= 1:
+                last_print[0] = time.monotonic()
+                _print_book(book, args.levels)
+
+        try:
+            asyncio.run(run_depth_stream(args.symbol, on_update=on_update,
+                                         snapshot_store=DepthSnapshotStore() if args.store else None))
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == '__main__':
+    main()
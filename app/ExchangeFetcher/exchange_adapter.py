@@ -0,0 +1,250 @@
+# app/ExchangeFetcher/exchange_adapter.py
+"""
+exchange_adapter.py
+- 交易所适配器：把交易所相关的部分（REST K线分页、K线流订阅、消息格式）与采集/批量写入/存储管道分开，
+  get_kline / get_kline_websocket / KlineMessageHandler 只依赖适配器接口，fetcher_queue_configs.exchange
+  决定采集任务使用哪个适配器；采集任务按 (exchange, symbol, interval) 区分，存储键同样包含交易所
+- 适配器统一输出 K线记录（parse_kline 格式：open_time/close_time 为毫秒，价格与成交量为交易所原始字符串）：
+    fetch_klines(symbol, interval, start_time, end_time, limit)  REST 取一页K线
+    iter_kline_pages(symbol, interval, start_time, end_time)     按 open_time 连续翻页
+    kline_messages(symbol, interval)                              K线流原始消息（异步迭代）
+    normalize_kline_message(message)                              原始消息 -> K线记录（含 is_closed/symbol/interval），非K线消息返回 None
+- 内置：
+    binance  参考实现（BINANCE_API_BASE_URL / BINANCE_WS_STREAM_URL，可指向本地模拟交易所）
+    fake     进程内假交易所：行情由 MockExchange/market.py 的 MockMarket 生成，消息使用与 Binance 不同的格式，
+             不需要网络，用于离线验证采集管道。写库时以 FAKE_<SYMBOL> 为键（见 kline_store.storage_symbol），不会混入真实K线
+- 新交易所：继承 ExchangeAdapter 实现上面的方法，register_adapter(name, cls) 注册后即可在队列配置中使用
+
+环境变量：
+    FAKE_EXCHANGE_RATE   fake 适配器每秒推送的K线消息数（默认 10）
+"""
+import asyncio
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Type
+
+from config import BINANCE_API_BASE_URL, BINANCE_WS_STREAM_URL
+
+logger = logging.getLogger(__name__)
+
+FAKE_EXCHANGE_RATE = float(os.getenv('FAKE_EXCHANGE_RATE', '10'))
+DEFAULT_EXCHANGE = 'binance'
+
+
+class ExchangeAdapter:
+    """
+    交易所适配器接口
+
+    子类至少实现 fetch_klines、kline_stream_url、normalize_kline_message；
+    需要连接后发送订阅消息的交易所实现 kline_subscribe_message，非 WebSocket 的数据源重写 kline_messages
+    """
+
+    name = ''
+    # REST 单次请求最多返回的K线根数
+    max_klines_per_request = 1000
+
+    # ---------- REST ----------
+
+    def fetch_klines(self, symbol: str, interval: str, start_time: Optional[int] = None,
+                     end_time: Optional[int] = None, limit: int = 100) -> List[dict]:
+        """
+        取一页K线（按 open_time 升序）
+
+        Raises:
+            requests.RequestException: 请求失败
+        """
+        raise NotImplementedError
+
+    def iter_kline_pages(self, symbol: str, interval: str, start_time: int,
+                         end_time: Optional[int] = None) -> Iterator[List[dict]]:
+        """从 start_time 开始按 open_time 连续翻页，直到 end_time 或没有更多数据"""
+        while True:
+            page = self.fetch_klines(symbol, interval, start_time=start_time, end_time=end_time,
+                                     limit=self.max_klines_per_request)
+            if not page:
+                return
+            yield page
+            start_time = int(page[-1]['open_time']) + 1
+            if len(page) < self.max_klines_per_request or (end_time is not None and start_time > end_time):
+                return
+
+    # ---------- 实时流 ----------
+
+    def kline_stream_name(self, symbol: str, interval: str) -> str:
+        """流名称（录制文件中的 stream 字段）"""
+        return f"{symbol.lower()}@kline_{interval}"
+
+    def kline_stream_url(self, symbol: str, interval: str) -> str:
+        raise NotImplementedError
+
+    def kline_subscribe_message(self, symbol: str, interval: str) -> Optional[str]:
+        """连接后需要发送的订阅消息，None 表示 URL 即订阅"""
+        return None
+
+    async def kline_messages(self, symbol: str, interval: str):
+        """
+        连接K线流并逐条产出原始消息；连接断开时抛出异常，由调用方重连
+        """
+        import websockets
+
+        async with websockets.connect(self.kline_stream_url(symbol, interval), ping_interval=20,
+                                      ping_timeout=10, close_timeout=10) as websocket:
+            subscribe = self.kline_subscribe_message(symbol, interval)
+            if subscribe is not None:
+                await websocket.send(subscribe)
+            logger.info(f"[{self.name}] 已连接 {symbol} {interval} K线流")
+            async for message in websocket:
+                yield message
+
+    def normalize_kline_message(self, message) -> Optional[dict]:
+        """原始消息（str / bytes / 已解析的 dict）-> K线记录，非K线消息返回 None"""
+        raise NotImplementedError
+
+
+class BinanceAdapter(ExchangeAdapter):
+    """Binance 现货（参考实现）"""
+
+    name = 'binance'
+    max_klines_per_request = 1000
+
+    def __init__(self, rest_url: str = BINANCE_API_BASE_URL, ws_url: str = BINANCE_WS_STREAM_URL):
+        self.rest_url = rest_url
+        self.ws_url = ws_url
+
+    def fetch_klines(self, symbol: str, interval: str, start_time: Optional[int] = None,
+                     end_time: Optional[int] = None, limit: int = 100) -> List[dict]:
+        import requests
+        from DataProcessingCalculator.DataModificationModule import parse_kline
+
+        params = {"symbol": symbol.upper(), "interval": interval, "limit": limit}
+        if start_time:
+            params["startTime"] = start_time
+        if end_time:
+            params["endTime"] = end_time
+        response = requests.get(f'{self.rest_url}klines', params=params, timeout=10)
+        response.raise_for_status()
+        return [parse_kline(k) for k in response.json()]
+
+    def kline_stream_url(self, symbol: str, interval: str) -> str:
+        return f"{self.ws_url}/ws/{self.kline_stream_name(symbol, interval)}"
+
+    def normalize_kline_message(self, message) -> Optional[dict]:
+        from DataProcessingCalculator.DataModificationModule import parse_kline
+
+        data = json.loads(message) if isinstance(message, (str, bytes)) else message
+        if 'k' not in data:
+            return None
+        kline_raw = data['k']
+        # 转换为与REST API相同的格式 [开盘时间, 开盘价, 最高价, 最低价, 收盘价, 成交量, ...]
+        parsed_kline = parse_kline([
+            kline_raw['t'], kline_raw['o'], kline_raw['h'], kline_raw['l'], kline_raw['c'], kline_raw['v'],
+            kline_raw['T'], kline_raw['q'], kline_raw['n'], kline_raw['V'], kline_raw['Q'], "0",
+        ])
+        parsed_kline['is_closed'] = kline_raw['x']
+        parsed_kline['symbol'] = kline_raw['s']
+        parsed_kline['interval'] = kline_raw['i']
+        return parsed_kline
+
+
+class FakeAdapter(ExchangeAdapter):
+    """
+    进程内假交易所：REST 与推送都由 MockMarket 生成，推送格式为
+        {"channel": "candle", "symbol": "BTCUSDT", "interval": "1m", "final": false,
+         "candle": [open_time, open, high, low, close, volume, close_time, quote_volume, trades]}
+    """
+
+    name = 'fake'
+    max_klines_per_request = 500
+
+    def __init__(self, rate: float = FAKE_EXCHANGE_RATE, price: float = 30000.0, seed: Optional[int] = None):
+        """
+        Args:
+            rate: 每秒推送的消息数，0 为不限速
+            price: 初始价格
+            seed: 随机种子，固定后生成的数据可复现
+        """
+        self.rate = rate
+        self.price = price
+        self.seed = seed
+        self.markets: Dict[str, object] = {}
+
+    def market(self, symbol: str):
+        from MockExchange.market import MockMarket
+
+        symbol = symbol.upper()
+        if symbol not in self.markets:
+            self.markets[symbol] = MockMarket(symbol, price=self.price, seed=self.seed)
+        return self.markets[symbol]
+
+    def fetch_klines(self, symbol: str, interval: str, start_time: Optional[int] = None,
+                     end_time: Optional[int] = None, limit: int = 100) -> List[dict]:
+        from DataProcessingCalculator.DataModificationModule import parse_kline
+
+        limit = min(limit, self.max_klines_per_request)
+        return [parse_kline(bar) for bar in self.market(symbol).klines(interval, limit, start_time, end_time)]
+
+    def kline_stream_url(self, symbol: str, interval: str) -> str:
+        return f"fake://{self.kline_stream_name(symbol, interval)}"
+
+    async def kline_messages(self, symbol: str, interval: str):
+        market = self.market(symbol)
+        delay = 1 / self.rate if self.rate else 0
+        while True:
+            kline_raw = market.next_kline_event(interval)['k']
+            yield json.dumps({
+                'channel': 'candle', 'symbol': kline_raw['s'], 'interval': kline_raw['i'], 'final': kline_raw['x'],
+                'candle': [kline_raw['t'], kline_raw['o'], kline_raw['h'], kline_raw['l'], kline_raw['c'],
+                           kline_raw['v'], kline_raw['T'], kline_raw['q'], kline_raw['n']],
+            })
+            await asyncio.sleep(delay)
+
+    def normalize_kline_message(self, message) -> Optional[dict]:
+        from DataProcessingCalculator.DataModificationModule import parse_kline
+
+        data = json.loads(message) if isinstance(message, (str, bytes)) else message
+        if data.get('channel') != 'candle':
+            return None
+        # 假交易所不提供主动买入量，补 "0"
+        parsed_kline = parse_kline([*data['candle'], "0", "0", "0"])
+        parsed_kline['is_closed'] = data['final']
+        parsed_kline['symbol'] = data['symbol']
+        parsed_kline['interval'] = data['interval']
+        return parsed_kline
+
+
+_ADAPTER_CLASSES: Dict[str, Type[ExchangeAdapter]] = {
+    'binance': BinanceAdapter,
+    'fake': FakeAdapter,
+}
+_adapters: Dict[str, ExchangeAdapter] = {}
+_adapters_lock = threading.Lock()
+
+
+def register_adapter(name: str, adapter_class: Type[ExchangeAdapter]) -> None:
+    """注册适配器类（名称与 fetcher_queue_configs.exchange 一致，不区分大小写）"""
+    with _adapters_lock:
+        _ADAPTER_CLASSES[name.lower()] = adapter_class
+        _adapters.pop(name.lower(), None)
+
+
+def available_exchanges() -> List[str]:
+    return sorted(_ADAPTER_CLASSES)
+
+
+def get_adapter(exchange: Optional[str] = None) -> ExchangeAdapter:
+    """
+    按交易所名称取共享的适配器实例（None 为 binance）
+
+    Raises:
+        ValueError: 未注册的交易所
+    """
+    name = (exchange or DEFAULT_EXCHANGE).lower()
+    with _adapters_lock:
+        adapter = _adapters.get(name)
+        if adapter is None:
+            if name not in _ADAPTER_CLASSES:
+                raise ValueError(f"未注册的交易所: {exchange}（可用: {', '.join(sorted(_ADAPTER_CLASSES))}）")
+            adapter = _adapters[name] = _ADAPTER_CLASSES[name]()
+        return adapter
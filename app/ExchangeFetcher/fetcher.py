@@ -18,7 +18,7 @@ logger = get_logger()
 logger.info("开始使用新的日志配置！")
 
 from DatabaseOperator.pg_operator import Session, engine, init_db, insert_price, insert_kline
-from DataProcessingCalculator.DataModificationModule import parse_kline
+from ExchangeFetcher.exchange_adapter import get_adapter
 
 def fetch_price(SYMBOL, Price, session=None):
     """
@@ -48,12 +48,42 @@ def fetch_price(SYMBOL, Price, session=None):
         return None
 
 
+
+def fetch_prices(symbols):
+    """
+    一次请求批量获取多个交易对的最新价格（ticker/price?symbols=[...]）
+    参数:
+        symbols - 交易对列表
+    返回值: {symbol: price}，获取失败的交易对不在结果中
+    """
+    symbols = sorted({s.upper() for s in symbols})
+    if not symbols:
+        return {}
+    if len(symbols) == 1:
+        price = fetch_price(symbols[0], None)
+        return {} if price is None else {symbols[0]: price}
+    try:
+        response = requests.get(f'{BINANCE_API_BASE_URL}ticker/price',
+                                params={'symbols': json.dumps(symbols, separators=(',', ':'))}, timeout=10)
+        response.raise_for_status()
+        return {item['symbol']: float(item['price']) for item in response.json()}
+    except Exception as e:
+        # 任一交易对无效时整个批量请求失败，逐个重试以免影响其他交易对
+        logger.warning(f"Batch price request failed for {symbols}: {e}, retrying one by one")
+        prices = {}
+        for symbol in symbols:
+            price = fetch_price(symbol, None)
+            if price is not None:
+                prices[symbol] = price
+        return prices
+
+
 # K Line
 # 需要(symbol, interval, dbr=False, session=None, table=None,startTime=None, endTime=None, limit=100)
 def get_kline(symbol, interval, dbr, session, table=None,
-              startTime=None, endTime=None, limit=100, auto_commit=False):
+              startTime=None, endTime=None, limit=100, auto_commit=False, cache=False, adapter=None):
     """
-    获取 Binance K 线数据，并可选择写入数据库。
+    获取 K 线数据（默认 Binance），并可选择写入数据库。
 
     参数：
         symbol     - 币种对（如 "BTCUSDT"）
@@ -65,59 +95,168 @@ def get_kline(symbol, interval, dbr, session, table=None,
         endTime    - 结束时间（Unix 毫秒）
         limit      - 获取数量，最大 1000
         auto_commit - 是否自动提交每次写入（默认False）
+        cache      - 是否将已完结的K线追加到本地列式缓存（需要 pyarrow，见 kline_cache）
+        adapter    - 交易所适配器（见 exchange_adapter），None 使用 binance；其他交易所以 <EXCHANGE>_<SYMBOL> 入库
 
     返回：
-        kline_data - 原始 K 线数据列表
+        parsed_klines - 解析后的 K 线数据列表
     """
-    url = f'{BINANCE_API_BASE_URL}klines'
-    params = {
-        "symbol": symbol.upper(),
-        "interval": interval,
-        "limit": limit
-    }
-    if startTime:
-        params["startTime"] = startTime
-    if endTime:
-        params["endTime"] = endTime
+    adapter = adapter or get_adapter()
 
     try:
-        response = requests.get(url, params=params, timeout=10)
-        response.raise_for_status()
-        kline_data = response.json()
+        parsed_klines = adapter.fetch_klines(symbol, interval, start_time=startTime, end_time=endTime, limit=limit)
 
         if dbr:
             if session is None:
                 raise ValueError("写入数据库时 session 参数不能为空")
                 
-            # 如果表为None，使用create_kline_table_if_not_exists创建表
+            # 存储键包含交易所（binance 之外为 <EXCHANGE>_<SYMBOL>），不同交易所的同名交易对互不覆盖
+            from DatabaseOperator.kline_store import resolve_kline_table, storage_symbol
+            series = storage_symbol(symbol, adapter.name)
+
+            # 如果表为None，按存储后端选择K线表（per_symbol: KLine_<SYMBOL>[_<interval>]，unified: klines），
+            # 与读取端 kline_table_name_for 使用同一规则
             if table is None:
-                from DatabaseOperator.pg_operator import create_kline_table_if_not_exists
-                table = create_kline_table_if_not_exists(engine, symbol.upper())
+                table = resolve_kline_table(series, interval)
                 
-            for raw_k in kline_data:
-                parsed_kline = parse_kline(raw_k)
-
+            for parsed_kline in parsed_klines:
                 # 跳过未来数据
                 if parsed_kline['open_time'] > int(datetime.now(timezone.utc).timestamp() * 1000):
                     continue
 
-                insert_kline(session, table, symbol.upper(), parsed_kline)
+                insert_kline(session, table, series, parsed_kline, interval=interval)
                 
                 # 自动提交选项：立即提交使数据对其他连接可见
                 if auto_commit:
                     session.commit()
 
-        return [parse_kline(k) for k in kline_data]
+        if cache:
+            from DataProcessingCalculator.kline_cache import append_klines
+            from DatabaseOperator.kline_store import storage_symbol
+            append_klines(storage_symbol(symbol, adapter.name), interval, parsed_klines)
+        return parsed_klines
 
     except requests.RequestException as e:
         logger.error(f"Failed to fetch klines for {symbol} {interval}: {e}")
         return []
 
+class KlineMessageHandler:
+    """
+    K线推送原始消息的解析与写入：入库、聚合、本地缓存、Redis Stream、回调
+    消息格式由交易所适配器解析（默认 binance 的 <symbol>@kline_<interval>，见 exchange_adapter）
+    入库、聚合、缓存与 Stream 都以 storage_symbol(symbol, adapter.name) 为键（binance 之外为 <EXCHANGE>_<SYMBOL>）
+    实时 WebSocket（get_kline_websocket）与录制回放（ExchangeFetcher/stream_recorder.py）共用
+
+    用法：
+        handler = KlineMessageHandler("BTCUSDT", "1m", dbr=True, session=session, auto_commit=True)
+        parsed_kline = handler.handle(message)    # 非K线消息或未来数据返回 None
+    """
+
+    def __init__(self, symbol, interval, dbr=False, session=None, table=None, callback=None,
+                 auto_commit=False, rollup=False, cache=False, stream=None, adapter=None):
+        """参数与 get_kline_websocket 相同"""
+        self.adapter = adapter or get_adapter()
+        self.symbol = symbol
+        self.interval = interval
+        self.dbr = dbr
+        self.session = session
+        self.table = table
+        self.callback = callback
+        self.auto_commit = auto_commit
+        self.rollup = rollup
+        self.cache = cache
+        self.stream = stream
+
+        from DatabaseOperator.kline_store import storage_symbol
+        self.series = storage_symbol(symbol, self.adapter.name)
+
+        # 数据库表初始化
+        if dbr:
+            if session is None:
+                raise ValueError("写入数据库时 session 参数不能为空")
+
+            if table is None:
+                from DatabaseOperator.kline_store import resolve_kline_table
+                self.table = resolve_kline_table(self.series, interval)
+
+            if rollup and interval == '1m':
+                from DatabaseOperator.kline_rollup import ensure_rollup_tables, rollup_closed_kline
+                ensure_rollup_tables(self.series)
+                self._rollup_closed_kline = rollup_closed_kline
+            else:
+                self.rollup = False
+
+        if cache:
+            from DataProcessingCalculator.kline_cache import append_klines
+            self._append_klines = append_klines
+
+        if stream:
+            from DatabaseOperator.redis_streams import StreamPublisher, kline_stream_key
+            self.publisher = stream if isinstance(stream, StreamPublisher) else StreamPublisher()
+            self.stream_key = kline_stream_key(self.series)
+
+    def handle(self, message):
+        """
+        处理一条原始消息（str 或已解析的 dict）
+
+        返回：
+            parsed_kline - 解析后的K线（含 is_closed/symbol/interval，symbol 为 self.series），非K线消息或未来数据返回 None
+        """
+        # 由适配器转换为与REST相同的K线记录（含 is_closed/symbol/interval），非K线消息返回 None
+        parsed_kline = self.adapter.normalize_kline_message(message)
+        if parsed_kline is None:
+            return None
+        # 回调与 Redis Stream 的下游（指标消费者写 ma_<symbol>、发布 stream:indicator:<SYMBOL>）按 symbol 区分，
+        # 使用存储用的交易对，其他交易所的K线不会混入 binance 的同名交易对
+        parsed_kline['symbol'] = self.series
+
+        # 跳过未来数据（与REST版本保持一致）
+        if parsed_kline['open_time'] > int(datetime.now(timezone.utc).timestamp() * 1000):
+            return None
+
+        # 调用回调函数
+        if self.callback:
+            self.callback(parsed_kline)
+
+        # 数据库写入（为了测试，暂时允许未完结的K线也入库）(哪有完结的K线，不然实时数据都没法存了)
+        if self.dbr and self.session is not None:
+            try:
+                insert_kline(self.session, self.table, self.series, parsed_kline, interval=self.interval)
+
+                # 1m K线完结时在数据库内增量聚合高周期K线
+                if self.rollup and parsed_kline['is_closed']:
+                    self._rollup_closed_kline(self.session, self.series, parsed_kline['open_time'])
+
+                # 自动提交选项：立即提交使数据对其他连接可见
+                if self.auto_commit:
+                    self.session.commit()
+
+            except Exception as db_error:
+                logger.error(f"Database write error for {self.symbol}: {db_error}")
+                if self.auto_commit:
+                    self.session.rollback()  # 自动提交模式下需要回滚
+
+        if self.cache and parsed_kline['is_closed']:
+            try:
+                self._append_klines(self.series, self.interval, [parsed_kline])
+            except Exception as cache_error:
+                logger.error(f"Kline cache write error for {self.symbol}: {cache_error}")
+
+        if self.stream and parsed_kline['is_closed']:
+            try:
+                self.publisher.publish(self.stream_key, parsed_kline)
+            except Exception as stream_error:
+                logger.error(f"Kline stream publish error for {self.symbol}: {stream_error}")
+
+        return parsed_kline
+
+
 # WebSocket K Line - WebSocket版本的get_kline
 async def get_kline_websocket(symbol, interval, dbr=False, session=None, table=None, 
-                             callback=None, max_klines=None, auto_reconnect=True, auto_commit=False):
+                             callback=None, max_klines=None, auto_reconnect=True, auto_commit=False,
+                             rollup=False, cache=False, collect=True, stream=None, recorder=None, adapter=None):
     """
-    通过WebSocket获取 Binance K 线数据，并可选择写入数据库。
+    通过WebSocket获取 K 线数据（默认 Binance），并可选择写入数据库。
     这是get_kline函数的WebSocket实时版本。
 
     参数：
@@ -130,104 +269,56 @@ async def get_kline_websocket(symbol, interval, dbr=False, session=None, table=N
         max_klines      - 最大接收K线数量（None表示无限制）
         auto_reconnect  - 是否自动重连（默认True）
         auto_commit     - 是否自动提交每次写入（默认False，推荐实时场景使用True）
+        rollup          - 1m K线完结时是否增量更新 5m/15m/1h/4h/1d 聚合表（仅 interval="1m" 且 dbr=True 时生效）
+        cache           - K线完结时是否追加到本地列式缓存（需要 pyarrow，见 kline_cache）
+        collect         - 是否在返回列表中保留收到的K线；长期运行的任务应设为 False 并通过 callback 消费
+        stream          - K线完结时 XADD 到 Redis Stream（stream:kline:<SYMBOL>）；True 使用默认连接，
+                          也可传入 redis_streams.StreamPublisher 实例
+        recorder        - stream_recorder.StreamRecorder，收到的原始消息先原样录制再处理
+        adapter         - 交易所适配器（见 exchange_adapter），决定订阅地址与消息格式；None 使用 binance，
+                          其他交易所以 <EXCHANGE>_<SYMBOL> 入库（见 kline_store.storage_symbol）
 
     返回：
         kline_data_list - 接收到的解析后K线数据列表
     """
-    # WebSocket URL配置
-    ws_url = "wss://stream.binance.com:9443"
-    stream_name = f"{symbol.lower()}@kline_{interval}"
-    ws_endpoint = f"{ws_url}/ws/{stream_name}"
+    # 订阅地址与消息格式由适配器决定（binance 使用 config.BINANCE_WS_STREAM_URL，可指向本地模拟交易所）
+    adapter = adapter or get_adapter()
+    stream_name = adapter.kline_stream_name(symbol, interval)
     
     kline_data_list = []  # 存储接收到的K线数据
     kline_count = 0
     reconnect_count = 0
     max_reconnect_attempts = 5
+
+    # 解析与写入逻辑与录制回放共用
+    handler = KlineMessageHandler(symbol, interval, dbr=dbr, session=session, table=table, callback=callback,
+                                  auto_commit=auto_commit, rollup=rollup, cache=cache, stream=stream,
+                                  adapter=adapter)
     
-    # 数据库表初始化
-    if dbr:
-        if session is None:
-            raise ValueError("写入数据库时 session 参数不能为空")
-        
-        if table is None:
-            from DatabaseOperator.pg_operator import create_kline_table_if_not_exists
-            table = create_kline_table_if_not_exists(engine, symbol.upper())
-    
-    logger.info(f"Starting WebSocket connection for {symbol} {interval} klines")
-    
+    logger.info(f"Starting {adapter.name} connection for {symbol} {interval} klines")
+
     while reconnect_count <= max_reconnect_attempts:
         try:
-            async with websockets.connect(
-                ws_endpoint, 
-                ping_interval=20, 
-                ping_timeout=10,
-                close_timeout=10
-            ) as websocket:
-                logger.info(f"Successfully connected to {symbol} {interval} kline stream")
-                reconnect_count = 0  # 重置重连计数
-                
-                async for message in websocket:
+            messages = adapter.kline_messages(symbol, interval)
+            try:
+                async for message in messages:
+                    reconnect_count = 0  # 收到消息即重置重连计数
+                    if recorder is not None:
+                        recorder.write(stream_name, message)
                     try:
-                        data = json.loads(message)
-                        
-                        # 检查是否为K线数据
-                        if 'k' in data:
-                            kline_raw = data['k']
-                            
-                            # 转换为与REST API相同的格式 [开盘时间, 开盘价, 最高价, 最低价, 收盘价, 成交量, ...]
-                            kline_array = [
-                                kline_raw['t'],      # 开盘时间
-                                kline_raw['o'],      # 开盘价
-                                kline_raw['h'],      # 最高价
-                                kline_raw['l'],      # 最低价
-                                kline_raw['c'],      # 收盘价
-                                kline_raw['v'],      # 成交量
-                                kline_raw['T'],      # 收盘时间
-                                kline_raw['q'],      # 成交额
-                                kline_raw['n'],      # 成交数量
-                                kline_raw['V'],      # 主动买入成交量
-                                kline_raw['Q'],      # 主动买入成交额
-                                "0"                  # 忽略字段
-                            ]
-                            
-                            # 使用现有的parse_kline函数解析
-                            parsed_kline = parse_kline(kline_array)
-                            
-                            # 添加WebSocket特有字段
-                            parsed_kline['is_closed'] = kline_raw['x']  # K线是否完结
-                            parsed_kline['symbol'] = kline_raw['s']     # 交易对
-                            parsed_kline['interval'] = kline_raw['i']   # 间隔
-                            
-                            # 跳过未来数据（与REST版本保持一致）
-                            if parsed_kline['open_time'] > int(datetime.now(timezone.utc).timestamp() * 1000):
-                                continue
-                            
-                            # 添加到结果列表
+                        parsed_kline = handler.handle(message)
+                        if parsed_kline is None:
+                            continue
+
+                        # 添加到结果列表
+                        if collect:
                             kline_data_list.append(parsed_kline)
-                            kline_count += 1
-                            
-                            # 调用回调函数
-                            if callback:
-                                callback(parsed_kline)
-                            
-                            # 数据库写入（为了测试，暂时允许未完结的K线也入库）(哪有完结的K线，不然实时数据都没法存了)
-                            if dbr and session is not None:
-                                try:
-                                    insert_kline(session, table, symbol.upper(), parsed_kline)
-                                    
-                                    # 自动提交选项：立即提交使数据对其他连接可见
-                                    if auto_commit:
-                                        session.commit()
-                                        
-                                except Exception as db_error:
-                                    logger.error(f"Database write error for {symbol}: {db_error}")
-                                    if auto_commit:
-                                        session.rollback()  # 自动提交模式下需要回滚
-                            
-                            # 检查是否达到最大K线数量
-                            if max_klines and kline_count >= max_klines:
-                                logger.info(f"Received {max_klines} klines for {symbol}, stopping")
-                                return kline_data_list
+                        kline_count += 1
+
+                        # 检查是否达到最大K线数量
+                        if max_klines and kline_count >= max_klines:
+                            logger.info(f"Received {max_klines} klines for {symbol}, stopping")
+                            return kline_data_list
                         
                     except json.JSONDecodeError as e:
                         logger.error(f"JSON decode error: {e}")
@@ -235,6 +326,8 @@ async def get_kline_websocket(symbol, interval, dbr=False, session=None, table=N
                     except Exception as e:
                         logger.error(f"Data processing error: {e}")
                         continue
+            finally:
+                await messages.aclose()
                         
         except websockets.exceptions.ConnectionClosed as e:
             logger.warning(f"WebSocket connection closed: {e}")
@@ -263,7 +356,7 @@ async def get_kline_websocket(symbol, interval, dbr=False, session=None, table=N
 
 
 def start_kline_websocket_sync(symbol, interval, dbr=False, session=None, table=None, 
-                              callback=None, max_klines=None, auto_commit=False):
+                              callback=None, max_klines=None, auto_commit=False, rollup=False, cache=False):
     """
     get_kline_websocket的同步包装函数，方便在非异步环境中使用
     
@@ -280,7 +373,9 @@ def start_kline_websocket_sync(symbol, interval, dbr=False, session=None, table=
         table=table,
         callback=callback,
         max_klines=max_klines,
-        auto_commit=auto_commit
+        auto_commit=auto_commit,
+        rollup=rollup,
+        cache=cache
     ))
 
 
@@ -0,0 +1,443 @@
+# app/ExchangeFetcher/stream_recorder.py
+"""
+stream_recorder.py
+- 行情流录制：原样保存收到的 WebSocket 帧及接收时间，gzip 压缩的 JSON Lines
+    {"t": 接收时间（毫秒，浮点）, "s": 流名称, "m": 原始消息文本}
+    {"t": ..., "s": "btcusdt@depth@100ms", "snapshot": {...}}    深度流连接后获取的 REST 快照
+  自动命名的文件为 <STREAM_RECORD_DIR>/<YYYYMMDD-HHMMSS>.jsonl.gz，每 STREAM_RECORD_ROTATE 秒换一个文件；
+  每秒 flush 一次，进程崩溃时最多丢失最后一秒，读取时忽略不完整的结尾
+- 回放：按录制顺序把消息交给与实时采集相同的处理逻辑
+    kline     fetcher.KlineMessageHandler（入库/聚合/缓存/Redis Stream）
+    aggTrade  trade_stream.AggTradeIngester（批量 COPY、tick/volume/dollar K线）
+    depth     depth_book.DepthSynchronizer（本地订单簿）
+  速度 1 为原速，N 为 N 倍速，0 为不等待（最大速度）；结果包含吞吐、单条处理耗时与调度延迟的 p50/p99，
+  用于可复现的全链路吞吐与延迟测量
+- 录制来源：record 子命令直接订阅任意流；get_kline_websocket(recorder=...) / run_agg_trade_stream(recorder=...) /
+  depth_book.run_depth_stream(recorder=...) 在采集的同时录制；主程序设置 STREAM_RECORD=true 时录制所有K线、成交与深度流
+
+环境变量：
+    STREAM_RECORD_DIR     录制文件目录（默认 <DATA_DIR>/stream_recordings）
+    STREAM_RECORD_ROTATE  自动命名的录制文件切换间隔秒数（默认 3600，0 表示不切换）
+
+用法：
+    cd app
+    python -m ExchangeFetcher.stream_recorder record --streams btcusdt@kline_1m,btcusdt@aggTrade --seconds 600
+    python -m ExchangeFetcher.stream_recorder info data/stream_recordings/20240101-000000.jsonl.gz
+    python -m ExchangeFetcher.stream_recorder replay data/stream_recordings --speed 0 --db
+"""
+import argparse
+import asyncio
+import gzip
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from config import BINANCE_WS_STREAM_URL
+from PathUniti import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+STREAM_RECORD_DIR = Path(os.getenv('STREAM_RECORD_DIR', str(DATA_DIR / 'stream_recordings')))
+STREAM_RECORD_ROTATE = float(os.getenv('STREAM_RECORD_ROTATE', '3600'))
+
+
+class StreamRecorder:
+    """
+    原始行情帧录制器（在事件循环线程中调用，不做加锁）
+
+    用法：
+        with StreamRecorder() as recorder:          # 或 StreamRecorder('btc.jsonl.gz')
+            recorder.write('btcusdt@kline_1m', message)
+    """
+
+    def __init__(self, path=None, directory: Path = STREAM_RECORD_DIR, rotate_seconds: float = STREAM_RECORD_ROTATE,
+                 flush_interval: float = 1.0, compresslevel: int = 6):
+        """
+        Args:
+            path: 录制文件路径；为 None 时在 directory 下按时间自动命名并定时切换
+            directory: 自动命名时的目录
+            rotate_seconds: 自动命名时切换文件的间隔秒数，0 表示不切换
+            flush_interval: flush 间隔秒数
+            compresslevel: gzip 压缩级别
+        """
+        self.fixed_path = Path(path) if path else None
+        self.directory = Path(directory)
+        self.rotate_seconds = rotate_seconds
+        self.flush_interval = flush_interval
+        self.compresslevel = compresslevel
+        self.path: Optional[Path] = None
+        self.files: List[Path] = []
+        self.stats = {'messages': 0, 'bytes': 0, 'snapshots': 0}
+        self._file = None
+        self._opened_at = 0.0
+        self._last_flush = 0.0
+
+    def _open(self) -> None:
+        if self.fixed_path is not None:
+            self.path = self.fixed_path
+        else:
+            self.path = self.directory / f"{datetime.now().strftime('%Y%m%d-%H%M%S')}.jsonl.gz"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = gzip.open(self.path, 'at', encoding='utf-8', compresslevel=self.compresslevel)
+        self._opened_at = self._last_flush = time.monotonic()
+        self.files.append(self.path)
+        logger.info(f"[StreamRecorder] 录制到 {self.path}")
+
+    def _write_line(self, record: dict) -> None:
+        now = time.monotonic()
+        if self._file is None:
+            self._open()
+        elif self.fixed_path is None and self.rotate_seconds and now - self._opened_at >= self.rotate_seconds:
+            self._file.close()
+            self._open()
+        line = json.dumps(record, separators=(',', ':')) + '\n'
+        self._file.write(line)
+        self.stats['bytes'] += len(line)
+        if now - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def write(self, stream: str, message, received_at: Optional[float] = None) -> None:
+        """录制一条原始消息（str 或 bytes）"""
+        if isinstance(message, bytes):
+            message = message.decode('utf-8')
+        t = received_at if received_at is not None else time.time() * 1000
+        self._write_line({'t': round(t, 3), 's': stream, 'm': message})
+        self.stats['messages'] += 1
+
+    def write_snapshot(self, stream: str, snapshot: dict) -> None:
+        """录制深度流的 REST 快照，回放时用于同步订单簿"""
+        self._write_line({'t': round(time.time() * 1000, 3), 's': stream, 'snapshot': snapshot})
+        self.stats['snapshots'] += 1
+
+    def flush(self) -> None:
+        if self._file is not None:
+            # GzipFile.flush 使用 Z_SYNC_FLUSH，之前写入的内容即使进程崩溃也可以读出
+            self._file.flush()
+            self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self) -> 'StreamRecorder':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+_recorder: Optional[StreamRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def get_stream_recorder() -> StreamRecorder:
+    """进程内共享的录制器（自动命名、定时切换文件）"""
+    global _recorder
+    with _recorder_lock:
+        if _recorder is None:
+            _recorder = StreamRecorder()
+        return _recorder
+
+
+def close_stream_recorder() -> None:
+    global _recorder
+    with _recorder_lock:
+        if _recorder is not None:
+            _recorder.close()
+            _recorder = None
+
+
+# ---------- 读取 ----------
+
+def recording_files(path) -> List[Path]:
+    """文件本身，或目录下按名称（即时间）排序的全部 .jsonl.gz"""
+    path = Path(path)
+    return sorted(path.glob('*.jsonl.gz')) if path.is_dir() else [path]
+
+
+def read_recording(path, streams: Optional[List[str]] = None) -> Iterator[dict]:
+    """按录制顺序读取记录；崩溃时留下的不完整结尾被忽略"""
+    for file_path in recording_files(path):
+        opener = gzip.open if file_path.suffix == '.gz' else open
+        try:
+            with opener(file_path, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        logger.warning(f"[StreamRecorder] {file_path} 跳过损坏的行")
+                        continue
+                    if streams is None or record['s'] in streams:
+                        yield record
+        except (EOFError, zlib.error) as e:
+            logger.warning(f"[StreamRecorder] {file_path} 结尾不完整，已读取到截断处: {e}")
+
+
+def recording_info(path) -> dict:
+    """各流的消息数与时间跨度"""
+    streams: Dict[str, dict] = {}
+    for record in read_recording(path):
+        info = streams.setdefault(record['s'], {'messages': 0, 'snapshots': 0, 'first': record['t']})
+        info['snapshots' if 'snapshot' in record else 'messages'] += 1
+        info['last'] = record['t']
+    for info in streams.values():
+        info['seconds'] = (info.pop('last') - info.pop('first')) / 1000
+    return streams
+
+
+# ---------- 录制 ----------
+
+async def record_streams(streams: List[str], recorder: StreamRecorder, seconds: Optional[float] = None,
+                         max_messages: Optional[int] = None) -> dict:
+    """
+    订阅若干行情流并原样录制，直到 seconds 秒或共 max_messages 条消息（都为 None 时直到被取消）
+    深度流在收到第一条消息后获取一次 REST 快照一并录制
+    """
+    import websockets
+    from ExchangeFetcher.depth_book import fetch_depth_snapshot
+
+    done = asyncio.Event()
+
+    async def record_one(stream: str) -> None:
+        backoff = 1
+        snapshot_taken = False
+        while not done.is_set():
+            try:
+                async with websockets.connect(f"{BINANCE_WS_STREAM_URL}/ws/{stream}", ping_interval=20,
+                                              ping_timeout=10, close_timeout=10, max_queue=None) as websocket:
+                    logger.info(f"[StreamRecorder] 已连接 {stream}")
+                    backoff = 1
+                    async for message in websocket:
+                        recorder.write(stream, message)
+                        if '@depth' in stream and not snapshot_taken:
+                            # 断线重连后不再补快照，回放时由同步器按丢包处理
+                            snapshot_taken = True
+                            snapshot = await asyncio.to_thread(fetch_depth_snapshot, stream.split('@')[0])
+                            recorder.write_snapshot(stream, snapshot)
+                        if max_messages and recorder.stats['messages'] >= max_messages:
+                            done.set()
+                            return
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[StreamRecorder] {stream} 连接异常: {e}，{backoff}s 后重连")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+    tasks = [asyncio.create_task(record_one(stream), name=f'record:{stream}') for stream in streams]
+    try:
+        await asyncio.wait_for(done.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        recorder.flush()
+    return dict(recorder.stats)
+
+
+# ---------- 回放 ----------
+
+class ReplayPipeline:
+    """
+    按流类型把录制的消息交给实时采集使用的处理器（每个流一个处理器，首次出现时创建）
+
+    用法：
+        pipeline = ReplayPipeline(dbw=True)
+        await pipeline.handle(record)
+        await pipeline.close()
+    """
+
+    def __init__(self, dbw: bool = False, rollup: bool = False, bar_specs: str = ''):
+        """
+        Args:
+            dbw: K线与成交是否写入数据库
+            rollup: 1m K线完结时是否增量更新聚合表
+            bar_specs: 成交流生成的K线，例如 volume:100,dollar:1000000
+        """
+        self.dbw = dbw
+        self.rollup = rollup
+        self.bar_specs = bar_specs
+        self.session = None
+        self.handlers: Dict[str, tuple] = {}
+        self.stats = {'kline': 0, 'aggTrade': 0, 'depth': 0, 'skipped': 0, 'errors': 0}
+
+    def _handler(self, stream: str) -> tuple:
+        if stream in self.handlers:
+            return self.handlers[stream]
+        symbol, _, name = stream.partition('@')
+        if name.startswith('kline_'):
+            from ExchangeFetcher.fetcher import KlineMessageHandler
+            if self.dbw and self.session is None:
+                from DatabaseOperator.pg_operator import Session
+                self.session = Session()
+            handler = ('kline', KlineMessageHandler(symbol.upper(), name[6:], dbr=self.dbw, session=self.session,
+                                                    auto_commit=True, rollup=self.rollup))
+        elif name == 'aggTrade':
+            from DataProcessingCalculator.trade_bars import parse_bar_specs
+            from ExchangeFetcher.trade_stream import AggTradeIngester
+            handler = ('aggTrade', AggTradeIngester(symbol, dbw=self.dbw, bar_builders=parse_bar_specs(self.bar_specs)))
+        elif name.startswith('depth'):
+            from ExchangeFetcher.depth_book import DepthSynchronizer, LocalOrderBook
+            handler = ('depth', DepthSynchronizer(LocalOrderBook(symbol)))
+        else:
+            handler = ('skipped', None)
+        self.handlers[stream] = handler
+        return handler
+
+    async def handle(self, record: dict) -> None:
+        kind, handler = self._handler(record['s'])
+        self.stats[kind] += 1
+        if handler is None:
+            return
+        try:
+            if 'snapshot' in record:
+                if kind == 'depth' and handler.needs_snapshot:
+                    handler.on_snapshot(record['snapshot'])
+            elif kind == 'kline':
+                handler.handle(record['m'])
+            elif kind == 'aggTrade':
+                from ExchangeFetcher.trade_stream import parse_agg_trade
+                data = json.loads(record['m'])
+                if data.get('e') == 'aggTrade':
+                    handler.add(parse_agg_trade(data))
+                    await handler.maybe_flush()
+            else:
+                handler.on_event(json.loads(record['m']))
+        except Exception as e:
+            self.stats['errors'] += 1
+            logger.error(f"[StreamReplay] {record['s']} 处理失败: {e}")
+
+    async def close(self) -> None:
+        for kind, handler in self.handlers.values():
+            if kind == 'aggTrade':
+                await handler.flush()
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+
+    def summary(self) -> dict:
+        """各处理器的结果：订单簿同步状态、成交写入数等"""
+        result = {}
+        for stream, (kind, handler) in self.handlers.items():
+            if kind == 'depth':
+                result[stream] = {'synced': handler.synced, 'updates': handler.book.updates,
+                                  'resyncs': handler.resyncs, 'best_bid': handler.book.best_bid(),
+                                  'best_ask': handler.book.best_ask()}
+            elif kind == 'aggTrade':
+                result[stream] = dict(handler.stats)
+        return result
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+async def replay_recording(path, pipeline: Optional[ReplayPipeline] = None, speed: float = 1.0,
+                           streams: Optional[List[str]] = None, max_messages: Optional[int] = None) -> dict:
+    """
+    回放录制文件
+
+    Args:
+        path: 录制文件或目录
+        pipeline: 处理管线，默认不写库的 ReplayPipeline
+        speed: 1 为原速，N 为 N 倍速，0 为不等待
+        streams: 只回放这些流
+        max_messages: 最多回放的消息数
+
+    Returns:
+        dict: messages, seconds, msg_per_s, handle_p50_ms/handle_p99_ms（单条处理耗时），
+              lag_p99_ms（按录制时间应处理的时刻与实际处理时刻之差，只在限速回放时统计）
+    """
+    pipeline = pipeline or ReplayPipeline()
+    handle_ms: List[float] = []
+    lag_ms: List[float] = []
+    first_t = None
+    started = time.perf_counter()
+    try:
+        for record in read_recording(path, streams):
+            if speed > 0:
+                if first_t is None:
+                    first_t = record['t']
+                delay = started + (record['t'] - first_t) / 1000 / speed - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                lag_ms.append(max(0.0, -delay) * 1000)
+            elif len(handle_ms) % 1000 == 0:
+                # 最大速度时定期让出事件循环，后台写库等任务才能运行
+                await asyncio.sleep(0)
+            handle_started = time.perf_counter()
+            await pipeline.handle(record)
+            handle_ms.append((time.perf_counter() - handle_started) * 1000)
+            if max_messages and len(handle_ms) >= max_messages:
+                break
+    finally:
+        await pipeline.close()
+    elapsed = time.perf_counter() - started
+    handle_ms.sort()
+    lag_ms.sort()
+    return {
+        'messages': len(handle_ms),
+        'seconds': elapsed,
+        'msg_per_s': len(handle_ms) / elapsed if elapsed else 0.0,
+        'handle_mean_ms': statistics.fmean(handle_ms) if handle_ms else 0.0,
+        'handle_p50_ms': _percentile(handle_ms, 0.5),
+        'handle_p99_ms': _percentile(handle_ms, 0.99),
+        'lag_p99_ms': _percentile(lag_ms, 0.99),
+        **pipeline.stats,
+    }
+
+
+def main():
+    """命令行入口"""
+    parser = argparse.ArgumentParser(description='行情流录制与回放')
+    sub = parser.add_subparsers(dest='command', required=True)
+    record = sub.add_parser('record', help='订阅并原样录制行情流')
+    record.add_argument('--streams', required=True, help='逗号分隔的流，例如 btcusdt@kline_1m,btcusdt@aggTrade')
+    record.add_argument('--seconds', type=float, default=None)
+    record.add_argument('--messages', type=int, default=None)
+    record.add_argument('--out', default=None, help='录制文件，默认 STREAM_RECORD_DIR 下按时间命名')
+    replay = sub.add_parser('replay', help='按录制顺序回放到采集处理逻辑')
+    replay.add_argument('path', help='录制文件或目录')
+    replay.add_argument('--speed', type=float, default=1.0, help='1 原速，N 倍速，0 最大速度')
+    replay.add_argument('--streams', default=None, help='只回放这些流（逗号分隔）')
+    replay.add_argument('--messages', type=int, default=None)
+    replay.add_argument('--db', action='store_true', help='写入数据库（K线/成交）')
+    replay.add_argument('--rollup', action='store_true', help='1m K线完结时更新聚合表')
+    replay.add_argument('--bars', default='', help='成交流生成的K线，例如 volume:10,tick:500')
+    info = sub.add_parser('info', help='查看录制文件中各流的消息数与时间跨度')
+    info.add_argument('path')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == 'record':
+        streams = [s.strip() for s in args.streams.split(',') if s.strip()]
+        with StreamRecorder(args.out, rotate_seconds=0) as recorder:
+            try:
+                stats = asyncio.run(record_streams(streams, recorder, args.seconds, args.messages))
+            except KeyboardInterrupt:
+                stats = recorder.stats
+        print(f"已录制 {stats['messages']} 条消息到 {', '.join(str(p) for p in recorder.files)}")
+    elif args.command == 'replay':
+        pipeline = ReplayPipeline(dbw=args.db, rollup=args.rollup, bar_specs=args.bars)
+        streams = [s.strip() for s in args.streams.split(',')] if args.streams else None
+        result = asyncio.run(replay_recording(args.path, pipeline, args.speed, streams, args.messages))
+        print(json.dumps(result, indent=2))
+        for stream, summary in pipeline.summary().items():
+            print(f"{stream}: {summary}")
+    else:
+        for stream, stream_info in recording_info(args.path).items():
+            print(f"{stream}: {stream_info}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,245 @@
+# app/ExchangeFetcher/trade_stream.py
+"""
+trade_stream.py
+- 订阅 <symbol>@aggTrade 归集成交，缓存为列式批次，按条数或时间间隔整批 COPY 写入 AggTrade_<SYMBOL>
+  （去重见 DatabaseOperator/trade_store.py）
+- 写库在线程中执行，不阻塞接收；写入失败时批次保留，下次合并重试
+- 断线重连后先用 REST aggTrades?fromId= 补采断线期间的成交，再继续实时推送
+- 可同时由成交流实时生成 tick/volume/dollar K线（见 DataProcessingCalculator/trade_bars.py）
+
+环境变量：
+    TRADE_BATCH_SIZE       每批写入的成交数（默认 1000）
+    TRADE_FLUSH_INTERVAL   最长多少秒写入一次（默认 1）
+    TRADE_BACKFILL_PAGES   重连后最多补采的页数，每页 1000 笔（默认 10）
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Callable, List, Optional
+
+import requests
+
+from config import BINANCE_API_BASE_URL, BINANCE_WS_STREAM_URL, DEFAULT_SYMBOL
+
+logger = logging.getLogger(__name__)
+
+TRADE_BATCH_SIZE = int(os.getenv('TRADE_BATCH_SIZE', '1000'))
+TRADE_FLUSH_INTERVAL = float(os.getenv('TRADE_FLUSH_INTERVAL', '1'))
+TRADE_BACKFILL_PAGES = int(os.getenv('TRADE_BACKFILL_PAGES', '10'))
+
+
+def parse_agg_trade(data: dict) -> dict:
+    """WebSocket aggTrade 消息或 REST aggTrades 元素 -> 统一格式（时间为毫秒）"""
+    return {
+        'agg_trade_id': int(data['a']),
+        'price': float(data['p']),
+        'quantity': float(data['q']),
+        'first_trade_id': int(data['f']),
+        'last_trade_id': int(data['l']),
+        'trade_time': int(data['T']),
+        'is_buyer_maker': bool(data['m']),
+    }
+
+
+def fetch_agg_trades(symbol: str, from_id: int, limit: int = 1000) -> List[dict]:
+    """REST 获取从 from_id 开始的归集成交"""
+    response = requests.get(f'{BINANCE_API_BASE_URL}aggTrades',
+                            params={'symbol': symbol.upper(), 'fromId': from_id, 'limit': limit}, timeout=10)
+    response.raise_for_status()
+    return [parse_agg_trade(item) for item in response.json()]
+
+
+class AggTradeIngester:
+    """
+    成交流处理：去重、批量写库、生成K线；不涉及网络，实时采集与补采共用
+
+    用法：
+        ingester = AggTradeIngester("BTCUSDT", bar_builders=parse_bar_specs("volume:100"), on_bar=print)
+        ingester.add(trade)
+        await ingester.maybe_flush()
+    """
+
+    def __init__(self, symbol: str, dbw: bool = True, bar_builders=None,
+                 on_trade: Optional[Callable[[dict], None]] = None,
+                 on_bar: Optional[Callable[[dict], None]] = None,
+                 batch_size: int = TRADE_BATCH_SIZE, flush_interval: float = TRADE_FLUSH_INTERVAL):
+        """
+        Args:
+            symbol: 交易对
+            dbw: 是否写入数据库
+            bar_builders: BarBuilder 列表，每笔成交都会送入
+            on_trade: 每笔（去重后）成交的回调
+            on_bar: 每根完结的 tick/volume/dollar K线的回调
+            batch_size: 批次达到该条数时写库
+            flush_interval: 距上次写库超过该秒数时写库
+        """
+        from DatabaseOperator.trade_store import TradeBatch
+        self.symbol = symbol.upper()
+        self.dbw = dbw
+        self.bar_builders = list(bar_builders or [])
+        self.on_trade = on_trade
+        self.on_bar = on_bar
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.batch = TradeBatch()
+        self.last_agg_trade_id: Optional[int] = None
+        self.stats = {'trades': 0, 'duplicates': 0, 'written': 0, 'flushes': 0, 'bars': 0}
+        self._last_flush = time.monotonic()
+
+    def add(self, trade: dict) -> bool:
+        """加入一笔成交；不晚于已处理的最大 ID 的成交视为重复，返回 False"""
+        agg_trade_id = trade['agg_trade_id']
+        if self.last_agg_trade_id is not None and agg_trade_id <= self.last_agg_trade_id:
+            self.stats['duplicates'] += 1
+            return False
+        self.last_agg_trade_id = agg_trade_id
+        self.stats['trades'] += 1
+        if self.dbw:
+            self.batch.append(trade)
+        if self.on_trade is not None:
+            self.on_trade(trade)
+        for builder in self.bar_builders:
+            bar = builder.update(trade)
+            if bar is not None:
+                self.stats['bars'] += 1
+                if self.on_bar is not None:
+                    self.on_bar({**bar, 'symbol': self.symbol})
+        return True
+
+    def flush_due(self) -> bool:
+        return len(self.batch) >= self.batch_size or (
+            len(self.batch) > 0 and time.monotonic() - self._last_flush >= self.flush_interval)
+
+    async def flush(self) -> int:
+        """把当前批次写入数据库；失败时保留批次等待下次重试"""
+        if not len(self.batch):
+            return 0
+        from DatabaseOperator.trade_store import TradeBatch, copy_trades
+        batch, self.batch = self.batch, TradeBatch()
+        self._last_flush = time.monotonic()
+        try:
+            written = await asyncio.to_thread(copy_trades, self.symbol, batch)
+        except Exception as e:
+            logger.error(f"[AggTrade] {self.symbol} 写入 {len(batch)} 笔成交失败，稍后重试: {e}")
+            # 把失败的批次放回队首，保持 ID 顺序
+            batch.extend(self._iter_batch(self.batch))
+            self.batch = batch
+            return 0
+        self.stats['written'] += written
+        self.stats['flushes'] += 1
+        return written
+
+    @staticmethod
+    def _iter_batch(batch):
+        columns = batch.columns
+        for i in range(len(batch)):
+            yield {name: values[i] for name, values in columns.items()}
+
+    async def maybe_flush(self) -> int:
+        return await self.flush() if self.flush_due() else 0
+
+    async def backfill(self, pages: int = TRADE_BACKFILL_PAGES) -> int:
+        """从最后处理的 ID 之后用 REST 补采，返回补采的成交数"""
+        if self.last_agg_trade_id is None:
+            return 0
+        count = 0
+        for _ in range(pages):
+            trades = await asyncio.to_thread(fetch_agg_trades, self.symbol, self.last_agg_trade_id + 1)
+            for trade in trades:
+                count += self.add(trade)
+            await self.maybe_flush()
+            if len(trades) < 1000:
+                break
+        if count:
+            logger.info(f"[AggTrade] {self.symbol} 补采 {count} 笔成交")
+        return count
+
+
+async def run_agg_trade_stream(symbol: str, ingester: Optional[AggTradeIngester] = None,
+                               max_trades: Optional[int] = None, recorder=None, **kwargs) -> AggTradeIngester:
+    """
+    订阅归集成交并持续写库，直到被取消（或处理 max_trades 笔成交）
+
+    Args:
+        symbol: 交易对
+        ingester: 处理器；为 None 时用 kwargs 创建 AggTradeIngester
+        max_trades: 处理该数量的成交后返回
+        recorder: stream_recorder.StreamRecorder，收到的原始消息先原样录制再处理
+    """
+    import websockets
+
+    ingester = ingester or AggTradeIngester(symbol, **kwargs)
+    if ingester.dbw and ingester.last_agg_trade_id is None:
+        # 从库中最新的成交继续，重启后自动补齐停机期间的数据
+        from DatabaseOperator.trade_store import latest_agg_trade_id
+        ingester.last_agg_trade_id = await asyncio.to_thread(latest_agg_trade_id, symbol)
+    stream_name = f"{symbol.lower()}@aggTrade"
+    ws_endpoint = f"{BINANCE_WS_STREAM_URL}/ws/{stream_name}"
+    backoff = 1
+
+    try:
+        while True:
+            try:
+                await ingester.backfill()
+                async with websockets.connect(ws_endpoint, ping_interval=20, ping_timeout=10,
+                                              close_timeout=10) as websocket:
+                    logger.info(f"[AggTrade] 已连接 {symbol} 成交流")
+                    backoff = 1
+                    while True:
+                        try:
+                            message = await asyncio.wait_for(websocket.recv(), timeout=ingester.flush_interval)
+                        except asyncio.TimeoutError:
+                            # 成交稀少时也按时间间隔写库
+                            await ingester.maybe_flush()
+                            continue
+                        if recorder is not None:
+                            recorder.write(stream_name, message)
+                        data = json.loads(message)
+                        if data.get('e') != 'aggTrade':
+                            continue
+                        ingester.add(parse_agg_trade(data))
+                        await ingester.maybe_flush()
+                        if max_trades and ingester.stats['trades'] >= max_trades:
+                            return ingester
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"[AggTrade] {symbol} 成交流异常: {e}，{backoff}s 后重连")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+    finally:
+        try:
+            await asyncio.shield(ingester.flush())
+        except Exception as e:
+            logger.error(f"[AggTrade] {symbol} 退出时写入失败: {e}")
+
+
+def main():
+    """
+    python -m ExchangeFetcher.trade_stream --symbol BTCUSDT --bars volume:10,tick:500
+    python -m ExchangeFetcher.trade_stream --symbol BTCUSDT --no-db --bars dollar:1000000 --max-trades 2000
+    """
+    from DataProcessingCalculator.trade_bars import parse_bar_specs
+
+    parser = argparse.ArgumentParser(description='归集成交采集与 tick/volume/dollar K线')
+    parser.add_argument('--symbol', default=DEFAULT_SYMBOL)
+    parser.add_argument('--bars', default='', help='K线配置，例如 volume:10,tick:500,dollar:1000000')
+    parser.add_argument('--no-db', action='store_true', help='不写数据库')
+    parser.add_argument('--max-trades', type=int, default=None)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    ingester = AggTradeIngester(args.symbol, dbw=not args.no_db, bar_builders=parse_bar_specs(args.bars),
+                                on_bar=lambda bar: print(json.dumps(bar)))
+    try:
+        asyncio.run(run_agg_trade_stream(args.symbol, ingester, max_trades=args.max_trades))
+    except KeyboardInterrupt:
+        pass
+    print(ingester.stats)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,11 @@
+# MockExchange Initialization
+"""
+本地模拟交易所（离线压测与延迟测试）
+- market.py: 行情模拟与回放（K线/深度/归集成交）、模拟账户与订单撮合
+- server.py: 兼容 Binance REST / WebSocket 行情流 / WebSocket API 的 FastAPI 服务
+
+启动：
+    cd app
+    python -m MockExchange.server --port 8700 --rate 1000
+然后设置环境变量 MOCK_EXCHANGE_URL=http://127.0.0.1:8700，采集、下单网关与基准脚本即连接到模拟交易所
+"""
@@ -0,0 +1,463 @@
+# app/MockExchange/market.py
+"""
+market.py
+- MockMarket：单个交易对的行情源，REST 与 WebSocket 共用同一份状态
+    K线     默认随机游走生成；给定录制文件时按顺序回放（循环），时间戳保持录制值
+    深度    本地订单簿（ExchangeFetcher.depth_book.LocalOrderBook）+ 连续的 U/u 序号，
+            REST 快照与增量推送一致，客户端按官方同步步骤即可重建；
+            给定 stream_recorder 格式的深度录制时先回放录制的增量，回放完后继续随机生成
+    归集成交 围绕中间价随机生成，保留最近的成交供 REST aggTrades 补采
+- MockAccount：模拟账户，MARKET 单按最优价立即成交，LIMIT 单穿价成交否则挂单，
+  每次状态变化生成 executionReport 推送给用户数据流
+"""
+import gzip
+import itertools
+import json
+import math
+import random
+import time
+import uuid
+from collections import deque
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterator, List, Optional
+
+from ExchangeFetcher.depth_book import LocalOrderBook
+
+# K线周期长度（毫秒）
+INTERVAL_MS: Dict[str, int] = {
+    '1m': 60_000, '3m': 180_000, '5m': 300_000, '15m': 900_000, '30m': 1_800_000,
+    '1h': 3_600_000, '2h': 7_200_000, '4h': 14_400_000, '6h': 21_600_000, '8h': 28_800_000,
+    '12h': 43_200_000, '1d': 86_400_000,
+}
+
+KLINE_HISTORY = 1000         # 每个周期预生成的历史K线根数
+DEPTH_LEVELS = 200           # 模拟订单簿每侧档数
+RECENT_TRADES = 5000         # 保留供 aggTrades 补采的成交数
+
+
+class MockError(Exception):
+    """模拟交易所的业务错误，对应 Binance 的 {"code": ..., "msg": ...}"""
+
+    def __init__(self, code: int, msg: str):
+        super().__init__(msg)
+        self.code = code
+        self.msg = msg
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _fmt(value: float) -> str:
+    return f"{value:.8f}"
+
+
+def _open_lines(path):
+    path = Path(path)
+    opener = gzip.open if path.suffix == '.gz' else open
+    return opener(path, 'rt', encoding='utf-8')
+
+
+def load_klines_file(path) -> List[list]:
+    """
+    读取录制的K线：JSON 数组（/api/v3/klines 的返回）或 JSON Lines（每行一个数组或 parse_kline 字典），
+    支持 .gz；返回按开盘时间排序的 REST 数组格式
+    """
+    with _open_lines(path) as f:
+        text = f.read()
+    try:
+        items = json.loads(text)
+        if items and not isinstance(items[0], (list, dict)):
+            items = [items]   # 只有一行的 JSON Lines
+    except ValueError:
+        items = [json.loads(line) for line in text.splitlines() if line.strip()]
+    klines = []
+    for item in items:
+        if isinstance(item, dict):
+            item = [item['open_time'], item['open'], item['high'], item['low'], item['close'], item['volume'],
+                    item['close_time'], item.get('quote_asset_volume', '0'), item.get('num_trades', 0),
+                    item.get('taker_buy_base_vol', '0'), item.get('taker_buy_quote_vol', '0'), '0']
+        klines.append([int(item[0]), *[str(v) for v in item[1:6]], int(item[6]), str(item[7]), int(item[8]),
+                       str(item[9]), str(item[10]), '0'])
+    klines.sort(key=lambda k: k[0])
+    return klines
+
+
+def load_depth_recording(path) -> tuple:
+    """
+    读取 stream_recorder 录制（depth_book record 或 STREAM_RECORD）中第一个深度流，
+    返回 (第一个快照, 该流的增量事件列表)
+    """
+    from ExchangeFetcher.stream_recorder import read_recording
+
+    stream, snapshot, events = None, None, []
+    for record in read_recording(path):
+        if stream is None:
+            if '@depth' not in record['s']:
+                continue
+            stream = record['s']
+        elif record['s'] != stream:
+            continue
+        if 'snapshot' in record:
+            snapshot = snapshot or record['snapshot']
+        else:
+            event = json.loads(record['m'])
+            if event.get('e') == 'depthUpdate':
+                events.append(event)
+    if snapshot is None:
+        raise ValueError(f"录制中没有深度快照: {path}")
+    return snapshot, events
+
+
+class MockMarket:
+    """
+    单个交易对的模拟行情
+
+    用法：
+        market = MockMarket("BTCUSDT", price=30000, seed=1)
+        market.klines('1m', limit=100)          # REST
+        market.next_kline_event('1m')            # WebSocket
+        market.next_depth_event(); market.depth_snapshot(100)
+    """
+
+    def __init__(self, symbol: str, price: float = 30000.0, seed: Optional[int] = None,
+                 volatility: float = 0.0001, klines_file=None, depth_file=None):
+        """
+        Args:
+            symbol: 交易对
+            price: 初始价格（有录制数据时取录制数据的价格）
+            seed: 随机种子，固定后生成的数据可复现
+            volatility: 每步随机游走的相对波动
+            klines_file: 回放的K线录制文件（见 load_klines_file）
+            depth_file: 回放的深度录制（见 load_depth_recording）
+        """
+        self.symbol = symbol.upper()
+        self.rng = random.Random(seed)
+        self.volatility = volatility
+        self.recorded_klines: List[list] = load_klines_file(klines_file) if klines_file else []
+        self._kline_cursor: Optional[Iterator[list]] = (
+            itertools.cycle(self.recorded_klines) if self.recorded_klines else None)
+        if self.recorded_klines:
+            price = float(self.recorded_klines[-1][4])
+        self.price = price
+        # 价格最小变动单位约为价格的十万分之一（取 10 的整数次幂）
+        self.tick = 10.0 ** math.floor(math.log10(price * 1e-5))
+        self._history: Dict[str, List[list]] = {}
+        self._live_bars: Dict[str, list] = {}
+
+        self.book = LocalOrderBook(self.symbol)
+        self._depth_replay: Deque[dict] = deque()
+        if depth_file:
+            snapshot, events = load_depth_recording(depth_file)
+            self.book.load_snapshot(snapshot)
+            self._depth_replay.extend(event for event in events if int(event['u']) > self.book.last_update_id)
+            self.price = self.book.mid_price() or self.price
+        else:
+            self._seed_book()
+
+        self.agg_trade_id = 0
+        self.trade_id = 0
+        self.recent_trades: Deque[dict] = deque(maxlen=RECENT_TRADES)
+
+    # ---------- 价格 ----------
+
+    def step(self) -> float:
+        """随机游走一步，返回新价格"""
+        self.price = max(self.tick, self.price * (1 + self.rng.gauss(0, self.volatility)))
+        return self.price
+
+    def ticker(self) -> dict:
+        return {'symbol': self.symbol, 'price': _fmt(self.book.mid_price() or self.price)}
+
+    # ---------- K线 ----------
+
+    def _make_bar(self, open_time: int, interval_ms: int, open_price: float, steps: int = 4) -> list:
+        high = low = close = open_price
+        for _ in range(steps):
+            close = self.step()
+            high, low = max(high, close), min(low, close)
+        volume = self.rng.uniform(1, 100)
+        taker = volume * self.rng.uniform(0.3, 0.7)
+        return [open_time, _fmt(open_price), _fmt(high), _fmt(low), _fmt(close), _fmt(volume),
+                open_time + interval_ms - 1, _fmt(volume * close), self.rng.randint(10, 1000),
+                _fmt(taker), _fmt(taker * close), '0']
+
+    def _synthetic_history(self, interval: str) -> List[list]:
+        """生成截止到当前周期之前的历史K线（全部为过去的时间戳），首次请求时生成并缓存"""
+        if interval not in self._history:
+            interval_ms = INTERVAL_MS[interval]
+            current_open = _now_ms() // interval_ms * interval_ms
+            # 从较早的价格开始游走，最后一根收盘价接近当前价格
+            saved_price, self.price = self.price, self.price * (1 + self.rng.gauss(0, 0.02))
+            bars, open_price = [], self.price
+            for i in range(KLINE_HISTORY, 0, -1):
+                bar = self._make_bar(current_open - i * interval_ms, interval_ms, open_price)
+                open_price = float(bar[4])
+                bars.append(bar)
+            self.price = saved_price
+            self._history[interval] = bars
+        return self._history[interval]
+
+    def klines(self, interval: str, limit: int = 500, start_time: Optional[int] = None,
+               end_time: Optional[int] = None) -> List[list]:
+        """REST klines：有录制数据时从录制数据中筛选，否则返回生成的历史K线"""
+        if interval not in INTERVAL_MS:
+            raise MockError(-1120, 'Invalid interval.')
+        bars = self.recorded_klines or self._synthetic_history(interval)
+        if start_time is not None:
+            bars = [bar for bar in bars if bar[0] >= start_time]
+        if end_time is not None:
+            bars = [bar for bar in bars if bar[0] <= end_time]
+        return bars[:limit] if start_time is not None else bars[-limit:]
+
+    def next_kline_event(self, interval: str) -> dict:
+        """
+        下一条 <symbol>@kline_<interval> 推送
+        - 回放：依次推送录制的K线（x=true），到末尾后从头循环
+        - 生成：更新当前周期的K线（x=false）；跨过周期边界时先推送上一根的完结版本（x=true）
+        """
+        if self._kline_cursor is not None:
+            bar, closed = next(self._kline_cursor), True
+        else:
+            interval_ms = INTERVAL_MS[interval]
+            open_time = _now_ms() // interval_ms * interval_ms
+            bar = self._live_bars.get(interval)
+            if bar is not None and bar[0] < open_time:
+                closed = True
+                self._live_bars.pop(interval)
+                self._synthetic_history(interval).append(bar)
+            else:
+                closed = False
+                if bar is None:
+                    bar = self._make_bar(open_time, interval_ms, self.price, steps=0)
+                    self._live_bars[interval] = bar
+                close = self.step()
+                qty = self.rng.uniform(0.001, 1)
+                bar[2], bar[3], bar[4] = _fmt(max(float(bar[2]), close)), _fmt(min(float(bar[3]), close)), _fmt(close)
+                bar[5] = _fmt(float(bar[5]) + qty)
+                bar[7] = _fmt(float(bar[7]) + qty * close)
+                bar[8] += 1
+        return {
+            'e': 'kline', 'E': _now_ms(), 's': self.symbol,
+            'k': {
+                't': bar[0], 'T': bar[6], 's': self.symbol, 'i': interval, 'f': 0, 'L': 0,
+                'o': bar[1], 'c': bar[4], 'h': bar[2], 'l': bar[3], 'v': bar[5], 'n': bar[8],
+                'x': closed, 'q': bar[7], 'V': bar[9], 'Q': bar[10], 'B': '0',
+            },
+        }
+
+    # ---------- 深度 ----------
+
+    def _seed_book(self) -> None:
+        bids, asks = [], []
+        self.price = round(self.price / self.tick) * self.tick
+        for i in range(1, DEPTH_LEVELS + 1):
+            bids.append([_fmt(self.price - i * self.tick), _fmt(self.rng.uniform(0.01, 5))])
+            asks.append([_fmt(self.price + i * self.tick), _fmt(self.rng.uniform(0.01, 5))])
+        self.book.load_snapshot({'lastUpdateId': 1, 'bids': bids, 'asks': asks, 'E': _now_ms()})
+
+    def depth_snapshot(self, limit: int = 100) -> dict:
+        snapshot = self.book.to_snapshot(limit)
+        return {'lastUpdateId': snapshot['lastUpdateId'], 'bids': snapshot['bids'], 'asks': snapshot['asks']}
+
+    def next_depth_event(self) -> dict:
+        """下一条 depthUpdate；U/u 与订单簿 lastUpdateId 连续，并已应用到订单簿"""
+        if self._depth_replay:
+            event = self._depth_replay.popleft()
+        else:
+            mid = self.price = self.price + self.rng.randint(-2, 2) * self.tick
+            bids, asks = [], []
+            # 价格移动后撤掉穿过中间价的档位，保证买一 < 卖一；档数超过上限时撤掉最远的档位
+            for side, levels, crossed in ((self.book.bids, bids, lambda p: p >= mid),
+                                          (self.book.asks, asks, lambda p: p <= mid)):
+                for price, _ in side.top():
+                    if not crossed(price):
+                        break
+                    levels.append([_fmt(price), '0'])
+                if len(side) > DEPTH_LEVELS:
+                    worst = side.prices[0] if side.is_bid else side.prices[-1]
+                    levels.append([_fmt(worst), '0'])
+            # 两侧各至少新增/修改一档
+            for levels, sign in ((bids, -1), (asks, 1)):
+                for _ in range(self.rng.randint(1, 3)):
+                    price = mid + sign * self.rng.randint(1, 20) * self.tick
+                    qty = 0 if self.rng.random() < 0.2 else self.rng.uniform(0.01, 5)
+                    levels.append([_fmt(round(price / self.tick) * self.tick), _fmt(qty)])
+            first_id = self.book.last_update_id + 1
+            event = {'e': 'depthUpdate', 'E': _now_ms(), 's': self.symbol, 'U': first_id,
+                     'u': first_id + len(bids) + len(asks) - 1, 'b': bids, 'a': asks}
+        self.book.apply_diff(event)
+        return event
+
+    # ---------- 成交 ----------
+
+    def next_agg_trade(self, price: Optional[float] = None, quantity: Optional[float] = None,
+                       is_buyer_maker: Optional[bool] = None) -> dict:
+        """下一条 aggTrade（未给出的字段随机生成）"""
+        self.agg_trade_id += 1
+        count = self.rng.randint(1, 3)
+        first_trade_id, self.trade_id = self.trade_id + 1, self.trade_id + count
+        if price is None:
+            price = self.step()
+        event = {
+            'e': 'aggTrade', 'E': _now_ms(), 's': self.symbol, 'a': self.agg_trade_id,
+            'p': _fmt(price), 'q': _fmt(quantity if quantity is not None else self.rng.uniform(0.001, 2)),
+            'f': first_trade_id, 'l': self.trade_id, 'T': _now_ms(),
+            'm': is_buyer_maker if is_buyer_maker is not None else self.rng.random() < 0.5, 'M': True,
+        }
+        self.recent_trades.append(event)
+        return event
+
+    def agg_trades(self, from_id: Optional[int] = None, limit: int = 500) -> List[dict]:
+        """REST aggTrades：字段与推送相同（不含 e/E/s）"""
+        trades = list(self.recent_trades)
+        if from_id is not None:
+            trades = [trade for trade in trades if trade['a'] >= from_id][:limit]
+        else:
+            trades = trades[-limit:]
+        return [{key: trade[key] for key in ('a', 'p', 'q', 'f', 'l', 'T', 'm', 'M')} for trade in trades]
+
+    def next_event(self, kind: str, interval: str = '1m') -> dict:
+        if kind == 'kline':
+            return self.next_kline_event(interval)
+        if kind == 'depth':
+            return self.next_depth_event()
+        if kind == 'aggTrade':
+            return self.next_agg_trade()
+        raise MockError(-1100, f'Unsupported stream: {kind}')
+
+
+class MockAccount:
+    """
+    模拟账户与订单
+
+    用法：
+        account = MockAccount(markets, on_execution=callback)
+        account.place_order({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': '0.01'})
+    """
+
+    def __init__(self, markets: Dict[str, MockMarket], on_execution: Optional[Callable[[dict], None]] = None):
+        self.markets = markets
+        self.on_execution = on_execution
+        self.orders: Dict[str, dict] = {}   # clientOrderId -> 订单
+        self._order_ids = itertools.count(1)
+        self.listen_keys: Dict[str, float] = {}
+        self.balances: Dict[str, dict] = {'USDT': {'free': 1_000_000.0, 'locked': 0.0}}
+
+    def market(self, symbol: Optional[str]) -> MockMarket:
+        market = self.markets.get((symbol or '').upper())
+        if market is None:
+            raise MockError(-1121, 'Invalid symbol.')
+        return market
+
+    # ---------- 订单 ----------
+
+    def _emit(self, order: dict, execution_type: str, last_qty: float = 0.0, last_price: float = 0.0) -> None:
+        if self.on_execution is None:
+            return
+        self.on_execution({
+            'e': 'executionReport', 'E': _now_ms(), 's': order['symbol'], 'c': order['clientOrderId'],
+            'S': order['side'], 'o': order['type'], 'f': order['timeInForce'] or 'GTC',
+            'q': order['origQty'], 'p': order['price'], 'P': order['stopPrice'],
+            'x': execution_type, 'X': order['status'], 'r': 'NONE', 'i': order['orderId'],
+            'l': _fmt(last_qty), 'z': order['executedQty'], 'L': _fmt(last_price), 'n': '0', 'N': None,
+            'T': order['updateTime'], 't': -1, 'w': order['status'] in ('NEW', 'PARTIALLY_FILLED'),
+            'm': False, 'O': order['time'], 'Z': order['cummulativeQuoteQty'], 'C': '',
+        })
+
+    def _fill(self, order: dict, price: float) -> None:
+        qty = float(order['origQty'])
+        order.update(status='FILLED', executedQty=order['origQty'], cummulativeQuoteQty=_fmt(qty * price),
+                     updateTime=_now_ms())
+        market = self.markets[order['symbol']]
+        market.next_agg_trade(price, qty, is_buyer_maker=order['side'] == 'SELL')
+        self._emit(order, 'TRADE', qty, price)
+
+    def place_order(self, params: dict) -> dict:
+        """下单并返回 RESULT 格式的结果；参数校验失败抛出 MockError"""
+        market = self.market(params.get('symbol'))
+        side, order_type = params.get('side'), params.get('type')
+        if side not in ('BUY', 'SELL'):
+            raise MockError(-1102, "Mandatory parameter 'side' was not sent, was empty/null, or malformed.")
+        if order_type not in ('MARKET', 'LIMIT', 'LIMIT_MAKER'):
+            raise MockError(-1116, 'Invalid orderType.')
+        try:
+            qty = float(params['quantity'])
+            limit_price = float(params['price']) if order_type != 'MARKET' else None
+        except (KeyError, TypeError, ValueError):
+            raise MockError(-1102, "Mandatory parameter 'quantity' or 'price' was not sent or malformed.")
+        client_order_id = params.get('newClientOrderId') or uuid.uuid4().hex
+        if client_order_id in self.orders:
+            raise MockError(-2010, 'Duplicate order sent.')
+
+        now = _now_ms()
+        order = {
+            'symbol': market.symbol, 'orderId': next(self._order_ids), 'orderListId': -1,
+            'clientOrderId': client_order_id, 'transactTime': now, 'price': _fmt(limit_price or 0),
+            'origQty': _fmt(qty), 'executedQty': _fmt(0), 'cummulativeQuoteQty': _fmt(0), 'status': 'NEW',
+            'timeInForce': params.get('timeInForce') if order_type == 'LIMIT' else None,
+            'type': order_type, 'side': side, 'stopPrice': _fmt(0), 'time': now, 'updateTime': now,
+            'workingTime': now, 'selfTradePreventionMode': 'NONE',
+        }
+        self.orders[client_order_id] = order
+        self._emit(order, 'NEW')
+
+        best = market.book.best_ask() if side == 'BUY' else market.book.best_bid()
+        touch = best[0] if best else market.price
+        crosses = limit_price is None or (limit_price >= touch if side == 'BUY' else limit_price <= touch)
+        if order_type == 'LIMIT_MAKER' and crosses:
+            order.update(status='EXPIRED', updateTime=_now_ms())
+            self._emit(order, 'EXPIRED')
+        elif crosses:
+            self._fill(order, touch)
+        elif order['timeInForce'] in ('IOC', 'FOK'):
+            order.update(status='EXPIRED', updateTime=_now_ms())
+            self._emit(order, 'EXPIRED')
+        return dict(order, fills=[])
+
+    def get_order(self, symbol: Optional[str], orig_client_order_id: Optional[str] = None,
+                  order_id=None) -> dict:
+        self.market(symbol)
+        if orig_client_order_id:
+            order = self.orders.get(orig_client_order_id)
+        else:
+            order = next((o for o in self.orders.values() if str(o['orderId']) == str(order_id)), None)
+        if order is None or order['symbol'] != symbol.upper():
+            raise MockError(-2013, 'Order does not exist.')
+        return order
+
+    def cancel_order(self, symbol: Optional[str], orig_client_order_id: Optional[str] = None,
+                     order_id=None) -> dict:
+        order = self.get_order(symbol, orig_client_order_id, order_id)
+        if order['status'] not in ('NEW', 'PARTIALLY_FILLED'):
+            raise MockError(-2011, 'Unknown order sent.')
+        order.update(status='CANCELED', updateTime=_now_ms())
+        self._emit(order, 'CANCELED')
+        return {**order, 'origClientOrderId': order['clientOrderId']}
+
+    def open_orders(self, symbol: Optional[str] = None) -> List[dict]:
+        return [order for order in self.orders.values()
+                if order['status'] in ('NEW', 'PARTIALLY_FILLED') and (not symbol or order['symbol'] == symbol.upper())]
+
+    def account(self) -> dict:
+        return {
+            'makerCommission': 10, 'takerCommission': 10, 'canTrade': True, 'canWithdraw': True,
+            'canDeposit': True, 'updateTime': _now_ms(), 'accountType': 'SPOT',
+            'balances': [{'asset': asset, 'free': _fmt(b['free']), 'locked': _fmt(b['locked'])}
+                         for asset, b in self.balances.items()],
+        }
+
+    # ---------- listenKey ----------
+
+    def create_listen_key(self) -> str:
+        listen_key = uuid.uuid4().hex + uuid.uuid4().hex
+        self.listen_keys[listen_key] = time.time()
+        return listen_key
+
+    def keepalive(self, listen_key: Optional[str]) -> None:
+        if listen_key not in self.listen_keys:
+            raise MockError(-1125, 'This listenKey does not exist.')
+        self.listen_keys[listen_key] = time.time()
+
+    def close_listen_key(self, listen_key: Optional[str]) -> None:
+        self.listen_keys.pop(listen_key, None)
@@ -0,0 +1,440 @@
+# app/MockExchange/server.py
+"""
+server.py
+- 本地模拟交易所：路径与消息格式与 Binance 一致，设置 MOCK_EXCHANGE_URL 后采集器、下单网关、
+  用户数据流与基准脚本无需改动即连接到这里（地址换算见 config.basicConfig）
+    REST           /api/v3/ping, time, ticker/price, klines, depth, aggTrades, order, openOrders,
+                   account, userDataStream
+    行情流         /ws/<symbol>@kline_<interval>, /ws/<symbol>@depth[@100ms], /ws/<symbol>@aggTrade
+    用户数据流     /ws/<listenKey>（executionReport）
+    WebSocket API  /ws-api/v3（session.logon, order.place, order.cancel, order.status, ping, time）
+    统计           /mock/stats
+- 每个行情流只有一个生产任务，按设定速率生成消息并广播给该流的所有连接；速率为 0 时不限速（压测上限）。
+  发送队列满的慢连接会被断开，与交易所行为一致
+- --recording 回放 ExchangeFetcher/stream_recorder.py 录制的原始帧：深度流以录制的快照与增量为准（回放完后继续生成），
+  其他流按录制顺序循环推送，速率仍由 --rate 控制
+- 不校验签名与 API Key；REST 与 WebSocket API 响应可注入固定延迟，模拟网络往返
+
+环境变量：
+    MOCK_EXCHANGE_RATE        每个行情流每秒消息数（默认 10，0 表示不限速）
+    MOCK_EXCHANGE_LATENCY_MS  REST 与 WebSocket API 响应的注入延迟毫秒数（默认 0）
+
+用法：
+    cd app
+    python -m MockExchange.server --port 8700 --symbols BTCUSDT,ETHUSDT --rate 1000
+    python -m MockExchange.server --klines-file data/btc_1m.json --depth-file depth_btc.jsonl.gz --rate 0
+    python -m MockExchange.server --recording data/stream_recordings --rate 0
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import parse_qsl
+
+from config import DEFAULT_SYMBOL
+from MockExchange.market import INTERVAL_MS, MockAccount, MockError, MockMarket
+
+logger = logging.getLogger(__name__)
+
+MOCK_EXCHANGE_RATE = float(os.getenv('MOCK_EXCHANGE_RATE', '10'))
+MOCK_EXCHANGE_LATENCY_MS = float(os.getenv('MOCK_EXCHANGE_LATENCY_MS', '0'))
+STREAM_QUEUE_SIZE = 10000    # 每个连接最多积压的消息数，超过后断开
+
+
+def parse_stream(stream: str) -> Tuple[str, str, Optional[str]]:
+    """'btcusdt@kline_1m' -> ('BTCUSDT', 'kline', '1m')；不支持的流抛出 MockError"""
+    symbol, _, name = stream.partition('@')
+    if name.startswith('kline_') and name[6:] in INTERVAL_MS:
+        return symbol.upper(), 'kline', name[6:]
+    if name in ('depth', 'depth@100ms', 'depth@1000ms'):
+        return symbol.upper(), 'depth', None
+    if name == 'aggTrade':
+        return symbol.upper(), 'aggTrade', None
+    raise MockError(-1100, f'Unsupported stream: {stream}')
+
+
+class StreamHub:
+    """
+    行情流广播：stream 名 -> 订阅队列集合；第一个订阅者到来时启动生产任务，最后一个离开时停止
+
+    用法：
+        queue = hub.subscribe('btcusdt@depth@100ms')
+        message = await queue.get()        # None 表示因积压过多被断开
+        hub.unsubscribe('btcusdt@depth@100ms', queue)
+    """
+
+    def __init__(self, markets: Dict[str, MockMarket], rate: float = MOCK_EXCHANGE_RATE,
+                 queue_size: int = STREAM_QUEUE_SIZE):
+        self.markets = markets
+        self.rate = rate
+        self.queue_size = queue_size
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._producers: Dict[str, asyncio.Task] = {}
+        self.recorded: Dict[str, List[str]] = {}   # 录制的原始帧，stream -> 消息列表
+        self.stats = {'messages': 0, 'deliveries': 0, 'slow_clients': 0}
+
+    def subscribe(self, stream: str, produce: bool = True) -> asyncio.Queue:
+        """
+        Args:
+            stream: 流名称；produce=False 时为只由 publish 推送的频道（用户数据流）
+        """
+        if produce:
+            symbol, kind, interval = parse_stream(stream)
+            market = self.markets.get(symbol)
+            if market is None:
+                raise MockError(-1121, 'Invalid symbol.')
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.setdefault(stream, set()).add(queue)
+        producer = self._producers.get(stream)
+        if produce and (producer is None or producer.done()):
+            self._producers[stream] = asyncio.create_task(self._produce(stream, market, kind, interval),
+                                                          name=f'mock-stream-{stream}')
+        return queue
+
+    def unsubscribe(self, stream: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(stream)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            self._subscribers.pop(stream, None)
+            producer = self._producers.pop(stream, None)
+            if producer is not None:
+                producer.cancel()
+
+    def publish(self, stream: str, message: str) -> int:
+        """广播一条消息，返回送达的连接数；积压超过上限的连接收到 None 后断开"""
+        subscribers = self._subscribers.get(stream)
+        if not subscribers:
+            return 0
+        self.stats['messages'] += 1
+        delivered = 0
+        for queue in list(subscribers):
+            try:
+                queue.put_nowait(message)
+                delivered += 1
+            except asyncio.QueueFull:
+                subscribers.discard(queue)
+                self.stats['slow_clients'] += 1
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+        self.stats['deliveries'] += delivered
+        return delivered
+
+    async def _produce(self, stream: str, market: MockMarket, kind: str, interval: Optional[str]) -> None:
+        period = 1 / self.rate if self.rate > 0 else 0
+        next_at = time.monotonic()
+        frames = itertools.cycle(self.recorded[stream]) if self.recorded.get(stream) else None
+        while self._subscribers.get(stream):
+            message = next(frames) if frames is not None else json.dumps(market.next_event(kind, interval))
+            self.publish(stream, message)
+            next_at += period
+            delay = next_at - time.monotonic()
+            if delay < -1:
+                # 落后超过 1 秒时不再追赶，避免恢复后突发
+                next_at = time.monotonic()
+            # 不限速时 sleep(0) 也会让出事件循环，保证各连接的发送任务能运行
+            await asyncio.sleep(max(delay, 0))
+
+
+class MockExchange:
+    """模拟交易所状态：行情、账户、广播与注入延迟，由 create_app 挂到 FastAPI 上"""
+
+    def __init__(self, symbols: List[str], rate: float = MOCK_EXCHANGE_RATE,
+                 latency_ms: float = MOCK_EXCHANGE_LATENCY_MS, seed: Optional[int] = None,
+                 klines_file=None, depth_file=None, recording=None):
+        """
+        Args:
+            symbols: 交易对列表
+            rate: 每个行情流每秒消息数，0 表示不限速
+            latency_ms: REST 与 WebSocket API 响应的注入延迟
+            seed: 随机种子
+            klines_file / depth_file: 录制数据，用于第一个交易对
+            recording: stream_recorder 录制的文件或目录，录制中出现的交易对自动加入
+        """
+        self.markets: Dict[str, MockMarket] = {}
+        for i, symbol in enumerate(symbols):
+            recorded = {'klines_file': klines_file, 'depth_file': depth_file} if i == 0 else {}
+            self.markets[symbol.upper()] = MockMarket(symbol, seed=None if seed is None else seed + i, **recorded)
+        self.hub = StreamHub(self.markets, rate)
+        if recording:
+            self.load_recording(recording)
+        self.account = MockAccount(self.markets, on_execution=self._on_execution)
+        self.latency = latency_ms / 1000
+        self.started_at = time.time()
+        self.stats = {'rest_requests': 0, 'ws_api_requests': 0}
+
+    def load_recording(self, path) -> Dict[str, int]:
+        """载入录制的原始帧，返回各流的消息数"""
+        from ExchangeFetcher.stream_recorder import read_recording
+
+        counts: Dict[str, int] = {}
+        for record in read_recording(path):
+            stream = record['s']
+            try:
+                symbol, kind, _ = parse_stream(stream)
+            except MockError:
+                continue
+            market = self.markets.get(symbol)
+            if market is None:
+                market = self.markets[symbol] = MockMarket(symbol)
+            if kind == 'depth':
+                # 深度以录制的第一个快照为起点，之后的增量进入行情源的回放队列，与 REST 快照保持一致
+                if 'snapshot' in record:
+                    if stream not in counts:
+                        market.book.load_snapshot(record['snapshot'])
+                        market.price = market.book.mid_price() or market.price
+                        counts[stream] = 0
+                elif stream in counts:
+                    event = json.loads(record['m'])
+                    if int(event['u']) > market.book.last_update_id:
+                        market._depth_replay.append(event)
+                        counts[stream] += 1
+            elif 'm' in record:
+                self.hub.recorded.setdefault(stream, []).append(record['m'])
+                counts[stream] = counts.get(stream, 0) + 1
+        logger.info(f"[MockExchange] 载入录制 {path}: {counts}")
+        return counts
+
+    def _on_execution(self, event: dict) -> None:
+        message = json.dumps(event)
+        for listen_key in list(self.account.listen_keys):
+            self.hub.publish(listen_key, message)
+
+    async def delay(self) -> None:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    def ws_api_call(self, request: dict) -> dict:
+        """处理一个 WebSocket API 请求，返回响应（status 200 或 400 + error）"""
+        request_id, method = request.get('id'), request.get('method')
+        params = request.get('params') or {}
+        now = int(time.time() * 1000)
+        self.stats['ws_api_requests'] += 1
+        try:
+            if method == 'order.place':
+                result = self.account.place_order(params)
+            elif method == 'order.cancel':
+                result = self.account.cancel_order(params.get('symbol'), params.get('origClientOrderId'),
+                                                   params.get('orderId'))
+            elif method == 'order.status':
+                result = self.account.get_order(params.get('symbol'), params.get('origClientOrderId'),
+                                                params.get('orderId'))
+            elif method == 'session.logon':
+                result = {'apiKey': params.get('apiKey'), 'authorizedSince': now, 'connectedSince': now,
+                          'returnRateLimits': False, 'serverTime': now}
+            elif method == 'ping':
+                result = {}
+            elif method == 'time':
+                result = {'serverTime': now}
+            elif method == 'ticker.price':
+                result = self.account.market(params.get('symbol')).ticker()
+            else:
+                raise MockError(-1100, f'Unknown method: {method}')
+        except MockError as e:
+            return {'id': request_id, 'status': 400, 'error': {'code': e.code, 'msg': e.msg}}
+        return {'id': request_id, 'status': 200, 'result': result, 'rateLimits': []}
+
+
+def create_app(exchange: Optional[MockExchange] = None):
+    """创建模拟交易所的 FastAPI 应用"""
+    from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+    from fastapi.responses import JSONResponse
+
+    exchange = exchange or MockExchange([DEFAULT_SYMBOL])
+    app = FastAPI(title='Mock Binance Exchange')
+    app.state.exchange = exchange
+    account = exchange.account
+
+    @app.exception_handler(MockError)
+    async def mock_error_handler(request: Request, exc: MockError):
+        return JSONResponse(status_code=400, content={'code': exc.code, 'msg': exc.msg})
+
+    async def request_params(request: Request) -> dict:
+        """合并 query string 与表单 body（签名请求两种方式都可能出现）"""
+        exchange.stats['rest_requests'] += 1
+        params = dict(request.query_params)
+        body = await request.body()
+        if body:
+            params.update(parse_qsl(body.decode('utf-8')))
+        await exchange.delay()
+        return params
+
+    def int_param(params: dict, name: str, default: Optional[int] = None) -> Optional[int]:
+        try:
+            return int(params[name]) if params.get(name) not in (None, '') else default
+        except ValueError:
+            raise MockError(-1100, f"Illegal characters found in parameter '{name}'.")
+
+    # ---------- 行情 REST ----------
+
+    @app.get('/api/v3/ping')
+    async def ping(request: Request):
+        await request_params(request)
+        return {}
+
+    @app.get('/api/v3/time')
+    async def server_time(request: Request):
+        await request_params(request)
+        return {'serverTime': int(time.time() * 1000)}
+
+    @app.get('/api/v3/ticker/price')
+    async def ticker_price(request: Request):
+        params = await request_params(request)
+        if params.get('symbol'):
+            return account.market(params['symbol']).ticker()
+        symbols = json.loads(params['symbols']) if params.get('symbols') else list(exchange.markets)
+        return [account.market(symbol).ticker() for symbol in symbols]
+
+    @app.get('/api/v3/klines')
+    async def klines(request: Request):
+        params = await request_params(request)
+        limit = min(int_param(params, 'limit', 500), 1000)
+        return account.market(params.get('symbol')).klines(params.get('interval', ''), limit,
+                                                            int_param(params, 'startTime'),
+                                                            int_param(params, 'endTime'))
+
+    @app.get('/api/v3/depth')
+    async def depth(request: Request):
+        params = await request_params(request)
+        return account.market(params.get('symbol')).depth_snapshot(min(int_param(params, 'limit', 100), 5000))
+
+    @app.get('/api/v3/aggTrades')
+    async def agg_trades(request: Request):
+        params = await request_params(request)
+        return account.market(params.get('symbol')).agg_trades(int_param(params, 'fromId'),
+                                                               min(int_param(params, 'limit', 500), 1000))
+
+    # ---------- 交易 REST ----------
+
+    @app.api_route('/api/v3/order', methods=['GET', 'POST', 'DELETE'])
+    async def order(request: Request):
+        params = await request_params(request)
+        if request.method == 'POST':
+            return account.place_order(params)
+        if request.method == 'DELETE':
+            return account.cancel_order(params.get('symbol'), params.get('origClientOrderId'), params.get('orderId'))
+        return account.get_order(params.get('symbol'), params.get('origClientOrderId'), params.get('orderId'))
+
+    @app.get('/api/v3/openOrders')
+    async def open_orders(request: Request):
+        params = await request_params(request)
+        return account.open_orders(params.get('symbol'))
+
+    @app.get('/api/v3/account')
+    async def account_info(request: Request):
+        await request_params(request)
+        return account.account()
+
+    @app.api_route('/api/v3/userDataStream', methods=['POST', 'PUT', 'DELETE'])
+    async def user_data_stream(request: Request):
+        params = await request_params(request)
+        if request.method == 'POST':
+            return {'listenKey': account.create_listen_key()}
+        if request.method == 'PUT':
+            account.keepalive(params.get('listenKey'))
+        else:
+            account.close_listen_key(params.get('listenKey'))
+        return {}
+
+    @app.get('/mock/stats')
+    async def stats():
+        return {
+            'uptime': time.time() - exchange.started_at,
+            'streams': {stream: len(queues) for stream, queues in exchange.hub._subscribers.items()},
+            **exchange.hub.stats, **exchange.stats,
+            'orders': len(account.orders), 'open_orders': len(account.open_orders()),
+        }
+
+    # ---------- WebSocket ----------
+
+    @app.websocket('/ws/{stream}')
+    async def stream_ws(websocket: WebSocket, stream: str):
+        await websocket.accept()
+        is_user_stream = stream in account.listen_keys
+        try:
+            queue = exchange.hub.subscribe(stream, produce=not is_user_stream)
+        except MockError as e:
+            await websocket.close(code=1008, reason=e.msg)
+            return
+        try:
+            while True:
+                message = await queue.get()
+                if message is None:
+                    await websocket.close(code=1008, reason='Slow consumer')
+                    break
+                await websocket.send_text(message)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        except Exception as e:
+            logger.debug(f"[MockExchange] {stream} 连接结束: {e}")
+        finally:
+            exchange.hub.unsubscribe(stream, queue)
+
+    @app.websocket('/ws-api/v3')
+    async def ws_api(websocket: WebSocket):
+        await websocket.accept()
+        send_lock = asyncio.Lock()
+        tasks: Set[asyncio.Task] = set()
+
+        async def handle(request: dict) -> None:
+            # 每个请求独立等待注入的延迟，并发请求的往返时间互不叠加
+            await exchange.delay()
+            response = exchange.ws_api_call(request)
+            async with send_lock:
+                await websocket.send_text(json.dumps(response))
+
+        try:
+            while True:
+                text = await websocket.receive_text()
+                try:
+                    request = json.loads(text)
+                except ValueError:
+                    async with send_lock:
+                        await websocket.send_text(json.dumps(
+                            {'id': None, 'status': 400, 'error': {'code': -1100, 'msg': 'Malformed request.'}}))
+                    continue
+                task = asyncio.create_task(handle(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return app
+
+
+def main():
+    """命令行入口"""
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description='本地模拟交易所（Binance 兼容 REST / WebSocket）')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8700)
+    parser.add_argument('--symbols', default=DEFAULT_SYMBOL, help='逗号分隔的交易对')
+    parser.add_argument('--rate', type=float, default=MOCK_EXCHANGE_RATE, help='每个行情流每秒消息数，0 为不限速')
+    parser.add_argument('--latency-ms', type=float, default=MOCK_EXCHANGE_LATENCY_MS, help='注入的响应延迟')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子')
+    parser.add_argument('--klines-file', default=None, help='回放的K线文件（用于第一个交易对）')
+    parser.add_argument('--depth-file', default=None, help='回放录制中的深度流（stream_recorder 格式，用于第一个交易对）')
+    parser.add_argument('--recording', default=None, help='回放 stream_recorder 录制的文件或目录')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    exchange = MockExchange([s.strip() for s in args.symbols.split(',') if s.strip()], rate=args.rate,
+                            latency_ms=args.latency_ms, seed=args.seed, klines_file=args.klines_file,
+                            depth_file=args.depth_file, recording=args.recording)
+    logger.info(f"[MockExchange] 交易对 {list(exchange.markets)}，速率 {args.rate or '不限'} msg/s，"
+                f"延迟 {args.latency_ms}ms；设置 MOCK_EXCHANGE_URL=http://{args.host}:{args.port} 以连接")
+    uvicorn.run(create_app(exchange), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
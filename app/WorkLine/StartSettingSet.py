@@ -1,47 +1,62 @@
-import redis
-import logging
-import logging.config
-import os
 import sys
 from pathlib import Path
+from typing import List, Optional, Tuple
 
 # 先设置路径，以便导入 PathUniti
 current_file = Path(__file__)
 app_dir = current_file.parent.parent  # WorkLine -> app
 if str(app_dir) not in sys.path:
     sys.path.insert(0, str(app_dir))
-# 现在可以导入 PathUniti 和其他模块
-from PathUniti import APP_DIR, get_log_file
-from DatabaseOperator.pg_operator import Session, engine
-from DatabaseOperator.redis_operator import RedisClient
+# 现在可以导入其他模块
+from DatabaseOperator.queue_config_cache import queue_config_cache
 from config.logging_config import get_logger
 
 # 获取日志记录器
 logger = get_logger(__name__)
 
-def Get_worklist():
-    # 引入 RedisClient
-    redis_client = RedisClient().client
 
-    # 写入和读取数据
-    redis_client.set("token", "abc123", ex=60)
-    print(redis_client.get("token"))
+def Get_worklist(default_symbol: Optional[str] = None, default_interval: str = '1m') -> List[Tuple[str, str, str]]:
+    """
+    读取激活的采集队列配置（fetcher_queue_configs），返回需要运行的 (exchange, symbol, interval) 列表
+    多个队列指向同一 (exchange, symbol, interval) 时只返回一次；同一 (symbol, interval) 配置在不同交易所时
+    是不同的任务（存储键同样包含交易所，见 kline_store.storage_symbol）；配置从 QueueConfigCache 读取（内存 -> Redis -> 数据库）
 
-    # 检查连接是否正常
-    print(RedisClient().is_connected())
+    Args:
+        default_symbol: 没有激活的队列时回退使用的交易对（None 表示不回退，回退任务使用 binance）
+        default_interval: 回退使用的K线周期
+
+    Returns:
+        List[Tuple[str, str, str]]: 按 exchange、symbol、interval 排序，exchange 为小写
+    """
+    from ExchangeFetcher.exchange_adapter import DEFAULT_EXCHANGE
+
+    configs = queue_config_cache.list(active_only=True)
+    worklist = sorted({((c.get('exchange') or DEFAULT_EXCHANGE).lower(), c['symbol'].upper(), c['interval'])
+                       for c in configs})
+    if not worklist and default_symbol:
+        worklist = [(DEFAULT_EXCHANGE, default_symbol.upper(), default_interval)]
+    return worklist
 
-    # 查看 Redis 状态信息
-    print(RedisClient().get_info())
 
 def main():
-    """主函数"""
+    """主函数：打印当前工作列表及各任务的运行统计"""
+    from WorkLine.queue_supervisor import read_queue_stats
     logger.info("开始获取工作列表...")
     try:
-        Get_worklist()
-        logger.info("工作列表获取成功")
+        worklist = Get_worklist()
+        stats = read_queue_stats()
+        logger.info(f"工作列表获取成功，共 {len(worklist)} 项")
+        for key in worklist:
+            exchange, symbol, interval = key
+            item = stats.get(':'.join(key))
+            if item:
+                print(f"{exchange} {symbol} {interval}: {item['state']} worker={item['worker']} rate={item['rate']}/s "
+                      f"lag={item['lag_ms']}ms restarts={item['restarts']}")
+            else:
+                print(f"{exchange} {symbol} {interval}: 未运行")
     except Exception as e:
         logger.error(f"获取工作列表失败: {e}")
 
 if __name__ == "__main__":
     # 运行主函数
-    main()
\ No newline at end of file
+    main()
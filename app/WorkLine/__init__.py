@@ -1,3 +1,3 @@
 # WorkLine module
-from master import main
-__all__ = ['main']
\ No newline at end of file
+from .master import main
+__all__ = ['main']
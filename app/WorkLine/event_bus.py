@@ -0,0 +1,102 @@
+# WorkLine/event_bus.py
+"""
+event_bus.py
+- 进程内异步发布/订阅，用于在同一事件循环内的采集、指标与信号任务之间传递事件
+- 每个订阅者拥有独立的有界队列，发布方永不阻塞；队列满时丢弃该订阅者最旧的事件并计数
+- 只能在事件循环线程内发布；其他线程请使用 publish_threadsafe
+"""
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 事件主题
+TOPIC_KLINE_CLOSED = 'kline.closed'          # {'symbol', 'interval', 'exchange', 'kline'}，kline 为 parse_kline 格式
+TOPIC_INDICATOR_UPDATED = 'indicator.updated'  # {'symbol', 'interval', 'exchange', 'open_time', 'close', 'ema5', ...}
+TOPIC_SIGNAL = 'signal'                       # {'symbol', 'interval', 'open_time', 'action', 'price'}
+TOPIC_TRADE_BAR = 'trade.bar'                 # tick/volume/dollar K线，见 trade_bars（含 symbol、kind、threshold）
+
+
+class Subscription:
+    """单个订阅者；支持 async for 迭代"""
+
+    def __init__(self, bus: 'EventBus', topic: str, maxsize: int):
+        self.bus = bus
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def _offer(self, event: Any) -> None:
+        if self.queue.full():
+            # 慢消费者只丢自己的旧事件，不影响发布方与其他订阅者
+            self.queue.get_nowait()
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"[EventBus] 订阅者 {self.topic} 处理过慢，已丢弃 {self.dropped} 个事件")
+        self.queue.put_nowait(event)
+
+    async def get(self) -> Any:
+        return await self.queue.get()
+
+    def close(self) -> None:
+        self.bus.unsubscribe(self)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        return await self.queue.get()
+
+
+class EventBus:
+    """进程内事件总线"""
+
+    def __init__(self, default_maxsize: int = 1000):
+        self.default_maxsize = default_maxsize
+        self._subscribers: Dict[str, List[Subscription]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.published: Dict[str, int] = {}
+
+    def subscribe(self, topic: str, maxsize: Optional[int] = None) -> Subscription:
+        """订阅主题（需在事件循环中调用），返回订阅对象"""
+        self._loop = asyncio.get_running_loop()
+        subscription = Subscription(self, topic, maxsize or self.default_maxsize)
+        self._subscribers.setdefault(topic, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscribers = self._subscribers.get(subscription.topic, [])
+        if subscription in subscribers:
+            subscribers.remove(subscription)
+
+    def publish(self, topic: str, event: Any) -> int:
+        """
+        发布事件（非阻塞）
+
+        Returns:
+            int: 收到事件的订阅者数量
+        """
+        subscribers = self._subscribers.get(topic, ())
+        for subscription in subscribers:
+            subscription._offer(event)
+        self.published[topic] = self.published.get(topic, 0) + 1
+        return len(subscribers)
+
+    def publish_threadsafe(self, topic: str, event: Any) -> None:
+        """从其他线程发布事件（例如在线程池中执行的同步采集代码）"""
+        if self._loop is None:
+            raise RuntimeError("EventBus 尚无订阅者，无法确定事件循环")
+        self._loop.call_soon_threadsafe(self.publish, topic, event)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """各主题的发布数、订阅者数与积压/丢弃数"""
+        return {
+            topic: {
+                'published': self.published.get(topic, 0),
+                'subscribers': len(subs),
+                'pending': sum(s.queue.qsize() for s in subs),
+                'dropped': sum(s.dropped for s in subs),
+            }
+            for topic, subs in self._subscribers.items()
+        }
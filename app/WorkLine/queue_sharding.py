@@ -0,0 +1,191 @@
+# WorkLine/queue_sharding.py
+"""
+queue_sharding.py
+- 多个工作进程/节点分摊激活的采集任务：一致性哈希决定归属，Redis 租约保证同一时刻只有一个进程在采集
+- 成员：每个进程定期把心跳写入有序集合 fetcher_queue:members（分值为 Redis 服务器时间），
+  超过 QUEUE_LEASE_TTL 未心跳的成员被剔除
+- 归属：存活成员按 QUEUE_SHARD_REPLICAS 个虚拟节点组成哈希环，(exchange, symbol, interval) 落在哪个成员就由谁采集；
+  成员增减时只有少量任务迁移
+- 租约：fetcher_queue:lease:<exchange>:<SYMBOL>:<interval> = 工作进程名（SET NX PX），持有者每次心跳续期；
+  归属变化时旧持有者主动释放，进程崩溃时租约在 TTL 后过期，新归属者随即接管
+
+由 QueueSupervisor(shard=ShardCoordinator()) 使用：每次对账先心跳，再只返回本进程持有租约的任务。
+
+环境变量：
+    QUEUE_LEASE_TTL          租约与心跳的过期秒数（默认 15）
+    QUEUE_HEARTBEAT_INTERVAL 心跳/续约间隔秒数（默认 5，需明显小于 TTL）
+    QUEUE_SHARD_REPLICAS     每个成员的虚拟节点数（默认 64）
+"""
+import bisect
+import hashlib
+import logging
+import os
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from DatabaseOperator.redis_operator import RedisClient, publish_queue_event
+from DatabaseOperator.redis_streams import default_consumer_name
+
+logger = logging.getLogger(__name__)
+
+QUEUE_MEMBERS_KEY = 'fetcher_queue:members'
+QUEUE_LEASE_PREFIX = 'fetcher_queue:lease:'
+QUEUE_LEASE_TTL = float(os.getenv('QUEUE_LEASE_TTL', '15'))
+QUEUE_HEARTBEAT_INTERVAL = float(os.getenv('QUEUE_HEARTBEAT_INTERVAL', '5'))
+QUEUE_SHARD_REPLICAS = int(os.getenv('QUEUE_SHARD_REPLICAS', '64'))
+
+# (exchange, symbol, interval)
+StreamKey = Tuple[str, str, str]
+
+# 租约不存在则获取，已由自己持有则续期；返回 1 表示持有
+_ACQUIRE_LUA = """
+local owner = redis.call('GET', KEYS[1])
+if not owner then
+    redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+    return 1
+end
+if owner == ARGV[1] then
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# 只删除自己持有的租约
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _hash(value: str) -> int:
+    # 各进程结果一致（不受 PYTHONHASHSEED 影响）
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), 'big')
+
+
+def lease_key(key: StreamKey) -> str:
+    return QUEUE_LEASE_PREFIX + ':'.join(key)
+
+
+class HashRing:
+    """一致性哈希环"""
+
+    def __init__(self, nodes: Iterable[str], replicas: int = QUEUE_SHARD_REPLICAS):
+        self.nodes = sorted(set(nodes))
+        points = sorted((_hash(f"{node}#{i}"), node) for node in self.nodes for i in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._owners = [node for _, node in points]
+
+    def node_for(self, value: str) -> Optional[str]:
+        """顺时针第一个虚拟节点所属的成员；环为空时返回 None"""
+        if not self._hashes:
+            return None
+        index = bisect.bisect(self._hashes, _hash(value)) % len(self._hashes)
+        return self._owners[index]
+
+
+class ShardCoordinator:
+    """基于 Redis 的成员心跳与任务租约"""
+
+    def __init__(self, client=None, worker_name: Optional[str] = None, lease_ttl: float = QUEUE_LEASE_TTL,
+                 heartbeat_interval: float = QUEUE_HEARTBEAT_INTERVAL, replicas: int = QUEUE_SHARD_REPLICAS):
+        """
+        Args:
+            client: Redis 客户端，默认 RedisClient 单例
+            worker_name: 成员名称，默认 主机名-进程号（必须在集群内唯一）
+            lease_ttl: 租约与心跳过期秒数
+            heartbeat_interval: 心跳/续约间隔秒数
+            replicas: 虚拟节点数
+        """
+        if heartbeat_interval * 2 > lease_ttl:
+            raise ValueError("心跳间隔需小于租约 TTL 的一半。")
+        self.client = client or RedisClient().client
+        self.worker_name = worker_name or default_consumer_name()
+        self.lease_ttl_ms = int(lease_ttl * 1000)
+        self.heartbeat_interval = heartbeat_interval
+        self.replicas = replicas
+        self.members: List[str] = []
+        self.owned: Set[StreamKey] = set()
+        self._joined = False
+        self._acquire = self.client.register_script(_ACQUIRE_LUA)
+        self._release = self.client.register_script(_RELEASE_LUA)
+
+    def heartbeat(self) -> List[str]:
+        """写入心跳、剔除过期成员，返回存活成员（使用 Redis 服务器时间，避免各节点时钟偏差）"""
+        seconds, micros = self.client.time()
+        now_ms = int(seconds) * 1000 + int(micros) // 1000
+        pipe = self.client.pipeline(transaction=False)
+        pipe.zadd(QUEUE_MEMBERS_KEY, {self.worker_name: now_ms})
+        pipe.zremrangebyscore(QUEUE_MEMBERS_KEY, 0, now_ms - self.lease_ttl_ms)
+        pipe.zrange(QUEUE_MEMBERS_KEY, 0, -1)
+        members = sorted(m.decode() if isinstance(m, bytes) else m for m in pipe.execute()[2])
+
+        if members != self.members:
+            logger.info(f"[Shard] 存活成员: {members}")
+        if not self._joined:
+            self._joined = True
+            # 通知其他成员立即重新分配，不必等到下一次心跳
+            self._announce('join')
+        self.members = members
+        return members
+
+    def assigned(self, keys: Iterable[StreamKey], members: Optional[Sequence[str]] = None) -> Set[StreamKey]:
+        """按哈希环计算归属本进程的任务"""
+        ring = HashRing(self.members if members is None else members, self.replicas)
+        return {key for key in keys if ring.node_for(':'.join(key)) == self.worker_name}
+
+    def claim(self, keys: Iterable[StreamKey]) -> List[StreamKey]:
+        """
+        心跳并认领任务：释放不再归属本进程的租约，获取/续期归属本进程的租约
+
+        Returns:
+            List[StreamKey]: 本进程持有租约、应当运行的任务
+        """
+        keys = set(keys)
+        assigned = self.assigned(keys, self.heartbeat())
+        self.release(self.owned - assigned)
+
+        candidates = sorted(assigned)
+        pipe = self.client.pipeline(transaction=False)
+        for key in candidates:
+            self._acquire(keys=[lease_key(key)], args=[self.worker_name, self.lease_ttl_ms], client=pipe)
+        results = pipe.execute() if candidates else []
+        owned = {key for key, held in zip(candidates, results) if int(held)}
+
+        waiting = len(candidates) - len(owned)
+        if waiting:
+            # 旧持有者尚未释放（或已崩溃，等待租约过期）
+            logger.info(f"[Shard] {waiting} 个任务等待租约释放")
+        self.owned = owned
+        return sorted(owned)
+
+    def release(self, keys: Iterable[StreamKey]) -> None:
+        keys = sorted(keys)
+        if not keys:
+            return
+        pipe = self.client.pipeline(transaction=False)
+        for key in keys:
+            self._release(keys=[lease_key(key)], args=[self.worker_name], client=pipe)
+        pipe.execute()
+        self.owned.difference_update(keys)
+        logger.info(f"[Shard] 释放租约: {keys}")
+
+    def leave(self) -> None:
+        """退出集群：释放全部租约并移除成员，其他成员立即接管"""
+        try:
+            self.release(self.owned)
+            self.client.zrem(QUEUE_MEMBERS_KEY, self.worker_name)
+            self._announce('leave')
+        except Exception as e:
+            logger.warning(f"[Shard] 退出集群失败，租约将在 TTL 后过期: {e}")
+        self._joined = False
+
+    def _announce(self, action: str) -> None:
+        try:
+            publish_queue_event(f"member_{action}", self.worker_name, client=self.client)
+        except Exception as e:
+            logger.warning(f"[Shard] 发布成员变更通知失败: {e}")
+
+    def status(self) -> Dict[str, object]:
+        return {'worker': self.worker_name, 'members': self.members, 'owned': sorted(self.owned)}
@@ -0,0 +1,279 @@
+# WorkLine/queue_supervisor.py
+"""
+queue_supervisor.py
+- 把激活的 fetcher_queue_configs 变成运行中的采集任务：每个 (exchange, symbol, interval) 一个 asyncio 任务
+- 热加载：订阅 Redis 频道 fetcher_queue:events（创建/更新/删除/激活/停用时由
+  ExchangeDataFetcherQueueSettings 发布，订阅线程由 QueueConfigCache 提供），收到通知后重新对账；
+  另有定时对账兜底，防止漏掉通知
+- 任务异常退出后按指数退避重启；稳定运行一段时间后退避重置
+- 可选分片（shard=ShardCoordinator()）：多个进程/节点通过 Redis 租约分摊任务，见 WorkLine/queue_sharding.py
+- 每个任务统计吞吐（条/秒）、完结K线延迟与空闲时间，定期写入 Redis 哈希 fetcher_queue:stats，
+  API（GET /api/queue/workers/stats）与其他进程可直接读取，键为 exchange:SYMBOL:interval
+
+环境变量：
+    QUEUE_RELOAD_INTERVAL  定时对账间隔秒数（默认 60）
+    QUEUE_STATS_INTERVAL   统计写入 Redis 的间隔秒数（默认 10）
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from DatabaseOperator.queue_config_cache import queue_config_cache
+from DatabaseOperator.redis_operator import RedisClient
+from DatabaseOperator.redis_streams import default_consumer_name
+
+logger = logging.getLogger(__name__)
+
+QUEUE_STATS_KEY = 'fetcher_queue:stats'
+QUEUE_RELOAD_INTERVAL = float(os.getenv('QUEUE_RELOAD_INTERVAL', '60'))
+QUEUE_STATS_INTERVAL = float(os.getenv('QUEUE_STATS_INTERVAL', '10'))
+RESTART_BACKOFF_MAX = 60
+# 任务连续运行超过该秒数后，下次异常从最小退避重新开始
+HEALTHY_RUN_SECONDS = 300
+
+# (exchange, symbol, interval)
+StreamKey = Tuple[str, str, str]
+
+
+class TaskStats:
+    """单个采集任务的运行统计"""
+
+    def __init__(self, exchange: str, symbol: str, interval: str):
+        self.exchange = exchange
+        self.symbol = symbol
+        self.interval = interval
+        self.state = 'starting'
+        self.started_at = time.time()
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        self.messages = 0
+        self.closed = 0
+        self.last_message_at: Optional[float] = None
+        self.lag_ms: Optional[int] = None
+        self.rate = 0.0
+        self._window_start = time.monotonic()
+        self._window_messages = 0
+
+    def record(self, kline: dict) -> None:
+        """每收到一条K线调用一次；完结K线记录从收盘到收到的延迟"""
+        now = time.time()
+        self.messages += 1
+        self._window_messages += 1
+        self.last_message_at = now
+        if kline.get('is_closed'):
+            self.closed += 1
+            self.lag_ms = int(now * 1000) - int(kline['close_time'])
+
+    def roll_window(self) -> float:
+        """结束当前统计窗口，更新并返回窗口内的吞吐（条/秒）"""
+        now = time.monotonic()
+        elapsed = now - self._window_start
+        if elapsed > 0:
+            self.rate = self._window_messages / elapsed
+        self._window_start = now
+        self._window_messages = 0
+        return self.rate
+
+    def as_dict(self) -> dict:
+        now = time.time()
+        return {
+            'exchange': self.exchange,
+            'symbol': self.symbol,
+            'interval': self.interval,
+            'state': self.state,
+            'uptime': round(now - self.started_at, 1),
+            'restarts': self.restarts,
+            'last_error': self.last_error,
+            'messages': self.messages,
+            'closed': self.closed,
+            'rate': round(self.rate, 3),
+            'lag_ms': self.lag_ms,
+            'idle_seconds': None if self.last_message_at is None else round(now - self.last_message_at, 1),
+        }
+
+
+def _default_loader() -> List[StreamKey]:
+    from WorkLine.StartSettingSet import Get_worklist
+    return Get_worklist()
+
+
+def task_name(key: StreamKey) -> str:
+    """任务键的字符串形式 exchange:SYMBOL:interval（统计哈希的字段名）"""
+    return ':'.join(key)
+
+
+def read_queue_stats(client=None) -> Dict[str, dict]:
+    """读取 Redis 中各采集任务的统计，键为 'exchange:SYMBOL:interval'"""
+    client = client or RedisClient().client
+    return {(k.decode() if isinstance(k, bytes) else k): json.loads(v)
+            for k, v in client.hgetall(QUEUE_STATS_KEY).items()}
+
+
+class QueueSupervisor:
+    """
+    采集任务监督器
+
+    用法：
+        supervisor = QueueSupervisor(lambda exchange, symbol, interval, stats: ingest(exchange, symbol, interval, stats))
+        await supervisor.run()
+    """
+
+    def __init__(self, task_factory: Callable[[str, str, str, TaskStats], Awaitable[None]],
+                 loader: Optional[Callable[[], List[StreamKey]]] = None, client=None,
+                 reload_interval: float = QUEUE_RELOAD_INTERVAL, stats_interval: float = QUEUE_STATS_INTERVAL,
+                 worker_name: Optional[str] = None, shard=None, config_cache=None):
+        """
+        Args:
+            task_factory: (exchange, symbol, interval, stats) -> 协程，运行一个采集任务；收到每条K线时应调用 stats.record
+            loader: 返回需要运行的 (exchange, symbol, interval) 列表（同步函数，在线程中执行），默认 Get_worklist
+            client: Redis 客户端（写统计），默认 RedisClient 单例
+            reload_interval: 定时对账间隔秒数
+            stats_interval: 统计写入 Redis 的间隔秒数
+            worker_name: 写入统计中的工作进程名称，默认 主机名-进程号
+            shard: 可选的 ShardCoordinator；设置后只运行本进程持有租约的任务，
+                   对账间隔不超过其心跳间隔（对账即心跳与续约）
+            config_cache: 订阅配置变更通知所用的 QueueConfigCache，默认全局实例
+        """
+        self.task_factory = task_factory
+        self.loader = loader or _default_loader
+        self.shard = shard
+        if shard is not None:
+            reload_interval = min(reload_interval, shard.heartbeat_interval)
+            stats_interval = min(stats_interval, shard.heartbeat_interval)
+            worker_name = worker_name or shard.worker_name
+        self.reload_interval = reload_interval
+        self.stats_interval = stats_interval
+        self.worker_name = worker_name or default_consumer_name()
+        if client is None:
+            try:
+                client = RedisClient().client
+            except Exception as e:
+                logger.warning(f"[Supervisor] Redis 不可用，不写任务统计: {e}")
+        self.client = client
+        self.tasks: Dict[StreamKey, asyncio.Task] = {}
+        self.stats: Dict[StreamKey, TaskStats] = {}
+        self.config_cache = config_cache or queue_config_cache
+        self._reload: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ---------- 任务管理 ----------
+
+    async def _run_task(self, key: StreamKey, stats: TaskStats) -> None:
+        """运行单个采集任务，异常或意外结束时按指数退避重启"""
+        name = ' '.join(key)
+        backoff = 1
+        while True:
+            started = time.monotonic()
+            stats.state = 'running'
+            try:
+                await self.task_factory(*key, stats)
+                stats.last_error = 'exited'
+                logger.warning(f"[Supervisor] 任务 {name} 已结束，{backoff}s 后重启")
+            except asyncio.CancelledError:
+                stats.state = 'stopped'
+                raise
+            except Exception as e:
+                stats.last_error = f"{type(e).__name__}: {e}"
+                logger.error(f"[Supervisor] 任务 {name} 异常: {e}，{backoff}s 后重启", exc_info=True)
+            if time.monotonic() - started > HEALTHY_RUN_SECONDS:
+                backoff = 1
+            stats.state = 'backoff'
+            stats.restarts += 1
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, RESTART_BACKOFF_MAX)
+
+    def _start(self, key: StreamKey) -> None:
+        stats = self.stats[key] = TaskStats(*key)
+        self.tasks[key] = asyncio.create_task(self._run_task(key, stats), name=f"ingest:{task_name(key)}")
+        logger.info(f"[Supervisor] 启动采集任务 {' '.join(key)}")
+
+    async def _stop(self, key: StreamKey) -> None:
+        task = self.tasks.pop(key)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        self.stats.pop(key, None)
+        if self.client is not None:
+            try:
+                await asyncio.to_thread(self.client.hdel, QUEUE_STATS_KEY, task_name(key))
+            except Exception as e:
+                logger.warning(f"[Supervisor] 清理任务统计失败: {e}")
+        logger.info(f"[Supervisor] 停止采集任务 {' '.join(key)}")
+
+    async def reconcile(self) -> None:
+        """按当前配置启动新增任务、停止已移除的任务"""
+        try:
+            desired = set(await asyncio.to_thread(self.loader))
+        except Exception as e:
+            logger.error(f"[Supervisor] 读取队列配置失败，保持当前任务: {e}")
+            desired = set(self.tasks)
+        if self.shard is not None:
+            try:
+                desired = set(await asyncio.to_thread(self.shard.claim, desired))
+            except Exception as e:
+                # 无法续约时租约可能已被他人接管，停止全部任务以保证不重复采集
+                logger.error(f"[Supervisor] 分片心跳失败，停止本进程任务: {e}")
+                desired = set()
+        current = set(self.tasks)
+        for key in sorted(current - desired):
+            await self._stop(key)
+        for key in sorted(desired - current):
+            self._start(key)
+        if desired != current:
+            logger.info(f"[Supervisor] 当前采集任务: {sorted(self.tasks)}")
+
+    # ---------- 通知与统计 ----------
+
+    def _on_config_event(self, event: dict) -> None:
+        """配置缓存监听线程中的回调：唤醒事件循环中的对账"""
+        logger.info(f"[Supervisor] 收到队列配置变更: {event}")
+        self._loop.call_soon_threadsafe(self._reload.set)
+
+    def snapshot(self) -> Dict[str, dict]:
+        """各任务的当前统计，键为 'exchange:SYMBOL:interval'"""
+        return {task_name(key): {**stats.as_dict(), 'worker': self.worker_name}
+                for key, stats in self.stats.items()}
+
+    def flush_stats(self) -> None:
+        """结束统计窗口并把快照写入 Redis 哈希"""
+        for stats in list(self.stats.values()):
+            stats.roll_window()
+        snapshot = self.snapshot()
+        if self.client is None or not snapshot:
+            return
+        self.client.hset(QUEUE_STATS_KEY, mapping={k: json.dumps(v) for k, v in snapshot.items()})
+
+    # ---------- 主循环 ----------
+
+    async def run(self) -> None:
+        """对账并持续监督，直到被取消"""
+        self._loop = asyncio.get_running_loop()
+        self._reload = asyncio.Event()
+        # 复用配置缓存的订阅线程：缓存先失效，再触发对账，因此对账读到的是新配置
+        self.config_cache.add_listener(self._on_config_event)
+
+        try:
+            await self.reconcile()
+            next_reload = time.monotonic() + self.reload_interval
+            while True:
+                try:
+                    await asyncio.wait_for(self._reload.wait(), timeout=self.stats_interval)
+                except asyncio.TimeoutError:
+                    pass
+                if self._reload.is_set() or time.monotonic() >= next_reload:
+                    # 短时间内的多条通知合并为一次对账
+                    self._reload.clear()
+                    await self.reconcile()
+                    next_reload = time.monotonic() + self.reload_interval
+                try:
+                    await asyncio.to_thread(self.flush_stats)
+                except Exception as e:
+                    logger.warning(f"[Supervisor] 写入任务统计失败: {e}")
+        finally:
+            self.config_cache.remove_listener(self._on_config_event)
+            for key in list(self.tasks):
+                await self._stop(key)
+            if self.shard is not None:
+                await asyncio.to_thread(self.shard.leave)
@@ -0,0 +1,177 @@
+# WorkLine/stream_workers.py
+"""
+stream_workers.py
+- 基于 Redis Streams 的跨进程指标/策略消费者（事件总线见 DatabaseOperator/redis_streams.py）
+- indicator：消费者组读取 stream:kline:<SYMBOL>，增量计算指标，写入 ma_<symbol>，
+  并把指标记录发布到 stream:indicator:<SYMBOL>；同组可启动多个进程分摊交易对
+- strategy：消费者组读取 stream:indicator:<SYMBOL>，按均线交叉生成交易信号
+
+先处理、再发布、最后确认：进程崩溃时未确认的K线会在重启后重放；崩溃后没有重启的消费者留下的消息，
+由同组其他消费者在消费循环中按 REDIS_STREAM_CLAIM_IDLE_MS 接管（StreamConsumer.claim_stale）。
+重复的K线由 IncrementalIndicators 按 open_time 忽略，ma_<symbol> 写入为 upsert。
+
+采集端需开启 REDIS_STREAMS=true（main.py）或调用 get_kline_websocket(..., stream=True)。
+
+用法：
+    cd app
+    python -m WorkLine.stream_workers indicator --symbols BTCUSDT,ETHUSDT
+    python -m WorkLine.stream_workers strategy --symbols BTCUSDT,ETHUSDT --fast ema5 --slow ema20
+"""
+import argparse
+import logging
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Sequence
+
+from DatabaseOperator.redis_streams import (REDIS_STREAM_CLAIM_IDLE_MS, StreamConsumer, StreamMessage,
+                                            StreamPublisher, indicator_stream_key, kline_stream_key)
+from DataProcessingCalculator.incremental_indicators import CrossoverDetector, IncrementalIndicators
+
+logger = logging.getLogger(__name__)
+
+INDICATOR_GROUP = 'indicator-engine'
+STRATEGY_GROUP = 'strategy'
+
+
+def _load_history(symbol: str, interval: str):
+    """读取已完结的历史K线用于预热指标"""
+    from DataProcessingCalculator.DataAnalyze import load_kline_dataframe
+    df = load_kline_dataframe(symbol, interval)
+    if df.empty:
+        return [], []
+    df = df[df['close_time'] < datetime.now(timezone.utc)]
+    return (df['open_time'].astype('int64') // 1_000_000).tolist(), df['close'].tolist()
+
+
+class IndicatorStreamWorker:
+    """K线流 -> 指标流"""
+
+    def __init__(self, symbols: Sequence[str], group: str = INDICATOR_GROUP, consumer: Optional[str] = None,
+                 client=None, store: bool = True, seed: bool = True, count: int = 100, block_ms: int = 5000,
+                 claim_idle_ms: int = REDIS_STREAM_CLAIM_IDLE_MS):
+        """
+        Args:
+            symbols: 交易对列表
+            group / consumer: 消费者组与消费者名称
+            client: Redis 客户端（测试时可注入 fakeredis）
+            store: 是否写入 ma_<symbol>
+            seed: 首次遇到 (symbol, interval) 时是否用数据库历史预热
+            count / block_ms: 每次读取的条数与阻塞时间
+            claim_idle_ms: 接管同组其他消费者闲置消息的阈值（毫秒），0 表示不接管
+        """
+        self.consumer = StreamConsumer([kline_stream_key(s) for s in symbols], group, consumer,
+                                       client=client, count=count, block_ms=block_ms, claim_idle_ms=claim_idle_ms)
+        self.publisher = StreamPublisher(client=self.consumer.client)
+        self.store = store
+        self.seed = seed
+        self._indicators: Dict[tuple, IncrementalIndicators] = {}
+
+    def _state(self, symbol: str, interval: str) -> IncrementalIndicators:
+        key = (symbol, interval)
+        indicators = self._indicators.get(key)
+        if indicators is None:
+            indicators = self._indicators[key] = IncrementalIndicators()
+            if self.seed:
+                indicators.seed(*_load_history(symbol, interval))
+                logger.info(f"[StreamWorker] {symbol} {interval} 预热 {indicators.count} 根K线")
+        return indicators
+
+    def handle(self, messages: List[StreamMessage]) -> int:
+        """处理一批K线：计算指标、批量写库、pipeline 批量发布，返回发布的记录数"""
+        records: Dict[str, List[dict]] = {}
+        events = []
+        for message in messages:
+            kline = message.event
+            symbol, interval = kline['symbol'].upper(), kline['interval']
+            record = self._state(symbol, interval).update(int(kline['open_time']), float(kline['close']))
+            if record is None:
+                continue
+            records.setdefault(symbol, []).append(record)
+            events.append((indicator_stream_key(symbol), {'symbol': symbol, 'interval': interval, **record}))
+
+        if self.store:
+            from DataProcessingCalculator.DataAnalyze import store_indicator_records
+            for symbol, rows in records.items():
+                store_indicator_records(symbol, rows)
+        self.publisher.publish_many(events)
+        return len(events)
+
+    def run(self, max_batches: Optional[int] = None) -> int:
+        """持续消费；返回确认的消息数"""
+        logger.info(f"[StreamWorker] 指标消费者 {self.consumer.consumer} 启动: {self.consumer.streams}")
+        return self.consumer.process(self.handle, max_batches)
+
+
+class StrategyStreamWorker:
+    """指标流 -> 交易信号"""
+
+    def __init__(self, symbols: Sequence[str], fast_column: str = 'ema5', slow_column: str = 'ema20',
+                 group: str = STRATEGY_GROUP, consumer: Optional[str] = None, client=None,
+                 execute: bool = False, count: int = 100, block_ms: int = 5000,
+                 claim_idle_ms: int = REDIS_STREAM_CLAIM_IDLE_MS):
+        """
+        Args:
+            symbols: 交易对列表
+            fast_column / slow_column: 快慢线字段
+            execute: 是否调用 trader.execute_trade 下单（默认只记录信号）
+            claim_idle_ms: 接管同组其他消费者闲置消息的阈值（毫秒），0 表示不接管
+        """
+        # 新建的策略组只关心之后的指标
+        self.consumer = StreamConsumer([indicator_stream_key(s) for s in symbols], group, consumer,
+                                       client=client, count=count, block_ms=block_ms, start_id='$',
+                                       claim_idle_ms=claim_idle_ms)
+        self.detector = CrossoverDetector(fast_column, slow_column)
+        self.execute = execute
+        self.signals: List[dict] = []
+
+    def handle(self, messages: List[StreamMessage]) -> None:
+        for message in messages:
+            event = message.event
+            signal_event = self.detector.update(event['symbol'], event['interval'], event)
+            if signal_event is None:
+                continue
+            logger.info(f"[Signal] {signal_event}")
+            self.signals.append(signal_event)
+            if self.execute:
+                from trader import execute_trade
+                execute_trade((signal_event['action'], signal_event['price']))
+
+    def run(self, max_batches: Optional[int] = None) -> int:
+        logger.info(f"[StreamWorker] 策略消费者 {self.consumer.consumer} 启动: {self.consumer.streams}")
+        return self.consumer.process(self.handle, max_batches)
+
+
+def main():
+    """命令行入口"""
+    from config.logging_config import setup_logging
+    setup_logging()
+
+    parser = argparse.ArgumentParser(description='Redis Streams 指标/策略消费者')
+    parser.add_argument('role', choices=['indicator', 'strategy'], help='消费者角色')
+    parser.add_argument('--symbols', required=True, help='交易对，逗号分隔')
+    parser.add_argument('--group', default=None, help='消费者组（默认按角色）')
+    parser.add_argument('--consumer', default=None, help='消费者名称（默认 主机名-进程号）')
+    parser.add_argument('--count', type=int, default=100, help='每次读取的最大条数')
+    parser.add_argument('--claim-idle-ms', type=int, default=REDIS_STREAM_CLAIM_IDLE_MS,
+                        help='接管同组其他消费者闲置超过该毫秒数的消息，0 表示不接管')
+    parser.add_argument('--no-store', action='store_true', help='指标不写入 ma_<symbol>')
+    parser.add_argument('--fast', default='ema5', help='策略快线字段')
+    parser.add_argument('--slow', default='ema20', help='策略慢线字段')
+    parser.add_argument('--execute', action='store_true', help='策略信号直接下单')
+    args = parser.parse_args()
+
+    symbols = [s.strip().upper() for s in args.symbols.split(',') if s.strip()]
+    if args.role == 'indicator':
+        worker = IndicatorStreamWorker(symbols, args.group or INDICATOR_GROUP, args.consumer,
+                                       store=not args.no_store, count=args.count, claim_idle_ms=args.claim_idle_ms)
+    else:
+        worker = StrategyStreamWorker(symbols, args.fast, args.slow, args.group or STRATEGY_GROUP,
+                                      args.consumer, execute=args.execute, count=args.count,
+                                      claim_idle_ms=args.claim_idle_ms)
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        logger.info(f"[StreamWorker] 已停止，待确认: {worker.consumer.pending()}")
+
+
+if __name__ == '__main__':
+    main()
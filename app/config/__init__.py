@@ -15,6 +15,13 @@ from .logging_config import (
 
 from .basicConfig import (
     BINANCE_API_BASE_URL, 
+    BINANCE_WS_STREAM_URL,
+    BINANCE_TRADE_API_URL,
+    BINANCE_WS_API_URL,
+    BINANCE_USER_STREAM_URL,
+    MOCK_EXCHANGE_URL,
+    BINANCE_API_KEY,
+    BINANCE_PRIVATE_KEY_PATH,
     DEFAULT_SYMBOL,
     DATABASE_URL,
     REDIS_URL,
@@ -34,6 +41,13 @@ __all__ = [
     'quick_setup',
     # 基础配置
     'BINANCE_API_BASE_URL',
+    'BINANCE_WS_STREAM_URL',
+    'BINANCE_TRADE_API_URL',
+    'BINANCE_WS_API_URL',
+    'BINANCE_USER_STREAM_URL',
+    'MOCK_EXCHANGE_URL',
+    'BINANCE_API_KEY',
+    'BINANCE_PRIVATE_KEY_PATH',
     'DEFAULT_SYMBOL',
     'DATABASE_URL',
     'REDIS_URL',
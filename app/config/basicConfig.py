@@ -17,8 +17,30 @@ load_dotenv()
 # 默认交易对
 DEFAULT_SYMBOL = os.getenv('DEFAULT_SYMBOL', 'ETHUSDT')
 
-# API配置
-BINANCE_API_BASE_URL = os.getenv('BINANCE_API_BASE_URL', 'https://api.binance.com/api/v3/')
+# 本地模拟交易所（MockExchange/server.py）地址，例如 http://127.0.0.1:8700
+# 设置后下面所有交易所地址都指向模拟交易所，用于离线压测
+MOCK_EXCHANGE_URL = os.getenv('MOCK_EXCHANGE_URL', '').rstrip('/')
+_MOCK_WS_URL = MOCK_EXCHANGE_URL.replace('http', 'ws', 1)
+
+# API配置（行情 REST）
+BINANCE_API_BASE_URL = (f'{MOCK_EXCHANGE_URL}/api/v3/' if MOCK_EXCHANGE_URL
+                        else os.getenv('BINANCE_API_BASE_URL', 'https://api.binance.com/api/v3/'))
+
+# 行情 WebSocket（K线/深度/成交流），连接地址为 <BINANCE_WS_STREAM_URL>/ws/<stream>
+BINANCE_WS_STREAM_URL = (_MOCK_WS_URL if MOCK_EXCHANGE_URL
+                         else os.getenv('BINANCE_WS_STREAM_URL', 'wss://stream.binance.com:9443'))
+
+# 下单/账户 REST（默认测试网）
+BINANCE_TRADE_API_URL = (f'{MOCK_EXCHANGE_URL}/api/v3/' if MOCK_EXCHANGE_URL
+                         else os.getenv('BINANCE_TRADE_API_URL', 'https://testnet.binance.vision/api/v3/'))
+
+# WebSocket API（order.place 等，默认测试网）
+BINANCE_WS_API_URL = (f'{_MOCK_WS_URL}/ws-api/v3' if MOCK_EXCHANGE_URL
+                      else os.getenv('BINANCE_WS_API_URL', 'wss://ws-api.testnet.binance.vision/ws-api/v3'))
+
+# 用户数据流 WebSocket，连接地址为 <BINANCE_USER_STREAM_URL>/<listenKey>（默认测试网）
+BINANCE_USER_STREAM_URL = (f'{_MOCK_WS_URL}/ws' if MOCK_EXCHANGE_URL
+                           else os.getenv('BINANCE_USER_STREAM_URL', 'wss://stream.testnet.binance.vision/ws'))
 
 # 测试用 API 密钥 (生产环境应从环境变量获取)
 BINANCE_API_KEY = os.getenv('BINANCE_API_KEY', 'PqG0U5YaArRtRKFPzXXS3AWnBX817uSpYnMIluDkG0RyDVVcphhtUsvLgw46MtJH')
@@ -1,14 +1,46 @@
 # main.py
-# 目前不具备完整的交易逻辑和API接口功能
+"""
+Production environment Entry Point
+在同一个事件循环中并发运行：
+- kline_rollfetch      WebSocket 采集K线（写库），K线完结时发布 kline.closed 事件
+- indicator_engine     订阅 kline.closed，增量更新 EMA/MACD 并写入 ma_<symbol>，发布 indicator.updated
+- FortunepointFounder  订阅 indicator.updated，按均线交叉生成交易信号
+- API 服务             uvicorn.Server.serve() 作为同一循环中的任务（RUN_API=false 可关闭）
+
+采集与指标任务由 QueueSupervisor 按激活的 fetcher_queue_configs 启停，队列激活/停用后通过
+Redis 频道 fetcher_queue:events 热加载，任务统计写入 fetcher_queue:stats（见 WorkLine/queue_supervisor.py）。
+
+信号由K线完结事件驱动（进程内发布/订阅，见 WorkLine/event_bus.py），不再轮询数据库。
+
+环境变量：
+    RUN_API              是否在同一进程中运行 API（默认 true）
+    API_PORT             API 端口（默认 8000）
+    KLINE_DB_WRITE       采集的K线是否写库（默认 true）
+    KLINE_ROLLUP         1m K线是否同时维护聚合表（默认 false）
+    QUEUE_SHARDING       多个进程/节点分摊采集任务（默认 false，见 WorkLine/queue_sharding.py）
+    KLINE_RING_ENABLED   采集的K线是否写入进程内环形缓冲区（默认 true，见 DataProcessingCalculator/kline_ring.py）
+    DEPTH_SYMBOLS        逗号分隔的交易对，维护本地订单簿并定时写入压缩快照（默认空，见 ExchangeFetcher/depth_book.py）
+    ORDER_GATEWAY        信号是否通过 WebSocket API 实际下单（默认 false 只输出，见 ExchangeBill/order_gateway.py）
+    USER_DATA_STREAM     是否订阅用户数据流，实时更新 BinanceOrders 与未完结订单索引（默认 false，见 ExchangeBill/user_data_stream.py）
+    PNL_SERVICE          增量盈亏：K线更新最新价，成交回报更新持仓与成本，快照批量写入 pnl_snapshots（默认 false，见 DataProcessingCalculator/pnl_service.py）
+    PNL_SYMBOLS          逗号分隔的交易对，盈亏服务启动时从数据库冷启动（默认 SYMBOL）
+    RISK_ENGINE          下单前内存风控：K线更新最新价，成交回报更新持仓，定时与 BinanceOrders 对账（默认 true，见 ExchangeBill/risk_engine.py）
+    TRADE_SYMBOLS        逗号分隔的交易对，采集归集成交并批量 COPY 入库（默认空，见 ExchangeFetcher/trade_stream.py）
+    TRADE_BARS           由成交流生成的K线，例如 volume:100,dollar:1000000，完结时发布 trade.bar 事件
+    STREAM_RECORD        是否把K线、成交与深度流的原始消息（深度含 REST 快照）录制到压缩文件，供离线回放（默认 false，见 ExchangeFetcher/stream_recorder.py）
+    REDIS_STREAMS        完结K线是否同时 XADD 到 Redis Stream，供其他进程消费（默认 false，见 WorkLine/stream_workers.py）
+    SIGNAL_FAST_COLUMN   信号快线（默认 ema5）
+    SIGNAL_SLOW_COLUMN   信号慢线（默认 ema20）
+"""
 
 import os
 import sys
-import time
+import signal
 import uvicorn
 import asyncio
 import logging
 from pathlib import Path
-from sqlalchemy import Table, MetaData
+from datetime import datetime, timezone
 
 # 添加当前目录到Python路径，确保可以导入其他模块
 current_dir = Path(__file__).parent
@@ -16,33 +48,210 @@ if str(current_dir) not in sys.path:
     sys.path.insert(0, str(current_dir))
 
 # 导入内部组件
+from config import SYMBOL
 from config.logging_config import setup_logging, get_logger
-from DatabaseOperator import *
-from ExchangeFetcher import fetch_price, get_kline
-from WorkLine import main as workline_main
+from WorkLine.event_bus import EventBus, TOPIC_KLINE_CLOSED, TOPIC_INDICATOR_UPDATED, TOPIC_SIGNAL, TOPIC_TRADE_BAR
+from WorkLine.queue_supervisor import QueueSupervisor
+
+logger = get_logger(__name__)
+
+RESTART_BACKOFF_MAX = 60
+
 
-async def QueueSettings():
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() in ('1', 'true', 'yes', 'on')
+
+
+async def _run_forever(name: str, coro_factory):
     '''
-    异步设置队列
-    需要定义队列的名称和相关参数
+    运行长期任务，异常退出时按指数退避重启；取消时直接退出
     '''
-    logging.info("开始设置Queue队列")
+    backoff = 1
+    while True:
+        try:
+            await coro_factory()
+            logger.warning(f"[Main] 任务 {name} 已结束，{backoff}s 后重启")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[Main] 任务 {name} 异常: {e}，{backoff}s 后重启", exc_info=True)
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, RESTART_BACKOFF_MAX)
+
 
+def _load_worklist():
+    '''激活的 (exchange, symbol, interval) 列表；没有激活的队列时回退到默认交易对的 binance 1m K线'''
+    from WorkLine.StartSettingSet import Get_worklist
+    return Get_worklist(SYMBOL)
 
-async def kline_rollfetch():
+
+async def kline_rollfetch(bus: EventBus, exchange: str, symbol: str, interval: str, stats=None):
     '''
     异步获取K线数据并存储到数据库
-    相关参数需要被定义在 redis 与主数据库
-    运行时优先执行数据表离散度分析
+    K线完结时发布 kline.closed 事件（REDIS_STREAMS=true 时同时写入 stream:kline:<SYMBOL>）
+    stats 为 QueueSupervisor 的 TaskStats，用于统计吞吐与延迟
+    KLINE_RING_ENABLED=true 时每条K线同时写入环形缓冲区，最近K线的读取无需查询数据库
+    exchange 取自队列配置，决定适配器（见 ExchangeFetcher/exchange_adapter.py）；binance 之外的交易所以
+    <EXCHANGE>_<SYMBOL> 为存储与事件中的交易对（见 kline_store.storage_symbol）
+    RISK_ENGINE=true 时每条K线的收盘价更新风控引擎的最新价格，PNL_SERVICE=true 时同时更新未实现盈亏（仅 binance）
+    '''
+    logging.info(f"开始异步获取K线数据: {exchange} {symbol} {interval}")
+    from DatabaseOperator.kline_store import storage_symbol
+    from DatabaseOperator.pg_operator import Session
+    from ExchangeFetcher.exchange_adapter import DEFAULT_EXCHANGE, get_adapter
+    from ExchangeFetcher.fetcher import get_kline_websocket
+
+    adapter = get_adapter(exchange)
+    series = storage_symbol(symbol, adapter.name)
+    # 风控与盈亏按下单交易所的价格计算，其他交易所的行情不参与
+    trading = adapter.name == DEFAULT_EXCHANGE
+
+    rings = None
+    if _env_flag('KLINE_RING_ENABLED', 'true'):
+        from DataProcessingCalculator.kline_ring import kline_rings
+        rings = kline_rings
+        if rings.buffer(series, interval, create=False) is None:
+            try:
+                await asyncio.to_thread(rings.seed, series, interval)
+            except Exception as e:
+                logger.warning(f"[Main] K线环形缓冲区预热失败 {series} {interval}: {e}")
+
+    risk = None
+    if trading and _env_flag('RISK_ENGINE', 'true'):
+        from ExchangeBill.risk_engine import get_risk_engine
+        risk = get_risk_engine()
+    pnl = None
+    if trading and _env_flag('PNL_SERVICE', 'false'):
+        from DataProcessingCalculator.pnl_service import get_pnl_service
+        pnl = get_pnl_service()
+
+    def on_kline(kline):
+        if risk is not None:
+            risk.update_price(symbol, float(kline['close']))
+        if pnl is not None:
+            pnl.on_price(symbol, float(kline['close']))
+        if stats is not None:
+            stats.record(kline)
+        if rings is not None:
+            rings.update(series, interval, kline)
+        if kline.get('is_closed'):
+            bus.publish(TOPIC_KLINE_CLOSED, {'symbol': series, 'interval': interval, 'exchange': adapter.name,
+                                             'kline': kline})
+
+    recorder = None
+    if _env_flag('STREAM_RECORD', 'false'):
+        from ExchangeFetcher.stream_recorder import get_stream_recorder
+        recorder = get_stream_recorder()
+
+    dbr = _env_flag('KLINE_DB_WRITE', 'true')
+    session = Session() if dbr else None
+    try:
+        await get_kline_websocket(symbol, interval, dbr=dbr, session=session, callback=on_kline,
+                                  auto_commit=True, rollup=_env_flag('KLINE_ROLLUP', 'false'),
+                                  collect=False, stream=_env_flag('REDIS_STREAMS', 'false'), recorder=recorder,
+                                  adapter=adapter)
+    finally:
+        if session is not None:
+            session.close()
+
+
+async def indicator_engine(bus: EventBus, symbol: str, interval: str, store: bool = True, exchange: str = 'binance'):
+    '''
+    订阅 kline.closed，增量计算指标并发布 indicator.updated
+    启动时用历史完结K线预热，之后每根K线 O(1) 更新
+    symbol 为存储用的交易对（binance 之外为 <EXCHANGE>_<SYMBOL>），exchange 随事件发布给信号任务
+    '''
+    from DataProcessingCalculator.incremental_indicators import IncrementalIndicators
+
+    # 先订阅再预热，预热期间到达的事件不会丢失（重复的K线会被忽略）
+    subscription = bus.subscribe(TOPIC_KLINE_CLOSED)
+    indicators = IncrementalIndicators()
+
+    def load_history():
+        from DataProcessingCalculator.DataAnalyze import load_kline_dataframe
+        df = load_kline_dataframe(symbol, interval)
+        if df.empty:
+            return [], []
+        df = df[df['close_time'] < datetime.now(timezone.utc)]
+        return (df['open_time'].astype('int64') // 1_000_000).tolist(), df['close'].tolist()
+
+    try:
+        open_times, closes = await asyncio.to_thread(load_history)
+        indicators.seed(open_times, closes)
+        logger.info(f"[Indicators] {symbol} {interval} 预热 {indicators.count} 根K线")
+
+        async for event in subscription:
+            if event['symbol'] != symbol or event['interval'] != interval:
+                continue
+            kline = event['kline']
+            record = indicators.update(int(kline['open_time']), float(kline['close']))
+            if record is None:
+                continue
+            if store:
+                from DataProcessingCalculator.DataAnalyze import store_indicator_records
+                await asyncio.to_thread(store_indicator_records, symbol, [record])
+            bus.publish(TOPIC_INDICATOR_UPDATED, {'symbol': symbol, 'interval': interval, 'exchange': exchange,
+                                                  **record})
+    finally:
+        subscription.close()
+
+
+async def ingest_stream(bus: EventBus, exchange: str, symbol: str, interval: str, stats=None):
     '''
-    logging.info("开始异步获取K线数据,优先执行数据表离散度分析")
+    单个 (exchange, symbol, interval) 的采集 + 指标任务；任一子任务异常时一起退出，由监督器整体重启
+    '''
+    from DatabaseOperator.kline_store import storage_symbol
+
+    async with asyncio.TaskGroup() as group:
+        group.create_task(indicator_engine(bus, storage_symbol(symbol, exchange), interval, exchange=exchange))
+        group.create_task(kline_rollfetch(bus, exchange, symbol, interval, stats))
+
 
-async def FortunepointFounder():
+async def FortunepointFounder(bus: EventBus, fast_column: str = 'ema5', slow_column: str = 'ema20', gateway=None):
     '''
     异步获取交易信号
-    需要定义交易策略和信号生成逻辑
+    订阅 indicator.updated，快线上穿慢线发出 BUY，下穿发出 SELL
+    提供 gateway（OrderGateway）时通过 WebSocket API 下单；下单在独立任务中执行，不阻塞信号处理
+    binance 之外交易所的行情只发布信号，不下单
     '''
     logging.info("开始异步获取交易信号")
+    from trader import execute_trade_async
+    from DataProcessingCalculator.incremental_indicators import CrossoverDetector
+
+    orders = set()
+
+    def on_order_done(task):
+        orders.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"[Signal] 下单失败: {task.exception()}")
+
+    subscription = bus.subscribe(TOPIC_INDICATOR_UPDATED)
+    detector = CrossoverDetector(fast_column, slow_column)
+    try:
+        async for event in subscription:
+            signal_event = detector.update(event['symbol'], event['interval'], event)
+            if signal_event is None:
+                continue
+            logger.info(f"[Signal] {signal_event}")
+            bus.publish(TOPIC_SIGNAL, signal_event)
+            if event.get('exchange', 'binance') != 'binance':
+                continue
+            task = asyncio.create_task(execute_trade_async(
+                (signal_event['action'], signal_event['price']), signal_event['symbol'], gateway))
+            orders.add(task)
+            task.add_done_callback(on_order_done)
+    finally:
+        subscription.close()
+
+
+async def serve_api():
+    '''
+    在当前事件循环中运行 FastAPI（替代阻塞的 uvicorn.run）
+    '''
+    port = int(os.getenv("API_PORT", "8000"))
+    server = uvicorn.Server(uvicorn.Config("myfastapi.main:app", host="0.0.0.0", port=port))
+    await server.serve()
+
 
 async def main():
     '''
@@ -50,13 +259,113 @@ async def main():
     '''
     # 设置统一的日志配置
     setup_logging()
-    logger = get_logger(__name__)
-    
     logger.info("应用程序启动")
     logging.info("启动主程序")
 
+    bus = EventBus()
+    # 采集任务由监督器按激活的 fetcher_queue_configs 启停（没有激活的队列时使用默认交易对的 1m K线）
+    shard = None
+    if _env_flag('QUEUE_SHARDING', 'false'):
+        # 多进程/多节点部署：按一致性哈希 + Redis 租约分摊采集任务
+        from WorkLine.queue_sharding import ShardCoordinator
+        shard = ShardCoordinator()
+    supervisor = QueueSupervisor(
+        lambda exchange, symbol, interval, stats: ingest_stream(bus, exchange, symbol, interval, stats),
+        loader=_load_worklist, shard=shard)
+
+    risk = None
+    if _env_flag('RISK_ENGINE', 'true'):
+        from ExchangeBill.risk_engine import get_risk_engine
+        risk = get_risk_engine()
+    pnl = None
+    if _env_flag('PNL_SERVICE', 'false'):
+        from DataProcessingCalculator.pnl_service import get_pnl_service
+        pnl = get_pnl_service()
+
+    gateway = None
+    if _env_flag('ORDER_GATEWAY', 'false'):
+        from ExchangeBill.order_gateway import OrderGateway
+        gateway = OrderGateway(risk_engine=risk or False)
+
+    tasks = [
+        asyncio.create_task(_run_forever('signal', lambda: FortunepointFounder(
+            bus, os.getenv('SIGNAL_FAST_COLUMN', 'ema5'), os.getenv('SIGNAL_SLOW_COLUMN', 'ema20'), gateway)),
+            name='signal'),
+        asyncio.create_task(_run_forever('supervisor', supervisor.run), name='supervisor'),
+    ]
+    if _env_flag('USER_DATA_STREAM', 'false'):
+        from ExchangeBill.user_data_stream import UserDataStream
+        execution_handlers = [handler for handler in (risk.apply if risk is not None else None,
+                                                      pnl.apply_order if pnl is not None else None) if handler]
+
+        def on_execution(record):
+            for handler in execution_handlers:
+                handler(record)
+
+        user_stream = UserDataStream(on_execution=on_execution if execution_handlers else None)
+        tasks.append(asyncio.create_task(_run_forever('user-stream', user_stream.run), name='user-stream'))
+    if risk is not None and gateway is not None:
+        # 对账前先把订单日志中待写的记录落库
+        from DatabaseOperator.order_journal import get_order_journal
+        risk.journal = get_order_journal()
+        tasks.append(asyncio.create_task(_run_forever('risk-reconcile', risk.run_reconcile_loop),
+                                         name='risk-reconcile'))
+    if pnl is not None:
+        pnl_symbols = [s.strip().upper() for s in os.getenv('PNL_SYMBOLS', SYMBOL).split(',') if s.strip()]
+        tasks.append(asyncio.create_task(_run_forever('pnl', lambda: pnl.run(pnl_symbols)), name='pnl'))
+    depth_symbols = [s.strip().upper() for s in os.getenv('DEPTH_SYMBOLS', '').split(',') if s.strip()]
+    trade_symbols = [s.strip().upper() for s in os.getenv('TRADE_SYMBOLS', '').split(',') if s.strip()]
+    stream_recorder = None
+    if (depth_symbols or trade_symbols) and _env_flag('STREAM_RECORD', 'false'):
+        from ExchangeFetcher.stream_recorder import get_stream_recorder
+        stream_recorder = get_stream_recorder()
+    if depth_symbols:
+        from ExchangeFetcher.depth_book import DepthSnapshotStore, run_depth_stream
+        store = DepthSnapshotStore()
+        for depth_symbol in depth_symbols:
+            tasks.append(asyncio.create_task(_run_forever(
+                f'depth:{depth_symbol}',
+                lambda s=depth_symbol: run_depth_stream(s, snapshot_store=store, recorder=stream_recorder)),
+                name=f'depth:{depth_symbol}'))
+    if trade_symbols:
+        from ExchangeFetcher.trade_stream import AggTradeIngester, run_agg_trade_stream
+        from DataProcessingCalculator.trade_bars import parse_bar_specs
+        for trade_symbol in trade_symbols:
+            # 处理器在重启之间保留，重连后从最后处理的成交继续补采
+            ingester = AggTradeIngester(trade_symbol, bar_builders=parse_bar_specs(os.getenv('TRADE_BARS', '')),
+                                        on_bar=lambda bar: bus.publish(TOPIC_TRADE_BAR, bar))
+            tasks.append(asyncio.create_task(_run_forever(
+                f'trades:{trade_symbol}', lambda s=trade_symbol, i=ingester: run_agg_trade_stream(s, i, recorder=stream_recorder)),
+                name=f'trades:{trade_symbol}'))
+
+    stop = asyncio.Event()
+    waiters = [asyncio.create_task(stop.wait())]
+    if _env_flag('RUN_API', 'true'):
+        # uvicorn 自行处理 SIGINT/SIGTERM，API 退出即整体退出
+        waiters.append(asyncio.create_task(serve_api(), name='api'))
+    else:
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+    try:
+        await asyncio.wait(waiters, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        logger.info(f"[Main] 正在停止，采集任务统计: {supervisor.snapshot()}，事件统计: {bus.stats()}")
+        if risk is not None:
+            logger.info(f"[Main] 风控统计: {risk.snapshot()}")
+        if pnl is not None:
+            logger.info(f"[Main] 盈亏: {pnl.snapshot()}，统计: {pnl.stats()}")
+        for task in tasks + waiters:
+            task.cancel()
+        await asyncio.gather(*tasks, *waiters, return_exceptions=True)
+        if gateway is not None:
+            await gateway.close()
+        if _env_flag('STREAM_RECORD', 'false'):
+            from ExchangeFetcher.stream_recorder import close_stream_recorder
+            close_stream_recorder()
+        logger.info("应用程序已停止")
+
 
 if __name__ == "__main__":
-    port = int(os.getenv("API_PORT", "8000"))
-    uvicorn.run("myfastapi.main:app", host="0.0.0.0", port=8000, reload=True)
     asyncio.run(main())
@@ -1,7 +1,8 @@
+import asyncio
 from typing import List, Optional, Any, Dict # Add Dict here
 from pydantic import BaseModel # Ensure BaseModel is imported
 # from fastapi import FastAPI # FastAPI instance will be in main.py
-from fastapi import APIRouter, Depends # Import APIRouter
+from fastapi import APIRouter, Depends, Query # Import APIRouter
 import pandas as pd
 from sqlalchemy import Table, MetaData, select, inspect # inspect 用于检查表是否存在
 from datetime import datetime
@@ -283,6 +284,61 @@ async def get_kline_data_from_db(current_user: Dict[str, Any] = Depends(get_curr
             )
         )
 
+class RecentKlineData(BaseModel):
+    symbol: str
+    interval: str
+    source: str  # memory / redis / database
+    dates: List[str]
+    values: List[List[Optional[float]]]  # [open, close, low, high, volume]，与 CoinData 相同
+
+
+def _recent_from_arrays(arrays: Dict[str, Any]) -> Dict[str, list]:
+    """环形缓冲区/镜像的数组 -> ECharts 的 dates + values"""
+    dates = pd.to_datetime(arrays['open_time'], unit='ms', utc=True).tz_convert(None).strftime('%Y-%m-%d %H:%M:%S').tolist()
+    values = [list(row) for row in zip(*(arrays[name].tolist() for name in ('open', 'close', 'low', 'high', 'volume')))]
+    return {'dates': dates, 'values': values}
+
+
+@router.get("/recent-klines", response_model=RecentKlineData, tags=["Echarts Data"])
+async def get_recent_klines(symbol: str = SYMBOL, interval: str = '1m', limit: int = Query(200, ge=1, le=5000),
+                            current_user: Dict[str, Any] = Depends(get_current_user_from_token)):
+    """
+    最近 limit 根K线：优先读本进程的环形缓冲区，其次 Redis 镜像，最后才查询数据库
+    """
+    from DataProcessingCalculator.kline_ring import kline_rings
+    symbol = symbol.upper()
+
+    arrays = kline_rings.last(symbol, interval, limit)
+    if arrays is not None and len(arrays['open_time']) >= min(limit, kline_rings.capacity):
+        return RecentKlineData(symbol=symbol, interval=interval, source='memory', **_recent_from_arrays(arrays))
+
+    if kline_rings.mirror:
+        try:
+            arrays = kline_rings.read_mirror(symbol, interval, limit)
+            if len(arrays['open_time']):
+                return RecentKlineData(symbol=symbol, interval=interval, source='redis', **_recent_from_arrays(arrays))
+        except Exception as e:
+            logger.warning(f"读取K线 Redis 镜像失败: {e}")
+
+    def load_from_db():
+        from DatabaseOperator.pg_operator import Session, dbget_kline
+        from DatabaseOperator.kline_store import kline_table_name_for
+        from DataProcessingCalculator.DataAnalyze import KLine_to_dataframe
+        with Session() as session:
+            rows = dbget_kline(session, kline_table_name_for(symbol, interval), symbol, order_by_column='open_time',
+                               ascending=False, interval=interval, limit=limit)
+        return KLine_to_dataframe(list(reversed(rows)))
+
+    df = await asyncio.to_thread(load_from_db)
+    if df.empty:
+        return RecentKlineData(symbol=symbol, interval=interval, source='database', dates=[], values=[])
+    return RecentKlineData(
+        symbol=symbol, interval=interval, source='database',
+        dates=df['open_time'].dt.tz_convert(None).dt.strftime('%Y-%m-%d %H:%M:%S').tolist(),
+        values=[[nan_to_none(row[name]) for name in ('open', 'close', 'low', 'high', 'volume')]
+                for _, row in df.iterrows()],
+    )
+
 # 如果您想直接运行此文件进行测试 (例如使用 uvicorn myfastapi.echarts:app --reload):
 # 请确保 PYTHONPATH 设置正确，以便能够找到父目录中的 database.py 和 config.py
 # 例如: export PYTHONPATH=/path/to/your/Cryp/AutoTradingBinance:$PYTHONPATH
@@ -127,7 +127,7 @@ from myfastapi.security import (
 )
 from myfastapi.chunked_encryption import chunk_encrypt_large_data
 from myfastapi.echarts import router as echarts_router # 从 echarts 导入 router 并重命名以避免冲突
-from myfastapi.queue import router as queue_router # 导入队列管理路由器
+from myfastapi.queue_api import router as queue_router # 导入队列管理路由器
 from myfastapi.redis_client import get_csrf_manager # 添加CSRF管理器导入
 
 # 应用生命周期管理
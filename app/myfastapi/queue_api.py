@@ -32,6 +32,7 @@ from myfastapi.security import (
 
 # 导入数据库操作
 from DatabaseOperator.pg_operator import fetcher_queue_manager
+from DatabaseOperator.queue_config_cache import queue_config_cache
 
 # 配置日志
 logger = logging.getLogger(__name__)
@@ -58,6 +59,13 @@ class QueueConfigUpdate(BaseModel):
     description: Optional[str] = Field(None, description="队列描述", max_length=500)
 
 # 工具函数
+def _check_exchange(exchange: str) -> None:
+    """交易所必须有已注册的采集适配器（见 ExchangeFetcher/exchange_adapter.py）"""
+    from ExchangeFetcher.exchange_adapter import available_exchanges
+    if exchange.lower() not in available_exchanges():
+        raise HTTPException(status_code=400,
+                            detail=f"不支持的交易所: {exchange}（可用: {', '.join(available_exchanges())}）")
+
 def encrypt_response(response_data: Dict[str, Any], client_id: Optional[str] = None) -> str:
     """加密响应数据，参考main.py的实现"""
     try:
@@ -124,7 +132,7 @@ async def get_all_queues(
         加密的队列配置列表
     """
     try:
-        configs = fetcher_queue_manager.get_all_queue_configs(active_only=active_only)
+        configs = queue_config_cache.list(active_only=active_only)
         
         response_data = {
             "success": True,
@@ -158,6 +166,43 @@ async def get_all_queues(
             status_code=500
         )
 
+@router.get("/workers/stats", summary="获取采集任务运行统计")
+async def get_worker_stats(
+    security_headers: dict = Depends(verify_security_headers)
+) -> Response:
+    """
+    获取队列监督器写入 Redis 的各采集任务统计（状态、吞吐、延迟、重启次数）
+    
+    Returns:
+        加密的任务统计，键为 exchange:SYMBOL:interval
+    """
+    client_id = security_headers.get("api_key")
+    try:
+        from WorkLine.queue_supervisor import read_queue_stats
+        stats = read_queue_stats()
+        response_data = {
+            "success": True,
+            "data": stats,
+            "total": len(stats),
+            "message": "获取任务统计成功"
+        }
+        return Response(
+            content=encrypt_response(response_data, client_id),
+            media_type="application/json"
+        )
+        
+    except Exception as e:
+        logger.error(f"获取任务统计失败: {e}")
+        error_response = {
+            "success": False,
+            "message": f"获取任务统计失败: {str(e)}"
+        }
+        return Response(
+            content=encrypt_response(error_response, client_id),
+            media_type="application/json",
+            status_code=500
+        )
+
 @router.get("/edfqs/{queue_name}", summary="获取特定队列配置")
 async def get_queue_config(
     queue_name: str,
@@ -173,7 +218,7 @@ async def get_queue_config(
         加密的队列配置信息
     """
     try:
-        config = fetcher_queue_manager.get_queue_config(queue_name)
+        config = queue_config_cache.get(queue_name)
         
         if not config:
             response_data = {
@@ -249,9 +294,10 @@ async def create_queue_config(
             queue_config = QueueConfigCreate(**request_data)
         except Exception as e:
             raise HTTPException(status_code=400, detail=f"请求数据格式错误: {str(e)}")
+        _check_exchange(queue_config.exchange)
         
-        # 检查队列名称是否已存在
-        existing_config = fetcher_queue_manager.get_queue_config(queue_config.queue_name)
+        # 检查队列名称是否已存在（读缓存；并发创建同名队列时由数据库唯一约束兜底）
+        existing_config = queue_config_cache.get(queue_config.queue_name)
         if existing_config:
             response_data = {
                 "success": False,
@@ -280,11 +326,10 @@ async def create_queue_config(
         )
         
         if result:
-            # 获取创建的配置信息
-            created_config = fetcher_queue_manager.get_queue_config(queue_config.queue_name)
+            # create_queue_config 直接返回新建的配置（INSERT ... RETURNING），无需再次查询
             response_data = {
                 "success": True,
-                "data": created_config,
+                "data": result,
                 "message": "队列配置创建成功"
             }
             status_code = 201
@@ -349,7 +394,7 @@ async def update_queue_config(
             raise HTTPException(status_code=400, detail="缺少请求数据")
         
         # 检查队列是否存在
-        existing_config = fetcher_queue_manager.get_queue_config(queue_name)
+        existing_config = queue_config_cache.get(queue_name)
         if not existing_config:
             response_data = {
                 "success": False,
@@ -390,10 +435,13 @@ async def update_queue_config(
                 status_code=400
             )
         
+        if 'exchange' in update_data:
+            _check_exchange(update_data['exchange'])
+
         # 如果要更新队列名称，检查新名称是否已存在
         if 'queue_name' in update_data and update_data['queue_name'] != queue_name:
             new_queue_name = update_data['queue_name']
-            existing_new_config = fetcher_queue_manager.get_queue_config(new_queue_name)
+            existing_new_config = queue_config_cache.get(new_queue_name)
             if existing_new_config:
                 response_data = {
                     "success": False,
@@ -418,7 +466,7 @@ async def update_queue_config(
             # 获取更新后的配置
             # 如果队列名称被更新，使用新名称查询
             final_queue_name = update_data.get('queue_name', queue_name)
-            updated_config = fetcher_queue_manager.get_queue_config(final_queue_name)
+            updated_config = queue_config_cache.get(final_queue_name)
             
             response_data = {
                 "success": True,
@@ -466,7 +514,7 @@ async def activate_queue(
     """
     try:
         # 检查队列是否存在
-        existing_config = fetcher_queue_manager.get_queue_config(queue_name)
+        existing_config = queue_config_cache.get(queue_name)
         if not existing_config:
             response_data = {
                 "success": False,
@@ -488,7 +536,7 @@ async def activate_queue(
         result = fetcher_queue_manager.activate_queue(queue_name, updated_by=updated_by)
         
         if result:
-            updated_config = fetcher_queue_manager.get_queue_config(queue_name)
+            updated_config = queue_config_cache.get(queue_name)
             response_data = {
                 "success": True,
                 "data": updated_config,
@@ -533,7 +581,7 @@ async def deactivate_queue(
     """
     try:
         # 检查队列是否存在
-        existing_config = fetcher_queue_manager.get_queue_config(queue_name)
+        existing_config = queue_config_cache.get(queue_name)
         if not existing_config:
             response_data = {
                 "success": False,
@@ -555,7 +603,7 @@ async def deactivate_queue(
         result = fetcher_queue_manager.deactivate_queue(queue_name, updated_by=updated_by)
         
         if result:
-            updated_config = fetcher_queue_manager.get_queue_config(queue_name)
+            updated_config = queue_config_cache.get(queue_name)
             response_data = {
                 "success": True,
                 "data": updated_config,
@@ -602,7 +650,7 @@ async def delete_queue_config(
     """
     try:
         # 检查队列是否存在
-        existing_config = fetcher_queue_manager.get_queue_config(queue_name)
+        existing_config = queue_config_cache.get(queue_name)
         if not existing_config:
             response_data = {
                 "success": False,
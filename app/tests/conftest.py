@@ -0,0 +1,14 @@
+# app/tests/conftest.py
+"""
+测试公共配置：项目模块以 app/ 为根目录导入（与 python -m 的运行方式一致）
+
+运行：
+    cd app
+    python -m pytest -q tests
+"""
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parent.parent
+if str(APP_DIR) not in sys.path:
+    sys.path.insert(0, str(APP_DIR))
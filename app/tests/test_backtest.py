@@ -0,0 +1,106 @@
+# app/tests/test_backtest.py
+"""向量化回测：下一根开盘成交、手续费与滑点、成交明细与指标，参数扫描排序与进程池一致"""
+import numpy as np
+import pytest
+
+from Backtest.engine import simulate
+from Backtest.sweep import parse_grid, run_sweep
+
+COST = 0.001 + 0.0001  # 手续费率 + 1 个基点滑点
+
+
+@pytest.fixture
+def bars():
+    return {
+        'open_time': np.arange(4, dtype=np.int64) * 60_000,
+        'open': np.array([100.0, 110.0, 121.0, 133.1]),
+        'close': np.array([105.0, 120.0, 115.0, 100.0]),
+    }
+
+
+def test_fills_fees_and_metrics(bars):
+    result = simulate(bars, np.array([1.0, 1.0, 0.0, 1.0]))
+
+    # 第 0 根收盘的决策在第 1 根开盘执行；最后一根的信号没有下一根可以成交
+    np.testing.assert_array_equal(result.positions, [0, 1, 1, 0])
+    # 持仓区间为开盘到下一根开盘，调仓当根扣除成本
+    np.testing.assert_allclose(result.returns, [0.0, 0.1 - COST, 0.1, -COST])
+    growth = (1.1 - COST) * 1.1 * (1 - COST)
+    np.testing.assert_allclose(result.equity[-1], 10000 * growth)
+
+    buy, sell = result.trades
+    assert (buy['open_time'], buy['side'], buy['position']) == (60_000, 'BUY', 1.0)
+    assert buy['price'] == pytest.approx(110 * 1.0001)
+    assert buy['quantity'] == pytest.approx(10000 / (110 * 1.0001))
+    assert buy['fee'] == pytest.approx(10.0)
+    equity_before_sell = 10000 * (1.1 - COST) * 1.1
+    assert (sell['side'], sell['position']) == ('SELL', 0.0)
+    assert sell['price'] == pytest.approx(133.1 * 0.9999)
+    assert sell['fee'] == pytest.approx(equity_before_sell * 0.001)
+
+    metrics = result.summary()
+    assert metrics['total_return'] == pytest.approx(growth - 1)
+    assert metrics['max_drawdown'] == pytest.approx(COST)
+    assert (metrics['trades'], metrics['win_rate'], metrics['exposure']) == (2, 1.0, 0.5)
+    assert metrics['sharpe'] > 0
+
+
+def test_short_position_and_losing_trade(bars):
+    result = simulate(bars, np.array([-1.0, 0.0, 0.0, 0.0]), fee_rate=0.0, slippage_bps=0.0)
+    np.testing.assert_allclose(result.returns, [0.0, -0.1, 0.0, 0.0])
+    assert result.metrics['win_rate'] == 0.0
+    assert result.metrics['max_drawdown'] == pytest.approx(0.1)
+    assert [trade['side'] for trade in result.trades] == ['SELL', 'BUY']
+
+
+def test_flat_and_empty_inputs(bars):
+    flat = simulate(bars, np.zeros(4))
+    assert flat.trades == [] and flat.metrics['sharpe'] == 0.0 and flat.metrics['final_equity'] == 10000.0
+
+    # NaN 目标仓位视为空仓；扫描时可以不生成成交明细
+    quiet = simulate(bars, np.array([np.nan, 1.0, 1.0, 1.0]), record_trades=False)
+    assert quiet.trades == [] and quiet.metrics['trades'] == 1
+
+    empty = simulate({'open_time': np.empty(0), 'open': np.empty(0), 'close': np.empty(0)}, np.empty(0))
+    assert empty.metrics['final_equity'] == 10000.0 and empty.metrics['trades'] == 0
+
+    with pytest.raises(ValueError):
+        simulate(bars, np.zeros(3))
+
+
+@pytest.fixture
+def candles():
+    rng = np.random.default_rng(11)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 400)))
+    return {
+        'open_time': np.arange(400, dtype=np.int64) * 60_000,
+        'open': np.concatenate(([close[0]], close[:-1])),
+        'close': close,
+    }
+
+
+def test_sweep_ranks_and_matches_process_pool(candles):
+    grid = {'fast': [5, 10, 30], 'slow': [20, 30]}
+    serial = run_sweep(candles, 'ema_cross', grid, processes=1)
+
+    assert len(serial) == 6
+    # fast >= slow 的组合返回 error 并排在最后
+    assert [row['params'] for row in serial[-2:]] == [{'fast': 30, 'slow': 20}, {'fast': 30, 'slow': 30}]
+    assert all('error' in row for row in serial[-2:])
+    sharpes = [row['sharpe'] for row in serial[:-2]]
+    assert sharpes == sorted(sharpes, reverse=True)
+
+    assert run_sweep(candles, 'ema_cross', grid, processes=2) == serial
+    by_drawdown = run_sweep(candles, 'ema_cross', grid, processes=1, rank_by='max_drawdown')
+    drawdowns = [row['max_drawdown'] for row in by_drawdown[:-2]]
+    assert drawdowns == sorted(drawdowns)
+
+    with pytest.raises(ValueError):
+        run_sweep(candles, 'unknown_rule', grid, processes=1)
+
+
+def test_parse_grid():
+    assert parse_grid(['fast=5,10', 'slow=20:50:10', 'allow_short=true,false', 'column=ema5']) == {
+        'fast': [5, 10], 'slow': [20, 30, 40], 'allow_short': [True, False], 'column': ['ema5']}
+    with pytest.raises(ValueError):
+        parse_grid(['fast'])
@@ -0,0 +1,83 @@
+# app/tests/test_binance_activity.py
+"""REST 下单（signed_request）：任何失败都释放风控占用的挂单额度"""
+import os
+import time
+
+import pytest
+import requests
+
+# 只创建引擎，不连接数据库
+os.environ.setdefault('DATABASE_URL', 'postgresql+psycopg2://localhost/test')
+
+from ExchangeBill import BinanceActivity_RSA, risk_engine  # noqa: E402
+from ExchangeBill.risk_engine import RiskEngine, RiskLimits  # noqa: E402
+
+ORDER = {'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'timeInForce': 'GTC', 'quantity': '0.01',
+         'price': '30000'}
+
+
+class FakeSigner:
+    def sign_query(self, query_string):
+        return 'signature'
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, text=''):
+        self.status_code = status_code
+        self.ok = status_code < 400
+        self._body = body
+        self.text = text
+
+    def json(self):
+        if self._body is None:
+            raise ValueError('Expecting value: line 1 column 1 (char 0)')
+        return self._body
+
+
+class FakePriceCache:
+    def get_entries(self, symbols, fetch=True, max_age=None):
+        return {s: {'price': 30000.0, 'timestamp': int(time.time() * 1000)} for s in symbols}
+
+
+@pytest.fixture
+def risk(monkeypatch):
+    engine = RiskEngine(RiskLimits(max_order_notional=1e9, max_position_notional=1e9, max_orders_per_second=100),
+                        price_cache=FakePriceCache())
+    monkeypatch.setattr(risk_engine, '_engine', engine)
+    monkeypatch.setattr(BinanceActivity_RSA, 'PRIVATE_KEY_PATH', 'key.pem')
+    monkeypatch.setattr(BinanceActivity_RSA, 'get_signer', lambda path: FakeSigner())
+    return engine
+
+
+def respond(monkeypatch, response):
+    def request(method, url, headers=None):
+        if isinstance(response, BaseException):
+            raise response
+        return response
+    monkeypatch.setattr(BinanceActivity_RSA.requests, 'request', request)
+
+
+@pytest.mark.parametrize('response', [requests.ConnectionError('reset'),
+                                      FakeResponse(502, text='<html>Bad Gateway</html>'),
+                                      FakeResponse(200, text='')])
+def test_failed_or_unparseable_response_releases_reservation(monkeypatch, risk, response):
+    respond(monkeypatch, response)
+    with pytest.raises((requests.RequestException, ValueError)):
+        BinanceActivity_RSA.signed_request('POST', '/api/v3/order', dict(ORDER))
+    assert risk.open_orders == {} and risk.symbols['BTCUSDT'].open_buy == 0
+
+
+def test_error_body_is_applied_as_rejection(monkeypatch, risk):
+    respond(monkeypatch, FakeResponse(400, {'code': -2010, 'msg': 'Account has insufficient balance.'}))
+    body = BinanceActivity_RSA.signed_request('POST', '/api/v3/order', dict(ORDER))
+    assert body['code'] == -2010
+    assert risk.open_orders == {}
+
+
+def test_accepted_order_keeps_reservation(monkeypatch, risk):
+    params = dict(ORDER, newClientOrderId='cid')
+    respond(monkeypatch, FakeResponse(200, {'orderId': 1, 'clientOrderId': 'cid', 'status': 'NEW',
+                                            'executedQty': '0'}))
+    BinanceActivity_RSA.signed_request('POST', '/api/v3/order', params)
+    assert list(risk.open_orders) == ['cid']
+    assert risk.symbols['BTCUSDT'].open_buy == pytest.approx(0.01)
@@ -0,0 +1,151 @@
+# app/tests/test_depth_book.py
+"""
+增量深度同步：用录制的 fixture（StreamRecorder 格式）回放快照与 depthUpdate 事件
+
+fixture 依次包含：快照前缓存的两条事件（第一条已包含在快照中）-> 快照 100 -> 正常事件
+-> 一条旧事件 -> 丢包 -> 第二个快照 110 -> 正常事件
+"""
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+
+from ExchangeFetcher.depth_book import (DepthSynchronizer, LocalOrderBook, OrderBookGapError,
+                                         replay_depth_recording)
+from ExchangeFetcher.stream_recorder import ReplayPipeline, read_recording
+
+FIXTURE = Path(__file__).parent / 'fixtures' / 'depth_btcusdt.jsonl'
+STREAM = 'btcusdt@depth@100ms'
+
+
+def fixture_records():
+    return list(read_recording(FIXTURE))
+
+
+def feed(sync: DepthSynchronizer, records) -> list:
+    """与实时采集相同：未同步时才使用快照，返回每条增量事件是否被应用"""
+    applied = []
+    for record in records:
+        if 'snapshot' in record:
+            if sync.needs_snapshot:
+                sync.on_snapshot(record['snapshot'])
+        else:
+            applied.append(sync.on_event(json.loads(record['m'])))
+    return applied
+
+
+def test_events_before_snapshot_are_buffered_then_applied():
+    records = fixture_records()
+    sync = DepthSynchronizer(LocalOrderBook('BTCUSDT'))
+    assert feed(sync, records[:2]) == [False, False]
+    assert sync.needs_snapshot and len(sync.buffer) == 2
+
+    assert sync.on_snapshot(records[2]['snapshot'])
+    assert sync.synced and sync.buffer == []
+    # 第一条缓存事件 u=99 已包含在快照中被丢弃（37000.50 的卖单没有被删除），第二条跨越快照被应用
+    assert sync.book.last_update_id == 102
+    assert sync.book.updates == 1
+    assert dict(sync.book.top(None)['asks'])[37000.5] == 1.5
+    assert dict(sync.book.top(None)['bids'])[37000.0] == 1.25
+
+
+def test_snapshot_older_than_buffer_is_rejected():
+    sync = DepthSynchronizer(LocalOrderBook('BTCUSDT'))
+    sync.on_event({'U': 200, 'u': 201, 'b': [], 'a': []})
+    assert not sync.on_snapshot({'lastUpdateId': 150, 'bids': [], 'asks': []})
+    assert sync.needs_snapshot and len(sync.buffer) == 1
+
+
+def test_stale_event_is_dropped():
+    records = fixture_records()
+    sync = DepthSynchronizer(LocalOrderBook('BTCUSDT'))
+    applied = feed(sync, records[:5])
+    # 快照后的正常事件被应用，u=103 <= 104 的旧事件被丢弃，订单簿不变
+    assert applied[-2:] == [True, False]
+    assert sync.synced and sync.resyncs == 0
+    assert sync.book.last_update_id == 104
+    assert sync.book.best_bid() == (37000.2, 0.1)
+
+
+def test_gap_triggers_resync():
+    records = fixture_records()
+    sync = DepthSynchronizer(LocalOrderBook('BTCUSDT'))
+    feed(sync, records[:6])
+    assert sync.book.last_update_id == 106
+
+    # U=109 > 106 + 1：回到未同步状态，丢包事件留在缓存中等待新快照
+    assert not sync.on_event(json.loads(records[6]['m']))
+    assert sync.needs_snapshot and sync.resyncs == 1
+    assert [event['U'] for event in sync.buffer] == [109]
+
+    feed(sync, records[7:])
+    assert sync.synced and sync.resyncs == 1
+    assert sync.book.last_update_id == 114
+    assert sync.book.updates == 5
+
+
+def test_top_and_spread_after_replay():
+    sync = DepthSynchronizer(LocalOrderBook('BTCUSDT'))
+    feed(sync, fixture_records())
+    book = sync.book
+    assert book.top(2) == {'bids': [(37000.25, 0.4), (37000.1, 0.5)],
+                           'asks': [(37000.35, 0.2), (37000.4, 0.8)]}
+    assert book.top(None)['asks'][-1] == (37000.6, 2.5)
+    assert book.spread() == pytest.approx(0.1)
+    assert book.mid_price() == pytest.approx(37000.3)
+
+
+def test_apply_diff_without_snapshot_raises():
+    with pytest.raises(OrderBookGapError):
+        LocalOrderBook('BTCUSDT').apply_diff({'U': 1, 'u': 2, 'b': [], 'a': []})
+
+
+def test_replay_pipeline_uses_same_synchronizer():
+    async def replay():
+        pipeline = ReplayPipeline()
+        for record in read_recording(FIXTURE):
+            await pipeline.handle(record)
+        await pipeline.close()
+        return pipeline
+
+    pipeline = asyncio.run(replay())
+    summary = pipeline.summary()[STREAM]
+    assert summary['synced'] and summary['resyncs'] == 1 and summary['updates'] == 5
+    assert summary['best_bid'] == (37000.25, 0.4)
+    assert summary['best_ask'] == (37000.35, 0.2)
+    assert pipeline.stats['errors'] == 0
+
+
+def test_replay_depth_recording():
+    syncs = replay_depth_recording(FIXTURE)
+    assert list(syncs) == ['BTCUSDT']
+    sync = syncs['BTCUSDT']
+    assert sync.synced and sync.resyncs == 1 and sync.book.last_update_id == 114
+    assert replay_depth_recording(FIXTURE, symbol='ETHUSDT') == {}
+
+
+def test_recorder_round_trip(tmp_path):
+    """run_depth_stream 的录制方式：原始消息 write、快照 write_snapshot，回放结果与 fixture 相同"""
+    from ExchangeFetcher.stream_recorder import StreamRecorder
+
+    path = tmp_path / 'depth.jsonl.gz'
+    with StreamRecorder(path) as recorder:
+        for record in fixture_records():
+            if 'snapshot' in record:
+                recorder.write_snapshot(record['s'], record['snapshot'])
+            else:
+                recorder.write(record['s'], record['m'])
+    book = replay_depth_recording(path)['BTCUSDT'].book
+    assert book.top(None) == replay_depth_recording(FIXTURE)['BTCUSDT'].book.top(None)
+
+
+def test_mock_market_replays_depth_recording():
+    from MockExchange.market import MockMarket, load_depth_recording
+
+    snapshot, events = load_depth_recording(FIXTURE)
+    assert snapshot['lastUpdateId'] == 100 and len(events) == 8
+    market = MockMarket('BTCUSDT', depth_file=FIXTURE)
+    # 快照之后的事件进入回放队列，已包含在快照中的事件被跳过
+    assert market.book.last_update_id == 100
+    assert [event['U'] for event in market._depth_replay][:2] == [100, 103]
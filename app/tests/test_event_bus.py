@@ -0,0 +1,107 @@
+# app/tests/test_event_bus.py
+"""进程内事件总线与增量指标：慢订阅者只丢自己的旧事件，增量 EMA/MACD/ROC 与全量计算一致，交叉出信号"""
+import asyncio
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# DataAnalyze 只创建引擎，不连接数据库
+os.environ.setdefault('DATABASE_URL', 'postgresql+psycopg2://localhost/test')
+
+from DataProcessingCalculator.incremental_indicators import CrossoverDetector, IncrementalIndicators  # noqa: E402
+from WorkLine.event_bus import EventBus  # noqa: E402
+
+
+def test_publish_fans_out_and_slow_subscriber_drops_oldest():
+    async def run():
+        bus = EventBus()
+        fast = bus.subscribe('kline.closed')
+        slow = bus.subscribe('kline.closed', maxsize=2)
+        other = bus.subscribe('signal')
+        for index in range(3):
+            assert bus.publish('kline.closed', index) == 2
+        stats = bus.stats()
+
+        received = [await fast.get() for _ in range(3)]
+        # 队列满时丢弃最旧的事件，发布方不阻塞
+        kept = [await slow.get(), await slow.get()]
+        slow.close()
+        assert bus.publish('kline.closed', 3) == 1
+        assert bus.publish('unknown', 'x') == 0
+        return received, kept, slow.dropped, other.queue.empty(), stats
+
+    received, kept, dropped, other_empty, stats = asyncio.run(run())
+    assert received == [0, 1, 2] and kept == [1, 2] and dropped == 1 and other_empty
+    assert stats['kline.closed'] == {'published': 3, 'subscribers': 2, 'pending': 5, 'dropped': 1}
+    assert stats['signal']['published'] == 0
+
+
+def test_publish_threadsafe_and_async_iteration():
+    async def run():
+        bus = EventBus()
+        subscription = bus.subscribe('trade.bar')
+        thread = threading.Thread(target=lambda: [bus.publish_threadsafe('trade.bar', i) for i in range(3)])
+        thread.start()
+        received = []
+        async for event in subscription:
+            received.append(event)
+            if len(received) == 3:
+                break
+        thread.join()
+        return received
+
+    assert asyncio.run(run()) == [0, 1, 2]
+    with pytest.raises(RuntimeError):
+        EventBus().publish_threadsafe('trade.bar', 0)
+
+
+@pytest.fixture
+def closes():
+    rng = np.random.default_rng(3)
+    return 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 200)))
+
+
+def test_incremental_indicators_match_batch_formulas(closes):
+    from DataProcessingCalculator.DataAnalyze import calculate_macd, calculate_multiple_emas, calculator_roc
+
+    df = calculate_macd(calculate_multiple_emas(pd.DataFrame({'close': closes})))
+    indicators = IncrementalIndicators()
+    records = [indicators.update(index * 60_000, close) for index, close in enumerate(closes)]
+
+    for column in ('ema5', 'ema10', 'ema20', 'ema30', 'ema12', 'ema26', 'dif', 'dea', 'macd'):
+        np.testing.assert_allclose([record[column] for record in records], df[column], rtol=1e-10)
+    for column in ('ema5', 'macd', 'dea'):
+        expected = calculator_roc(df, column)
+        assert records[0][f'{column}_roc'] is None
+        np.testing.assert_allclose([record[f'{column}_roc'] for record in records[1:]], expected[1:], rtol=1e-8)
+
+
+def test_duplicate_and_out_of_order_klines_are_ignored(closes):
+    indicators = IncrementalIndicators()
+    last = indicators.seed(np.arange(10) * 60_000, closes[:10])
+    assert indicators.count == 10 and last['open_time'] == 540_000
+    # websocket 重连后重复推送的旧K线不改变状态
+    assert indicators.update(540_000, 1.0) is None
+    assert indicators.update(0, 1.0) is None
+    assert indicators.update(600_000, closes[10])['ema5'] != last['ema5']
+    assert indicators.count == 11
+
+
+def test_crossover_detector_per_series():
+    detector = CrossoverDetector()
+
+    def record(open_time, fast, slow):
+        return {'open_time': open_time, 'close': 100.0 + open_time, 'ema5': fast, 'ema20': slow}
+
+    # 第一条记录只建立状态，不出信号
+    assert detector.update('BTCUSDT', '1m', record(0, 1.0, 2.0)) is None
+    assert detector.update('BTCUSDT', '1m', record(1, 1.5, 2.0)) is None
+    assert detector.update('BTCUSDT', '1m', record(2, 2.5, 2.0)) == {
+        'symbol': 'BTCUSDT', 'interval': '1m', 'open_time': 2, 'action': 'BUY', 'price': 102.0}
+    # 其他周期的状态相互独立
+    assert detector.update('BTCUSDT', '5m', record(2, 1.0, 2.0)) is None
+    assert detector.update('BTCUSDT', '1m', record(3, 2.0, 2.0)) is None
+    assert detector.update('BTCUSDT', '1m', record(4, 1.0, 2.0))['action'] == 'SELL'
@@ -0,0 +1,169 @@
+# app/tests/test_exchange_adapter.py
+"""交易所适配器：fake 交易所跑通采集管道，任务与存储键都包含交易所"""
+import asyncio
+import json
+import os
+
+import pytest
+
+# 只创建引擎，不连接数据库
+os.environ.setdefault('DATABASE_URL', 'postgresql+psycopg2://localhost/test')
+
+from DatabaseOperator.kline_store import storage_symbol  # noqa: E402
+from ExchangeFetcher.exchange_adapter import FakeAdapter, get_adapter  # noqa: E402
+from ExchangeFetcher.fetcher import KlineMessageHandler, get_kline, get_kline_websocket  # noqa: E402
+
+KLINE_FIELDS = {'open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time', 'is_closed', 'symbol', 'interval'}
+
+
+def test_fake_adapter_websocket_pipeline(tmp_path):
+    """fake 交易所的消息格式与 binance 不同，经适配器归一化后与 binance 的K线记录字段一致，并按适配器的流名录制"""
+    from ExchangeFetcher.stream_recorder import StreamRecorder, read_recording
+
+    adapter = FakeAdapter(rate=0, seed=1)
+    received = []
+    with StreamRecorder(tmp_path / 'klines.jsonl.gz') as recorder:
+        klines = asyncio.run(get_kline_websocket('BTCUSDT', '1m', max_klines=5, callback=received.append,
+                                                 auto_reconnect=False, recorder=recorder, adapter=adapter))
+
+    assert len(klines) == 5 and received == klines
+    for kline in klines:
+        assert KLINE_FIELDS <= set(kline)
+        # symbol 为存储用的交易对，下游按它区分交易所
+        assert (kline['symbol'], kline['interval']) == ('FAKE_BTCUSDT', '1m')
+        assert float(kline['low']) <= float(kline['close']) <= float(kline['high'])
+
+    records = list(read_recording(tmp_path / 'klines.jsonl.gz'))
+    assert {record['s'] for record in records} == {'btcusdt@kline_1m'}
+    assert json.loads(records[0]['m'])['channel'] == 'candle'
+
+
+def test_handler_normalizes_by_adapter_and_keys_storage_by_exchange():
+    fake = KlineMessageHandler('BTCUSDT', '1m', dbr=False, adapter=FakeAdapter(rate=0, seed=1))
+    assert fake.series == 'FAKE_BTCUSDT'
+    assert KlineMessageHandler('btcusdt', '1m', dbr=False).series == 'BTCUSDT'
+
+    # binance 格式的消息不是 fake 交易所的K线消息
+    assert fake.handle(json.dumps({'e': 'kline', 'k': {}})) is None
+    message = json.dumps({'channel': 'candle', 'symbol': 'BTCUSDT', 'interval': '1m', 'final': True,
+                          'candle': [0, '1', '2', '0.5', '1.5', '10', 59999, '15', 3]})
+    kline = fake.handle(message)
+    assert kline['is_closed'] and kline['close_time'] == 59999 and float(kline['close']) == 1.5
+
+
+def test_fake_kline_stream_feeds_exchange_prefixed_indicators(monkeypatch):
+    """fake 交易所的完结K线经 Redis Stream 进入指标消费者，写入 ma_fake_btcusdt、发布到 stream:indicator:FAKE_BTCUSDT"""
+    fakeredis = pytest.importorskip('fakeredis')
+    from DataProcessingCalculator import DataAnalyze
+    from DatabaseOperator.redis_streams import StreamPublisher, indicator_stream_key
+    from WorkLine.stream_workers import IndicatorStreamWorker
+
+    client = fakeredis.FakeRedis()
+    handler = KlineMessageHandler('BTCUSDT', '1m', stream=StreamPublisher(client=client),
+                                  adapter=FakeAdapter(rate=0, seed=1))
+    for index in range(3):
+        handler.handle(json.dumps({'channel': 'candle', 'symbol': 'BTCUSDT', 'interval': '1m', 'final': True,
+                                   'candle': [index * 60_000, '1', '2', '0.5', str(100 + index), '10',
+                                              index * 60_000 + 59_999, '15', 3]}))
+
+    stored = {}
+    monkeypatch.setattr(DataAnalyze, 'store_indicator_records',
+                        lambda symbol, records: stored.setdefault(f"ma_{symbol.lower()}", []).extend(records))
+    worker = IndicatorStreamWorker(['FAKE_BTCUSDT'], client=client, seed=False, block_ms=1, claim_idle_ms=0)
+    assert worker.run(max_batches=1) == 3
+
+    assert list(stored) == ['ma_fake_btcusdt'] and len(stored['ma_fake_btcusdt']) == 3
+    assert client.xlen(indicator_stream_key('FAKE_BTCUSDT')) == 3
+    assert not client.exists(indicator_stream_key('BTCUSDT'))
+
+
+def test_per_symbol_tables_with_exchange_prefix():
+    from DatabaseOperator.kline_store import parse_per_symbol_table
+
+    assert parse_per_symbol_table('KLine_BTCUSDT') == ('BTCUSDT', '1m')
+    assert parse_per_symbol_table('KLine_BTCUSDT_1h') == ('BTCUSDT', '1h')
+    assert parse_per_symbol_table('KLine_BTCUSDT_1M') == ('BTCUSDT', '1M')
+    assert parse_per_symbol_table('KLine_1INCHUSDT_5m') == ('1INCHUSDT', '5m')
+    # 其他交易所的分表迁移后 symbol 列保留交易所前缀，与 storage_symbol 一致
+    assert parse_per_symbol_table('KLine_FAKE_BTCUSDT') == (storage_symbol('BTCUSDT', 'fake'), '1m')
+    assert parse_per_symbol_table('KLine_FAKE_BTCUSDT_4h') == ('FAKE_BTCUSDT', '4h')
+    assert parse_per_symbol_table('KLine_BTCUSDT_legacy') is None
+    assert parse_per_symbol_table('KLine_UNKNOWN_BTCUSDT') is None
+
+
+def test_fake_adapter_rest_pages():
+    adapter = FakeAdapter(rate=0, seed=1)
+    page = get_kline('BTCUSDT', '1m', dbr=False, session=None, limit=20, adapter=adapter)
+    assert len(page) == 20
+    open_times = [kline['open_time'] for kline in page]
+    assert open_times == sorted(open_times) and len(set(open_times)) == 20
+
+
+def test_storage_symbol():
+    assert storage_symbol('btcusdt') == 'BTCUSDT'
+    assert storage_symbol('BTCUSDT', 'Binance') == 'BTCUSDT'
+    assert storage_symbol('btcusdt', 'fake') == 'FAKE_BTCUSDT'
+    assert get_adapter('FAKE') is get_adapter('fake')
+
+
+def test_worklist_keys_tasks_by_exchange(monkeypatch):
+    from WorkLine import StartSettingSet
+
+    configs = [
+        {'queue_name': 'a', 'exchange': 'binance', 'symbol': 'btcusdt', 'interval': '1m'},
+        {'queue_name': 'b', 'exchange': 'FAKE', 'symbol': 'BTCUSDT', 'interval': '1m'},
+        {'queue_name': 'c', 'exchange': 'binance', 'symbol': 'BTCUSDT', 'interval': '1m'},
+        {'queue_name': 'd', 'exchange': None, 'symbol': 'ETHUSDT', 'interval': '5m'},
+    ]
+    monkeypatch.setattr(StartSettingSet.queue_config_cache, 'list', lambda active_only=False: configs)
+    # 同一 (symbol, interval) 在不同交易所是不同的任务，同一交易所的重复队列只运行一次
+    assert StartSettingSet.Get_worklist() == [('binance', 'BTCUSDT', '1m'), ('binance', 'ETHUSDT', '5m'),
+                                              ('fake', 'BTCUSDT', '1m')]
+
+    monkeypatch.setattr(StartSettingSet.queue_config_cache, 'list', lambda active_only=False: [])
+    assert StartSettingSet.Get_worklist('btcusdt') == [('binance', 'BTCUSDT', '1m')]
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes = {}
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
+
+
+def test_supervisor_runs_one_task_per_exchange():
+    from WorkLine.queue_supervisor import QUEUE_STATS_KEY, QueueSupervisor
+
+    started = []
+    worklist = [('binance', 'BTCUSDT', '1m'), ('fake', 'BTCUSDT', '1m')]
+
+    async def task_factory(exchange, symbol, interval, stats):
+        started.append((exchange, symbol, interval))
+        stats.record({'is_closed': False})
+        await asyncio.Event().wait()
+
+    async def run():
+        client = FakeRedis()
+        supervisor = QueueSupervisor(task_factory, loader=lambda: list(worklist), client=client)
+        await supervisor.reconcile()
+        await asyncio.sleep(0)
+        supervisor.flush_stats()
+        stats_keys = sorted(client.hashes[QUEUE_STATS_KEY])
+
+        worklist.pop()
+        await supervisor.reconcile()
+        running = sorted(supervisor.tasks)
+        for key in list(supervisor.tasks):
+            await supervisor._stop(key)
+        return stats_keys, running, client.hashes[QUEUE_STATS_KEY]
+
+    stats_keys, running, remaining = asyncio.run(run())
+    assert sorted(started) == [('binance', 'BTCUSDT', '1m'), ('fake', 'BTCUSDT', '1m')]
+    assert stats_keys == ['binance:BTCUSDT:1m', 'fake:BTCUSDT:1m']
+    assert running == [('binance', 'BTCUSDT', '1m')]
+    assert remaining == {}
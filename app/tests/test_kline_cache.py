@@ -0,0 +1,52 @@
+# app/tests/test_kline_cache.py
+"""本地列式K线缓存：采集端只追加首尾相接的K线，缺口由 sync_from_db 补齐"""
+import pytest
+
+pytest.importorskip('pyarrow')
+
+from DataProcessingCalculator import kline_cache  # noqa: E402
+
+MINUTE = 60_000
+NOW = 1_700_000_000_000
+
+
+def bar(index: int) -> dict:
+    open_time = NOW - 100 * MINUTE + index * MINUTE
+    return {
+        'open_time': open_time, 'close_time': open_time + MINUTE - 1,
+        'open': 1.0, 'high': 2.0, 'low': 0.5, 'close': 1.5, 'volume': 10.0,
+        'quote_asset_volume': 15.0, 'num_trades': 3, 'taker_buy_base_vol': 5.0, 'taker_buy_quote_vol': 7.5,
+    }
+
+
+@pytest.fixture(autouse=True)
+def cache_root(tmp_path, monkeypatch):
+    monkeypatch.setattr(kline_cache, 'KLINE_CACHE_DIR', tmp_path)
+    return tmp_path
+
+
+def cached_open_times():
+    return [int(t) for t in kline_cache.load_klines('BTCUSDT', '1m', columns=['open_time'])['open_time']]
+
+
+def test_contiguous_append_requires_seeded_cache():
+    assert kline_cache.append_klines('BTCUSDT', '1m', [bar(0)], now_ms=NOW) == 0
+    assert kline_cache.list_segments('BTCUSDT', '1m') == []
+
+
+def test_contiguous_append_stops_at_gap():
+    kline_cache.append_klines('BTCUSDT', '1m', [bar(0), bar(1)], now_ms=NOW, contiguous=False)
+
+    # bar(3)、bar(4) 之前缺 bar(2)：只有缺口之前的部分可以追加（此处为空）
+    assert kline_cache.append_klines('BTCUSDT', '1m', [bar(3), bar(4)], now_ms=NOW) == 0
+    assert kline_cache.append_klines('BTCUSDT', '1m', [bar(2), bar(3), bar(5)], now_ms=NOW) == 2
+    assert cached_open_times() == [bar(i)['open_time'] for i in range(4)]
+
+
+def test_sync_mode_appends_past_gaps_and_skips_unclosed():
+    kline_cache.append_klines('BTCUSDT', '1m', [bar(0)], now_ms=NOW, contiguous=False)
+    unclosed = bar(100)
+    added = kline_cache.append_klines('BTCUSDT', '1m', [bar(0), bar(2), unclosed], now_ms=NOW, contiguous=False)
+    assert added == 1
+    assert cached_open_times() == [bar(0)['open_time'], bar(2)['open_time']]
+    assert kline_cache.last_cached_close_time('BTCUSDT', '1m') == bar(2)['close_time']
@@ -0,0 +1,119 @@
+# app/tests/test_kline_compact.py
+"""compact K线布局：整数价格与纪元毫秒无损编码、写入不带 symbol、读取时在 SQL 中解码"""
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import MetaData, create_mock_engine
+from sqlalchemy.dialects import postgresql
+
+# 只创建引擎，不连接数据库
+os.environ.setdefault('DATABASE_URL', 'postgresql+psycopg2://localhost/test')
+
+from DatabaseOperator import kline_compact, kline_partition, pg_operator  # noqa: E402
+from DatabaseOperator.kline_compact import encode_kline, encode_price, from_epoch_ms, to_epoch_ms  # noqa: E402
+
+UTC = timezone.utc
+
+KLINE = {'open_time': 1_704_067_200_000, 'close_time': 1_704_067_259_999, 'open': '42000.12345678',
+         'high': '42100', 'low': '0.00000001', 'close': 0.1 + 0.2, 'volume': '12.5',
+         'quote_asset_volume': '123456789.123', 'num_trades': '321', 'taker_buy_base_vol': '6',
+         'taker_buy_quote_vol': '252000'}
+
+
+class NoTables:
+    def has_table(self, name):
+        return False
+
+
+@pytest.fixture
+def make_table(monkeypatch):
+    """不连接数据库建表，返回 (layout -> Table) 的构造函数"""
+    mock = create_mock_engine('postgresql+psycopg2://', lambda sql, *args, **kwargs: None)
+    monkeypatch.setattr(pg_operator, 'inspect', lambda bind: NoTables())
+    monkeypatch.setattr(kline_partition, 'is_partitioned_table', lambda table_name: False)
+    return lambda layout: pg_operator.create_kline_table_if_not_exists(mock, 'BTCUSDT', partitioned=False,
+                                                                       layout=layout)
+
+
+class RecordingSession:
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, stmt):
+        self.statements.append(stmt.compile(dialect=postgresql.dialect()))
+        return self
+
+    def fetchall(self):
+        return []
+
+
+def test_price_and_time_encoding_is_lossless():
+    assert encode_price('42000.12345678') == 4_200_012_345_678
+    assert encode_price('0.00000001') == 1
+    # 经 Decimal(str(...)) 转换，浮点误差不会多出一个最小单位
+    assert encode_price(0.1 + 0.2) == 30_000_000
+    assert encode_price(0.29) == 29_000_000
+
+    ts = datetime(2024, 1, 1, 0, 0, 59, 999000, tzinfo=UTC)
+    assert to_epoch_ms(ts) == 1_704_067_259_999 and from_epoch_ms(1_704_067_259_999) == ts
+    assert to_epoch_ms(ts.astimezone(timezone(timedelta(hours=8)))) == 1_704_067_259_999
+    with pytest.raises(ValueError):
+        to_epoch_ms(datetime(2024, 1, 1))
+
+
+def test_encode_kline():
+    row = encode_kline(KLINE)
+    assert row == {'open_time': 1_704_067_200_000, 'close_time': 1_704_067_259_999, 'open': 4_200_012_345_678,
+                   'high': 4_210_000_000_000, 'low': 1, 'close': 30_000_000, 'volume': 12.5,
+                   'quote_asset_volume': 123456789.123, 'num_trades': 321, 'taker_buy_base_vol': 6.0,
+                   'taker_buy_quote_vol': 252000.0}
+
+
+def test_layout_detection(make_table):
+    assert kline_compact.is_compact_table(make_table('compact'))
+    assert not kline_compact.is_compact_table(make_table('standard'))
+    assert kline_compact.is_compact_layout('COMPACT') and not kline_compact.is_compact_layout('standard')
+    with pytest.raises(ValueError):
+        kline_compact.is_compact_layout('columnar')
+
+
+def test_compact_insert_path(make_table):
+    table = make_table('compact')
+    assert 'symbol' not in table.c and 'timestamp' not in table.c
+    session = RecordingSession()
+
+    assert pg_operator.insert_kline(session, table, 'BTCUSDT', KLINE) == datetime(2024, 1, 1, tzinfo=UTC)
+
+    (stmt,) = session.statements
+    assert 'ON CONFLICT (open_time) DO UPDATE SET' in str(stmt)
+    assert stmt.params == encode_kline(KLINE)
+
+
+def test_compact_read_path_decodes_in_sql(monkeypatch, make_table):
+    metadata = MetaData()
+    make_table('compact').to_metadata(metadata)
+    monkeypatch.setattr(pg_operator, 'metadata', metadata)
+    session = RecordingSession()
+
+    pg_operator.dbget_kline(session, 'KLine_BTCUSDT', 'BTCUSDT', limit=10,
+                            start_time=datetime(2024, 1, 1, tzinfo=UTC))
+
+    (stmt,) = session.statements
+    # 去掉绑定参数的类型转换（%(x)s::BIGINT），只比较语句结构
+    sql = re.sub(r'::[A-Z]+', '', ' '.join(str(stmt).split()))
+    # 表中不存 symbol：作为常量返回，也不按 symbol 过滤
+    assert sql.startswith('SELECT %(param_1)s AS symbol') and stmt.params['param_1'] == 'BTCUSDT'
+    assert 'CAST("KLine_BTCUSDT".open AS FLOAT) / CAST(%(param_2)s AS NUMERIC) AS open' in sql
+    assert 'to_timestamp("KLine_BTCUSDT".open_time / CAST(%(open_time_1)s AS DOUBLE PRECISION)) AS open_time' in sql
+    assert 'WHERE "KLine_BTCUSDT".open_time >= %(open_time_2)s' in sql and 'symbol =' not in sql
+    # 增量读取的起始时间按纪元毫秒比较，可以使用主键索引
+    assert stmt.params['open_time_2'] == 1_704_067_200_000
+    assert stmt.params['param_2'] == kline_compact.PRICE_SCALE
+
+
+def test_decoded_source_sql():
+    sql = kline_compact.decoded_source_sql('KLine_BTCUSDT')
+    assert 'open::float8 / 100000000 AS open' in sql and 'to_timestamp(open_time / 1000.0) AS open_time' in sql
+    assert sql.endswith('FROM "KLine_BTCUSDT" WHERE open_time >= :start_ms AND open_time < :end_ms)')
@@ -0,0 +1,156 @@
+# app/tests/test_kline_partition.py
+"""K线月度分区：分区命名与边界、在调用方事务内建分区、保留策略只删除过期整月"""
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# 只创建引擎，不连接数据库
+os.environ.setdefault('DATABASE_URL', 'postgresql+psycopg2://localhost/test')
+
+from DatabaseOperator import kline_compact, kline_partition  # noqa: E402
+from DatabaseOperator.kline_partition import add_months, month_start, partition_name  # noqa: E402
+
+UTC = timezone.utc
+
+
+class FakeResult:
+    def __init__(self, value=None):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+
+class FakeConnection:
+    """记录 DDL；fail 为真时 CREATE TABLE 抛错，exists 为 to_regclass 查询的结果"""
+
+    def __init__(self, fail=False, exists=False):
+        self.info = {}
+        self.statements = []
+        self.fail = fail
+        self.exists = exists
+
+    @contextmanager
+    def begin_nested(self):
+        yield
+
+    def execute(self, stmt, params=None):
+        sql = str(stmt)
+        if sql.startswith('SELECT to_regclass'):
+            return FakeResult(self.exists)
+        if self.fail:
+            raise RuntimeError('relation already exists')
+        self.statements.append(sql)
+        return FakeResult()
+
+
+@pytest.fixture
+def partitioned(monkeypatch):
+    """所有表视为 standard 布局的分区父表，进程内分区缓存从空开始"""
+    monkeypatch.setattr(kline_partition, '_known_partitions', set())
+    monkeypatch.setattr(kline_partition, 'is_partitioned_table', lambda table_name: True)
+    monkeypatch.setattr(kline_compact, 'is_compact_table', lambda table: False)
+
+
+def test_month_arithmetic_and_names():
+    assert month_start(datetime(2024, 3, 31, 23, 59, tzinfo=UTC)) == datetime(2024, 3, 1, tzinfo=UTC)
+    # 按 UTC 取月份：东八区 4 月 1 日 02:00 仍属于 UTC 的 3 月
+    assert month_start(datetime(2024, 4, 1, 2, tzinfo=timezone(timedelta(hours=8)))) == datetime(2024, 3, 1, tzinfo=UTC)
+    with pytest.raises(ValueError):
+        month_start(datetime(2024, 3, 1))
+
+    assert add_months(datetime(2024, 12, 1, tzinfo=UTC), 1) == datetime(2025, 1, 1, tzinfo=UTC)
+    assert add_months(datetime(2024, 1, 1, tzinfo=UTC), -13) == datetime(2022, 12, 1, tzinfo=UTC)
+    assert partition_name('KLine_BTCUSDT', datetime(2025, 1, 1, tzinfo=UTC)) == 'KLine_BTCUSDT_p202501'
+
+
+def test_partition_bounds_by_layout(monkeypatch):
+    month = datetime(2025, 1, 1, tzinfo=UTC)
+    monkeypatch.setattr(kline_compact, 'is_compact_table', lambda table: False)
+    assert kline_partition._partition_bound('KLine_BTCUSDT', month) == "'2025-01-01T00:00:00+00:00'"
+    monkeypatch.setattr(kline_compact, 'is_compact_table', lambda table: True)
+    assert kline_partition._partition_bound('KLine_BTCUSDT', month) == '1735689600000'
+
+
+def test_partitions_created_in_caller_transaction_and_cached_on_commit(partitioned):
+    connection = FakeConnection()
+    names = kline_partition.ensure_kline_partitions('KLine_BTCUSDT', datetime(2024, 11, 15, tzinfo=UTC),
+                                                    datetime(2025, 1, 2, tzinfo=UTC), bind=connection)
+
+    assert names == ['KLine_BTCUSDT_p202411', 'KLine_BTCUSDT_p202412', 'KLine_BTCUSDT_p202501']
+    assert connection.statements[1] == (
+        'CREATE TABLE IF NOT EXISTS "KLine_BTCUSDT_p202412" PARTITION OF "KLine_BTCUSDT" '
+        "FOR VALUES FROM ('2024-12-01T00:00:00+00:00') TO ('2025-01-01T00:00:00+00:00')"
+    )
+    # 提交前其他连接看不到分区，不记入进程内缓存；同一事务内不重复执行 DDL
+    assert kline_partition._known_partitions == set()
+    kline_partition.ensure_partition_for_time('KLine_BTCUSDT', datetime(2024, 12, 3, tzinfo=UTC), bind=connection)
+    assert len(connection.statements) == 3
+
+    kline_partition._on_commit(connection)
+    assert kline_partition._known_partitions == set(names)
+    kline_partition.ensure_partition_for_time('KLine_BTCUSDT', datetime(2024, 12, 3, tzinfo=UTC), bind=FakeConnection())
+
+
+def test_rolled_back_partitions_are_not_cached(partitioned):
+    connection = FakeConnection()
+    kline_partition.ensure_partition_for_time('KLine_BTCUSDT', datetime(2024, 12, 3, tzinfo=UTC), bind=connection)
+    kline_partition._on_rollback(connection)
+    kline_partition._on_commit(connection)
+    assert kline_partition._known_partitions == set()
+
+
+def test_failed_partition_ddl(partitioned):
+    month = datetime(2024, 12, 1, tzinfo=UTC)
+    # 并发创建：另一方已建好分区时视为成功
+    assert kline_partition.create_month_partition('KLine_BTCUSDT', month,
+                                                  bind=FakeConnection(fail=True, exists=True)) == 'KLine_BTCUSDT_p202412'
+    with pytest.raises(RuntimeError):
+        kline_partition.create_month_partition('KLine_BTCUSDT', month, bind=FakeConnection(fail=True))
+
+
+def test_unpartitioned_table_is_untouched(monkeypatch):
+    monkeypatch.setattr(kline_partition, 'is_partitioned_table', lambda table_name: False)
+    connection = FakeConnection()
+    assert kline_partition.ensure_kline_partitions('KLine_BTCUSDT', datetime(2024, 1, 1, tzinfo=UTC),
+                                                   datetime(2024, 6, 1, tzinfo=UTC), bind=connection) == []
+    kline_partition.ensure_partition_for_time('KLine_BTCUSDT', datetime(2024, 1, 1, tzinfo=UTC), bind=connection)
+    assert connection.statements == []
+
+
+class FakeEngine:
+    def __init__(self):
+        self.statements = []
+
+    @contextmanager
+    def begin(self):
+        connection = FakeConnection()
+        yield connection
+        self.statements.extend(connection.statements)
+
+
+def test_retention_drops_only_expired_months(monkeypatch, tmp_path):
+    current = month_start(datetime.now(UTC))
+    partitions = [(partition_name('KLine_BTCUSDT', add_months(current, offset)), add_months(current, offset))
+                  for offset in (-3, -2, -1, 0, 1)]
+    fake = FakeEngine()
+    archived = []
+    monkeypatch.setattr(kline_partition, 'engine', fake)
+    monkeypatch.setattr(kline_partition, '_quote', lambda name: f'"{name}"')
+    monkeypatch.setattr(kline_partition, 'list_partitions', lambda table_name: partitions)
+    monkeypatch.setattr(kline_partition, 'archive_partition', lambda name, archive_dir: archived.append(name))
+    monkeypatch.setattr(kline_partition, '_known_partitions', {partitions[0][0]})
+
+    # 保留 2 个月：当前月与上个月，以及预建的未来分区
+    dropped = kline_partition.apply_kline_retention('KLine_BTCUSDT', 2, archive_dir=str(tmp_path))
+
+    assert dropped == [partitions[0][0], partitions[1][0]]
+    assert archived == dropped
+    assert fake.statements[:2] == [f'ALTER TABLE "KLine_BTCUSDT" DETACH PARTITION "{dropped[0]}"',
+                                   f'DROP TABLE "{dropped[0]}"']
+    assert kline_partition._known_partitions == set()
+
+    with pytest.raises(ValueError):
+        kline_partition.apply_kline_retention('KLine_BTCUSDT', 0)
@@ -0,0 +1,100 @@
+# app/tests/test_kline_ring.py
+"""K线环形缓冲区：同一根K线原地刷新、满后覆盖最旧、最近 N 根按时间升序，完结K线镜像到 Redis（fakeredis）"""
+import numpy as np
+import pytest
+
+from DataProcessingCalculator.kline_ring import KlineRingBuffer, KlineRingRegistry, ring_key
+
+
+def kline(index, close=None, is_closed=True):
+    close = 100.0 + index if close is None else close
+    return {'open_time': index * 60_000, 'close_time': index * 60_000 + 59_999, 'open': str(close - 1),
+            'high': str(close + 1), 'low': str(close - 2), 'close': str(close), 'volume': '1.5',
+            'num_trades': 3, 'is_closed': is_closed}
+
+
+def test_update_in_place_and_wrap_around():
+    buffer = KlineRingBuffer(capacity=3)
+    assert buffer.last_open_time is None and buffer.last()['close'].size == 0
+
+    buffer.update(kline(0))
+    buffer.update(kline(1, close=50.0, is_closed=False))
+    # 未完结K线不断推送：覆盖最新一格而不是追加
+    assert buffer.update(kline(1, close=51.0))
+    assert buffer.size == 2
+    np.testing.assert_array_equal(buffer.last()['close'], [100.0, 51.0])
+
+    for index in range(2, 5):
+        buffer.update(kline(index))
+    recent = buffer.last()
+    np.testing.assert_array_equal(recent['open_time'], [120_000, 180_000, 240_000])
+    assert recent['open_time'].dtype == np.int64 and recent['close'].dtype == np.float64
+    np.testing.assert_array_equal(buffer.last(2)['close'], [103.0, 104.0])
+    assert buffer.last(10)['close'].size == 3 and buffer.last(0)['close'].size == 0
+
+    # 早于最新一根的K线（重连后的旧推送）被忽略
+    assert not buffer.update(kline(3, close=0.0))
+    assert buffer.last()['close'][1] == 103.0
+
+    # 读取结果是拷贝
+    recent['close'][:] = 0
+    assert buffer.last()['close'][0] == 102.0
+
+    with pytest.raises(ValueError):
+        KlineRingBuffer(capacity=0)
+
+
+def test_closed_only_excludes_forming_kline():
+    buffer = KlineRingBuffer(capacity=4)
+    for index in range(4):
+        buffer.update(kline(index))
+    buffer.update(kline(4, is_closed=False))
+    np.testing.assert_array_equal(buffer.last(closed_only=True)['open_time'], [60_000, 120_000, 180_000])
+    np.testing.assert_array_equal(buffer.last(2, closed_only=True)['open_time'], [120_000, 180_000])
+    np.testing.assert_array_equal(buffer.last(2)['open_time'], [180_000, 240_000])
+
+    buffer.update(kline(4))
+    np.testing.assert_array_equal(buffer.last(1, closed_only=True)['open_time'], [240_000])
+
+
+def test_extend_keeps_most_recent_history():
+    buffer = KlineRingBuffer(capacity=3)
+    columns = {'open_time': np.arange(5) * 60_000, 'close_time': np.arange(5) * 60_000 + 59_999,
+               'close': np.arange(5, dtype=float)}
+    assert buffer.extend(columns) == 3
+    np.testing.assert_array_equal(buffer.last()['close'], [2.0, 3.0, 4.0])
+    # 缺失的列记为 0
+    assert buffer.last()['volume'].tolist() == [0.0, 0.0, 0.0]
+
+
+def test_registry_mirrors_closed_klines_to_redis():
+    fakeredis = pytest.importorskip('fakeredis')
+    client = fakeredis.FakeRedis()
+    registry = KlineRingRegistry(capacity=3, client=client, mirror=True)
+
+    assert registry.last('btcusdt', '1m') is None
+    registry.update('btcusdt', '1m', kline(0, is_closed=False))
+    assert not client.exists(ring_key('BTCUSDT', '1m'))
+    for index in range(5):
+        registry.update('btcusdt', '1m', kline(index))
+
+    assert registry.keys() == [('BTCUSDT', '1m')]
+    np.testing.assert_array_equal(registry.last('BTCUSDT', '1m', 2)['close'], [103.0, 104.0])
+    # 镜像只保留容量内的最新完结K线
+    assert client.llen(ring_key('BTCUSDT', '1m')) == 3
+    mirror = registry.read_mirror('BTCUSDT', '1m')
+    np.testing.assert_array_equal(mirror['open_time'], [120_000, 180_000, 240_000])
+    np.testing.assert_array_equal(mirror['high'], [103.0, 104.0, 105.0])
+    assert registry.read_mirror('BTCUSDT', '1m', 1)['close'].tolist() == [104.0]
+    assert registry.read_mirror('ETHUSDT', '1m')['close'].size == 0
+
+
+class BrokenRedis:
+    def pipeline(self, transaction=False):
+        raise ConnectionError('redis is down')
+
+
+def test_mirror_failure_does_not_block_ingestion():
+    registry = KlineRingRegistry(capacity=3, client=BrokenRedis(), mirror=True)
+    assert registry.update('BTCUSDT', '1m', kline(0))
+    assert registry.last('BTCUSDT', '1m')['close'].tolist() == [100.0]
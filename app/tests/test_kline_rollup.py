@@ -0,0 +1,152 @@
+# app/tests/test_kline_rollup.py
+"""聚合K线：桶边界对齐 UTC 纪元、各存储布局选用对应的聚合 SQL、回填按桶边界分段"""
+import os
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+# 只创建引擎，不连接数据库
+os.environ.setdefault('DATABASE_URL', 'postgresql+psycopg2://localhost/test')
+
+from DatabaseOperator import kline_rollup  # noqa: E402
+from DatabaseOperator.kline_rollup import bucket_bounds  # noqa: E402
+
+UTC = timezone.utc
+
+
+def ms(*args) -> int:
+    return int(datetime(*args, tzinfo=UTC).timestamp() * 1000)
+
+
+class RecordingConnection:
+    """记录执行的 SQL 与参数；bounds 为回填查询 min/max(open_time) 的结果"""
+
+    def __init__(self, bounds=(None, None)):
+        self.bounds = bounds
+        self.calls = []
+
+    def execute(self, stmt, params=None):
+        self.calls.append((str(stmt), dict(params or {})))
+        return SimpleNamespace(rowcount=1, one=lambda: self.bounds)
+
+
+@pytest.fixture
+def layout(monkeypatch):
+    """默认 per_symbol + standard 布局；返回可修改的开关"""
+    state = SimpleNamespace(unified=False, compact=False, partitions=[])
+    monkeypatch.setattr(kline_rollup, 'is_unified_backend', lambda: state.unified)
+    monkeypatch.setattr(kline_rollup, 'is_compact_table', lambda table: state.compact)
+    monkeypatch.setattr(kline_rollup, 'ensure_kline_partitions',
+                        lambda table, start, end, bind=None: state.partitions.append((table, start, end)))
+    return state
+
+
+@pytest.mark.parametrize('interval, open_time, start, end', [
+    ('5m', ms(2024, 1, 1, 0, 7), datetime(2024, 1, 1, 0, 5, tzinfo=UTC), datetime(2024, 1, 1, 0, 10, tzinfo=UTC)),
+    ('1h', ms(2024, 1, 1, 13, 59), datetime(2024, 1, 1, 13, tzinfo=UTC), datetime(2024, 1, 1, 14, tzinfo=UTC)),
+    # 4h 与 1d 按 UTC 纪元对齐（与 Binance 一致），而不是按本地时区
+    ('4h', ms(2024, 1, 1, 3, 0), datetime(2024, 1, 1, 0, tzinfo=UTC), datetime(2024, 1, 1, 4, tzinfo=UTC)),
+    ('1d', ms(2024, 3, 5, 23, 59), datetime(2024, 3, 5, tzinfo=UTC), datetime(2024, 3, 6, tzinfo=UTC)),
+])
+def test_bucket_bounds(interval, open_time, start, end):
+    assert bucket_bounds(open_time, interval) == (start, end)
+    # 桶开始本身属于该桶
+    assert bucket_bounds(int(start.timestamp() * 1000), interval) == (start, end)
+
+
+def test_unknown_interval_is_rejected():
+    with pytest.raises(ValueError):
+        kline_rollup.rollup_closed_kline(RecordingConnection(), 'BTCUSDT', 0, intervals=['1m'])
+    assert kline_rollup._validate_intervals(None) == list(kline_rollup.ROLLUP_INTERVALS)
+
+
+def test_closed_kline_updates_every_bucket(layout):
+    session = RecordingConnection()
+    kline_rollup.rollup_closed_kline(session, 'btcusdt', ms(2024, 1, 1, 13, 7), intervals=['5m', '1h'])
+
+    (sql_5m, params_5m), (sql_1h, params_1h) = session.calls
+    assert 'INSERT INTO "KLine_BTCUSDT_5m"' in sql_5m and 'FROM "KLine_BTCUSDT" AS s' in sql_5m
+    assert params_5m == {'symbol': 'BTCUSDT', 'step_seconds': 300,
+                         'start_time': datetime(2024, 1, 1, 13, 5, tzinfo=UTC),
+                         'end_time': datetime(2024, 1, 1, 13, 10, tzinfo=UTC)}
+    assert 'INSERT INTO "KLine_BTCUSDT_1h"' in sql_1h and params_1h['step_seconds'] == 3600
+    # 目标分区覆盖 [桶开始, 桶结束) 的最后一毫秒
+    assert layout.partitions[1] == ('KLine_BTCUSDT_1h', datetime(2024, 1, 1, 13, tzinfo=UTC),
+                                    datetime(2024, 1, 1, 14, tzinfo=UTC) - timedelta(milliseconds=1))
+
+
+def test_compact_rollup_uses_epoch_ms(layout):
+    layout.compact = True
+    session = RecordingConnection()
+    kline_rollup.rollup_closed_kline(session, 'BTCUSDT', ms(2024, 1, 1, 0, 7), intervals=['15m'])
+
+    ((sql, params),) = session.calls
+    assert '(s.open_time / :step_ms) * :step_ms' in sql
+    assert params == {'step_ms': 900_000, 'start_ms': ms(2024, 1, 1, 0, 0), 'end_ms': ms(2024, 1, 1, 0, 15)}
+
+
+def test_unified_rollup_reads_and_writes_klines(layout):
+    layout.unified = True
+    session = RecordingConnection()
+    kline_rollup.rollup_closed_kline(session, 'BTCUSDT', ms(2024, 1, 1, 0, 7), intervals=['5m'])
+
+    ((sql, params),) = session.calls
+    assert 'INSERT INTO klines' in sql and 'FROM klines AS s' in sql
+    assert 'ON CONFLICT (symbol, "interval", open_time)' in sql
+    assert params['interval'] == '5m' and params['symbol'] == 'BTCUSDT'
+    # 统一表不需要维护分区
+    assert layout.partitions == []
+
+
+class FakeEngine:
+    def __init__(self, bounds):
+        self.dialect = kline_rollup.engine.dialect
+        self.bounds_connection = RecordingConnection(bounds)
+        self.transactions = []
+
+    @contextmanager
+    def connect(self):
+        yield self.bounds_connection
+
+    @contextmanager
+    def begin(self):
+        connection = RecordingConnection()
+        self.transactions.append(connection)
+        yield connection
+
+
+def test_backfill_chunks_align_to_bucket_boundaries(monkeypatch, layout):
+    fake = FakeEngine((datetime(2024, 1, 1, 0, 3, tzinfo=UTC), datetime(2024, 1, 2, 12, 30, tzinfo=UTC)))
+    monkeypatch.setattr(kline_rollup, 'engine', fake)
+    monkeypatch.setattr(kline_rollup, 'ensure_rollup_tables', lambda symbol, intervals: None)
+
+    totals = kline_rollup.backfill_rollups('BTCUSDT', ['4h', '1d'], chunk_days=1)
+
+    windows = [(params['step_seconds'], params['start_time'], params['end_time'])
+               for connection in fake.transactions for _, params in connection.calls]
+    day = timedelta(days=1)
+    start = datetime(2024, 1, 1, tzinfo=UTC)
+    # 最后一段延伸到最新 1m K线所在桶的结束，每个桶只在一个事务内聚合
+    assert windows == [(14400, start, start + day), (14400, start + day, datetime(2024, 1, 2, 16, tzinfo=UTC)),
+                       (86400, start, start + day), (86400, start + day, start + 2 * day)]
+    assert totals == {'4h': 2, '1d': 2}
+
+
+def test_backfill_compact_bounds_and_empty_table(monkeypatch, layout):
+    fake = FakeEngine((ms(2024, 1, 1, 0, 3), ms(2024, 1, 1, 0, 9)))
+    monkeypatch.setattr(kline_rollup, 'engine', fake)
+    monkeypatch.setattr(kline_rollup, 'ensure_rollup_tables', lambda symbol, intervals: None)
+    layout.compact = True
+    assert kline_rollup.backfill_rollups('BTCUSDT', ['5m']) == {'5m': 1}
+    ((_, params),) = fake.transactions[0].calls
+    assert (params['start_ms'], params['end_ms']) == (ms(2024, 1, 1, 0, 0), ms(2024, 1, 1, 0, 10))
+
+    fake = FakeEngine((None, None))
+    monkeypatch.setattr(kline_rollup, 'engine', fake)
+    assert kline_rollup.backfill_rollups('BTCUSDT', ['5m', '1h']) == {'5m': 0, '1h': 0}
+    assert fake.transactions == []
+
+    with pytest.raises(ValueError):
+        kline_rollup.backfill_rollups('BTCUSDT', chunk_days=0)
@@ -0,0 +1,136 @@
+# app/tests/test_kline_store.py
+"""统一K线表 klines：建表结构、按 (symbol, interval, open_time) UPSERT、读取时推导 close_time"""
+import os
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import MetaData, create_mock_engine
+from sqlalchemy.dialects import postgresql
+
+# 只创建引擎，不连接数据库
+os.environ.setdefault('DATABASE_URL', 'postgresql+psycopg2://localhost/test')
+
+from DatabaseOperator import kline_partition, kline_store, pg_operator  # noqa: E402
+
+UTC = timezone.utc
+
+KLINE = {'open_time': 1_704_067_200_000, 'close_time': 1_704_067_259_999, 'open': '42000.5', 'high': '42100',
+         'low': '41900', 'close': '42050.25', 'volume': '12.5', 'quote_asset_volume': '525000',
+         'num_trades': 321, 'taker_buy_base_vol': '6', 'taker_buy_quote_vol': '252000', 'interval': '1m'}
+
+
+class NoTables:
+    def has_table(self, name):
+        return False
+
+
+@pytest.fixture
+def tables(monkeypatch):
+    """不连接数据库建表：DDL 编译为 PostgreSQL 语句后记录下来"""
+    ddl = []
+    mock = create_mock_engine('postgresql+psycopg2://',
+                              lambda sql, *args, **kwargs: ddl.append(str(sql.compile(dialect=mock.dialect))))
+    monkeypatch.setattr(kline_store, 'inspect', lambda bind: NoTables())
+    monkeypatch.setattr(pg_operator, 'inspect', lambda bind: NoTables())
+    monkeypatch.setattr(kline_store, '_unified_table', None)
+    monkeypatch.setattr(kline_partition, 'is_partitioned_table', lambda table_name: False)
+    return mock, ddl
+
+
+class RecordingSession:
+    def __init__(self, rows=()):
+        self.rows = list(rows)
+        self.statements = []
+
+    def execute(self, stmt):
+        self.statements.append(stmt.compile(dialect=postgresql.dialect()))
+        return self
+
+    def fetchall(self):
+        return self.rows
+
+
+def test_unified_table_layout(tables):
+    mock, ddl = tables
+    table = kline_store.create_unified_kline_table_if_not_exists(mock)
+
+    create = ' '.join(ddl[0].split())
+    assert 'CONSTRAINT klines_pkey PRIMARY KEY (symbol, interval, open_time)' in create
+    # close_time 与入库时间可推导，不逐行保存；价格为 double precision
+    assert 'close_time' not in create and 'timestamp' not in create
+    assert 'open FLOAT NOT NULL' in create
+    assert 'USING brin (open_time)' in ddl[1]
+    assert kline_store.create_unified_kline_table_if_not_exists() is table
+
+
+def test_insert_kline_unified_upserts_by_symbol_interval(tables):
+    mock, _ = tables
+    table = kline_store.create_unified_kline_table_if_not_exists(mock)
+    session = RecordingSession()
+
+    assert pg_operator.insert_kline(session, table, 'BTCUSDT', KLINE) == datetime(2024, 1, 1, tzinfo=UTC)
+    pg_operator.insert_kline(session, table, 'BTCUSDT', KLINE, interval='1h')
+
+    first, second = session.statements
+    assert 'ON CONFLICT (symbol, interval, open_time) DO UPDATE SET' in str(first)
+    assert set(first.params) == {'symbol', 'interval', 'open_time', 'open', 'high', 'low', 'close', 'volume',
+                                 'quote_asset_volume', 'num_trades', 'taker_buy_base_vol', 'taker_buy_quote_vol'}
+    assert (first.params['interval'], first.params['close']) == ('1m', 42050.25)
+    assert second.params['interval'] == '1h'
+
+
+def test_insert_kline_per_symbol_table(tables):
+    mock, _ = tables
+    table = pg_operator.create_kline_table_if_not_exists(mock, 'BTCUSDT', partitioned=False, layout='standard')
+    session = RecordingSession()
+    pg_operator.insert_kline(session, table, 'BTCUSDT', KLINE)
+
+    (stmt,) = session.statements
+    assert 'INSERT INTO "KLine_BTCUSDT"' in str(stmt) and 'ON CONFLICT (open_time) DO UPDATE SET' in str(stmt)
+    assert stmt.params['close_time'] == datetime(2024, 1, 1, 0, 0, 59, 999000, tzinfo=UTC)
+    assert 'interval' not in stmt.params
+
+
+def test_dbget_kline_unified_derives_close_time(monkeypatch, tables):
+    mock, _ = tables
+    metadata = MetaData()
+    kline_store.create_unified_kline_table_if_not_exists(mock).to_metadata(metadata)
+    # dbget_kline 按表名反射；表已在 metadata 中时直接复用，不访问数据库
+    monkeypatch.setattr(pg_operator, 'metadata', metadata)
+    session = RecordingSession(rows=[('row',)])
+
+    rows = pg_operator.dbget_kline(session, 'klines', 'BTCUSDT', ascending=False, interval='4h', limit=5,
+                                   start_time=datetime(2024, 1, 1, tzinfo=UTC))
+
+    assert rows == [('row',)]
+    (stmt,) = session.statements
+    sql = ' '.join(str(stmt).split())
+    assert "(klines.open_time + interval '4 hours') - interval '1 millisecond' AS close_time" in sql
+    assert 'CAST(NULL AS TIMESTAMP WITH TIME ZONE) AS timestamp' in sql
+    assert 'WHERE klines.symbol = %(symbol_1)s' in sql and 'AND klines.interval = %(interval_1)s' in sql
+    assert 'AND klines.open_time >= %(open_time_1)s' in sql and 'ORDER BY klines.open_time DESC LIMIT' in sql
+    assert (stmt.params['symbol_1'], stmt.params['interval_1'], stmt.params['param_1']) == ('BTCUSDT', '4h', 5)
+
+
+def test_close_time_expression_and_backend_validation():
+    with pytest.raises(ValueError):
+        kline_store.close_time_expression(None, '7m')
+    assert kline_store.is_unified_backend('UNIFIED')
+    assert not kline_store.is_unified_backend('per_symbol')
+    with pytest.raises(ValueError):
+        kline_store.is_unified_backend('sharded')
+    assert kline_store.kline_table_name_for('btcusdt', '1h', backend='per_symbol') == 'KLine_BTCUSDT_1h'
+    assert kline_store.kline_table_name_for('btcusdt', '1h', backend='unified') == 'klines'
+
+
+def test_latest_klines_returns_ascending(monkeypatch):
+    calls = []
+
+    def dbget_kline(session, table_name, symbol, **kwargs):
+        calls.append((table_name, symbol, kwargs))
+        return [3, 2, 1]
+
+    monkeypatch.setattr(pg_operator, 'dbget_kline', dbget_kline)
+    assert kline_store.latest_klines(None, 'btcusdt', '5m', limit=3, backend='unified') == [1, 2, 3]
+    assert calls == [('klines', 'BTCUSDT', {'order_by_column': 'open_time', 'ascending': False,
+                                            'interval': '5m', 'limit': 3})]
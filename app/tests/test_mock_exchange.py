@@ -0,0 +1,249 @@
+# app/tests/test_mock_exchange.py
+"""模拟交易所：行情可复现、深度快照与增量可重建订单簿、订单撮合与 executionReport、行情流广播与慢连接断开、录制回放"""
+import asyncio
+import json
+
+import pytest
+
+from ExchangeFetcher.depth_book import LocalOrderBook
+from ExchangeFetcher.stream_recorder import StreamRecorder
+from MockExchange.market import INTERVAL_MS, KLINE_HISTORY, MockAccount, MockError, MockMarket
+from MockExchange.server import MockExchange, StreamHub, parse_stream
+
+DEPTH = 'btcusdt@depth@100ms'
+
+
+def test_synthetic_klines_are_reproducible():
+    market = MockMarket('btcusdt', price=30000, seed=1)
+    bars = market.klines('1m', limit=1000)
+    assert bars == MockMarket('BTCUSDT', price=30000, seed=1).klines('1m', limit=1000)
+    assert len(bars) == KLINE_HISTORY and market.symbol == 'BTCUSDT'
+
+    # 连续且全部为已完结的历史K线，与 REST 数组格式一致
+    assert all(b[0] - a[0] == INTERVAL_MS['1m'] for a, b in zip(bars, bars[1:]))
+    assert all(bar[6] == bar[0] + INTERVAL_MS['1m'] - 1 for bar in bars)
+    assert all(float(bar[3]) <= min(float(bar[1]), float(bar[4])) <= float(bar[2]) for bar in bars)
+
+    assert market.klines('1m', limit=5) == bars[-5:]
+    assert market.klines('1m', limit=3, start_time=bars[10][0]) == bars[10:13]
+    assert market.klines('1m', start_time=bars[10][0], end_time=bars[12][0]) == bars[10:13]
+    with pytest.raises(MockError) as exc_info:
+        market.klines('7m')
+    assert exc_info.value.code == -1120
+
+
+def test_live_kline_event_updates_current_bar():
+    market = MockMarket('BTCUSDT', seed=2)
+    first = market.next_kline_event('1h')['k']
+    second = market.next_kline_event('1h')['k']
+    assert (first['t'], first['x'], first['i']) == (second['t'], False, '1h')
+    assert second['n'] == first['n'] + 1
+    assert float(second['v']) > float(first['v'])
+
+
+def test_recorded_klines_replay_in_order(tmp_path):
+    path = tmp_path / 'klines.jsonl'
+    rows = [{'open_time': i * 60_000, 'open': '1', 'high': '2', 'low': '0.5', 'close': str(10 + i),
+             'volume': '3', 'close_time': i * 60_000 + 59_999} for i in (2, 0, 1)]
+    path.write_text('\n'.join(json.dumps(row) for row in rows))
+
+    market = MockMarket('BTCUSDT', klines_file=path)
+    assert market.price == 12.0
+    assert [bar[0] for bar in market.klines('1m')] == [0, 60_000, 120_000]
+    # 推送按开盘时间依次回放（均为完结K线），到末尾后循环
+    events = [market.next_kline_event('1m')['k'] for _ in range(4)]
+    assert [(k['t'], k['c'], k['x']) for k in events] == [
+        (0, '10', True), (60_000, '11', True), (120_000, '12', True), (0, '10', True)]
+
+
+def test_client_rebuilds_book_from_snapshot_and_diffs():
+    market = MockMarket('BTCUSDT', price=30000, seed=3)
+    client = LocalOrderBook('BTCUSDT')
+    client.load_snapshot(market.depth_snapshot(5000))
+
+    last_id = client.last_update_id
+    for _ in range(200):
+        event = market.next_depth_event()
+        assert event['U'] == last_id + 1 and event['u'] >= event['U']
+        assert client.apply_diff(event)
+        last_id = event['u']
+        bid, ask = market.book.best_bid(), market.book.best_ask()
+        assert bid[0] < ask[0]
+    # 按官方同步步骤重建的订单簿与交易所一致
+    assert client.top(None) == market.book.top(None)
+    assert len(market.depth_snapshot(10)['bids']) == 10
+
+
+def test_agg_trades_rest_matches_stream():
+    market = MockMarket('BTCUSDT', seed=4)
+    events = [market.next_event('aggTrade') for _ in range(10)]
+    assert [e['a'] for e in events] == list(range(1, 11))
+    assert all(b['f'] == a['l'] + 1 for a, b in zip(events, events[1:]))
+
+    assert [t['a'] for t in market.agg_trades(limit=3)] == [8, 9, 10]
+    page = market.agg_trades(from_id=4, limit=2)
+    assert page == [{key: events[i][key] for key in ('a', 'p', 'q', 'f', 'l', 'T', 'm', 'M')} for i in (3, 4)]
+    with pytest.raises(MockError):
+        market.next_event('bookTicker')
+
+
+def make_account(reports):
+    market = MockMarket('BTCUSDT', price=30000, seed=5)
+    return market, MockAccount({'BTCUSDT': market}, on_execution=reports.append)
+
+
+def test_market_and_crossing_limit_orders_fill_at_touch():
+    reports = []
+    market, account = make_account(reports)
+    ask, bid = market.book.best_ask()[0], market.book.best_bid()[0]
+
+    order = account.place_order({'symbol': 'btcusdt', 'side': 'BUY', 'type': 'MARKET', 'quantity': '2',
+                                 'newClientOrderId': 'm1'})
+    assert (order['status'], order['executedQty']) == ('FILLED', '2.00000000')
+    assert float(order['cummulativeQuoteQty']) == pytest.approx(2 * ask)
+    assert [(r['x'], r['X']) for r in reports] == [('NEW', 'NEW'), ('TRADE', 'FILLED')]
+    assert float(reports[-1]['L']) == ask and reports[-1]['c'] == 'm1'
+    # 成交同时生成一条归集成交，买方主动 m=False
+    trade = market.agg_trades(limit=1)[0]
+    assert (float(trade['p']), float(trade['q']), trade['m']) == (ask, 2.0, False)
+
+    # 穿价的限价卖单按买一成交，而不是按限价
+    order = account.place_order({'symbol': 'BTCUSDT', 'side': 'SELL', 'type': 'LIMIT', 'timeInForce': 'GTC',
+                                 'quantity': '1', 'price': str(bid - 100)})
+    assert order['status'] == 'FILLED' and float(order['cummulativeQuoteQty']) == pytest.approx(bid)
+
+
+def test_resting_limit_order_lifecycle():
+    reports = []
+    market, account = make_account(reports)
+    bid = market.book.best_bid()[0]
+
+    order = account.place_order({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'timeInForce': 'GTC',
+                                 'quantity': '1', 'price': str(bid - 50), 'newClientOrderId': 'rest'})
+    assert order['status'] == 'NEW' and order['fills'] == []
+    assert [o['clientOrderId'] for o in account.open_orders('btcusdt')] == ['rest']
+    assert account.get_order('BTCUSDT', order_id=order['orderId'])['clientOrderId'] == 'rest'
+
+    canceled = account.cancel_order('BTCUSDT', 'rest')
+    assert (canceled['status'], canceled['origClientOrderId']) == ('CANCELED', 'rest')
+    assert account.open_orders() == [] and reports[-1]['x'] == 'CANCELED' and not reports[-1]['w']
+    with pytest.raises(MockError) as exc_info:
+        account.cancel_order('BTCUSDT', 'rest')
+    assert exc_info.value.code == -2011
+
+    # IOC 不穿价即过期；LIMIT_MAKER 穿价会成为吃单，直接拒绝
+    ioc = account.place_order({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'timeInForce': 'IOC',
+                               'quantity': '1', 'price': str(bid - 50)})
+    maker = account.place_order({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT_MAKER', 'quantity': '1',
+                                 'price': str(market.book.best_ask()[0])})
+    assert ioc['status'] == maker['status'] == 'EXPIRED'
+    assert account.open_orders() == []
+
+
+@pytest.mark.parametrize('params, code', [
+    ({'symbol': 'ETHUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': '1'}, -1121),
+    ({'symbol': 'BTCUSDT', 'side': 'HOLD', 'type': 'MARKET', 'quantity': '1'}, -1102),
+    ({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'STOP_LOSS', 'quantity': '1'}, -1116),
+    ({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'quantity': '1'}, -1102),
+    ({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': '1', 'newClientOrderId': 'dup'}, -2010),
+])
+def test_invalid_orders_are_rejected(params, code):
+    _, account = make_account([])
+    account.place_order({'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': '1',
+                         'newClientOrderId': 'dup'})
+    with pytest.raises(MockError) as exc_info:
+        account.place_order(params)
+    assert exc_info.value.code == code
+
+
+def test_parse_stream():
+    assert parse_stream('btcusdt@kline_1m') == ('BTCUSDT', 'kline', '1m')
+    assert parse_stream(DEPTH) == ('BTCUSDT', 'depth', None)
+    assert parse_stream('ethusdt@aggTrade') == ('ETHUSDT', 'aggTrade', None)
+    for stream in ('btcusdt@kline_7m', 'btcusdt@bookTicker', 'btcusdt'):
+        with pytest.raises(MockError):
+            parse_stream(stream)
+
+
+def test_stream_hub_broadcasts_and_drops_slow_clients():
+    async def run():
+        hub = StreamHub({'BTCUSDT': MockMarket('BTCUSDT', seed=6)}, rate=0, queue_size=5)
+        fast = hub.subscribe(DEPTH)
+        slow = hub.subscribe(DEPTH)
+        producer = hub._producers[DEPTH]
+        # 一个流只有一个生产任务，两个连接收到相同的消息
+        messages = [await fast.get() for _ in range(3)]
+        assert [json.loads(m)['e'] for m in messages] == ['depthUpdate'] * 3
+
+        for _ in range(20):
+            await fast.get()
+        # slow 从不读取：队列满后被移除，只剩断开标记 None
+        assert slow.get_nowait() is None and hub.stats['slow_clients'] == 1
+
+        hub.unsubscribe(DEPTH, fast)
+        await asyncio.sleep(0)
+        assert producer.cancelled() and DEPTH not in hub._subscribers
+        with pytest.raises(MockError):
+            hub.subscribe('btcusdt@bookTicker')
+        with pytest.raises(MockError):
+            hub.subscribe('ethusdt@aggTrade')
+
+    asyncio.run(run())
+
+
+def test_ws_api_and_user_data_stream():
+    async def run():
+        exchange = MockExchange(['BTCUSDT'], rate=0, seed=7)
+        listen_key = exchange.account.create_listen_key()
+        user_stream = exchange.hub.subscribe(listen_key, produce=False)
+
+        placed = exchange.ws_api_call({'id': 'a', 'method': 'order.place', 'params': {
+            'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': '1', 'newClientOrderId': 'ws1'}})
+        assert (placed['id'], placed['status'], placed['result']['status']) == ('a', 200, 'FILLED')
+        status = exchange.ws_api_call({'id': 'b', 'method': 'order.status',
+                                       'params': {'symbol': 'BTCUSDT', 'origClientOrderId': 'ws1'}})
+        assert status['result']['executedQty'] == '1.00000000'
+
+        # 下单产生的 executionReport 推送到 listenKey 对应的用户数据流
+        reports = [json.loads(user_stream.get_nowait()) for _ in range(user_stream.qsize())]
+        assert [(r['e'], r['x']) for r in reports] == [('executionReport', 'NEW'), ('executionReport', 'TRADE')]
+
+        missing = exchange.ws_api_call({'id': 'c', 'method': 'order.cancel',
+                                        'params': {'symbol': 'BTCUSDT', 'origClientOrderId': 'nope'}})
+        assert missing == {'id': 'c', 'status': 400, 'error': {'code': -2013, 'msg': 'Order does not exist.'}}
+        assert exchange.ws_api_call({'id': 'd', 'method': 'order.amend'})['error']['code'] == -1100
+        assert exchange.stats['ws_api_requests'] == 4
+
+        exchange.account.keepalive(listen_key)
+        exchange.account.close_listen_key(listen_key)
+        with pytest.raises(MockError):
+            exchange.account.keepalive(listen_key)
+
+    asyncio.run(run())
+
+
+def test_load_recording_replays_frames(tmp_path):
+    path = tmp_path / 'recording.jsonl.gz'
+    snapshot = {'lastUpdateId': 100, 'bids': [['99.0', '1.0']], 'asks': [['101.0', '1.0']]}
+    kline = {'e': 'kline', 's': 'ETHUSDT', 'k': {'t': 0, 'c': '2000'}}
+    with StreamRecorder(path) as recorder:
+        # 快照之前的增量没有起点，被忽略
+        recorder.write(DEPTH, json.dumps({'e': 'depthUpdate', 'U': 90, 'u': 95, 'b': [], 'a': []}))
+        recorder.write_snapshot(DEPTH, snapshot)
+        recorder.write(DEPTH, json.dumps({'e': 'depthUpdate', 'U': 95, 'u': 100, 'b': [], 'a': []}))
+        recorder.write(DEPTH, json.dumps({'e': 'depthUpdate', 'U': 101, 'u': 102, 'b': [['100.0', '2.0']],
+                                          'a': []}))
+        recorder.write('ethusdt@kline_1m', json.dumps(kline))
+        recorder.write('btcusdt@bookTicker', '{}')
+
+    exchange = MockExchange(['BTCUSDT'], seed=8)
+    counts = exchange.load_recording(path)
+    assert counts == {DEPTH: 1, 'ethusdt@kline_1m': 1}
+    # 录制中出现的新交易对自动加入
+    assert sorted(exchange.markets) == ['BTCUSDT', 'ETHUSDT']
+    assert exchange.hub.recorded['ethusdt@kline_1m'] == [json.dumps(kline)]
+
+    market = exchange.markets['BTCUSDT']
+    assert market.depth_snapshot()['lastUpdateId'] == 100 and market.price == 100.0
+    assert market.next_depth_event()['u'] == 102
+    assert market.book.best_bid() == (100.0, 2.0)
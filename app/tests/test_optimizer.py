@@ -0,0 +1,51 @@
+# app/tests/test_optimizer.py
+"""EMA / MACD 周期优化：EMA 矩阵口径、排序指标校验、串行与进程池结果一致"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from Backtest.optimizer import build_combinations, ema_matrix, optimize
+
+
+@pytest.fixture
+def candles():
+    rng = np.random.default_rng(7)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, 600)))
+    return {
+        'open_time': np.arange(600, dtype=np.int64) * 60_000,
+        'open': np.concatenate(([close[0]], close[:-1])),
+        'close': close,
+    }
+
+
+def test_ema_matrix_matches_pandas(candles):
+    spans = [3, 10, 26]
+    matrix = ema_matrix(candles['close'], spans)
+    assert matrix.shape == (3, 600)
+    for row, span in enumerate(spans):
+        expected = pd.Series(candles['close']).ewm(span=span, adjust=False).mean().to_numpy()
+        np.testing.assert_allclose(matrix[row], expected)
+
+
+def test_oos_rank_requires_holdout(candles):
+    combinations = build_combinations('ema', [5], [20])
+    with pytest.raises(ValueError, match='holdout'):
+        optimize(candles, 'ema', combinations, processes=1, rank_by='oos_score')
+    with pytest.raises(ValueError, match='未知的排序指标'):
+        optimize(candles, 'ema', combinations, processes=1, rank_by='profit')
+
+    results = optimize(candles, 'ema', combinations, processes=1, rank_by='oos_score', holdout=0.3)
+    assert 'oos_score' in results[0]
+
+
+def test_build_combinations_rejects_non_integer_periods():
+    with pytest.raises(ValueError):
+        build_combinations('ema', [5.5], [20])
+
+
+def test_pool_matches_serial(candles):
+    combinations = build_combinations('macd', [5, 8], [20, 26], [9])
+    serial = optimize(candles, 'macd', combinations, processes=1)
+    pooled = optimize(candles, 'macd', combinations, processes=2)
+    assert [r['params'] for r in serial] == [r['params'] for r in pooled]
+    assert [r['score'] for r in serial] == pytest.approx([r['score'] for r in pooled])
@@ -0,0 +1,141 @@
+# app/tests/test_order_gateway.py
+"""下单网关与风控：价格两级读取、发送失败时按 order.status 处理并释放挂单额度"""
+import asyncio
+import os
+import time
+
+import pytest
+
+# 只创建引擎，不连接数据库
+os.environ.setdefault('DATABASE_URL', 'postgresql+psycopg2://localhost/test')
+
+from ExchangeBill.order_gateway import OrderGateway, OrderGatewayError  # noqa: E402
+from ExchangeBill.risk_engine import RiskEngine, RiskLimits, RiskRejected  # noqa: E402
+
+
+class FakePriceCache:
+    def __init__(self, prices):
+        self.prices = prices
+        self.calls = []
+
+    def get_entries(self, symbols, fetch=True, max_age=None):
+        self.calls.append((list(symbols), max_age))
+        now_ms = int(time.time() * 1000)
+        return {s: {'price': self.prices[s], 'timestamp': now_ms} if s in self.prices else None for s in symbols}
+
+
+class ListRecorder:
+    def __init__(self):
+        self.records = []
+
+    def record(self, record):
+        self.records.append(record)
+
+
+def make_gateway(responses, prices=None):
+    """responses: method -> 返回值或异常"""
+    cache = FakePriceCache(prices if prices is not None else {'BTCUSDT': 30000.0})
+    risk = RiskEngine(RiskLimits(max_order_notional=1e9, max_position_notional=1e9, max_orders_per_second=100,
+                                 price_max_age=60), price_cache=cache)
+    gateway = OrderGateway(signer=object(), recorder=ListRecorder(), risk_engine=risk)
+
+    async def request(method, params=None, signed=True):
+        response = responses[method]
+        if isinstance(response, BaseException):
+            raise response
+        return response
+
+    gateway.request = request
+    return gateway, risk, cache
+
+
+def place(gateway, **params):
+    return asyncio.run(gateway.place_order(symbol='BTCUSDT', side='BUY', type='MARKET', quantity='0.01',
+                                           newClientOrderId='cid', **params))
+
+
+def test_stale_price_is_refreshed_from_price_cache():
+    gateway, risk, cache = make_gateway({'order.place': {'orderId': 1, 'clientOrderId': 'cid', 'status': 'NEW'}})
+    place(gateway)
+    assert cache.calls == [(['BTCUSDT'], 60)]
+    assert risk.last_price('BTCUSDT') == 30000.0
+    # 进程内价格未过期：不再读取缓存
+    assert not risk.price_stale('BTCUSDT')
+    assert risk.refresh_price('BTCUSDT') == 30000.0 and len(cache.calls) == 1
+
+
+def test_timestamp_is_stamped_after_price_refresh():
+    gateway, _, cache = make_gateway({'order.place': {'orderId': 1, 'clientOrderId': 'cid', 'status': 'NEW'}})
+    sent = []
+    refreshed_at = []
+    request = gateway.request
+
+    def slow_get_entries(symbols, fetch=True, max_age=None):
+        time.sleep(0.05)
+        refreshed_at.append(int(time.time() * 1000))
+        return FakePriceCache.get_entries(cache, symbols, fetch, max_age)
+
+    async def recording_request(method, params=None, signed=True):
+        sent.append(dict(params))
+        return await request(method, params, signed)
+
+    cache.get_entries = slow_get_entries
+    gateway.request = recording_request
+    place(gateway)
+    assert sent[0]['timestamp'] >= refreshed_at[0]
+
+
+def test_no_price_anywhere_is_rejected():
+    gateway, risk, _ = make_gateway({}, prices={})
+    with pytest.raises(RiskRejected) as e:
+        place(gateway)
+    assert e.value.rule == 'no_price'
+    assert gateway.recorder.records == []
+
+
+def test_result_is_recorded_once_without_pre_send_row():
+    gateway, risk, _ = make_gateway({'order.place': {'orderId': 1, 'clientOrderId': 'cid', 'status': 'FILLED',
+                                                     'executedQty': '0.01', 'cummulativeQuoteQty': '300'}})
+    place(gateway)
+    assert [record['order_status'] for record in gateway.recorder.records] == ['FILLED']
+    assert risk.open_orders == {} and risk.symbols['BTCUSDT'].position == pytest.approx(0.01)
+
+
+@pytest.mark.parametrize('failure', [ConnectionError('WebSocket API 连接已断开'), asyncio.TimeoutError()])
+def test_send_failure_not_at_exchange_releases_reservation(failure):
+    gateway, risk, _ = make_gateway({'order.place': failure,
+                                     'order.status': OrderGatewayError(400, -2013, 'Order does not exist.')})
+    with pytest.raises(type(failure)):
+        place(gateway)
+    assert risk.open_orders == {} and risk.symbols['BTCUSDT'].open_buy == 0
+    assert [record['order_status'] for record in gateway.recorder.records] == ['REJECTED']
+
+
+@pytest.mark.parametrize('status_error', [OrderGatewayError(429, -1003, 'Too many requests.'),
+                                          OrderGatewayError(400, -1021, 'Timestamp outside of recvWindow.')])
+def test_status_error_other_than_not_found_keeps_order_unresolved(status_error):
+    gateway, risk, _ = make_gateway({'order.place': asyncio.TimeoutError(), 'order.status': status_error})
+    with pytest.raises(asyncio.TimeoutError):
+        place(gateway)
+    # 不能确认订单不存在：不写拒单记录，由用户数据流回报或对账补齐
+    assert gateway.recorder.records == []
+    assert risk.open_orders == {}
+
+
+def test_send_failure_resolved_by_order_status():
+    gateway, risk, _ = make_gateway({'order.place': asyncio.TimeoutError(),
+                                     'order.status': {'orderId': 1, 'clientOrderId': 'cid', 'status': 'NEW',
+                                                      'executedQty': '0'}})
+    with pytest.raises(asyncio.TimeoutError):
+        place(gateway)
+    # 订单已到达交易所：保留挂单额度，按查询结果记录
+    assert 'cid' in risk.open_orders
+    assert [record['order_status'] for record in gateway.recorder.records] == ['NEW']
+
+
+def test_send_and_status_failure_releases_without_record():
+    gateway, risk, _ = make_gateway({'order.place': ConnectionError('down'), 'order.status': ConnectionError('down')})
+    with pytest.raises(ConnectionError):
+        place(gateway)
+    assert risk.open_orders == {}
+    assert gateway.recorder.records == []
@@ -0,0 +1,103 @@
+# app/tests/test_order_journal.py
+"""订单日志写库失败处理：拆批定位出错的记录，反复失败的记录进入死信文件，检查点越过它"""
+import json
+import os
+
+import pytest
+from sqlalchemy.exc import IntegrityError, OperationalError
+
+# 只创建引擎，不连接数据库
+os.environ.setdefault('DATABASE_URL', 'postgresql+psycopg2://localhost/test')
+
+from DatabaseOperator import order_journal  # noqa: E402
+from DatabaseOperator.pg_operator import normalize_order_status, order_response_to_record  # noqa: E402
+
+
+class FakeSession:
+    def __init__(self):
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+class ScriptedJournal(order_journal.OrderJournal):
+    """_write_batch 不访问数据库：含 poison 订单的批次抛出约束错误，前 outages 次调用抛出连接错误"""
+
+    def __init__(self, *args, outages: int = 0, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.outages = outages
+        self.written = []
+        self.calls = 0
+
+    def _write_batch(self, session, table, batch):
+        self.calls += 1
+        if self.outages:
+            self.outages -= 1
+            raise OperationalError('INSERT', {}, Exception('connection refused'))
+        cids = [item['data']['newClientOrderId'] for _, item, _ in batch]
+        if 'poison' in cids:
+            raise IntegrityError('INSERT', {}, Exception('violates check constraint'))
+        self.written.extend(cids)
+        return {cid: f'uuid-{cid}' for cid in cids}
+
+
+@pytest.fixture(autouse=True)
+def no_sleep(monkeypatch):
+    monkeypatch.setattr(order_journal.time, 'sleep', lambda seconds: None)
+
+
+def make_journal(tmp_path, **kwargs) -> ScriptedJournal:
+    return ScriptedJournal(wal_path=tmp_path / 'order_journal.wal', max_attempts=2, **kwargs)
+
+
+def submit(journal, cids):
+    """只写 WAL，不启动后台线程，返回 (seq, item, future) 批次"""
+    batch = []
+    journal._enqueue = lambda seq, item, future: batch.append((seq, item, future))
+    for cid in cids:
+        journal.record({'newClientOrderId': cid, 'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET'})
+    return batch
+
+
+def test_poison_record_is_dead_lettered(tmp_path):
+    journal = make_journal(tmp_path)
+    batch = submit(journal, ['a', 'b', 'poison', 'c', 'd'])
+    journal._flush(FakeSession(), None, batch)
+
+    # 其他记录按原顺序落库
+    assert journal.written == ['a', 'b', 'c', 'd']
+    assert batch[0][2].result() == 'uuid-a'
+    with pytest.raises(IntegrityError):
+        batch[2][2].result()
+
+    lines = [json.loads(line) for line in journal.dead_letter_path.read_text(encoding='utf-8').splitlines()]
+    assert journal.dead_letter_path.name == 'order_journal.dead.jsonl'
+    assert [(line['seq'], line['data']['newClientOrderId']) for line in lines] == [(3, 'poison')]
+    assert 'violates check constraint' in lines[0]['error']
+    assert journal.stats['dead_letters'] == 1
+
+    # 检查点越过死信记录：全部处理完后 WAL 被截断，重启不会再回放
+    assert journal.flush(timeout=0.1)
+    journal.close()
+    assert journal.wal_path.read_text(encoding='utf-8') == ''
+
+
+def test_connection_errors_retry_whole_batch(tmp_path):
+    journal = make_journal(tmp_path, outages=3)
+    batch = submit(journal, ['a', 'b', 'c'])
+    journal._flush(FakeSession(), None, batch)
+
+    # 连接错误不拆批、不进入死信，恢复后整批一次写入
+    assert journal.calls == 4
+    assert journal.written == ['a', 'b', 'c']
+    assert not journal.dead_letter_path.exists()
+    journal.close()
+
+
+def test_status_aliases_apply_to_order_responses():
+    assert normalize_order_status('EXPIRED_IN_MATCH') == 'EXPIRED'
+    assert normalize_order_status('FILLED') == 'FILLED'
+    record = order_response_to_record({'symbol': 'BTCUSDT', 'newClientOrderId': 'x'},
+                                      result={'orderId': 1, 'clientOrderId': 'x', 'status': 'PENDING_NEW'})
+    assert record['order_status'] == 'NEW'
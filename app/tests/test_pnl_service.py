@@ -0,0 +1,85 @@
+# app/tests/test_pnl_service.py
+"""增量盈亏：平均成本法与冷启动口径（最后买入价以 buy_history 为准）"""
+import os
+
+import pytest
+
+# 只创建引擎，不连接数据库
+os.environ.setdefault('DATABASE_URL', 'postgresql+psycopg2://localhost/test')
+
+from DatabaseOperator import pnl_store  # noqa: E402
+from DataProcessingCalculator.pnl_service import PnLService  # noqa: E402
+
+
+def cold_start(monkeypatch, last_buy_price):
+    loaded = {
+        'last_price': 110.0,
+        'last_buy_price': last_buy_price,
+        'fills': [
+            {'newClientOrderId': 'a', 'side': 'BUY', 'executed_qty': 2, 'cummulative_quote_qty': 200},
+            {'newClientOrderId': 'b', 'side': 'BUY', 'executed_qty': 2, 'cummulative_quote_qty': 240},
+            {'newClientOrderId': 'c', 'side': 'SELL', 'executed_qty': 1, 'cummulative_quote_qty': 130},
+        ],
+    }
+    monkeypatch.setattr(pnl_store, 'load_cold_start', lambda symbol: loaded)
+    return PnLService(store=False).cold_start('BTCUSDT')
+
+
+def test_buy_history_is_authoritative_for_last_buy_price(monkeypatch):
+    state = cold_start(monkeypatch, last_buy_price=105.0)
+    # 回放成交中最后一笔买入为 120，diff 仍按 buy_history 的 105 计算
+    assert state.last_buy_price == 105.0
+    assert state.diff == pytest.approx(5.0)
+
+
+def test_replayed_buy_used_without_buy_history(monkeypatch):
+    state = cold_start(monkeypatch, last_buy_price=None)
+    assert state.last_buy_price == 120.0
+
+
+def test_average_cost_replay(monkeypatch):
+    state = cold_start(monkeypatch, last_buy_price=105.0)
+    assert state.position == pytest.approx(3.0)
+    assert state.avg_cost == pytest.approx(110.0)
+    assert state.realized == pytest.approx(20.0)
+    assert state.unrealized == pytest.approx(0.0)
+
+
+def test_duplicate_order_reports_counted_once():
+    service = PnLService(store=False)
+    record = {'newClientOrderId': 'x', 'symbol': 'BTCUSDT', 'side': 'BUY', 'executed_qty': '1',
+              'cummulative_quote_qty': '100'}
+    service.apply_order(record)
+    service.apply_order(record)
+    service.apply_order({**record, 'executed_qty': '3', 'cummulative_quote_qty': '400'})
+    state = service.positions['BTCUSDT']
+    assert state.position == pytest.approx(3.0)
+    assert state.avg_cost == pytest.approx(400 / 3)
+
+
+class FakeSession:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def test_calculate_diff_without_binance_orders_table(monkeypatch, capsys):
+    """没有 BinanceOrders 表时与原来的 calculate_diff 一致：只用最新价格与 buy_history"""
+    from sqlalchemy.exc import NoSuchTableError
+    from DataProcessingCalculator import calculator
+
+    def missing_table():
+        raise NoSuchTableError('BinanceOrders')
+
+    monkeypatch.setattr(pnl_store, 'get_order_table', missing_table)
+    monkeypatch.setattr(pnl_store, 'Session', FakeSession)
+    monkeypatch.setattr(pnl_store, 'load_last_price', lambda session, symbol: 110.0)
+    monkeypatch.setattr(pnl_store, 'load_last_buy_price', lambda session, symbol: 100.0)
+    monkeypatch.setattr(pnl_store, 'reflect_table', lambda name: None)
+
+    assert pnl_store.load_order_fills(FakeSession(), 'BTCUSDT') == []
+    calculator.calculate_diff('BTCUSDT')
+    output = capsys.readouterr().out
+    assert 'Current price: 110.0' in output and 'Last buy price: 100.0' in output
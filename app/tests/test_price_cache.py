@@ -0,0 +1,62 @@
+# app/tests/test_price_cache.py
+"""读穿透价格缓存：批量读取、未命中回填、max_age、并发未命中只请求一次"""
+import threading
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from DatabaseOperator.price_cache import PriceCache  # noqa: E402
+
+
+class SlowFetcher:
+    def __init__(self, prices, delay=0.05):
+        self.prices = prices
+        self.delay = delay
+        self.calls = []
+
+    def __call__(self, symbols):
+        self.calls.append(sorted(symbols))
+        time.sleep(self.delay)
+        return {s: self.prices[s] for s in symbols if s in self.prices}
+
+
+def test_read_through_backfills_cache():
+    fetcher = SlowFetcher({'BTCUSDT': 50000.0, 'ETHUSDT': 3000.0}, delay=0)
+    cache = PriceCache(client=fakeredis.FakeRedis(), fetcher=fetcher)
+    cache.set_price('BTCUSDT', 49000.0)
+
+    assert cache.get_prices(['btcusdt', 'ETHUSDT', 'XRPUSDT']) == {
+        'BTCUSDT': 49000.0, 'ETHUSDT': 3000.0, 'XRPUSDT': None}
+    assert fetcher.calls == [['ETHUSDT', 'XRPUSDT']]
+    assert cache.get_price('ETHUSDT', fetch=False) == 3000.0
+    assert cache.stats['hits'] == 2 and cache.stats['misses'] == 2
+
+
+def test_max_age_refetches_stale_prices():
+    fetcher = SlowFetcher({'BTCUSDT': 50000.0}, delay=0)
+    cache = PriceCache(client=fakeredis.FakeRedis(), fetcher=fetcher)
+    cache.set_price('BTCUSDT', 40000.0, timestamp_ms=int(time.time() * 1000) - 120_000)
+
+    assert cache.get_price('BTCUSDT') == 40000.0
+    entry = cache.get_entries(['BTCUSDT'], max_age=60)['BTCUSDT']
+    assert entry['price'] == 50000.0
+    assert entry['timestamp'] >= int(time.time() * 1000) - 5_000
+    assert cache.stats['stale'] == 1
+
+
+def test_concurrent_misses_share_one_fetch():
+    fetcher = SlowFetcher({'BTCUSDT': 50000.0})
+    cache = PriceCache(client=fakeredis.FakeRedis(), fetcher=fetcher)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_price('BTCUSDT'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [50000.0] * 8
+    assert len(fetcher.calls) == 1
+    assert cache.stats['fetches'] == 1
+    assert cache.stats['misses'] + cache.stats['hits'] == 8
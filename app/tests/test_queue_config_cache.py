@@ -0,0 +1,75 @@
+# app/tests/test_queue_config_cache.py
+"""队列配置缓存：数据库读取失败时不写缓存，继续使用上一次的快照（fakeredis）"""
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from DatabaseOperator.queue_config_cache import QUEUE_CONFIG_HASH, QueueConfigCache  # noqa: E402
+
+
+class FakeManager:
+    def __init__(self, configs):
+        self.configs = configs
+        self.error = None
+        self.calls = 0
+
+    def load_queue_configs(self, active_only=True):
+        self.calls += 1
+        if self.error is not None:
+            raise self.error
+        return [dict(c) for c in self.configs if c['is_active'] or not active_only]
+
+
+def make_cache(configs):
+    manager = FakeManager(configs)
+    client = fakeredis.FakeRedis()
+    cache = QueueConfigCache(manager=manager, client=client, ttl=60)
+    # 不启动订阅线程
+    cache._listener_thread = object()
+    return cache, manager, client
+
+
+CONFIGS = [{'queue_name': 'btc', 'symbol': 'BTCUSDT', 'interval': '1m', 'exchange': 'binance', 'is_active': True},
+           {'queue_name': 'eth', 'symbol': 'ETHUSDT', 'interval': '1m', 'exchange': 'binance', 'is_active': False}]
+
+
+def test_first_load_failure_raises_and_caches_nothing():
+    cache, manager, client = make_cache(CONFIGS)
+    manager.error = ConnectionError('database is down')
+    with pytest.raises(ConnectionError):
+        cache.list()
+    assert not client.exists(QUEUE_CONFIG_HASH)
+
+    # 恢复后正常加载并回填 Redis
+    manager.error = None
+    assert [c['queue_name'] for c in cache.list()] == ['btc']
+    assert client.hexists(QUEUE_CONFIG_HASH, 'btc') and client.hexists(QUEUE_CONFIG_HASH, '__loaded_at__')
+
+
+def test_failure_after_invalidate_serves_previous_snapshot():
+    cache, manager, client = make_cache(CONFIGS)
+    assert [c['queue_name'] for c in cache.list(active_only=False)] == ['btc', 'eth']
+
+    manager.error = ConnectionError('database is down')
+    cache.invalidate(shared=True)
+    # 故障不会变成“没有任何队列”，也不会写入 Redis
+    assert [c['queue_name'] for c in cache.list()] == ['btc']
+    assert cache.get('eth')['is_active'] is False
+    assert not client.exists(QUEUE_CONFIG_HASH)
+    calls = manager.calls
+    cache.list()
+    assert manager.calls == calls + 1  # 快照不延长有效期，每次读取都重试
+
+    manager.error = None
+    manager.configs = CONFIGS[:1]
+    assert cache.get('eth') is None
+    assert client.hexists(QUEUE_CONFIG_HASH, 'btc')
+
+
+def test_database_only_fallback_without_redis():
+    manager = FakeManager(CONFIGS)
+    cache = QueueConfigCache(manager=manager, client=None, ttl=0)
+    cache._client_failed = True
+    assert len(cache.list(active_only=False)) == 2
+    manager.error = ConnectionError('database is down')
+    assert len(cache.list(active_only=False)) == 2
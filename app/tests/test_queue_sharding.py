@@ -0,0 +1,94 @@
+# app/tests/test_queue_sharding.py
+"""采集任务分片：一致性哈希只迁移少量任务，租约保证同一任务只有一个持有者，成员增减后重新平衡（fakeredis）"""
+import pytest
+
+from WorkLine.queue_sharding import QUEUE_MEMBERS_KEY, HashRing, ShardCoordinator, lease_key
+
+KEYS = [('binance', f'SYM{i}USDT', interval) for i in range(40) for interval in ('1m', '5m')]
+
+
+def owners(ring, keys=KEYS):
+    return {key: ring.node_for(':'.join(key)) for key in keys}
+
+
+def test_hash_ring_is_stable_and_moves_few_keys():
+    ring = HashRing(['node-a', 'node-b', 'node-c'])
+    before = owners(ring)
+    # 与成员顺序、进程无关
+    assert owners(HashRing(['node-c', 'node-a', 'node-b', 'node-a'])) == before
+    assert set(before.values()) == {'node-a', 'node-b', 'node-c'}
+
+    after = owners(HashRing(['node-a', 'node-b', 'node-c', 'node-d']))
+    moved = [key for key in KEYS if before[key] != after[key]]
+    # 新成员只从其他成员处接手任务，其余任务不动
+    assert all(after[key] == 'node-d' for key in moved)
+    assert 0 < len(moved) < len(KEYS) / 2
+
+    assert HashRing([]).node_for('binance:BTCUSDT:1m') is None
+
+
+@pytest.fixture
+def client():
+    fakeredis = pytest.importorskip('fakeredis')
+    # 租约的获取/释放是 Lua 脚本，fakeredis 需要 lupa 才能执行
+    pytest.importorskip('lupa')
+    return fakeredis.FakeRedis()
+
+
+def make_node(client, name):
+    return ShardCoordinator(client=client, worker_name=name, lease_ttl=15, heartbeat_interval=5, replicas=64)
+
+
+def test_claim_splits_keys_between_members(client):
+    a, b = make_node(client, 'node-a'), make_node(client, 'node-b')
+    a.claim(KEYS)
+    b.claim(KEYS)
+    # a 首次认领时只看到自己，b 加入后 a 下一次心跳释放归属 b 的租约，b 随后获取
+    owned_a = set(a.claim(KEYS))
+    owned_b = set(b.claim(KEYS))
+
+    assert owned_a and owned_b and not owned_a & owned_b
+    assert owned_a | owned_b == set(KEYS)
+    assert owned_b == a.assigned(KEYS, ['node-a', 'node-b']) ^ set(KEYS)
+    key = sorted(owned_b)[0]
+    assert client.get(lease_key(key)) == b'node-b'
+    assert 0 < client.pttl(lease_key(key)) <= 15_000
+
+
+def test_lease_blocks_new_owner_until_released(client):
+    a = make_node(client, 'node-a')
+    assert set(a.claim(KEYS)) == set(KEYS)
+
+    b = make_node(client, 'node-b')
+    # b 的哈希环里已有 a，但 a 尚未释放租约：b 不会重复采集
+    assert b.claim(KEYS) == []
+    a.claim(KEYS)
+    owned_b = set(b.claim(KEYS))
+    assert owned_b and owned_b.isdisjoint(a.owned)
+
+    # a 退出集群：释放租约、移除成员，b 接管全部任务
+    a.leave()
+    assert client.zscore(QUEUE_MEMBERS_KEY, 'node-a') is None
+    assert set(b.claim(KEYS)) == set(KEYS)
+    assert b.status()['members'] == ['node-b']
+
+
+def test_expired_member_is_dropped_and_release_only_own_lease(client):
+    a, b = make_node(client, 'node-a'), make_node(client, 'node-b')
+    a.heartbeat()
+    # node-b 的最后一次心跳早于 TTL：视为已崩溃
+    seconds, _ = client.time()
+    client.zadd(QUEUE_MEMBERS_KEY, {'node-b': (int(seconds) - 60) * 1000})
+    assert a.heartbeat() == ['node-a']
+
+    client.set(lease_key(KEYS[0]), 'node-b')
+    a.release([KEYS[0]])
+    assert client.get(lease_key(KEYS[0])) == b'node-b'
+    assert KEYS[0] not in a.claim(KEYS)
+    b.release([KEYS[0]])
+    assert client.get(lease_key(KEYS[0])) is None
+
+
+def test_heartbeat_interval_must_leave_room_before_expiry():
+    with pytest.raises(ValueError):
+        ShardCoordinator(client=object(), worker_name='node-a', lease_ttl=10, heartbeat_interval=6)
@@ -0,0 +1,227 @@
+# app/tests/test_queue_supervisor.py
+"""采集任务监督器：异常后指数退避重启、对账失败保持现状、分片心跳失败停止任务、配置通知触发热加载"""
+import asyncio
+import time
+
+import pytest
+
+from WorkLine import queue_supervisor
+from WorkLine.queue_supervisor import QUEUE_STATS_KEY, QueueSupervisor, TaskStats, read_queue_stats
+
+# 被测代码的 asyncio.sleep 会被替换，测试自身的等待使用原函数
+_sleep = asyncio.sleep
+
+BTC = ('binance', 'BTCUSDT', '1m')
+ETH = ('binance', 'ETHUSDT', '1m')
+
+
+async def idle(exchange, symbol, interval, stats):
+    await asyncio.Event().wait()
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """记录退避时长，不真正等待"""
+    recorded = []
+
+    async def sleep(delay, *args):
+        recorded.append(delay)
+        await _sleep(0)
+
+    monkeypatch.setattr(queue_supervisor.asyncio, 'sleep', sleep)
+    return recorded
+
+
+class FakeRedis:
+    def __init__(self):
+        self.hashes = {}
+
+    def hset(self, key, mapping):
+        self.hashes.setdefault(key, {}).update(mapping)
+
+    def hdel(self, key, *fields):
+        for field in fields:
+            self.hashes.get(key, {}).pop(field, None)
+
+
+def make_supervisor(task_factory=idle, worklist=(BTC,), **kwargs):
+    kwargs.setdefault('client', FakeRedis())
+    return QueueSupervisor(task_factory, loader=lambda: list(worklist), **kwargs)
+
+
+async def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, 'timeout'
+        await _sleep(0.001)
+
+
+def test_failed_task_restarts_with_exponential_backoff(sleeps):
+    attempts = []
+
+    async def flaky(exchange, symbol, interval, stats):
+        attempts.append(symbol)
+        if len(attempts) <= 8:
+            raise ConnectionError('websocket closed')
+        if len(attempts) == 9:
+            return
+        await asyncio.Event().wait()
+
+    async def run():
+        supervisor = make_supervisor(flaky)
+        await supervisor.reconcile()
+        await wait_until(lambda: len(attempts) == 10)
+        stats = supervisor.stats[BTC]
+        result = (stats.state, stats.restarts, stats.last_error)
+        await supervisor._stop(BTC)
+        return result, stats.state
+
+    (state, restarts, last_error), stopped = asyncio.run(run())
+    assert sleeps == [1, 2, 4, 8, 16, 32, 60, 60, 60]
+    assert (state, restarts, last_error) == ('running', 9, 'exited')
+    assert stopped == 'stopped'
+
+
+def test_backoff_resets_after_healthy_run(monkeypatch, sleeps):
+    monkeypatch.setattr(queue_supervisor, 'HEALTHY_RUN_SECONDS', -1)
+    attempts = []
+
+    async def flaky(exchange, symbol, interval, stats):
+        attempts.append(symbol)
+        if len(attempts) <= 3:
+            raise ConnectionError('websocket closed')
+        await asyncio.Event().wait()
+
+    async def run():
+        supervisor = make_supervisor(flaky)
+        await supervisor.reconcile()
+        await wait_until(lambda: len(attempts) == 4)
+        await supervisor._stop(BTC)
+
+    asyncio.run(run())
+    assert sleeps == [1, 1, 1]
+
+
+def test_reconcile_keeps_tasks_when_loader_fails():
+    worklist = [BTC, ETH]
+    state = {'fail': False}
+
+    def loader():
+        if state['fail']:
+            raise ConnectionError('database is down')
+        return list(worklist)
+
+    async def run():
+        supervisor = QueueSupervisor(idle, loader=loader, client=FakeRedis())
+        await supervisor.reconcile()
+        started = sorted(supervisor.tasks)
+        state['fail'] = True
+        await supervisor.reconcile()
+        kept = sorted(supervisor.tasks)
+        state['fail'] = False
+        worklist.remove(ETH)
+        await supervisor.reconcile()
+        remaining = sorted(supervisor.tasks)
+        for key in list(supervisor.tasks):
+            await supervisor._stop(key)
+        return started, kept, remaining
+
+    started, kept, remaining = asyncio.run(run())
+    assert started == kept == [BTC, ETH]
+    assert remaining == [BTC]
+
+
+class FakeShard:
+    heartbeat_interval = 5
+    worker_name = 'node-a'
+
+    def __init__(self):
+        self.owned = None
+        self.error = None
+        self.left = False
+
+    def claim(self, keys):
+        if self.error is not None:
+            raise self.error
+        return [key for key in keys if self.owned is None or key in self.owned]
+
+    def leave(self):
+        self.left = True
+
+
+def test_shard_limits_tasks_and_heartbeat_failure_stops_all():
+    shard = FakeShard()
+    shard.owned = {ETH}
+
+    async def run():
+        supervisor = make_supervisor(worklist=(BTC, ETH), shard=shard, reload_interval=60, stats_interval=10)
+        intervals = (supervisor.reload_interval, supervisor.stats_interval, supervisor.worker_name)
+        await supervisor.reconcile()
+        owned = sorted(supervisor.tasks)
+        # 续约失败时租约可能已被其他节点接管，不能继续采集
+        shard.error = ConnectionError('redis is down')
+        await supervisor.reconcile()
+        return intervals, owned, sorted(supervisor.tasks)
+
+    intervals, owned, after_failure = asyncio.run(run())
+    assert intervals == (5, 5, 'node-a')
+    assert owned == [ETH] and after_failure == []
+
+
+class FakeConfigCache:
+    def __init__(self):
+        self.listeners = []
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def remove_listener(self, listener):
+        self.listeners.remove(listener)
+
+
+def test_config_event_triggers_hot_reload():
+    worklist = [BTC]
+    cache = FakeConfigCache()
+    shard = FakeShard()
+    client = FakeRedis()
+
+    async def run():
+        supervisor = QueueSupervisor(idle, loader=lambda: list(worklist), client=client, config_cache=cache,
+                                     reload_interval=3600, stats_interval=0.01, shard=shard)
+        runner = asyncio.create_task(supervisor.run())
+        await wait_until(lambda: supervisor.tasks)
+        await wait_until(lambda: QUEUE_STATS_KEY in client.hashes)
+
+        # 配置缓存的订阅线程收到变更通知
+        worklist.append(ETH)
+        await asyncio.to_thread(cache.listeners[0], {'action': 'create', 'queue_name': 'eth'})
+        await wait_until(lambda: ETH in supervisor.tasks)
+
+        runner.cancel()
+        await asyncio.gather(runner, return_exceptions=True)
+        return supervisor.tasks
+
+    assert asyncio.run(run()) == {}
+    assert cache.listeners == [] and shard.left
+    # 停止的任务从统计哈希中移除
+    assert client.hashes[QUEUE_STATS_KEY] == {}
+
+
+def test_task_stats_and_shared_snapshot():
+    fakeredis = pytest.importorskip('fakeredis')
+    stats = TaskStats(*BTC)
+    now_ms = int(time.time() * 1000)
+    stats.record({'is_closed': False})
+    stats.record({'is_closed': True, 'close_time': now_ms - 1500})
+    assert (stats.messages, stats.closed) == (2, 1)
+    assert 1500 <= stats.lag_ms < 5000
+    assert stats.roll_window() > 0 and stats._window_messages == 0
+
+    client = fakeredis.FakeRedis()
+    supervisor = make_supervisor(client=client, worker_name='test')
+    supervisor.stats[BTC] = stats
+    supervisor.flush_stats()
+    shared = read_queue_stats(client)
+    assert list(shared) == ['binance:BTCUSDT:1m']
+    assert shared['binance:BTCUSDT:1m']['worker'] == 'test'
+    assert shared['binance:BTCUSDT:1m']['closed'] == 1
@@ -0,0 +1,89 @@
+# app/tests/test_redis_streams.py
+"""Redis Streams 事件总线：发布/读取/确认、崩溃重放、裁剪墓碑、接管闲置消息（fakeredis）"""
+import time
+
+import pytest
+
+fakeredis = pytest.importorskip('fakeredis')
+
+from DatabaseOperator.redis_streams import StreamConsumer, StreamPublisher, kline_stream_key  # noqa: E402
+from WorkLine.stream_workers import IndicatorStreamWorker  # noqa: E402
+
+STREAM = kline_stream_key('BTCUSDT')
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis()
+
+
+def kline(index: int) -> dict:
+    return {'symbol': 'BTCUSDT', 'interval': '1m', 'open_time': 1_700_000_000_000 + index * 60_000,
+            'close': 100.0 + index}
+
+
+def consumer(client, name='c1', **kwargs) -> StreamConsumer:
+    kwargs.setdefault('claim_idle_ms', 0)
+    return StreamConsumer([STREAM], 'group', name, client=client, block_ms=1, **kwargs)
+
+
+def test_publish_read_ack(client):
+    reader = consumer(client)
+    publisher = StreamPublisher(client=client)
+    ids = publisher.publish_many((STREAM, kline(i)) for i in range(3))
+    assert len(ids) == 3
+
+    messages = reader.read()
+    assert [m.id for m in messages] == ids
+    assert messages[0].event == kline(0)
+    assert reader.pending() == {STREAM: 3}
+
+    assert reader.ack(messages) == 3
+    assert reader.pending() == {STREAM: 0}
+    assert reader.read() == []
+
+
+def test_restart_replays_unacked_messages_first(client):
+    publisher = StreamPublisher(client=client)
+    publisher.publish(STREAM, kline(0))
+    first = consumer(client)
+    delivered = first.read()
+    assert len(delivered) == 1
+
+    # 同名消费者重启：未确认的消息先重放，之后才读新消息
+    publisher.publish(STREAM, kline(1))
+    restarted = consumer(client)
+    assert [m.id for m in restarted.read()] == [delivered[0].id]
+    restarted.ack(delivered)
+    assert [m.event['open_time'] for m in restarted.read()] == [kline(1)['open_time']]
+
+
+def test_trimmed_pending_entries_are_acked(client):
+    publisher = StreamPublisher(client=client)
+    for i in range(3):
+        publisher.publish(STREAM, kline(i))
+    first = consumer(client)
+    assert len(first.read()) == 3
+    client.xtrim(STREAM, maxlen=1, approximate=False)
+
+    restarted = consumer(client)
+    replayed = restarted.read()
+    assert [m.event['open_time'] for m in replayed] == [kline(2)['open_time']]
+    assert restarted.tombstones == 2
+    assert restarted.pending() == {STREAM: 1}
+
+
+def test_worker_loop_claims_messages_of_dead_consumer(client):
+    publisher = StreamPublisher(client=client)
+    publisher.publish_many((STREAM, kline(i)) for i in range(2))
+    dead = StreamConsumer([STREAM], 'indicator-engine', 'dead', client=client, block_ms=1, claim_idle_ms=0)
+    assert len(dead.read()) == 2
+
+    worker = IndicatorStreamWorker(['BTCUSDT'], consumer='alive', client=client, store=False, seed=False,
+                                   block_ms=1, claim_idle_ms=1)
+    time.sleep(0.01)  # 超过 claim_idle_ms
+    assert worker.run(max_batches=2) == 2
+    assert worker.consumer.claimed == 2
+    assert worker.consumer.pending() == {STREAM: 0}
+    published = client.xrange('stream:indicator:BTCUSDT')
+    assert len(published) == 2
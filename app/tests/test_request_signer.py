@@ -0,0 +1,94 @@
+# app/tests/test_request_signer.py
+"""请求签名器：RSA 与 Ed25519 签名可被公钥验证、私钥只加载一次、文件变化后自动重新加载"""
+import base64
+import os
+import urllib.parse
+
+import pytest
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, ed25519, padding, rsa
+
+from ExchangeBill import request_signer
+from ExchangeBill.request_signer import RequestSigner, get_signer
+
+QUERY = 'symbol=BTCUSDT&side=BUY&type=LIMIT&quantity=0.01&price=30000&timestamp=1704067200000'
+
+
+def write_key(path, key, password=None, mtime_ns=None):
+    encryption = serialization.BestAvailableEncryption(password) if password else serialization.NoEncryption()
+    path.write_bytes(key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, encryption))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+@pytest.fixture
+def rsa_key():
+    return rsa.generate_private_key(public_exponent=65537, key_size=2048)
+
+
+def test_rsa_signature_verifies(tmp_path, rsa_key):
+    signer = RequestSigner(write_key(tmp_path / 'rsa.pem', rsa_key))
+    signature = base64.b64decode(signer.sign(QUERY))
+    assert signer.key_type == 'rsa' and len(signature) == 256
+    rsa_key.public_key().verify(signature, QUERY.encode(), padding.PKCS1v15(), hashes.SHA256())
+    # PKCS#1 v1.5 签名是确定的，URL 编码后可直接拼接到查询字符串
+    assert urllib.parse.unquote_plus(signer.sign_query(QUERY)) == signer.sign(QUERY)
+
+
+def test_ed25519_signature_verifies(tmp_path):
+    key = ed25519.Ed25519PrivateKey.generate()
+    signer = RequestSigner(write_key(tmp_path / 'ed25519.pem', key))
+    signature = base64.b64decode(signer.sign(QUERY))
+    assert signer.key_type == 'ed25519' and len(signature) == 64
+    key.public_key().verify(signature, QUERY.encode())
+
+
+def test_key_is_loaded_once_and_reloaded_on_rotation(tmp_path, rsa_key):
+    path = write_key(tmp_path / 'key.pem', rsa_key, mtime_ns=1_000_000_000)
+    signer = RequestSigner(path, check_interval=0)
+    for _ in range(5):
+        signer.sign(QUERY)
+    assert signer.loads == 1
+
+    # 密钥轮换为 Ed25519：文件 mtime 变化后下一次签名使用新密钥
+    rotated = ed25519.Ed25519PrivateKey.generate()
+    write_key(tmp_path / 'key.pem', rotated, mtime_ns=2_000_000_000)
+    rotated.public_key().verify(base64.b64decode(signer.sign(QUERY)), QUERY.encode())
+    assert (signer.loads, signer.key_type) == (2, 'ed25519')
+
+
+def test_file_is_not_checked_within_interval(tmp_path, rsa_key):
+    path = write_key(tmp_path / 'key.pem', rsa_key, mtime_ns=1_000_000_000)
+    signer = RequestSigner(path, check_interval=3600)
+    signer.sign(QUERY)
+    write_key(tmp_path / 'key.pem', ed25519.Ed25519PrivateKey.generate(), mtime_ns=2_000_000_000)
+    signer.sign(QUERY)
+    assert (signer.loads, signer.key_type) == (1, 'rsa')
+
+
+def test_encrypted_key_uses_password_from_env(monkeypatch, tmp_path):
+    key = ed25519.Ed25519PrivateKey.generate()
+    path = write_key(tmp_path / 'key.pem', key, password=b'secret')
+    monkeypatch.setenv('BINANCE_PRIVATE_KEY_PASSWORD', 'secret')
+    key.public_key().verify(base64.b64decode(RequestSigner(path).sign(QUERY)), QUERY.encode())
+
+    monkeypatch.delenv('BINANCE_PRIVATE_KEY_PASSWORD')
+    with pytest.raises(TypeError):
+        RequestSigner(path).sign(QUERY)
+
+
+def test_invalid_configuration(tmp_path):
+    with pytest.raises(ValueError):
+        RequestSigner('')
+    with pytest.raises(TypeError, match='RSA 或 Ed25519'):
+        RequestSigner(write_key(tmp_path / 'ec.pem', ec.generate_private_key(ec.SECP256R1()))).sign(QUERY)
+    with pytest.raises(FileNotFoundError):
+        RequestSigner(str(tmp_path / 'missing.pem')).sign(QUERY)
+
+
+def test_get_signer_reuses_instance(monkeypatch, tmp_path):
+    monkeypatch.setattr(request_signer, '_signers', {})
+    path = write_key(tmp_path / 'key.pem', ed25519.Ed25519PrivateKey.generate())
+    assert get_signer(path) is get_signer(path)
+    assert get_signer(path) is not get_signer(str(tmp_path / 'other.pem'))
@@ -0,0 +1,175 @@
+# app/tests/test_risk_engine.py
+"""内存风控：下单前限额、回报去重、释放额度、与数据库对账"""
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from ExchangeBill.risk_engine import RiskEngine, RiskLimits, RiskRejected
+
+
+def make_engine(**limits) -> RiskEngine:
+    defaults = dict(max_order_notional=1000, max_position_notional=5000, max_open_orders=20,
+                    max_orders_per_second=100, price_band=0.05, price_max_age=60)
+    risk = RiskEngine(RiskLimits(**{**defaults, **limits}), price_cache=object())
+    risk.update_price('BTCUSDT', 100.0)
+    return risk
+
+
+def order(cid='a', side='BUY', quantity='1', **params):
+    return {'symbol': 'BTCUSDT', 'side': side, 'type': 'MARKET', 'quantity': quantity, 'newClientOrderId': cid,
+            **params}
+
+
+def record(cid='a', side='BUY', status='NEW', executed='0', quantity='1'):
+    return {'newClientOrderId': cid, 'symbol': 'BTCUSDT', 'side': side, 'quantity': quantity,
+            'order_status': status, 'executed_qty': executed}
+
+
+def rejected_rule(risk, params) -> str:
+    with pytest.raises(RiskRejected) as e:
+        risk.pre_trade(params)
+    return e.value.rule
+
+
+def test_pre_trade_reserves_open_order():
+    risk = make_engine()
+    risk.pre_trade(order(quantity='2'))
+    assert list(risk.open_orders) == ['a']
+    state = risk.symbols['BTCUSDT']
+    assert (state.open_buy, state.open_count) == (2.0, 1)
+    assert risk.checks == 1
+
+
+@pytest.mark.parametrize('limits, params, rule', [
+    ({}, order(quantity='11'), 'order_notional'),
+    ({'max_position_notional': 150}, order(quantity='2'), 'position_notional'),
+    ({}, order(type='LIMIT', price='106'), 'price_band'),
+])
+def test_pre_trade_limits(limits, params, rule):
+    risk = make_engine(**limits)
+    assert rejected_rule(risk, params) == rule
+    assert risk.open_orders == {} and risk.rejections == {rule: 1}
+
+
+def test_price_band_only_checks_aggressive_side():
+    risk = make_engine()
+    # 买价远低于最新价、卖价远高于最新价不会立即成交，不受价格带限制
+    risk.pre_trade(order('a', type='LIMIT', price='50'))
+    risk.pre_trade(order('b', side='SELL', type='LIMIT', price='150', quantity='1'))
+    assert rejected_rule(risk, order('c', side='SELL', type='LIMIT', price='94')) == 'price_band'
+
+
+def test_no_price_and_stale_price_are_rejected():
+    risk = make_engine()
+    assert rejected_rule(risk, {**order(), 'symbol': 'ETHUSDT'}) == 'no_price'
+    risk.symbols['BTCUSDT'].price_time = time.monotonic() - 61
+    assert risk.price_stale('BTCUSDT')
+    assert rejected_rule(risk, order()) == 'no_price'
+    # 限价单以自身价格计算名义金额
+    risk.pre_trade(order(type='LIMIT', price='100'))
+
+
+def test_position_limit_counts_open_orders_on_same_side():
+    risk = make_engine(max_position_notional=500)
+    risk.pre_trade(order('a', quantity='3'))
+    assert rejected_rule(risk, order('b', quantity='3')) == 'position_notional'
+    # 卖单方向的敞口被多头持仓抵消
+    risk.apply(record('a', status='FILLED', executed='3', quantity='3'))
+    risk.pre_trade(order('c', side='SELL', quantity='7'))
+
+
+def test_open_orders_and_order_rate_limits():
+    risk = make_engine(max_open_orders=2)
+    risk.pre_trade(order('a'))
+    risk.pre_trade(order('b'))
+    assert rejected_rule(risk, order('c')) == 'open_orders'
+
+    risk = make_engine(max_orders_per_second=2)
+    risk.pre_trade(order('a'))
+    risk.pre_trade(order('b'))
+    assert rejected_rule(risk, order('c')) == 'order_rate'
+
+
+def test_order_without_client_order_id_gets_generated_id():
+    risk = make_engine()
+    params = order()
+    del params['newClientOrderId']
+    risk.pre_trade(params)
+    assert params['newClientOrderId'] in risk.open_orders
+    risk.release(params['newClientOrderId'])
+    assert risk.open_orders == {} and risk.symbols['BTCUSDT'].open_buy == 0
+
+
+def test_apply_counts_fill_increments_once():
+    risk = make_engine()
+    risk.pre_trade(order(quantity='2'))
+    partial = record(status='PARTIALLY_FILLED', executed='0.5', quantity='2')
+    risk.apply(partial)
+    risk.apply(partial)
+    state = risk.symbols['BTCUSDT']
+    assert state.position == pytest.approx(0.5) and state.open_buy == pytest.approx(1.5)
+
+    filled = record(status='FILLED', executed='2', quantity='2')
+    risk.apply(filled)
+    # 下单结果与用户数据流各报一次、乱序的旧回报：都不重复计入
+    risk.apply(filled)
+    risk.apply(partial)
+    assert state.position == pytest.approx(2.0)
+    assert risk.open_orders == {} and state.open_buy == pytest.approx(0) and state.open_count == 0
+
+
+def test_apply_rejection_releases_and_unknown_order_is_tracked():
+    risk = make_engine()
+    risk.pre_trade(order('a'))
+    risk.apply(record('a', status='REJECTED'))
+    assert risk.open_orders == {}
+
+    # 其他途径下的订单按回报建立挂单
+    risk.apply(record('web', side='SELL', quantity='4'))
+    assert risk.symbols['BTCUSDT'].open_sell == pytest.approx(4)
+    risk.apply(record('web', side='SELL', status='CANCELED', quantity='4'))
+    assert risk.open_orders == {} and risk.symbols['BTCUSDT'].open_sell == pytest.approx(0)
+    # 没有 newClientOrderId 的记录无法对应，忽略
+    risk.apply({'symbol': 'BTCUSDT', 'side': 'BUY', 'order_status': 'FILLED', 'executed_qty': '1'})
+    assert risk.symbols['BTCUSDT'].position == 0
+
+
+def test_release_unknown_order_is_noop():
+    risk = make_engine()
+    risk.pre_trade(order('a'))
+    risk.release('missing')
+    risk.release('a')
+    risk.release('a')
+    assert risk.open_orders == {} and risk.symbols['BTCUSDT'].open_count == 0
+
+
+class FlushJournal:
+    def __init__(self):
+        self.flushes = 0
+
+    def flush(self):
+        self.flushes += 1
+
+
+def test_reconcile_against_db_rows(monkeypatch):
+    risk = make_engine()
+    risk.journal = FlushJournal()
+    risk.pre_trade(order('recent'))
+    risk.pre_trade(order('old', quantity='2'))
+    risk.open_orders['old'][4] -= 60
+    risk.apply(record('filled', status='FILLED', executed='1'))
+
+    rows = {'db-open': SimpleNamespace(symbol='BTCUSDT', side='SELL', quantity='5', executed_qty='2')}
+    monkeypatch.setattr(risk, '_load_from_db', lambda: {'positions': {'BTCUSDT': 3.0, 'ETHUSDT': -1.0},
+                                                         'open_orders': rows})
+    result = risk.reconcile()
+
+    assert risk.journal.flushes == 1
+    assert result['drift'] == {'BTCUSDT': pytest.approx(2.0), 'ETHUSDT': pytest.approx(-1.0)}
+    # 库中的未完结订单按剩余数量重建；刚下的、尚未落库的订单保留；旧的内存挂单被库中状态取代
+    assert sorted(risk.open_orders) == ['db-open', 'recent']
+    btc = risk.symbols['BTCUSDT']
+    assert btc.position == 3.0 and btc.open_sell == pytest.approx(3) and btc.open_buy == pytest.approx(1)
+    assert result['open_orders'] == 2
+    assert risk.reconcile()['drift'] == {}
@@ -0,0 +1,143 @@
+# app/tests/test_stream_recorder.py
+"""行情流录制：K线/成交帧与深度快照原样写入再读出，flush 后未关闭也可读，截断与损坏的行被跳过，回放交给实时处理器"""
+import asyncio
+import gzip
+import json
+import os
+
+import pytest
+
+# 回放K线时导入采集模块，只创建引擎，不连接数据库
+os.environ.setdefault('DATABASE_URL', 'postgresql+psycopg2://localhost/test')
+
+from ExchangeFetcher.stream_recorder import (ReplayPipeline, StreamRecorder, read_recording,  # noqa: E402
+                                             recording_files, recording_info, replay_recording)
+
+KLINE = 'btcusdt@kline_1m'
+TRADE = 'btcusdt@aggTrade'
+DEPTH = 'btcusdt@depth@100ms'
+
+
+def kline_message(index, is_closed=True):
+    return json.dumps({'e': 'kline', 'E': index * 60_000 + 1, 's': 'BTCUSDT', 'k': {
+        't': index * 60_000, 'T': index * 60_000 + 59_999, 's': 'BTCUSDT', 'i': '1m', 'f': 0, 'L': 0,
+        'o': '100.0', 'c': str(100.0 + index), 'h': '110.0', 'l': '90.0', 'v': '1.5', 'n': 3, 'x': is_closed,
+        'q': '150.0', 'V': '0.5', 'Q': '50.0', 'B': '0'}})
+
+
+def trade_message(agg_trade_id):
+    return json.dumps({'e': 'aggTrade', 'E': 1, 's': 'BTCUSDT', 'a': agg_trade_id, 'p': '100.5', 'q': '0.25',
+                       'f': agg_trade_id, 'l': agg_trade_id, 'T': 1_704_067_200_000 + agg_trade_id, 'm': False,
+                       'M': True})
+
+
+def write_sample(path):
+    snapshot = {'lastUpdateId': 10, 'bids': [['99.0', '1.0']], 'asks': [['101.0', '1.0']]}
+    with StreamRecorder(path) as recorder:
+        recorder.write(KLINE, kline_message(0), received_at=1000.0)
+        # bytes 帧按 UTF-8 解码后保存
+        recorder.write(TRADE, trade_message(1).encode('utf-8'), received_at=1000.5)
+        recorder.write(TRADE, trade_message(2), received_at=1001.25)
+        recorder.write(DEPTH, json.dumps({'e': 'depthUpdate', 'U': 11, 'u': 12, 'b': [['99.5', '2.0']],
+                                          'a': []}), received_at=1002.0)
+        recorder.write_snapshot(DEPTH, snapshot)
+        recorder.write(KLINE, kline_message(1), received_at=1500.0)
+    return recorder, snapshot
+
+
+def test_round_trip_preserves_frames(tmp_path):
+    path = tmp_path / 'sample.jsonl.gz'
+    recorder, snapshot = write_sample(path)
+    assert recorder.stats['messages'] == 5 and recorder.stats['snapshots'] == 1
+    assert recorder.files == [path] and recorder._file is None
+
+    records = list(read_recording(path))
+    assert [record['s'] for record in records] == [KLINE, TRADE, TRADE, DEPTH, DEPTH, KLINE]
+    assert records[0] == {'t': 1000.0, 's': KLINE, 'm': kline_message(0)}
+    assert records[1]['m'] == trade_message(1) and records[2]['t'] == 1001.25
+    assert records[4]['snapshot'] == snapshot and 'm' not in records[4]
+
+    assert [record['m'] for record in read_recording(path, streams=[TRADE])] == [trade_message(1), trade_message(2)]
+    info = recording_info(path)
+    assert info[KLINE] == {'messages': 2, 'snapshots': 0, 'seconds': 0.5}
+    assert (info[DEPTH]['messages'], info[DEPTH]['snapshots']) == (1, 1)
+
+
+def test_flushed_frames_are_readable_before_close(tmp_path):
+    path = tmp_path / 'live.jsonl.gz'
+    recorder = StreamRecorder(path, flush_interval=3600)
+    recorder.write(KLINE, kline_message(0))
+    recorder.flush()
+    # GzipFile.flush 之后即使进程崩溃，已写入的帧也能读出
+    assert [record['m'] for record in read_recording(path)] == [kline_message(0)]
+
+    recorder.write(KLINE, kline_message(1))
+    recorder.close()
+    recorder.close()
+    assert len(list(read_recording(path))) == 2
+
+
+def test_truncated_and_corrupt_tails_are_skipped(tmp_path):
+    path = tmp_path / 'crash.jsonl.gz'
+    write_sample(path)
+    data = path.read_bytes()
+    truncated = tmp_path / 'truncated.jsonl.gz'
+    truncated.write_bytes(data[:len(data) // 2])
+    # 读到截断处为止，不抛出异常
+    assert len(list(read_recording(truncated))) < 6
+
+    plain = tmp_path / 'manual.jsonl'
+    plain.write_text(json.dumps({'t': 1, 's': KLINE, 'm': kline_message(0)}) + '\n{"t": 2, "s": "btc\n')
+    assert [record['t'] for record in read_recording(plain)] == [1]
+
+
+def test_directory_is_read_in_file_name_order(tmp_path):
+    for name, index in (('20240101-010000', 1), ('20240101-000000', 0)):
+        with StreamRecorder(tmp_path / f'{name}.jsonl.gz') as recorder:
+            recorder.write(KLINE, kline_message(index))
+    (tmp_path / 'notes.txt').write_text('not a recording')
+    with gzip.open(tmp_path / 'other.json.gz', 'wt') as f:
+        f.write('{}')
+
+    assert [path.name for path in recording_files(tmp_path)] == ['20240101-000000.jsonl.gz',
+                                                                 '20240101-010000.jsonl.gz']
+    assert [record['m'] for record in read_recording(tmp_path)] == [kline_message(0), kline_message(1)]
+
+
+def test_auto_named_recorder_uses_directory(tmp_path):
+    recorder = StreamRecorder(directory=tmp_path / 'recordings', rotate_seconds=0)
+    recorder.write(KLINE, kline_message(0))
+    recorder.close()
+    assert recorder.path.parent == tmp_path / 'recordings' and recorder.path.name.endswith('.jsonl.gz')
+    assert len(list(read_recording(tmp_path / 'recordings'))) == 1
+
+
+def test_replay_feeds_live_handlers(tmp_path):
+    path = tmp_path / 'sample.jsonl.gz'
+    write_sample(path)
+    with open(path, 'ab') as f:
+        f.write(gzip.compress(b'{"t": 1501, "s": "btcusdt@bookTicker", "m": "{}"}\n'))
+
+    pipeline = ReplayPipeline(bar_specs='tick:2')
+    result = asyncio.run(replay_recording(path, pipeline, speed=0))
+    assert result['messages'] == 7
+    assert (result['kline'], result['aggTrade'], result['depth'], result['skipped']) == (2, 2, 2, 1)
+    assert result['errors'] == 0
+
+    summary = pipeline.summary()
+    # 快照之前的增量先缓存，快照到来后按序应用
+    assert summary[DEPTH]['synced'] and summary[DEPTH]['best_bid'] == (99.5, 2.0)
+    assert summary[TRADE]['trades'] == 2
+
+    limited = asyncio.run(replay_recording(path, speed=0, streams=[KLINE], max_messages=1))
+    assert (limited['messages'], limited['kline'], limited['aggTrade']) == (1, 1, 0)
+
+
+def test_paced_replay_follows_recorded_timing(tmp_path):
+    path = tmp_path / 'paced.jsonl.gz'
+    with StreamRecorder(path) as recorder:
+        recorder.write('btcusdt@bookTicker', '{}', received_at=0.0)
+        recorder.write('btcusdt@bookTicker', '{}', received_at=200.0)
+    result = asyncio.run(replay_recording(path, speed=4))
+    # 录制间隔 200ms，4 倍速回放约 50ms
+    assert result['messages'] == 2 and result['seconds'] == pytest.approx(0.05, abs=0.04)
@@ -0,0 +1,203 @@
+# app/tests/test_trade_stream.py
+"""归集成交：列式批次的 COPY 编码与去重写入、失败批次保序重试、重连补采，以及 tick/volume/dollar K线"""
+import asyncio
+import csv
+import os
+
+import pytest
+
+# 只创建引擎，不连接数据库
+os.environ.setdefault('DATABASE_URL', 'postgresql+psycopg2://localhost/test')
+
+from DataProcessingCalculator.trade_bars import create_bar_builder, parse_bar_specs  # noqa: E402
+from DatabaseOperator import trade_store  # noqa: E402
+from DatabaseOperator.trade_store import TRADE_COLUMNS, TradeBatch  # noqa: E402
+from ExchangeFetcher import trade_stream  # noqa: E402
+from ExchangeFetcher.trade_stream import AggTradeIngester, parse_agg_trade  # noqa: E402
+
+
+def trade(agg_trade_id, price=100.0, quantity=1.0, is_buyer_maker=False, trade_time=None):
+    return parse_agg_trade({'a': agg_trade_id, 'p': str(price), 'q': str(quantity), 'f': agg_trade_id * 10,
+                            'l': agg_trade_id * 10 + 1, 'm': is_buyer_maker,
+                            'T': 1_704_067_200_000 + agg_trade_id if trade_time is None else trade_time})
+
+
+def test_trade_batch_csv_for_copy():
+    batch = TradeBatch()
+    batch.extend([trade(1, price=0.1 + 0.2, is_buyer_maker=True), trade(2, price=42000.5, quantity=0.00000001)])
+    assert len(batch) == 2 and batch.last_agg_trade_id == 2
+
+    rows = list(csv.reader(batch.to_csv()))
+    assert len(rows[0]) == len(TRADE_COLUMNS)
+    assert rows[0] == ['1', '2024-01-01T00:00:00.001000+00:00', '0.30000000000000004', '1.0', '10', '11', 't']
+    # repr 保留 float 的全部精度
+    assert rows[1][2:4] == ['42000.5', '1e-08'] and rows[1][6] == 'f'
+
+    batch.clear()
+    assert len(batch) == 0 and batch.to_csv().read() == ''
+
+
+class FakeCursor:
+    def __init__(self, fail_on=None):
+        self.statements = []
+        self.copied = None
+        self.rowcount = 0
+        self.fail_on = fail_on
+
+    def execute(self, sql):
+        if self.fail_on and self.fail_on in sql:
+            raise RuntimeError('connection lost')
+        self.statements.append(sql)
+        self.rowcount = 1
+
+    def copy_expert(self, sql, file):
+        self.statements.append(sql)
+        self.copied = file.read()
+
+    def close(self):
+        pass
+
+
+class FakeRawConnection:
+    def __init__(self, cursor):
+        self._cursor = cursor
+        self.committed = self.rolled_back = self.closed = False
+
+    def cursor(self):
+        return self._cursor
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def close(self):
+        self.closed = True
+
+
+class FakeEngine:
+    def __init__(self, connection):
+        self.dialect = trade_store.engine.dialect
+        self.connection = connection
+
+    def raw_connection(self):
+        return self.connection
+
+
+def test_copy_trades_stages_and_dedups(monkeypatch):
+    connection = FakeRawConnection(FakeCursor())
+    monkeypatch.setattr(trade_store, 'engine', FakeEngine(connection))
+    monkeypatch.setattr(trade_store, 'create_trade_table_if_not_exists', lambda symbol: 'AggTrade_BTCUSDT')
+    batch = TradeBatch()
+    batch.extend([trade(1), trade(2)])
+
+    assert trade_store.copy_trades('BTCUSDT', batch) == 1
+    create, copy, insert = connection.cursor().statements
+    assert 'CREATE TEMP TABLE IF NOT EXISTS aggtrade_staging (LIKE "AggTrade_BTCUSDT"' in create
+    assert copy.startswith('COPY aggtrade_staging (agg_trade_id, trade_time, price,')
+    # COPY 不能处理冲突，经临时表 INSERT ... ON CONFLICT DO NOTHING 去重
+    assert insert.endswith('FROM aggtrade_staging ON CONFLICT (agg_trade_id) DO NOTHING')
+    assert connection.cursor().copied.count('\n') == 2
+    assert connection.committed and connection.closed
+
+    # 空批次不建立连接
+    monkeypatch.setattr(trade_store, 'engine', None)
+    assert trade_store.copy_trades('BTCUSDT', TradeBatch()) == 0
+
+
+def test_copy_trades_rolls_back_on_error(monkeypatch):
+    connection = FakeRawConnection(FakeCursor(fail_on='INSERT INTO'))
+    monkeypatch.setattr(trade_store, 'engine', FakeEngine(connection))
+    monkeypatch.setattr(trade_store, 'create_trade_table_if_not_exists', lambda symbol: 'AggTrade_BTCUSDT')
+    batch = TradeBatch()
+    batch.append(trade(1))
+    with pytest.raises(RuntimeError):
+        trade_store.copy_trades('BTCUSDT', batch)
+    assert connection.rolled_back and connection.closed and not connection.committed
+
+
+def test_bar_builders_close_on_threshold():
+    tick = create_bar_builder('tick', 3)
+    bars = [tick.update(trade(i, price=price)) for i, price in enumerate([100, 103, 99, 101], start=1)]
+    assert bars[:2] == [None, None] and bars[3] is None
+    bar = bars[2]
+    assert (bar['open'], bar['high'], bar['low'], bar['close']) == (100.0, 103.0, 99.0, 99.0)
+    assert (bar['first_agg_trade_id'], bar['last_agg_trade_id'], bar['num_trades']) == (1, 3, 3)
+    assert tick.pending()['open'] == 101.0 and tick.bars == 1
+
+    # 使累计量达到阈值的那笔成交整笔计入当前K线，不拆分
+    volume = create_bar_builder('volume', 5)
+    assert volume.update(trade(1, quantity=2, is_buyer_maker=True)) is None
+    bar = volume.update(trade(2, quantity=4))
+    assert bar['volume'] == 6.0 and bar['taker_buy_base_vol'] == 4.0 and volume.pending() is None
+
+    dollar = create_bar_builder('dollar', 1000)
+    assert dollar.update(trade(1, price=100, quantity=9)) is None
+    bar = dollar.update(trade(2, price=200, quantity=1))
+    assert bar['quote_asset_volume'] == 1100.0 and (bar['kind'], bar['threshold']) == ('dollar', 1000)
+
+
+def test_parse_bar_specs():
+    builders = parse_bar_specs(' volume:100, TICK:500,,dollar:1e6 ')
+    assert [(b.kind, b.threshold) for b in builders] == [('volume', 100), ('tick', 500), ('dollar', 1e6)]
+    assert parse_bar_specs('') == []
+    for spec in ('volume', 'range:10', 'tick:0'):
+        with pytest.raises(ValueError):
+            parse_bar_specs(spec)
+
+
+def test_ingester_dedups_and_emits_bars():
+    bars = []
+    ingester = AggTradeIngester('btcusdt', bar_builders=parse_bar_specs('tick:2'), on_bar=bars.append,
+                                batch_size=10, flush_interval=3600)
+    for agg_trade_id in (1, 2, 2, 1, 3):
+        ingester.add(trade(agg_trade_id))
+    assert ingester.stats['trades'] == 3 and ingester.stats['duplicates'] == 2
+    assert ingester.batch.columns['agg_trade_id'] == [1, 2, 3]
+    assert len(bars) == 1 and bars[0]['symbol'] == 'BTCUSDT'
+    assert not ingester.flush_due()
+
+
+def test_failed_flush_keeps_batch_in_order(monkeypatch):
+    written = []
+    state = {'fail': True}
+
+    def copy_trades(symbol, batch):
+        if state['fail']:
+            raise ConnectionError('database is down')
+        written.extend(batch.columns['agg_trade_id'])
+        return len(batch)
+
+    monkeypatch.setattr(trade_store, 'copy_trades', copy_trades)
+    ingester = AggTradeIngester('BTCUSDT', batch_size=2, flush_interval=3600)
+
+    async def run():
+        ingester.add(trade(1))
+        ingester.add(trade(2))
+        assert await ingester.maybe_flush() == 0
+        ingester.add(trade(3))
+        state['fail'] = False
+        return await ingester.flush()
+
+    assert asyncio.run(run()) == 3
+    assert written == [1, 2, 3] and len(ingester.batch) == 0
+    assert ingester.stats['flushes'] == 1
+
+
+def test_backfill_pages_from_last_id(monkeypatch):
+    requests = []
+
+    def fetch_agg_trades(symbol, from_id, limit=1000):
+        requests.append(from_id)
+        count = 1000 if from_id == 11 else 3
+        return [trade(from_id + i) for i in range(count)]
+
+    monkeypatch.setattr(trade_stream, 'fetch_agg_trades', fetch_agg_trades)
+    ingester = AggTradeIngester('BTCUSDT', dbw=False)
+    assert asyncio.run(ingester.backfill()) == 0
+    ingester.last_agg_trade_id = 10
+
+    assert asyncio.run(ingester.backfill()) == 1003
+    # 满页继续翻页，不足一页时停止
+    assert requests == [11, 1011] and ingester.last_agg_trade_id == 1013
@@ -0,0 +1,62 @@
+# app/tests/test_user_data_stream.py
+"""用户数据流：先连接并缓存推送，再取 openOrders，最后按顺序应用缓存的推送"""
+import asyncio
+import json
+import os
+import time
+
+# 只创建引擎，不连接数据库
+os.environ.setdefault('DATABASE_URL', 'postgresql+psycopg2://localhost/test')
+
+from ExchangeBill.user_data_stream import UserDataStream  # noqa: E402
+
+
+def execution_report(client_order_id: str, status: str, executed: str = '0') -> str:
+    return json.dumps({'e': 'executionReport', 'E': 1, 's': 'BTCUSDT', 'c': client_order_id, 'S': 'BUY',
+                       'o': 'LIMIT', 'f': 'GTC', 'q': '1', 'p': '30000', 'P': '0', 'X': status, 'i': 1,
+                       'z': executed, 'Z': '0', 'T': 1_700_000_000_000})
+
+
+class FakeWebSocket:
+    """依次推送消息，推送完后保持连接"""
+
+    def __init__(self, messages):
+        self.messages = list(messages)
+
+    async def __aiter__(self):
+        for message in self.messages:
+            await asyncio.sleep(0)
+            yield message
+        await asyncio.Event().wait()
+
+
+def test_events_during_open_orders_request_are_applied_after_snapshot():
+    stream = UserDataStream(journal=False)
+
+    def fetch_open_orders():
+        # 请求期间 a 已成交、b 新挂单，快照仍是请求开始时的状态
+        time.sleep(0.05)
+        return [{'clientOrderId': 'a', 'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'LIMIT', 'origQty': '1',
+                 'price': '30000', 'orderId': 1, 'status': 'NEW', 'executedQty': '0'}]
+
+    stream.fetch_open_orders = fetch_open_orders
+    websocket = FakeWebSocket([execution_report('a', 'FILLED', '1'), execution_report('b', 'NEW')])
+
+    async def connect():
+        buffered = await stream._load_open_orders(websocket)
+        assert stream.open_orders.get('a') is not None
+        assert all(stream._dispatch(event) for event in buffered)
+        return buffered
+
+    buffered = asyncio.run(connect())
+    assert [event['c'] for event in buffered] == ['a', 'b']
+    assert stream.open_orders.get('a') is None
+    assert stream.open_orders.get('b')['order_status'] == 'NEW'
+    assert stream.stats['executions'] == 2
+
+
+def test_listen_key_expired_stops_dispatch():
+    stream = UserDataStream(journal=False)
+    assert not stream._dispatch({'e': 'listenKeyExpired'})
+    assert stream._dispatch({'e': 'outboundAccountPosition', 'u': 1, 'B': [{'a': 'USDT', 'f': '10', 'l': '0'}]})
+    assert stream.balances['USDT']['free'] == 10.0
@@ -9,3 +9,26 @@ def execute_trade(decision, quantity=0.001):
     # 模拟交易输出，真实交易需调用 Binance API
     print(f"[Trader] Executing {action} order at price {price}, quantity {quantity}")
     # 可加入数据库记录或调用实际交易接口
+
+
+async def execute_trade_async(decision, symbol, gateway=None, quantity=0.001):
+    """
+    异步执行交易：提供 gateway（ExchangeBill.order_gateway.OrderGateway）时通过 WebSocket API 下市价单，
+    否则与 execute_trade 相同只输出；风控拒绝（RiskRejected）时只输出原因，返回 None
+    """
+    if not decision:
+        return None
+    if gateway is None:
+        execute_trade(decision, quantity)
+        return None
+
+    from ExchangeBill.risk_engine import RiskRejected
+
+    action, price = decision
+    try:
+        result = await gateway.place_order(symbol=symbol, side=action, type='MARKET', quantity=str(quantity))
+    except RiskRejected as e:
+        print(f"[Trader] {symbol} {action} order rejected by risk check: {e}")
+        return None
+    print(f"[Trader] {symbol} {action} order placed: {result.get('orderId')} {result.get('status')} (signal price {price})")
+    return result